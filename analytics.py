@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analyses de la flotte sur tout l'historique des ancrages, en NumPy.
+
+Les ancrages sont chargés une seule fois en colonnes (AnchorArrays :
+timestamp, routeur, jour du slot, numéro de slot, tx présente) ; c'est le
+seul parcours Python par ancrage. Chaque indicateur est ensuite une
+opération vectorisée sur ces colonnes (masques, np.unique, bincount, tri
+groupé), sans boucle par ancrage :
+
+- lag d'ancrage : timestamp de l'ancrage - fin du slot (même grille UTC que
+  tracing.slot_end) ; percentiles globaux et par routeur, part des slots
+  ancrés au-delà du SLA (ANALYTICS_LAG_SLA secondes)
+- couverture : slots distincts ancrés / slots attendus (144 par jour, slots
+  pas encore terminés exclus), du premier jour ancré du routeur (ou --since)
+  au dernier jour de la flotte (ou --until) ; trous = suites de slots
+  consécutifs jamais ancrés, plus grands trous de la flotte
+- breaches : routeurs en breach et slots compromis / slots vérifiés au
+  dernier envoi (état des routeurs, une ligne par routeur)
+- transactions par jour (UTC, jour de l'ancrage)
+
+Seul le premier ancrage d'un slot compte pour le lag et la couverture (comme
+AnchorIndex.find_slot) ; les ancrages en double sont comptés à part.
+
+numpy est optionnel pour le gateway (pip install numpy) : sans lui, les
+analyses lèvent AnalyticsUnavailable et le reste du service fonctionne.
+
+Rapport en ligne de commande (fichiers JSON du répertoire de données) :
+    python3 analytics.py report [--data-dir DIR] [--since AAAA-MM-JJ] [--until AAAA-MM-JJ]
+                                [--router ID] [--sla 3600] [--top 20] [--json]
+
+Exporte :
+- AnchorArrays(anchors, signature=None) : anchors est un itérable (liste ou flux)
+- fleet_report(arrays, routers=None, since=None, until=None, router_id=None, sla=..., now=None, top_gaps=20)
+- lag_stats, coverage_stats, breach_stats, daily_tx_counts
+- day_number(date) / day_string(day), AnalyticsUnavailable
+"""
+
+import os
+import sys
+import json
+import time
+import array
+import argparse
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+try:
+    import numpy as np  # Optionnel: pip install numpy
+except ImportError:
+    np = None
+
+SLOT_SECONDS = 600
+DAY_SECONDS = 86400
+SLOTS_PER_DAY = DAY_SECONDS // SLOT_SECONDS
+
+ANALYTICS_LAG_SLA = float(os.getenv("ANALYTICS_LAG_SLA", "3600"))
+LAG_PERCENTILES = (50, 90, 95, 99)
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class AnalyticsUnavailable(RuntimeError):
+    """numpy n'est pas installé"""
+
+
+def _require_numpy():
+    if np is None:
+        raise AnalyticsUnavailable("numpy requis pour les analyses (pip install numpy)")
+
+
+def day_number(value) -> int:
+    """Jours depuis le 1970-01-01 d'une date AAAA-MM-JJ, -1 si illisible"""
+    try:
+        return date.fromisoformat(str(value)).toordinal() - _EPOCH_ORDINAL
+    except ValueError:
+        return -1
+
+
+def day_string(day: int) -> str:
+    return (date(1970, 1, 1) + timedelta(days=int(day))).isoformat()
+
+
+def _epoch(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _slot_number(value) -> int:
+    try:
+        slot = int(value)
+    except (TypeError, ValueError):
+        return -1
+    return slot if 0 <= slot < SLOTS_PER_DAY else -1
+
+
+def _round(value, digits: int = 1):
+    return None if value is None or value != value else round(float(value), digits)
+
+
+# ============================================================================
+# COLONNES
+# ============================================================================
+
+class AnchorArrays:
+    """
+    Ancrages en colonnes, une ligne par ancrage dans l'ordre du fichier.
+    Les routeurs sont codés par entier (router_ids[code]) ; un ancrage sans
+    slot lisible (ancien format) a day = slot = -1.
+    """
+
+    def __init__(self, anchors: Iterable[dict], signature=None):
+        _require_numpy()
+        self.signature = signature
+        router_codes: Dict[str, int] = {}
+        day_codes: Dict[str, int] = {}
+
+        def router_code(router_id):
+            code = router_codes.get(router_id)
+            if code is None:
+                code = router_codes[router_id] = len(router_codes)
+            return code
+
+        def day_code(slot_date):
+            day = day_codes.get(slot_date)
+            if day is None:
+                day = day_codes[slot_date] = day_number(slot_date)
+            return day
+
+        # Un seul parcours (les ancrages peuvent arriver en flux) vers des colonnes compactes
+        columns = (array.array("d"), array.array("i"), array.array("i"), array.array("h"), array.array("b"))
+        timestamps, routers, days, slots, has_tx = columns
+        for a in anchors:
+            timestamps.append(_epoch(a.get("timestamp")))
+            routers.append(router_code(a.get("router_id")))
+            days.append(day_code(a.get("slot_date")))
+            slots.append(_slot_number(a.get("slot_id")))
+            has_tx.append(bool(a.get("txid")))
+        self.timestamp = np.frombuffer(timestamps, np.float64).copy()
+        self.router = np.frombuffer(routers, np.int32).copy()
+        self.day = np.frombuffer(days, np.int32).copy()
+        self.slot = np.frombuffer(slots, np.int16).copy()
+        self.has_tx = np.frombuffer(has_tx, np.int8).astype(np.bool_)
+        self.router_ids = list(router_codes)
+        self._router_codes = router_codes
+        self.has_slot = (self.day >= 0) & (self.slot >= 0) & ~np.isnan(self.timestamp)
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def router_code(self, router_id: str) -> Optional[int]:
+        return self._router_codes.get(router_id)
+
+    def slot_rows(self, since_day: Optional[int] = None, until_day: Optional[int] = None,
+                  router: Optional[int] = None):
+        """Indices du premier ancrage de chaque slot (routeur, jour, slot) dans la plage ; (indices, doublons)"""
+        mask = self.has_slot.copy()
+        if since_day is not None:
+            mask &= self.day >= since_day
+        if until_day is not None:
+            mask &= self.day <= until_day
+        if router is not None:
+            mask &= self.router == router
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return rows, 0
+        day = self.day[rows].astype(np.int64)
+        day_span = int(day.max() - day.min()) + 1
+        key = ((self.router[rows].astype(np.int64) * day_span + (day - day.min())) * SLOTS_PER_DAY
+               + self.slot[rows])
+        _, first = np.unique(key, return_index=True)  # première occurrence dans l'ordre du fichier
+        first.sort()
+        return rows[first], len(rows) - len(first)
+
+
+# ============================================================================
+# INDICATEURS
+# ============================================================================
+
+def _grouped_percentiles(groups, values, group_count: int, percentiles=LAG_PERCENTILES):
+    """(effectif par groupe, percentiles [groupe, p]) en interpolation linéaire, comme np.percentile"""
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    result = np.full((group_count, len(percentiles)), np.nan)
+    present = counts > 0
+    for column, pct in enumerate(percentiles):
+        position = starts[present] + (counts[present] - 1) * (pct / 100)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        result[present, column] = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+    return counts, result
+
+
+def lag_stats(arrays: AnchorArrays, rows, sla: float = ANALYTICS_LAG_SLA) -> tuple:
+    """(résumé global, {code routeur: résumé}) du lag ancrage - fin de slot, en secondes"""
+    lag = (arrays.timestamp[rows]
+           - (arrays.day[rows].astype(np.float64) * DAY_SECONDS
+              + (arrays.slot[rows].astype(np.float64) + 1) * SLOT_SECONDS))
+    late = lag > sla
+    fleet = {"count": int(len(lag)), "sla_seconds": sla, "late": int(late.sum()),
+             "late_rate": _round(late.mean(), 4) if len(lag) else None}
+    if len(lag):
+        fleet.update({"mean": _round(lag.mean()), "max": _round(lag.max()), "min": _round(lag.min())})
+        fleet.update({f"p{pct}": _round(value) for pct, value in zip(LAG_PERCENTILES, np.percentile(lag, LAG_PERCENTILES))})
+
+    groups = arrays.router[rows]
+    counts, percentiles = _grouped_percentiles(groups, lag, len(arrays.router_ids))
+    late_counts = np.bincount(groups[late], minlength=len(arrays.router_ids))
+    per_router = {}
+    for code in np.flatnonzero(counts):
+        entry = {f"lag_p{pct}": _round(value) for pct, value in zip(LAG_PERCENTILES, percentiles[code])}
+        entry.update({"late": int(late_counts[code]), "late_rate": _round(late_counts[code] / counts[code], 4)})
+        per_router[int(code)] = entry
+    return fleet, per_router
+
+
+def coverage_stats(arrays: AnchorArrays, rows, since_day: Optional[int] = None, until_day: Optional[int] = None,
+                   now: Optional[float] = None, top_gaps: int = 20) -> tuple:
+    """
+    (résumé global, {code routeur: couverture}) sur une grille booléenne
+    [routeur, jour, slot] mise à plat (un octet par slot attendu).
+    """
+    now = time.time() if now is None else now
+    fleet = {"expected_slots": 0, "anchored_slots": 0, "coverage": None, "gaps": 0,
+             "missing_slots": 0, "longest_gap_slots": 0, "largest_gaps": []}
+    if not len(rows):
+        return fleet, {}
+    router_count = len(arrays.router_ids)
+    routers, days, slots = arrays.router[rows], arrays.day[rows].astype(np.int64), arrays.slot[rows]
+
+    # Plage par routeur : premier jour ancré (ou since) -> dernier jour de la flotte (ou until), bornée à aujourd'hui
+    today = int(now // DAY_SECONDS)
+    last_day = int(arrays.day[arrays.has_slot].max())
+    end_day = min(until_day if until_day is not None else last_day, today)
+    first_day = np.full(router_count, np.iinfo(np.int64).max)
+    np.minimum.at(first_day, routers, days)
+    seen = np.bincount(routers, minlength=router_count) > 0
+    start = np.where(seen, first_day if since_day is None else since_day, end_day + 1)
+    day_count = np.maximum(end_day - start + 1, 0)
+    offsets = np.concatenate(([0], np.cumsum(day_count * SLOTS_PER_DAY)))
+
+    grid = np.zeros(int(offsets[-1]), np.bool_)
+    inside = days <= end_day
+    cells = (offsets[routers[inside]] + (days[inside] - start[routers[inside]]) * SLOTS_PER_DAY
+             + slots[inside])
+    grid[cells] = True
+
+    # Slots pas encore terminés aujourd'hui : ni attendus ni manquants (fin de segment)
+    future = np.zeros(router_count, np.int64)
+    if end_day == today:
+        finished_today = int((now - today * DAY_SECONDS) // SLOT_SECONDS)
+        future[day_count > 0] = SLOTS_PER_DAY - finished_today
+        for code in np.flatnonzero(future):
+            grid[offsets[code + 1] - future[code]:offsets[code + 1]] = True
+    expected = day_count * SLOTS_PER_DAY - future
+    anchored = np.zeros(router_count, np.int64)
+    if len(grid):
+        anchored[day_count > 0] = np.add.reduceat(grid, offsets[:-1][day_count > 0], dtype=np.int64)
+    anchored -= future
+
+    # Trous : débuts et fins des suites de slots manquants, sans franchir une limite de routeur
+    missing = ~grid
+    segment_starts = offsets[:-1][day_count > 0]
+    previous = np.zeros_like(missing)
+    previous[1:] = missing[:-1]
+    previous[segment_starts] = False
+    following = np.zeros_like(missing)
+    following[:-1] = missing[1:]
+    following[offsets[1:][day_count > 0] - 1] = False
+    gap_starts = np.flatnonzero(missing & ~previous)
+    gap_lengths = np.flatnonzero(missing & ~following) + 1 - gap_starts
+    gap_routers = np.searchsorted(offsets, gap_starts, side="right") - 1
+    gap_counts = np.bincount(gap_routers, minlength=router_count)
+    longest = np.zeros(router_count, np.int64)
+    np.maximum.at(longest, gap_routers, gap_lengths)
+
+    per_router = {}
+    for code in np.flatnonzero(expected > 0):
+        per_router[int(code)] = {
+            "first_date": day_string(start[code]),
+            "last_date": day_string(end_day),
+            "expected_slots": int(expected[code]),
+            "anchored_slots": int(anchored[code]),
+            "coverage": _round(anchored[code] / expected[code], 4),
+            "gaps": int(gap_counts[code]),
+            "longest_gap_slots": int(longest[code]),
+        }
+
+    largest = np.argsort(gap_lengths, kind="stable")[::-1][:top_gaps]
+    largest_gaps = []
+    for index in largest:
+        code = int(gap_routers[index])
+        local = int(gap_starts[index] - offsets[code])
+        largest_gaps.append({
+            "router_id": arrays.router_ids[code],
+            "date": day_string(start[code] + local // SLOTS_PER_DAY),
+            "slot": local % SLOTS_PER_DAY,
+            "length_slots": int(gap_lengths[index]),
+        })
+    total_expected = int(expected.sum())
+    fleet.update({
+        "expected_slots": total_expected,
+        "anchored_slots": int(anchored.sum()),
+        "coverage": _round(anchored.sum() / total_expected, 4) if total_expected else None,
+        "gaps": int(len(gap_starts)),
+        "missing_slots": int(gap_lengths.sum()),
+        "longest_gap_slots": int(gap_lengths.max()) if len(gap_lengths) else 0,
+        "largest_gaps": largest_gaps,
+    })
+    return fleet, per_router
+
+
+def breach_stats(routers: dict, router_id: Optional[str] = None) -> dict:
+    """Breaches au dernier envoi des routeurs (une valeur par routeur : pas de colonnes)"""
+    if router_id is not None:
+        routers = {router_id: routers[router_id]} if router_id in routers else {}
+    with_slots = [info for info in routers.values() if info.get("slots")]
+    in_breach = [info for info in with_slots if info.get("security_status") == "breach"]
+    compromised = sum(len(info.get("compromised_slots") or []) for info in with_slots)
+    verified = compromised + sum(len(info.get("secure_slots") or []) for info in with_slots
+                                 if info.get("security_status") != "breach")
+    return {
+        "routers_reporting": len(with_slots),
+        "routers_in_breach": len(in_breach),
+        "router_breach_rate": _round(len(in_breach) / len(with_slots), 4) if with_slots else None,
+        "compromised_slots": compromised,
+        "verified_slots": verified,
+        "slot_breach_rate": _round(compromised / verified, 4) if verified else None,
+    }
+
+
+def daily_tx_counts(arrays: AnchorArrays, since_day: Optional[int] = None, until_day: Optional[int] = None,
+                    router: Optional[int] = None) -> list:
+    """Transactions d'ancrage par jour UTC (jours sans tx inclus, entre le premier et le dernier jour)"""
+    mask = arrays.has_tx & ~np.isnan(arrays.timestamp)
+    if router is not None:
+        mask &= arrays.router == router
+    days = (arrays.timestamp[mask] // DAY_SECONDS).astype(np.int64)
+    if since_day is not None:
+        days = days[days >= since_day]
+    if until_day is not None:
+        days = days[days <= until_day]
+    if not len(days):
+        return []
+    first = int(days.min())
+    counts = np.bincount(days - first)
+    return [{"date": day_string(first + offset), "tx": int(count)} for offset, count in enumerate(counts)]
+
+
+def fleet_report(arrays: AnchorArrays, routers: Optional[dict] = None, since: Optional[str] = None,
+                 until: Optional[str] = None, router_id: Optional[str] = None, sla: float = ANALYTICS_LAG_SLA,
+                 now: Optional[float] = None, top_gaps: int = 20) -> dict:
+    """Rapport complet ; since / until : dates AAAA-MM-JJ incluses (ValueError si illisibles)"""
+    started = time.perf_counter()
+    since_day = until_day = None
+    if since:
+        since_day = day_number(since)
+        if since_day < 0:
+            raise ValueError(f"date invalide: {since}")
+    if until:
+        until_day = day_number(until)
+        if until_day < 0:
+            raise ValueError(f"date invalide: {until}")
+    routers = routers or {}
+    router = arrays.router_code(router_id) if router_id is not None else None
+    if router_id is not None and router is None:
+        rows, duplicates = np.empty(0, np.int64), 0
+    else:
+        rows, duplicates = arrays.slot_rows(since_day, until_day, router)
+
+    lag, lag_by_router = lag_stats(arrays, rows, sla)
+    coverage, coverage_by_router = coverage_stats(arrays, rows, since_day, until_day, now, top_gaps)
+    per_router = {}
+    for code in sorted(set(lag_by_router) | set(coverage_by_router)):
+        per_router[arrays.router_ids[code]] = {**coverage_by_router.get(code, {}), **lag_by_router.get(code, {})}
+    daily = ([] if router_id is not None and router is None
+             else daily_tx_counts(arrays, since_day, until_day, router))
+
+    return {
+        "since": since,
+        "until": until,
+        "router_id": router_id,
+        "anchors": int(len(arrays)),
+        "slots_anchored": int(len(rows)),
+        "duplicate_anchors": int(duplicates),
+        "lag_seconds": lag,
+        "coverage": coverage,
+        "breaches": breach_stats(routers, router_id),
+        "daily_tx": daily,
+        "routers": per_router,
+        "never_anchored": sorted(r for r in routers if arrays.router_code(r) is None
+                                 and (router_id is None or r == router_id)),
+        "compute_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def _load_routers(data_dir: Path) -> dict:
+    routers_file = data_dir / "routers.json"
+    if routers_file.exists():
+        return json.loads(routers_file.read_text())
+    if (data_dir / "snr_routers.db").exists():
+        os.environ.setdefault("SNR_DB_PATH", str(data_dir / "snr_routers.db"))
+        from database import get_all_routers
+        return get_all_routers()
+    return {}
+
+
+def report(args) -> None:
+    data_dir = Path(args.data_dir)
+    anchors_file = data_dir / "anchors.json"
+    if not anchors_file.exists():
+        raise SystemExit(f"❌ {anchors_file} introuvable")
+    try:
+        _require_numpy()
+    except AnalyticsUnavailable as e:
+        raise SystemExit(f"❌ {e}")
+
+    started = time.perf_counter()
+    arrays = AnchorArrays(json.loads(anchors_file.read_text()))
+    load_ms = (time.perf_counter() - started) * 1000
+    try:
+        result = fleet_report(arrays, _load_routers(data_dir), args.since, args.until, args.router,
+                              args.sla, top_gaps=args.top)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+
+    lag, coverage, breaches = result["lag_seconds"], result["coverage"], result["breaches"]
+    print(f"📊 {result['anchors']} ancrages, {result['slots_anchored']} slots ancrés "
+          f"({result['duplicate_anchors']} doublons) — chargement {load_ms:.0f} ms, calcul {result['compute_ms']:.0f} ms")
+    if lag["count"]:
+        print(f"⏱️  Lag d'ancrage: p50={lag['p50']}s p90={lag['p90']}s p95={lag['p95']}s p99={lag['p99']}s "
+              f"max={lag['max']}s — {lag['late']} au-delà de {lag['sla_seconds']:.0f}s ({lag['late_rate']:.2%})")
+    if coverage["expected_slots"]:
+        print(f"🧩 Couverture: {coverage['anchored_slots']}/{coverage['expected_slots']} slots "
+              f"({coverage['coverage']:.2%}), {coverage['gaps']} trous, {coverage['missing_slots']} slots manquants, "
+              f"plus long {coverage['longest_gap_slots']} slots")
+        for gap in coverage["largest_gaps"][:args.top]:
+            print(f"   {gap['router_id'][:16]:16} {gap['date']} slot {gap['slot']:>3}  {gap['length_slots']} slots")
+    print(f"🚨 Breaches: {breaches['routers_in_breach']}/{breaches['routers_reporting']} routeurs, "
+          f"{breaches['compromised_slots']}/{breaches['verified_slots']} slots compromis")
+    if result["daily_tx"]:
+        counts = [day["tx"] for day in result["daily_tx"]]
+        print(f"🔗 Transactions: {sum(counts)} sur {len(counts)} jours "
+              f"(min {min(counts)}/jour, max {max(counts)}/jour, {counts.count(0)} jours sans tx)")
+    worst = sorted(result["routers"].items(), key=lambda item: item[1].get("coverage") or 0)[:args.top]
+    for router_id, entry in worst:
+        print(f"   {router_id[:16]:16} couverture={entry.get('coverage') or 0:.2%} trous={entry.get('gaps', 0)} "
+              f"lag p95={entry.get('lag_p95')}s")
+    if result["never_anchored"]:
+        print(f"⚠️  {len(result['never_anchored'])} routeur(s) jamais ancré(s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyses de lag d'ancrage et de couverture de la flotte")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report_parser = commands.add_parser("report", help="rapport sur les fichiers du répertoire de données")
+    report_parser.add_argument("--data-dir", default=os.getenv("SNR_DATA_DIR", str(Path(__file__).parent / "data")))
+    report_parser.add_argument("--since", help="premier jour de slot (AAAA-MM-JJ)")
+    report_parser.add_argument("--until", help="dernier jour de slot (AAAA-MM-JJ)")
+    report_parser.add_argument("--router", help="un seul routeur")
+    report_parser.add_argument("--sla", type=float, default=ANALYTICS_LAG_SLA, help="lag maximal attendu (secondes)")
+    report_parser.add_argument("--top", type=int, default=20, help="plus grands trous / routeurs les moins couverts")
+    report_parser.add_argument("--json", action="store_true", help="rapport complet en JSON")
+    args = parser.parse_args(argv)
+    report(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
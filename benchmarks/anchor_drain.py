@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Banc d'ancrage hors ligne : vide un arriéré de slots finalisés non ancrés
+avec la chaîne simulée (chain_provider.SimulatedChain) et mesure le débit
+d'ancrage (ancrages/min) et le temps de vidage de l'arriéré.
+
+La flotte est celle de fleet_load (mêmes slots) sans ancrage existant.
+Chaque passage appelle anchor_pending_slots() du gateway (le corps du thread
+d'auto-ancrage) jusqu'à ce que plus rien ne soit en attente ou que
+--max-passes soit atteint (les erreurs simulées laissent des slots pour le
+passage suivant).
+
+Usage :
+    python3 benchmarks/anchor_drain.py [--routers 10] [--days 1] [--finalized 0.8]
+                                       [--latency 0.05] [--jitter 0.02] [--error-rate 0.01]
+                                       [--block-time 5] [--max-passes 5] [--mode json|db]
+                                       [-o resultats.json] [--verbose]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import contextlib
+from pathlib import Path
+
+from fleet_load import ROOT, Fleet, seed_data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vidage d'un arriéré d'ancrages sur une chaîne simulée")
+    parser.add_argument("--routers", type=int, default=10)
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--finalized", type=float, default=0.8)
+    parser.add_argument("--latency", type=float, default=0.05, help="latence par appel (s)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="variation de latence (s)")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="part des appels en erreur")
+    parser.add_argument("--block-time", type=float, default=5, help="temps de bloc simulé (s)")
+    parser.add_argument("--max-passes", type=int, default=5)
+    parser.add_argument("--mode", choices=("json", "db"), default="json")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", help="fichier JSON de résultats")
+    parser.add_argument("--verbose", action="store_true", help="afficher la sortie du gateway")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.TemporaryDirectory(prefix="snr-drain-")
+    data_dir = Path(tmp.name)
+    # Configuration lue à l'import par writer / chain_provider / gateway
+    os.environ.update({
+        "SNR_DATA_DIR": str(data_dir),
+        "SNR_DB_PATH": str(data_dir / "snr_routers.db"),
+        "ENABLE_DATABASE": "true" if args.mode == "db" else "false",
+        "CHAIN_PROVIDER": "simulated",
+        "SIM_CHAIN_LATENCY": str(args.latency),
+        "SIM_CHAIN_JITTER": str(args.jitter),
+        "SIM_CHAIN_ERROR_RATE": str(args.error_rate),
+        "SIM_CHAIN_BLOCK_TIME": str(args.block_time),
+    })
+    sys.path.insert(0, str(ROOT))
+
+    fleet = Fleet(args.routers, args.days, args.finalized, anchored=0.0, tampered=0.0, seed=args.seed)
+    seed_data(fleet, data_dir, args.mode)
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        import snr_bsv_gateway as gateway
+        import writer
+    backlog = sum(
+        1 for router in gateway.load_routers().values()
+        for slot in router.get("slots", []) if slot.get("finalized") and slot.get("slot_hash")
+    )
+    print(f"⛓️  Arriéré: {backlog} slots ({args.routers} routeurs), latence {args.latency}s, "
+          f"erreurs {args.error_rate:.0%}, bloc {args.block_time}s")
+
+    passes, anchored, failures = [], 0, 0
+    started = time.perf_counter()
+    for number in range(1, args.max_passes + 1):
+        pass_started = time.perf_counter()
+        with quiet:
+            done, failed = gateway.anchor_pending_slots()
+        passes.append({"pass": number, "anchored": done, "failures": failed,
+                       "seconds": round(time.perf_counter() - pass_started, 3)})
+        anchored += done
+        failures += failed
+        print(f"   passage {number}: {done} ancrés, {failed} échecs, {passes[-1]['seconds']}s")
+        if failed == 0:
+            break
+    elapsed = time.perf_counter() - started
+
+    # Confirmation : attendre le bloc suivant puis interroger le statut des tx
+    anchors = gateway.load_anchors()
+    time.sleep(min(args.block_time, 30))
+    writer.PROVIDER.error_rate = 0
+    confirmed = sum(1 for a in anchors if (writer.get_tx_status(a["txid"]) or {}).get("confirmations", 0) > 0)
+
+    result = {
+        "config": vars(args),
+        "backlog": backlog,
+        "anchored": anchored,
+        "failures": failures,
+        "remaining": backlog - anchored,
+        "drain_seconds": round(elapsed, 3),
+        "anchors_per_minute": round(anchored / elapsed * 60, 1) if elapsed else 0.0,
+        "confirmed_after_one_block": confirmed,
+        "passes": passes,
+        "provider": writer.PROVIDER.stats,
+    }
+    print(f"📊 {anchored}/{backlog} ancrés en {result['drain_seconds']}s "
+          f"({result['anchors_per_minute']} ancrages/min), {failures} échecs, {confirmed} confirmés")
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+        print(f"💾 Résultats: {args.output}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Banc de charge de /anchor : simule une flotte de N routeurs et mesure le
+débit, la latence (p50/p95/p99) et les octets écrits par le gateway.
+
+Chaque routeur envoie ses slots de 10 minutes (144 par jour) : une part est
+finalisée, la plupart des slots finalisés sont déjà ancrés (anchors.json) et
+une petite part est falsifiée (slot_hash différent de l'ancrage -> breach).
+
+Chaque configuration (mode JSON ou ENABLE_DATABASE × taille de flotte) tourne
+dans un sous-process isolé : le gateway lit sa configuration à l'import, et
+ses données vont dans un répertoire temporaire (SNR_DATA_DIR, SNR_DB_PATH).
+
+Les données initiales (routers.json / SQLite, anchors.json) grossissent avec
+la flotte : ~20 Ko de slots par routeur et par jour simulé. Les grandes
+flottes (100000) sont à lancer explicitement via --fleet.
+
+Usage :
+    python3 benchmarks/fleet_load.py [--fleet 10,100,1000] [--modes json,db]
+                                     [--requests 1000] [--rate 0] [--concurrency 1]
+                                     [--transport client|http] [--days 1]
+                                     [--finalized 0.8] [--anchored 0.9] [--tampered 0.01]
+                                     [--seed 42] [-o resultats.json] [--verbose]
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import tempfile
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = Path(__file__).resolve().parent.parent
+SLOTS_PER_DAY = 144
+MODES = ("json", "db")
+
+
+# ============================================================================
+# FLOTTE SIMULÉE
+# ============================================================================
+
+def _slot_hash(router_id: str, date: str, slot: int, salt: str = "") -> str:
+    return hashlib.sha256(f"{router_id}|{date}|{slot}{salt}".encode()).hexdigest()
+
+
+class Fleet:
+    """Routeurs, slots et ancrages déterministes (graine fixe)"""
+
+    def __init__(self, size: int, days: int, finalized: float, anchored: float, tampered: float, seed: int):
+        self.size = size
+        self.rng = random.Random(seed)
+        today = datetime.now(timezone.utc).date()
+        self.dates = [(today - timedelta(days=d)).strftime("%Y-%m-%d") for d in reversed(range(days))]
+        self.router_ids = [f"bench-{i:06d}" for i in range(size)]
+        self.finalized, self.anchored, self.tampered = finalized, anchored, tampered
+
+    def router_slots(self, router_id: str) -> tuple:
+        """(slots envoyés par le routeur, ancrages existants pour ce routeur)"""
+        rng = random.Random(router_id)
+        slots, anchors = [], []
+        for date in self.dates:
+            for slot in range(SLOTS_PER_DAY):
+                is_final = rng.random() < self.finalized
+                anchored_hash = _slot_hash(router_id, date, slot)
+                sent_hash = anchored_hash
+                if is_final and rng.random() < self.tampered:
+                    sent_hash = _slot_hash(router_id, date, slot, salt="tampered")
+                slots.append({"slot": slot, "date": date, "slot_hash": sent_hash, "finalized": is_final})
+                if is_final and rng.random() < self.anchored:
+                    anchors.append({
+                        "txid": hashlib.sha256(anchored_hash.encode()).hexdigest(),
+                        "snr_hash": anchored_hash,
+                        "timestamp": int(time.time()) - rng.randint(0, 86400),
+                        "router_id": router_id,
+                        "slot_id": slot,
+                        "slot_date": date,
+                    })
+        return slots, anchors
+
+    def payload(self, router_id: str, slots: list) -> dict:
+        return {
+            "router_id": router_id,
+            "router_name": f"Bench {router_id[-6:]}",
+            "router_mac": "02:00:00:00:00:00",
+            "timestamp": int(time.time()),
+            "global_hash": hashlib.sha256(router_id.encode()).hexdigest(),
+            "slots": slots,
+        }
+
+
+def seed_data(fleet: Fleet, data_dir: Path, mode: str) -> dict:
+    """Écrit l'état initial de la flotte ; retourne les slots de chaque routeur"""
+    all_slots, routers, anchors = {}, {}, []
+    now = int(time.time())
+    for router_id in fleet.router_ids:
+        slots, router_anchors = fleet.router_slots(router_id)
+        all_slots[router_id] = slots
+        anchors.extend(router_anchors)
+        routers[router_id] = {
+            "name": f"Bench {router_id[-6:]}",
+            "first_seen": now - 86400,
+            "last_seen": now - 60,
+            "security_status": "secure",
+            "slots": slots,
+        }
+    (data_dir / "anchors.json").write_text(json.dumps(anchors, indent=2))
+    if mode == "json":
+        (data_dir / "routers.json").write_text(json.dumps(routers, indent=2))
+    else:
+        from database import init_db, add_or_update_router
+        init_db()
+        for router_id, info in routers.items():
+            add_or_update_router(router_id, {"name": info["name"], "security_status": "secure"})
+    return all_slots
+
+
+# ============================================================================
+# MESURES
+# ============================================================================
+
+def _written_bytes() -> int:
+    """Octets passés à write() par ce process (Linux), None si indisponible"""
+    try:
+        for line in Path("/proc/self/io").read_text().splitlines():
+            if line.startswith("wchar:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def percentile(values: list, pct: float) -> float:
+    """Percentile au rang le plus proche (values trié)"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[rank]
+
+
+# ============================================================================
+# TRANSPORTS
+# ============================================================================
+
+class TestClientTransport:
+    """Appels in-process via le client de test Flask (un client par thread)"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def post(self, path: str, payload: dict) -> tuple:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.post(path, json=payload)
+        return response.status_code, response.get_json(silent=True) or {}
+
+    def close(self):
+        pass
+
+
+class HTTPTransport:
+    """Appels HTTP sur un serveur werkzeug local (threadé) lancé dans ce process"""
+
+    def __init__(self, app):
+        import requests
+        from werkzeug.serving import make_server, WSGIRequestHandler
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass  # une ligne de log par requête fausserait la mesure
+
+        self._requests = requests
+        self.server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self._local = threading.local()
+
+    def post(self, path: str, payload: dict) -> tuple:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        response = session.post(self.base_url + path, json=payload, timeout=120)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        return response.status_code, body
+
+    def close(self):
+        self.server.shutdown()
+
+
+TRANSPORTS = {"client": TestClientTransport, "http": HTTPTransport}
+
+
+# ============================================================================
+# WORKER (une configuration, process isolé)
+# ============================================================================
+
+def run_worker(args) -> dict:
+    data_dir = Path(os.environ["SNR_DATA_DIR"])
+    fleet = Fleet(args.routers, args.days, args.finalized, args.anchored, args.tampered, args.seed)
+
+    seed_started = time.perf_counter()
+    all_slots = seed_data(fleet, data_dir, args.mode)
+    seed_seconds = time.perf_counter() - seed_started
+    bytes_before = _dir_size(data_dir)
+
+    sys.path.insert(0, str(ROOT))
+    import snr_bsv_gateway as gateway
+    if args.mode == "db" and not gateway.USE_DATABASE:
+        raise RuntimeError("mode db demandé mais la base SQLite n'a pas pu être activée")
+
+    order = list(fleet.router_ids)
+    fleet.rng.shuffle(order)
+    transport = TRANSPORTS[args.transport](gateway.app)
+    latencies = [0.0] * args.requests
+    statuses, breaches = {}, 0
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+
+    def worker_loop(started: float):
+        nonlocal breaches
+        for i in counter:
+            if args.rate > 0:
+                delay = started + i / args.rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            router_id = order[i % len(order)]
+            payload = fleet.payload(router_id, all_slots[router_id])
+            t0 = time.perf_counter()
+            try:
+                status, body = transport.post("/anchor", payload)
+            except Exception as e:
+                status, body = f"exception:{type(e).__name__}", {}
+            latencies[i] = time.perf_counter() - t0
+            with lock:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if body.get("breach_detected"):
+                    breaches += 1
+
+    written_before = _written_bytes()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for future in [pool.submit(worker_loop, started) for _ in range(args.concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    written_after = _written_bytes()
+    transport.close()
+
+    latencies.sort()
+    ok = statuses.get("200", 0)
+    return {
+        "mode": args.mode,
+        "routers": args.routers,
+        "transport": args.transport,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "target_rate": args.rate,
+        "slots_per_request": SLOTS_PER_DAY * args.days,
+        "seed_seconds": round(seed_seconds, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        "statuses": statuses,
+        "breach_responses": breaches,
+        "bytes_written": written_after - written_before if written_before is not None else None,
+        "bytes_written_per_request": (
+            round((written_after - written_before) / args.requests) if written_before is not None and args.requests else None
+        ),
+        "data_bytes_before": bytes_before,
+        "data_bytes_after": _dir_size(data_dir),
+    }
+
+
+# ============================================================================
+# ORCHESTRATION
+# ============================================================================
+
+def run_config(mode: str, routers: int, args) -> dict:
+    """Lance une configuration dans un sous-process avec un répertoire de données jetable"""
+    with tempfile.TemporaryDirectory(prefix="snr-bench-") as tmp:
+        result_path = Path(tmp) / "result.json"
+        data_dir = Path(tmp) / "data"
+        data_dir.mkdir()
+        env = dict(os.environ)
+        env.update({
+            "SNR_DATA_DIR": str(data_dir),
+            "SNR_DB_PATH": str(data_dir / "snr_routers.db"),
+            "ENABLE_DATABASE": "true" if mode == "db" else "false",
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")])),
+        })
+        command = [
+            sys.executable, __file__, "--worker", "--mode", mode, "--routers", str(routers),
+            "--requests", str(args.requests), "--rate", str(args.rate),
+            "--concurrency", str(args.concurrency), "--transport", args.transport,
+            "--days", str(args.days), "--finalized", str(args.finalized),
+            "--anchored", str(args.anchored), "--tampered", str(args.tampered),
+            "--seed", str(args.seed), "--result", str(result_path),
+        ]
+        output = None if args.verbose else subprocess.DEVNULL
+        completed = subprocess.run(command, env=env, stdout=output)
+        if completed.returncode != 0 or not result_path.exists():
+            return {"mode": mode, "routers": routers, "error": f"code retour {completed.returncode}"}
+        return json.loads(result_path.read_text())
+
+
+def _format_bytes(value) -> str:
+    if value is None:
+        return "n/a"
+    for unit in ("o", "Ko", "Mo", "Go"):
+        if abs(value) < 1024 or unit == "Go":
+            return f"{value:.0f} {unit}" if unit == "o" else f"{value:.1f} {unit}"
+        value /= 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de charge /anchor pour une flotte de routeurs simulée")
+    parser.add_argument("--fleet", default="10,100,1000", help="tailles de flotte, séparées par des virgules")
+    parser.add_argument("--modes", default="json,db", help="json, db ou json,db")
+    parser.add_argument("--requests", type=int, default=1000, help="requêtes /anchor par configuration")
+    parser.add_argument("--rate", type=float, default=0, help="requêtes/s visées (0 = au plus vite)")
+    parser.add_argument("--concurrency", type=int, default=1, help="clients simultanés")
+    parser.add_argument("--transport", choices=tuple(TRANSPORTS), default="client")
+    parser.add_argument("--days", type=int, default=1, help="jours de slots envoyés par requête")
+    parser.add_argument("--finalized", type=float, default=0.8, help="part des slots finalisés")
+    parser.add_argument("--anchored", type=float, default=0.9, help="part des slots finalisés déjà ancrés")
+    parser.add_argument("--tampered", type=float, default=0.01, help="part des slots finalisés falsifiés")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", help="fichier JSON de résultats")
+    parser.add_argument("--verbose", action="store_true", help="afficher la sortie du gateway")
+    # Interne : exécution d'une configuration dans le sous-process
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--routers", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        Path(args.result).write_text(json.dumps(run_worker(args)))
+        return
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"mode inconnu: {mode}")
+    sizes = [int(size) for size in args.fleet.split(",") if size.strip()]
+
+    results = []
+    print(f"🚀 Banc /anchor: {args.requests} requêtes, transport={args.transport}, concurrence={args.concurrency}")
+    for mode in modes:
+        for size in sizes:
+            result = run_config(mode, size, args)
+            results.append(result)
+            if "error" in result:
+                print(f"❌ {mode:4} {size:>7} routeurs: {result['error']}")
+                continue
+            latency = result["latency_ms"]
+            print(f"📊 {mode:4} {size:>7} routeurs: {result['throughput_rps']:>8.1f} req/s  "
+                  f"p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms p99={latency['p99']:.1f}ms  "
+                  f"écrit={_format_bytes(result['bytes_written'])} "
+                  f"({_format_bytes(result['bytes_written_per_request'])}/req)  "
+                  f"statuts={result['statuses']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"config": vars(args), "results": results}, indent=2))
+        print(f"💾 Résultats: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmarks des fonctions chaudes du gateway, avec baselines JSON et
+seuils de régression.
+
+Tout tourne hors ligne : données dans un répertoire temporaire
+(SNR_DATA_DIR), chaîne simulée sans latence (CHAIN_PROVIDER=simulated).
+
+Chaque cas est mesuré comme timeit : le nombre d'appels par échantillon est
+calibré pour durer au moins --min-time, puis on garde la médiane (et le
+minimum) du temps par appel sur --repeat échantillons.
+
+Baselines : benchmarks/baselines.json, {cas: {"seconds": médiane,
+"threshold": tolérance optionnelle}}. Un cas est en régression si sa médiane
+dépasse baseline × (1 + seuil) ; le code retour vaut alors 1. Les baselines
+dépendent de la machine : les régénérer (--save-baseline) sur la machine
+qui compare.
+
+Usage :
+    python3 benchmarks/microbench.py [--filter MOT] [--quick] [--repeat 5] [--min-time 0.2]
+                                     [--threshold 0.25] [--baseline FICHIER]
+                                     [--save-baseline] [-o resultats.json] [--list]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import platform
+import tempfile
+import argparse
+import contextlib
+import statistics
+from pathlib import Path
+from datetime import datetime
+
+from fleet_load import ROOT, Fleet
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baselines.json"
+DEFAULT_THRESHOLD = 0.25
+
+
+class Case:
+    def __init__(self, name: str, fn, setup=None, repeat: int = None, group: str = ""):
+        self.name, self.fn, self.setup, self.repeat, self.group = name, fn, setup, repeat, group
+
+
+def measure(fn, repeat: int, min_time: float) -> dict:
+    """Temps par appel : médiane et minimum sur repeat échantillons d'au moins min_time"""
+    fn()  # échauffement : index et caches construits hors mesure
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number = min(1_000_000, number * (10 if elapsed < min_time / 10 else 2))
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return {"seconds": statistics.median(samples), "min_seconds": min(samples), "number": number, "repeat": repeat}
+
+
+# ============================================================================
+# JEUX DE DONNÉES
+# ============================================================================
+
+def make_anchors(count: int, routers: int = 100) -> list:
+    rng = random.Random(count)
+    now = int(time.time())
+    anchors = []
+    for i in range(count):
+        slot_hash = hashlib.sha256(str(i).encode()).hexdigest()
+        anchors.append({
+            "txid": hashlib.sha256(slot_hash.encode()).hexdigest(),
+            "snr_hash": slot_hash,
+            "timestamp": now - rng.randint(0, 30 * 86400),
+            "router_id": f"bench-{i % routers:06d}",
+            "slot_id": (i // routers) % 144,
+            "slot_date": f"2026-01-{1 + (i // (routers * 144)) % 28:02d}",
+        })
+    return anchors
+
+
+def make_chain(count: int) -> list:
+    """Blocks forensiques chaînés valides (chain_hash = sha256(prev || logs))"""
+    blocks, prev = [], bytes(32)
+    for i in range(count):
+        logs = hashlib.sha256(str(i).encode()).digest()
+        chain = hashlib.sha256(prev + logs).digest()
+        blocks.append({"prev_hash": prev.hex(), "logs_hash": logs.hex(), "chain_hash": chain.hex(),
+                       "timestamp": 1_760_000_000 + i * 30})
+        prev = chain
+    return blocks
+
+
+class Workspace:
+    """Installe des jeux de données dans le répertoire du gateway"""
+
+    def __init__(self, gateway, data_dir: Path):
+        self.gw, self.data_dir = gateway, data_dir
+        self.current = {}
+
+    def _write(self, name: str, key, build) -> None:
+        if self.current.get(name) != key:
+            (self.data_dir / name).write_text(json.dumps(build(), indent=2))
+            self.current[name] = key
+            self.gw.invalidate_read_caches()
+
+    def anchors(self, count: int) -> None:
+        self._write("anchors.json", count, lambda: make_anchors(count))
+
+    def fleet(self, size: int) -> None:
+        def build():
+            fleet = Fleet(size, 1, 0.8, 0.9, 0.01, seed=size)
+            now = int(time.time())
+            return {router_id: {"name": router_id, "last_seen": now - 20, "security_status": "secure",
+                                "local_hash": "aa" * 32, "blockchain_hash": "aa" * 32,
+                                "anchored_local_hash": "aa" * 32, "slots": fleet.router_slots(router_id)[0]}
+                    for router_id in fleet.router_ids}
+        self._write("routers.json", size, build)
+
+
+# ============================================================================
+# CAS
+# ============================================================================
+
+def build_cases(gw, ws: Workspace, quick: bool) -> list:
+    import writer
+    from forensic_verify import verify_blocks
+
+    cases = []
+    anchor_sizes = (10_000, 100_000) if quick else (10_000, 100_000, 1_000_000)
+    fleet_sizes = (10, 1_000) if quick else (10, 1_000, 10_000)
+
+    # OP_RETURN : push direct (32 octets), OP_PUSHDATA1 et OP_PUSHDATA2
+    scripts = {
+        "push32": "006a20" + "ab" * 32,
+        "pushdata1": "006a4c50" + "cd" * 80,
+        "pushdata2": "006a4d0001" + "ef" * 256,
+    }
+    for label, script in scripts.items():
+        cases.append(Case(f"parse_op_return_hex[{label}]", lambda s=script: writer._parse_op_return_hex(s),
+                          group="writer"))
+
+    # Vérification des slots reçus par anchor() (index en mémoire, 1 et 7 jours de slots)
+    def slot_setup():
+        ws.anchors(100_000)
+        ws.fleet(10)
+    router_id = "bench-000000"
+    day_slots = Fleet(1, 1, 0.8, 0.9, 0.01, seed=1).router_slots(router_id)[0]
+    for days in (1, 7):
+        slots = [dict(slot, date=f"2026-01-{1 + k:02d}") for k in range(days) for slot in day_slots]
+        cases.append(Case(f"anchor.verify_slots[{len(slots)} slots]",
+                          lambda s=slots: gw.verify_slots(router_id, s, gw.get_anchor_index()),
+                          setup=slot_setup, group="anchor"))
+    client = gw.app.test_client()
+    payload = {"router_id": "bench-000001", "slots": Fleet(10, 1, 0.8, 0.9, 0.01, seed=10).router_slots("bench-000001")[0]}
+    cases.append(Case("anchor.request[10 routeurs]", lambda: client.post("/anchor", json=payload),
+                      setup=slot_setup, group="anchor"))
+
+    # Statut et statistiques d'un routeur
+    def status_setup():
+        ws.anchors(100_000)
+        ws.fleet(1_000)
+    cases.append(Case("get_security_status[1000 routeurs]", lambda: gw.get_security_status("bench-000500"),
+                      setup=status_setup, group="status"))
+    cases.append(Case("get_router_stats[100k ancrages]", lambda: gw.get_router_stats("bench-000050"),
+                      setup=status_setup, group="status"))
+
+    # Chargement / sauvegarde des ancrages
+    for count in anchor_sizes:
+        repeat = 1 if count >= 1_000_000 else None
+        anchors = []
+
+        def load_setup(n=count):
+            ws.anchors(n)
+        cases.append(Case(f"load_anchors[{count}]", gw.load_anchors, setup=load_setup, repeat=repeat, group="anchors"))
+
+        def save_setup(n=count, holder=anchors):
+            ws.anchors(n)
+            holder[:] = gw.load_anchors()
+
+        def save(holder=anchors):
+            gw.save_anchors(holder)
+        cases.append(Case(f"save_anchors[{count}]", save, setup=save_setup, repeat=repeat, group="anchors"))
+
+    # Rendu du dashboard (micro-cache invalidé à chaque appel)
+    for size in fleet_sizes:
+        def dashboard_setup(n=size):
+            ws.anchors(10_000)
+            ws.fleet(n)
+
+        def render():
+            gw.invalidate_read_caches()
+            response = client.get("/")
+            assert response.status_code == 200, response.status_code
+        cases.append(Case(f"dashboard[{size} routeurs]", render, setup=dashboard_setup,
+                          repeat=1 if size >= 10_000 else None, group="dashboard"))
+
+    # Forensique : vérification de chaîne (100k blocks) et rendu de la page depuis l'analyse
+    blocks = make_chain(100_000)
+    forensic = {}
+
+    def forensic_setup():
+        if not forensic:
+            forensic["id"] = "bench-forensic"
+            gw.FORENSIC_STORE.put(forensic["id"], "bench-000000", "full", int(time.time()), int(time.time()),
+                                  {"blocks": blocks})
+    cases.append(Case("verify_blocks[100k]", lambda: verify_blocks(blocks, workers=1), repeat=3, group="forensics"))
+    cases.append(Case("view_forensics[100k blocks]",
+                      lambda: client.get(f"/forensics/{forensic['id']}"), setup=forensic_setup, group="forensics"))
+    return cases
+
+
+# ============================================================================
+# BASELINES
+# ============================================================================
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get("cases", {}).get(name)
+        if not reference:
+            result["status"] = "new"
+            continue
+        limit = reference.get("threshold", threshold)
+        ratio = result["seconds"] / reference["seconds"] if reference["seconds"] else 1.0
+        result["baseline_seconds"] = reference["seconds"]
+        result["ratio"] = round(ratio, 3)
+        result["status"] = "regression" if ratio > 1 + limit else ("improved" if ratio < 1 - limit else "ok")
+        if result["status"] == "regression":
+            regressions.append(name)
+    return regressions
+
+
+def _format_seconds(value: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if value >= scale:
+            return f"{value / scale:.2f} {unit}"
+    return f"{value / 1e-9:.0f} ns"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks du gateway SNR avec baselines")
+    parser.add_argument("--filter", help="ne lancer que les cas dont le nom contient ce texte")
+    parser.add_argument("--quick", action="store_true", help="sans les plus grandes tailles (1M ancrages, 10k routeurs)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="durée minimale d'un échantillon (s)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="tolérance de régression (0.25 = +25%%)")
+    parser.add_argument("--baseline", default=str(BASELINE_FILE))
+    parser.add_argument("--save-baseline", action="store_true", help="enregistrer les résultats comme baseline")
+    parser.add_argument("-o", "--output", help="fichier JSON de résultats")
+    parser.add_argument("--list", action="store_true", help="lister les cas sans les lancer")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.TemporaryDirectory(prefix="snr-microbench-")
+    data_dir = Path(tmp.name)
+    os.environ.update({
+        "SNR_DATA_DIR": str(data_dir),
+        "ENABLE_DATABASE": "false",
+        "CHAIN_PROVIDER": "simulated",
+        "SIM_CHAIN_LATENCY": "0",
+        "SIM_CHAIN_ERROR_RATE": "0",
+    })
+    sys.path.insert(0, str(ROOT))
+    devnull = open(os.devnull, "w")
+    with contextlib.redirect_stdout(devnull):
+        import snr_bsv_gateway as gw
+
+    ws = Workspace(gw, data_dir)
+    cases = [case for case in build_cases(gw, ws, args.quick) if not args.filter or args.filter in case.name]
+    if args.list:
+        for case in cases:
+            print(case.name)
+        return
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    results = {}
+    print(f"⏱️  {len(cases)} cas (repeat={args.repeat}, min-time={args.min_time}s)")
+    for case in cases:
+        with contextlib.redirect_stdout(devnull):
+            if case.setup:
+                case.setup()
+            result = measure(case.fn, case.repeat or args.repeat, args.min_time)
+        results[case.name] = dict(result, group=case.group)
+        print(f"   {case.name:40} {_format_seconds(result['seconds']):>10}  (min {_format_seconds(result['min_seconds'])}, "
+              f"{result['number']}×{result['repeat']})")
+
+    regressions = compare(results, baseline, args.threshold) if baseline else []
+    if baseline:
+        for name, result in results.items():
+            if result["status"] in ("regression", "improved"):
+                icon = "🔴" if result["status"] == "regression" else "🟢"
+                print(f"{icon} {name}: ×{result['ratio']} ({_format_seconds(result['baseline_seconds'])} -> "
+                      f"{_format_seconds(result['seconds'])})")
+        print(f"{'❌' if regressions else '✅'} {len(regressions)} régression(s) (seuil +{args.threshold:.0%})")
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor(), "cpus": os.cpu_count()},
+        "threshold": args.threshold,
+        "cases": results,
+        "regressions": regressions,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"💾 Résultats: {args.output}")
+    if args.save_baseline:
+        saved = dict(baseline.get("cases", {}))
+        for name, result in results.items():
+            # Conserver un seuil propre au cas s'il a été réglé à la main
+            saved[name] = dict(saved.get(name, {}), seconds=result["seconds"])
+        baseline_path.write_text(json.dumps({"generated_at": report["generated_at"], "machine": report["machine"],
+                                             "cases": saved}, indent=2, sort_keys=True))
+        print(f"💾 Baseline: {baseline_path}")
+    tmp.cleanup()
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rejeu accéléré d'une capture de trafic (capture.py, SNR_CAPTURE_FILE) contre
+une instance du gateway, et comparaison entre builds.
+
+Les requêtes sont renvoyées dans l'ordre, à leurs instants d'origine divisés
+par --speed (1 à 100×) : les rafales (heartbeats après une coupure réseau,
+tempêtes forensiques) gardent leur forme. Un répartiteur attend l'instant
+prévu puis confie la requête à un pool de --concurrency clients ; le retard
+sur le planning est mesuré (lag).
+
+Cibles :
+- --target http://hôte:port : instance lancée à part (n'importe quel build)
+- --in-process [--root CHECKOUT] : gateway importé depuis CHECKOUT, données
+  dans un répertoire temporaire (ou une copie de --data-dir), chaîne simulée
+
+Le rapport donne par endpoint : nombre, erreurs (5xx / exception), statuts
+différents de la capture, latences p50/p95/p99/max, à côté des mêmes
+chiffres capturés en production.
+
+Limite : les identifiants générés par le serveur (sessions d'upload
+reprenables) ne sont pas réécrits ; les requêtes qui les réutilisent
+apparaissent comme statuts différents.
+
+Usage :
+    python3 benchmarks/replay.py run CAPTURE [--target URL | --in-process [--root DIR] [--data-dir DIR]]
+                                     [--speed 10] [--concurrency 32] [--endpoint NOM]
+                                     [--label NOM] [-o rapport.json] [--verbose]
+    python3 benchmarks/replay.py compare RAPPORT_A RAPPORT_B [--threshold 0.1]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import threading
+import contextlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from fleet_load import ROOT, percentile
+
+
+def _stats(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "max": round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+# ============================================================================
+# CIBLES
+# ============================================================================
+
+class HTTPTarget:
+    def __init__(self, base_url: str):
+        import requests
+        self._requests = requests
+        self.base_url = base_url.rstrip("/")
+        self._local = threading.local()
+
+    def send(self, record: dict) -> int:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        response = session.request(record["m"], self.base_url + record["p"], data=record["body"] or None,
+                                   headers=record.get("h") or {}, timeout=300)
+        response.content  # lire le corps : la latence inclut la réponse complète
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class InProcessTarget:
+    """Gateway importé dans ce process (client de test Flask par thread)"""
+
+    def __init__(self, root: Path, data_dir: Path = None, quiet=contextlib.nullcontext()):
+        self._tmp = tempfile.TemporaryDirectory(prefix="snr-replay-")
+        work_dir = Path(self._tmp.name) / "data"
+        if data_dir:
+            shutil.copytree(data_dir, work_dir)
+        else:
+            work_dir.mkdir()
+        os.environ.update({
+            "SNR_DATA_DIR": str(work_dir),
+            "SNR_DB_PATH": str(work_dir / "snr_routers.db"),
+            "CHAIN_PROVIDER": "simulated",
+        })
+        os.environ.pop("SNR_CAPTURE_FILE", None)
+        sys.path.insert(0, str(root))
+        with quiet:
+            import snr_bsv_gateway
+        self.app = snr_bsv_gateway.app
+        self._local = threading.local()
+
+    def send(self, record: dict) -> int:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(record["p"], method=record["m"], data=record["body"], headers=record.get("h") or {})
+        response.get_data()
+        return response.status_code
+
+    def close(self):
+        self._tmp.cleanup()
+
+
+# ============================================================================
+# REJEU
+# ============================================================================
+
+def replay(records: list, target, speed: float, concurrency: int) -> list:
+    """Renvoie chaque enregistrement à son instant (accéléré) ; retourne les résultats dans l'ordre"""
+    results = [None] * len(records)
+    if not records:
+        return results
+    origin = records[0]["t"]
+
+    def send(i: int, scheduled: float):
+        record = records[i]
+        started = time.perf_counter()
+        try:
+            status = target.send(record)
+        except Exception as e:
+            status = f"exception:{type(e).__name__}"
+        results[i] = {
+            "status": status,
+            "latency_ms": (time.perf_counter() - started) * 1000,
+            "lag_ms": max(0.0, (started - scheduled) * 1000),
+        }
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, record in enumerate(records):
+            scheduled = start + (record["t"] - origin) / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, i, scheduled)
+    return results
+
+
+def build_report(records: list, results: list, args, elapsed: float) -> dict:
+    endpoints = {}
+    for record, result in zip(records, results):
+        entry = endpoints.setdefault(record.get("e") or record["p"].split("?")[0], {
+            "count": 0, "errors": 0, "status_mismatch": 0, "captured_errors": 0,
+            "_latency": [], "_captured": [], "_lag": [],
+        })
+        entry["count"] += 1
+        status = result["status"]
+        if not isinstance(status, int) or status >= 500:
+            entry["errors"] += 1
+        if record.get("s") is not None and status != record["s"]:
+            entry["status_mismatch"] += 1
+        if (record.get("s") or 0) >= 500:
+            entry["captured_errors"] += 1
+        entry["_latency"].append(result["latency_ms"])
+        entry["_lag"].append(result["lag_ms"])
+        if record.get("d") is not None:
+            entry["_captured"].append(record["d"])
+
+    for entry in endpoints.values():
+        entry["latency_ms"] = _stats(entry.pop("_latency"))
+        entry["captured_latency_ms"] = _stats(entry.pop("_captured"))
+        entry["lag_ms"] = _stats(entry.pop("_lag"))
+        entry["error_rate"] = round(entry["errors"] / entry["count"], 4)
+
+    span = records[-1]["t"] - records[0]["t"] if records else 0
+    return {
+        "label": args.label,
+        "capture": str(args.capture),
+        "target": args.target or f"in-process:{args.root}",
+        "speed": args.speed,
+        "concurrency": args.concurrency,
+        "requests": len(records),
+        "captured_span_seconds": round(span, 3),
+        "replay_seconds": round(elapsed, 3),
+        "endpoints": endpoints,
+    }
+
+
+def run(args) -> None:
+    sys.path.append(str(ROOT))
+    from capture import read_capture
+
+    if not 1 <= args.speed <= 100:
+        raise SystemExit("--speed doit être entre 1 et 100")
+    records = sorted(read_capture(args.capture), key=lambda record: record["t"])
+    if args.endpoint:
+        records = [record for record in records if record.get("e") == args.endpoint]
+    truncated = sum(1 for record in records if record.get("trunc"))
+    records = [record for record in records if not record.get("trunc")]
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    target = HTTPTarget(args.target) if args.target else InProcessTarget(Path(args.root), args.data_dir, quiet)
+    print(f"🎬 Rejeu de {len(records)} requêtes à {args.speed}× ({truncated} tronquées ignorées) "
+          f"vers {args.target or 'le gateway en process'}")
+
+    started = time.perf_counter()
+    try:
+        with quiet if not args.target else contextlib.nullcontext():
+            results = replay(records, target, args.speed, args.concurrency)
+    finally:
+        target.close()
+    report = build_report(records, results, args, time.perf_counter() - started)
+
+    for endpoint, entry in sorted(report["endpoints"].items()):
+        latency, captured = entry["latency_ms"], entry["captured_latency_ms"]
+        print(f"📊 {endpoint:32} {entry['count']:>6}  p50={latency['p50']:.1f}ms p99={latency['p99']:.1f}ms "
+              f"(capturé p50={captured['p50']:.1f}ms p99={captured['p99']:.1f}ms)  "
+              f"erreurs={entry['errors']} statuts≠={entry['status_mismatch']}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"💾 Rapport: {args.output}")
+
+
+def compare(args) -> None:
+    """Différences de latence et d'erreurs par endpoint entre deux rapports"""
+    a, b = (json.loads(Path(path).read_text()) for path in (args.report_a, args.report_b))
+    print(f"🔍 {a.get('label') or args.report_a}  ->  {b.get('label') or args.report_b}")
+    worse = 0
+    for endpoint in sorted(set(a["endpoints"]) | set(b["endpoints"])):
+        ea, eb = a["endpoints"].get(endpoint), b["endpoints"].get(endpoint)
+        if not ea or not eb:
+            print(f"   {endpoint:32} présent dans un seul rapport")
+            continue
+        cells = []
+        for pct in ("p50", "p95", "p99"):
+            before, after = ea["latency_ms"][pct], eb["latency_ms"][pct]
+            ratio = after / before if before else 1.0
+            marker = ""
+            if ratio > 1 + args.threshold:
+                marker, worse = "🔴", worse + 1
+            elif ratio < 1 - args.threshold:
+                marker = "🟢"
+            cells.append(f"{pct} {before:.1f}->{after:.1f}ms{marker}")
+        error_delta = eb["error_rate"] - ea["error_rate"]
+        if error_delta > 0:
+            worse += 1
+        print(f"   {endpoint:32} {'  '.join(cells)}  erreurs {ea['error_rate']:.2%}->{eb['error_rate']:.2%}")
+    print(f"{'❌' if worse else '✅'} {worse} dégradation(s) (seuil +{args.threshold:.0%})")
+    sys.exit(1 if worse else 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rejeu accéléré d'une capture de trafic du gateway")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="rejouer une capture")
+    run_parser.add_argument("capture", help="fichier SNR_CAPTURE_FILE")
+    run_parser.add_argument("--target", help="URL d'une instance (sinon --in-process)")
+    run_parser.add_argument("--in-process", action="store_true", help="importer le gateway dans ce process")
+    run_parser.add_argument("--root", default=str(ROOT), help="checkout du build à tester (--in-process)")
+    run_parser.add_argument("--data-dir", help="données initiales copiées avant rejeu (--in-process)")
+    run_parser.add_argument("--speed", type=float, default=1.0, help="accélération (1 à 100)")
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--endpoint", help="ne rejouer qu'un endpoint Flask (ex: anchor)")
+    run_parser.add_argument("--label", help="nom du build dans le rapport")
+    run_parser.add_argument("-o", "--output", help="rapport JSON")
+    run_parser.add_argument("--verbose", action="store_true", help="afficher la sortie du gateway (--in-process)")
+
+    compare_parser = commands.add_parser("compare", help="comparer deux rapports de rejeu")
+    compare_parser.add_argument("report_a")
+    compare_parser.add_argument("report_b")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="tolérance de latence (0.1 = +10%%)")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        if not args.target and not args.in_process:
+            run_parser.error("--target ou --in-process requis")
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()
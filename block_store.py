@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stockage dédupliqué des blocks forensiques.
+
+Chaque dump forensique renvoie tout l'historique du routeur : deux uploads
+successifs partagent presque tous leurs blocks. Un block n'est stocké qu'une
+fois, adressé par son chain_hash ; un upload n'est plus qu'un manifeste de
+clés (voir forensic_store).
+
+- clé = chain_hash binaire (32 octets) ; si ce chain_hash est déjà stocké
+  avec un contenu différent (ou s'il est absent / invalide), la clé est le
+  sha256 de la ligne JSON du block
+- refs = nombre d'occurrences dans les manifestes ; un block est supprimé
+  quand refs retombe à 0
+- lecture via un cache LRU des lignes JSON partagé par tous les uploads
+- totaux (blocks, tailles) tenus à jour dans la table totals par add_batch et
+  release : summary() ne parcourt pas la table des blocks
+
+Les lookups, insertions et incréments d'un lot sont faits dans une même
+transaction BEGIN IMMEDIATE : un block ne peut pas être supprimé entre le
+moment où un upload le trouve et celui où il le référence.
+
+Exporte :
+- BlockStore(path, cache_entries)
+"""
+
+import os
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+BLOCK_CACHE_ENTRIES = int(os.getenv("FORENSIC_BLOCK_CACHE_ENTRIES", "65536"))
+
+# Nombre de paramètres par requête IN (...) (limite SQLite historique : 999)
+SQL_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    key BLOB PRIMARY KEY,
+    digest BLOB NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    refs INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    blocks INTEGER NOT NULL,
+    stored_bytes INTEGER NOT NULL,
+    raw_bytes INTEGER NOT NULL
+)
+"""
+
+TOTALS_UPDATE = "UPDATE totals SET blocks = blocks + ?, stored_bytes = stored_bytes + ?, raw_bytes = raw_bytes + ? WHERE id = 0"
+
+
+class BlockStore:
+    def __init__(self, path: Path, cache_entries: int = BLOCK_CACHE_ENTRIES):
+        self.path = Path(path)
+        self.cache_entries = cache_entries
+        self._local = threading.local()
+        self._cache: "OrderedDict[bytes, bytes]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.stats = {"cache_hits": 0, "cache_misses": 0, "new_blocks": 0, "shared_blocks": 0}
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        # Base existante sans totaux : un seul parcours, à l'ouverture
+        conn.execute(
+            "INSERT OR IGNORE INTO totals SELECT 0, COUNT(*), COALESCE(SUM(length(body)), 0), "
+            "COALESCE(SUM(size), 0) FROM blocks"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _select(conn, columns: str, keys: List[bytes]) -> list:
+        rows = []
+        for i in range(0, len(keys), SQL_BATCH):
+            chunk = keys[i:i + SQL_BATCH]
+            rows.extend(conn.execute(
+                f"SELECT {columns} FROM blocks WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return rows
+
+    # ---------------------------------------------------------------- écriture
+
+    def add_batch(self, items: List[Tuple[Optional[bytes], bytes]]) -> Tuple[List[bytes], int]:
+        """
+        Stocke un lot de (chain_hash binaire ou None, ligne JSON). Retourne la
+        clé de chaque block dans l'ordre et le nombre de blocks nouveaux.
+        Chaque occurrence compte une référence.
+        """
+        digests = [hashlib.sha256(line).digest() for _, line in items]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            wanted = list({chain or digest for (chain, _), digest in zip(items, digests)})
+            known = dict(self._select(conn, "key, digest", wanted))
+            keys, counts, inserts = [], Counter(), {}
+            for (chain, line), digest in zip(items, digests):
+                key = chain or digest
+                stored = known.get(key)
+                if stored is not None and stored != digest:
+                    # Même chain_hash, contenu différent : adresser par le contenu
+                    key = digest
+                    if key not in known:
+                        known.update(self._select(conn, "key, digest", [key]))
+                    stored = known.get(key)
+                if stored is None:
+                    known[key] = digest
+                    inserts[key] = (digest, line)
+                keys.append(key)
+                counts[key] += 1
+            rows = [(key, digest, zlib.compress(line), len(line)) for key, (digest, line) in inserts.items()]
+            conn.executemany("INSERT INTO blocks (key, digest, body, size, refs) VALUES (?, ?, ?, ?, 0)", rows)
+            if rows:
+                conn.execute(TOTALS_UPDATE, (len(rows), sum(len(row[2]) for row in rows), sum(row[3] for row in rows)))
+            conn.executemany("UPDATE blocks SET refs = refs + ? WHERE key = ?",
+                             [(count, key) for key, count in counts.items()])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.stats["new_blocks"] += len(inserts)
+        self.stats["shared_blocks"] += len(items) - len(inserts)
+        return keys, len(inserts)
+
+    def release(self, keys: Iterable[bytes]) -> int:
+        """Retire une référence par occurrence ; supprime les blocks sans référence. Retourne le nombre supprimé."""
+        counts = Counter(keys)
+        if not counts:
+            return 0
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("UPDATE blocks SET refs = refs - ? WHERE key = ?",
+                             [(count, key) for key, count in counts.items()])
+            removed = [row for row in self._select(conn, "key, refs, length(body), size", list(counts)) if row[1] <= 0]
+            conn.executemany("DELETE FROM blocks WHERE key = ?", [(row[0],) for row in removed])
+            if removed:
+                conn.execute(TOTALS_UPDATE, (-len(removed), -sum(row[2] for row in removed),
+                                             -sum(row[3] for row in removed)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._cache_lock:
+            for row in removed:
+                self._cache.pop(row[0], None)
+        return len(removed)
+
+    # ----------------------------------------------------------------- lecture
+
+    def get_many(self, keys: List[bytes]) -> List[bytes]:
+        """Lignes JSON des blocks, dans l'ordre des clés (KeyError si un block manque)"""
+        found = {}
+        with self._cache_lock:
+            for key in keys:
+                line = self._cache.get(key)
+                if line is not None:
+                    self._cache.move_to_end(key)
+                    found[key] = line
+        missing = [key for key in set(keys) if key not in found]
+        self.stats["cache_hits"] += len(keys) - len(missing)
+        self.stats["cache_misses"] += len(missing)
+        if missing:
+            loaded = {key: zlib.decompress(body) for key, body in self._select(self._conn(), "key, body", missing)}
+            found.update(loaded)
+            with self._cache_lock:
+                self._cache.update(loaded)
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+        try:
+            return [found[key] for key in keys]
+        except KeyError as e:
+            raise KeyError(f"block manquant: {e.args[0].hex()}") from None
+
+    def summary(self) -> dict:
+        """Nombre de blocks, tailles stockée et décompressée (lus dans la table totals)"""
+        count, stored, raw = self._conn().execute(
+            "SELECT blocks, stored_bytes, raw_bytes FROM totals WHERE id = 0"
+        ).fetchone()
+        return {"blocks": count, "stored_bytes": stored, "raw_bytes": raw, "cached_blocks": len(self._cache)}
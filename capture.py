@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Capture du trafic d'ingestion pour le rejouer plus tard (benchmarks/replay.py) :
+POST /anchor, POST /forensics, sessions d'upload /forensics/uploads*,
+/api/forensic-request/<router_id> et /api/forensic-response/<router_id>.
+Le tri se fait sur l'endpoint Flask de la requête : les vues (GET /anchors,
+GET /forensics/<id>, /api/forensics/...) ne sont pas capturées.
+
+- middleware WSGI : le corps est recopié au fil de la lecture par
+  l'application (un upload forensique en flux n'est jamais chargé en entier),
+  tronqué au-delà de CAPTURE_MAX_BODY
+- l'enregistrement part après la réponse dans une file bornée en nombre
+  (CAPTURE_QUEUE_SIZE) et en octets de corps en attente (CAPTURE_QUEUE_BYTES) ;
+  un thread compresse les corps et écrit : la requête n'attend ni zlib ni le
+  disque ; file pleine = enregistrement abandonné (compté dans stats)
+- format : NDJSON, une ligne par requête, corps compressé (zlib) en base64
+
+Champs d'un enregistrement : t (epoch de début), m (méthode), p (chemin et
+query), e (endpoint Flask), r (router_id si trouvé), h (en-têtes utiles),
+n (taille annoncée), b (corps), trunc (corps tronqué), s (statut),
+d (durée en ms jusqu'à la fin de la réponse).
+
+Activation : SNR_CAPTURE_FILE=/chemin/capture.ndjson
+
+Exporte :
+- init_app(app, path=CAPTURE_FILE)
+- CaptureWriter(path)
+- read_capture(path) -> itérateur d'enregistrements (corps décodé)
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import queue
+import base64
+import threading
+from typing import Iterator, Optional
+
+from werkzeug.wsgi import ClosingIterator
+
+from logs import get_logger
+
+log = get_logger("capture")
+
+CAPTURE_FILE = os.getenv("SNR_CAPTURE_FILE", "")
+CAPTURE_MAX_BODY = int(os.getenv("SNR_CAPTURE_MAX_BODY", str(64 * 1024 * 1024)))
+CAPTURE_QUEUE_SIZE = int(os.getenv("SNR_CAPTURE_QUEUE_SIZE", "10000"))
+CAPTURE_QUEUE_BYTES = int(os.getenv("SNR_CAPTURE_QUEUE_BYTES", str(256 * 1024 * 1024)))
+CAPTURE_ENDPOINTS = frozenset((
+    "anchor",
+    "receive_forensics",
+    "begin_forensic_upload",
+    "forensic_upload_session",
+    "commit_forensic_upload",
+    "forensic_request",
+    "forensic_response",
+))
+CAPTURED_HEADERS = ("Content-Type", "Content-Encoding", "Upload-Offset", "Upload-Length", "Accept-Encoding")
+
+_ROUTER_ID = re.compile(rb'"(?:router_id|device_id)"\s*:\s*"([^"]{1,200})"')
+ROUTER_ID_SCAN = 64 * 1024
+
+
+class _TeeInput:
+    """Flux d'entrée WSGI qui garde une copie (bornée) de ce que l'application lit"""
+
+    def __init__(self, stream, max_bytes: int):
+        self._stream = stream
+        self._max = max_bytes
+        self.chunks = []
+        self.size = 0
+        self.truncated = False
+
+    def _keep(self, data: bytes) -> bytes:
+        if data:
+            room = self._max - self.size
+            if room > 0:
+                self.chunks.append(data[:room])
+                self.size += min(len(data), room)
+            if len(data) > room:
+                self.truncated = True
+        return data
+
+    def read(self, *args) -> bytes:
+        return self._keep(self._stream.read(*args))
+
+    def readline(self, *args) -> bytes:
+        return self._keep(self._stream.readline(*args))
+
+    def readlines(self, *args) -> list:
+        return [self._keep(line) for line in self._stream.readlines(*args)]
+
+    def __iter__(self):
+        for line in self._stream:
+            yield self._keep(line)
+
+    def body(self) -> bytes:
+        return b"".join(self.chunks)
+
+
+class CaptureWriter:
+    """File bornée (enregistrements et octets) + thread d'écriture vers le fichier de capture (append)"""
+
+    def __init__(self, path: str, queue_size: int = CAPTURE_QUEUE_SIZE, queue_bytes: int = CAPTURE_QUEUE_BYTES):
+        self.path = path
+        self.queue_bytes = queue_bytes
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=queue_size)
+        self._queued_bytes = 0
+        self._bytes_lock = threading.Lock()
+        self.stats = {"captured": 0, "dropped": 0, "bytes": 0}
+        threading.Thread(target=self._run, name="capture-writer", daemon=True).start()
+
+    def submit(self, record: dict, body: bytes = b"") -> None:
+        with self._bytes_lock:
+            if self._queued_bytes + len(body) > self.queue_bytes:
+                self.stats["dropped"] += 1
+                return
+            try:
+                self._queue.put_nowait((record, body))
+            except queue.Full:
+                self.stats["dropped"] += 1
+                return
+            self._queued_bytes += len(body)
+
+    def _release(self, records: list) -> None:
+        with self._bytes_lock:
+            self._queued_bytes -= sum(len(body) for _, body in records)
+
+    @staticmethod
+    def _encode(record: dict, body: bytes) -> str:
+        if "r" not in record:
+            match = _ROUTER_ID.search(body[:ROUTER_ID_SCAN])
+            if match:
+                record["r"] = match.group(1).decode("utf-8", "replace")
+        if body:
+            record["b"] = base64.b64encode(zlib.compress(body, 6)).decode("ascii")
+        return json.dumps(record, separators=(",", ":")) + "\n"
+
+    def _run(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                records = [self._queue.get()]
+                while len(records) < 256:
+                    try:
+                        records.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    data = "".join(self._encode(record, body) for record, body in records)
+                finally:
+                    self._release(records)
+                try:
+                    f.write(data)
+                    f.flush()
+                    self.stats["captured"] += len(records)
+                    self.stats["bytes"] += len(data)
+                except OSError as e:
+                    self.stats["dropped"] += len(records)
+                    log.error("❌ Erreur écriture capture: %s", e)
+
+
+class CaptureMiddleware:
+    def __init__(self, app, writer: CaptureWriter, endpoints=CAPTURE_ENDPOINTS, max_body: int = CAPTURE_MAX_BODY):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.writer = writer
+        self.endpoints = frozenset(endpoints)
+        self.max_body = max_body
+
+    def _match(self, environ) -> tuple:
+        """(endpoint, arguments de l'URL) de la route Flask, (None, {}) si aucune"""
+        try:
+            return self.app.url_map.bind_to_environ(environ).match()
+        except Exception:
+            return None, {}
+
+    def __call__(self, environ, start_response):
+        endpoint, url_args = self._match(environ)
+        if endpoint not in self.endpoints:
+            return self.wsgi_app(environ, start_response)
+
+        started, t0 = time.time(), time.perf_counter()
+        tee = _TeeInput(environ["wsgi.input"], self.max_body)
+        environ["wsgi.input"] = tee
+        status = {}
+
+        def capture_start_response(status_line, headers, exc_info=None):
+            status["code"] = int(status_line.split(" ", 1)[0])
+            return start_response(status_line, headers, exc_info)
+
+        path = environ.get("PATH_INFO", "")
+        query = environ.get("QUERY_STRING")
+        record = {
+            "t": round(started, 6),
+            "m": environ.get("REQUEST_METHOD", "GET"),
+            "p": path + (f"?{query}" if query else ""),
+            "e": endpoint,
+            "h": {name: environ[key] for name, key in (
+                (name, "CONTENT_TYPE" if name == "Content-Type" else "HTTP_" + name.upper().replace("-", "_"))
+                for name in CAPTURED_HEADERS) if environ.get(key)},
+            "n": int(environ.get("CONTENT_LENGTH") or 0),
+        }
+
+        if url_args.get("router_id"):
+            record["r"] = url_args["router_id"]
+
+        def finish():
+            if tee.truncated:
+                record["trunc"] = True
+            record["s"] = status.get("code")
+            record["d"] = round((time.perf_counter() - t0) * 1000, 3)
+            self.writer.submit(record, tee.body())
+
+        return ClosingIterator(self.wsgi_app(environ, capture_start_response), [finish])
+
+
+def init_app(app, path: str = CAPTURE_FILE) -> Optional[CaptureWriter]:
+    """Active la capture si un chemin est configuré ; retourne le writer (pour les métriques)"""
+    if not path:
+        return None
+    writer = CaptureWriter(path)
+    app.wsgi_app = CaptureMiddleware(app, writer)
+    log.info("🎥 Capture du trafic d'ingestion: %s", path)
+    return writer
+
+
+def read_capture(path: str) -> Iterator[dict]:
+    """Enregistrements d'une capture, corps décompressé dans "body" (bytes)"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # ligne incomplète (capture interrompue)
+            record["body"] = zlib.decompress(base64.b64decode(record["b"])) if record.get("b") else b""
+            yield record
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Accès à la chaîne BSV derrière une interface commune, pour pouvoir remplacer
+WhatsOnChain par une chaîne simulée (benchmarks, tests hors ligne).
+
+ChainProvider étend le Provider de bsvlib (get_unspents, get_balance,
+broadcast : utilisé tel quel par Wallet) avec les lectures faites par
+writer.py :
+- address_unspents(address) : UTXOs au format WoC (tx_hash, tx_pos, value, height)
+- op_return(txid) : sorties OP_RETURN [{"hex": script}], None si tx inconnue
+- tx_status(txid) : {"txid", "confirmations", "blockheight"}, None si inconnue
+
+Implémentations :
+- WhatsOnChainProvider : API WoC (WOC_URL, testnet par défaut) ; pointée
+  sur le serveur simulé, elle passe par HTTP comme en production
+- SimulatedChain : chaîne en mémoire ; latence, taux d'erreur et temps de
+  bloc configurables, UTXOs réellement dépensés et rendus (la monnaie de
+  chaque tx devient un UTXO), blocs minés d'après l'horloge
+
+Sélection via CHAIN_PROVIDER=woc|simulated (make_provider). Paramètres de
+la chaîne simulée : SIM_CHAIN_LATENCY, SIM_CHAIN_JITTER (secondes),
+SIM_CHAIN_ERROR_RATE (0..1), SIM_CHAIN_BLOCK_TIME (secondes),
+SIM_CHAIN_FUNDING (satoshis donnés à l'adresse du wallet).
+
+Serveur WoC simulé (même API HTTP, pour un gateway dans un autre process) :
+    python3 chain_provider.py serve [--port 8765] [--fund ADRESSE:SATOSHIS]
+puis CHAIN_PROVIDER=woc WOC_URL=http://127.0.0.1:8765/v1/bsv
+
+Chaque appel est mesuré dans snr_chain_call_seconds{provider, call, result}
+(/metrics du gateway).
+
+Exporte :
+- ChainProvider, WhatsOnChainProvider, SimulatedChain, ChainProviderError
+- make_provider(name=None, fund_address=None)
+"""
+
+import os
+import abc
+import time
+import random
+import hashlib
+import argparse
+import threading
+import functools
+from typing import Dict, List, Optional
+
+import requests
+from bsvlib.constants import Chain
+from bsvlib.script.type import P2pkhScriptType
+from bsvlib.service.provider import Provider, BroadcastResult
+from bsvlib.service.whatsonchain import WhatsOnChain
+from bsvlib.transaction.transaction import Transaction
+
+from metrics import Histogram
+
+CHAIN_PROVIDER = os.getenv("CHAIN_PROVIDER", "woc")
+WOC_URL = os.getenv("WOC_URL", "https://api.whatsonchain.com/v1/bsv")
+
+SIM_CHAIN_LATENCY = float(os.getenv("SIM_CHAIN_LATENCY", "0"))
+SIM_CHAIN_JITTER = float(os.getenv("SIM_CHAIN_JITTER", "0"))
+SIM_CHAIN_ERROR_RATE = float(os.getenv("SIM_CHAIN_ERROR_RATE", "0"))
+SIM_CHAIN_BLOCK_TIME = float(os.getenv("SIM_CHAIN_BLOCK_TIME", "600"))
+SIM_CHAIN_FUNDING = int(os.getenv("SIM_CHAIN_FUNDING", "100000000"))
+
+
+CHAIN_CALL_SECONDS = Histogram("snr_chain_call_seconds", "Latence des appels au fournisseur de chaîne",
+                               ("provider", "call", "result"))
+
+
+class ChainProviderError(RuntimeError):
+    """Erreur du fournisseur (HTTP 5xx, erreur simulée...)"""
+
+
+def timed(call: str):
+    """Mesure la méthode dans CHAIN_CALL_SECONDS ; exception ou broadcast non propagé : result=error"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            started, result = time.perf_counter(), "error"
+            try:
+                value = method(self, *args, **kwargs)
+                if not (isinstance(value, BroadcastResult) and not value.propagated):
+                    result = "ok"
+                return value
+            finally:
+                CHAIN_CALL_SECONDS.observe(time.perf_counter() - started, provider=self.key, call=call, result=result)
+        return wrapper
+    return decorator
+
+
+class ChainProvider(Provider, abc.ABC):
+    name = "abstract"
+    key = "abstract"
+
+    @abc.abstractmethod
+    def address_unspents(self, address: str) -> List[Dict]:
+        ...
+
+    @abc.abstractmethod
+    def op_return(self, txid: str) -> Optional[List[Dict]]:
+        ...
+
+    @abc.abstractmethod
+    def tx_status(self, txid: str) -> Optional[Dict]:
+        ...
+
+
+# ============================================================================
+# WHATSONCHAIN
+# ============================================================================
+
+class WhatsOnChainProvider(WhatsOnChain, ChainProvider):
+    name = "WhatsOnChain"
+    key = "woc"
+
+    def __init__(self, chain: Chain = Chain.TEST, url: str = WOC_URL, timeout: int = 20):
+        super().__init__(chain, timeout=timeout)
+        self.url = url.rstrip("/")
+        self.base = f"{self.url}/{self.chain.value}"
+
+    @timed("get_unspents")
+    def get_unspents(self, **kwargs) -> List[Dict]:
+        return super().get_unspents(**kwargs)
+
+    @timed("get_balance")
+    def get_balance(self, **kwargs) -> int:
+        return super().get_balance(**kwargs)
+
+    @timed("broadcast")
+    def broadcast(self, raw: str) -> BroadcastResult:
+        return super().broadcast(raw)
+
+    @timed("address_unspents")
+    def address_unspents(self, address: str) -> List[Dict]:
+        r = requests.get(f"{self.base}/address/{address}/unspent/all", timeout=self.timeout)
+        r.raise_for_status()
+        response = r.json()
+        if isinstance(response, dict) and "result" in response:
+            return response["result"]
+        if isinstance(response, list):
+            return response
+        raise ChainProviderError(f"Format UTXO inattendu : {response}")
+
+    @timed("op_return")
+    def op_return(self, txid: str) -> Optional[List[Dict]]:
+        r = requests.get(f"{self.base}/tx/{txid}/opreturn", timeout=self.timeout)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        return r.json() or []
+
+    @timed("tx_status")
+    def tx_status(self, txid: str) -> Optional[Dict]:
+        r = requests.get(f"{self.base}/tx/hash/{txid}", timeout=self.timeout)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        tx = r.json()
+        return {"txid": txid, "confirmations": tx.get("confirmations", 0), "blockheight": tx.get("blockheight")}
+
+
+# ============================================================================
+# CHAÎNE SIMULÉE
+# ============================================================================
+
+class SimulatedChain(ChainProvider):
+    """
+    Chaîne en mémoire, thread-safe. Une tx diffusée entre dans le bloc
+    suivant ; la hauteur avance d'un bloc toutes les block_time secondes.
+    """
+
+    name = "Simulated chain"
+    key = "simulated"
+
+    def __init__(self, chain: Chain = Chain.TEST, latency: float = SIM_CHAIN_LATENCY,
+                 jitter: float = SIM_CHAIN_JITTER, error_rate: float = SIM_CHAIN_ERROR_RATE,
+                 block_time: float = SIM_CHAIN_BLOCK_TIME, seed: Optional[int] = None):
+        super().__init__(chain)
+        self.latency, self.jitter, self.error_rate, self.block_time = latency, jitter, error_rate, block_time
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._base_height = 1_000_000
+        self._utxos: Dict[tuple, Dict] = {}      # (txid, vout) -> {satoshi, script, height}
+        self._txs: Dict[str, Dict] = {}          # txid -> {height, op_returns}
+        self.stats = {"calls": 0, "errors": 0, "broadcasts": 0, "rejected": 0}
+
+    # ---------------------------------------------------------------- horloge
+
+    def height(self) -> int:
+        return self._base_height + int((time.time() - self._started) / self.block_time) if self.block_time > 0 \
+            else self._base_height
+
+    def _call(self) -> None:
+        """Latence simulée puis erreur éventuelle (comme un 5xx de WoC)"""
+        delay = self.latency + (self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.stats["calls"] += 1
+            failed = self.error_rate and self._rng.random() < self.error_rate
+            if failed:
+                self.stats["errors"] += 1
+        if failed:
+            raise ChainProviderError("erreur simulée du fournisseur")
+
+    # --------------------------------------------------------------- écriture
+
+    def fund(self, address: str, satoshi: int, outputs: int = 1) -> List[str]:
+        """Crée des UTXOs confirmés pour address (faucet)"""
+        script = P2pkhScriptType.locking(address).hex()
+        txids = []
+        with self._lock:
+            for _ in range(outputs):
+                txid = hashlib.sha256(f"fund|{address}|{self._rng.random()}".encode()).hexdigest()
+                self._utxos[(txid, 0)] = {"satoshi": satoshi // outputs, "script": script, "height": self.height() - 1}
+                self._txs[txid] = {"height": self.height() - 1, "op_returns": []}
+                txids.append(txid)
+        return txids
+
+    @timed("broadcast")
+    def broadcast(self, raw: str) -> BroadcastResult:
+        try:
+            self._call()
+        except ChainProviderError as e:
+            return BroadcastResult(False, str(e))
+        tx = Transaction.from_hex(raw)
+        if tx is None:
+            return BroadcastResult(False, "transaction illisible")
+        txid = tx.txid()
+        with self._lock:
+            if txid in self._txs:
+                return BroadcastResult(True, txid)
+            spent = [(tx_input.txid, tx_input.vout) for tx_input in tx.tx_inputs]
+            if any(outpoint not in self._utxos for outpoint in spent):
+                self.stats["rejected"] += 1
+                return BroadcastResult(False, "Missing inputs")
+            for outpoint in spent:
+                del self._utxos[outpoint]
+            mined_at = self.height() + 1
+            op_returns = []
+            for vout, tx_output in enumerate(tx.tx_outputs):
+                script = tx_output.locking_script.hex()
+                if script.startswith("006a") or script.startswith("6a"):
+                    op_returns.append({"n": vout, "hex": script})
+                else:
+                    self._utxos[(txid, vout)] = {"satoshi": tx_output.satoshi, "script": script, "height": mined_at}
+            self._txs[txid] = {"height": mined_at, "op_returns": op_returns}
+            self.stats["broadcasts"] += 1
+        return BroadcastResult(True, txid)
+
+    # ---------------------------------------------------------------- lecture
+
+    def _address_utxos(self, address: str) -> List[tuple]:
+        script = P2pkhScriptType.locking(address).hex()
+        with self._lock:
+            return [(outpoint, utxo) for outpoint, utxo in self._utxos.items() if utxo["script"] == script]
+
+    @timed("address_unspents")
+    def address_unspents(self, address: str) -> List[Dict]:
+        self._call()
+        return [
+            {"tx_hash": txid, "tx_pos": vout, "value": utxo["satoshi"], "height": utxo["height"]}
+            for (txid, vout), utxo in self._address_utxos(address)
+        ]
+
+    @timed("get_unspents")
+    def get_unspents(self, **kwargs) -> List[Dict]:
+        address, _, _ = self.parse_kwargs(**kwargs)
+        try:
+            self._call()
+        except ChainProviderError:
+            if kwargs.get("throw"):
+                raise
+            return []
+        unspents = []
+        for (txid, vout), utxo in self._address_utxos(address):
+            unspent = {"txid": txid, "vout": vout, "satoshi": utxo["satoshi"], "height": utxo["height"]}
+            unspent.update(kwargs)
+            unspents.append(unspent)
+        return unspents
+
+    def get_balance(self, **kwargs) -> int:
+        address, _, _ = self.parse_kwargs(**kwargs)
+        return sum(utxo["satoshi"] for _, utxo in self._address_utxos(address))
+
+    @timed("op_return")
+    def op_return(self, txid: str) -> Optional[List[Dict]]:
+        self._call()
+        with self._lock:
+            tx = self._txs.get(txid)
+            return [dict(item) for item in tx["op_returns"]] if tx else None
+
+    @timed("tx_status")
+    def tx_status(self, txid: str) -> Optional[Dict]:
+        self._call()
+        with self._lock:
+            tx = self._txs.get(txid)
+        if tx is None:
+            return None
+        height = self.height()
+        confirmed = height >= tx["height"]
+        return {
+            "txid": txid,
+            "confirmations": height - tx["height"] + 1 if confirmed else 0,
+            "blockheight": tx["height"] if confirmed else None,
+        }
+
+
+def make_provider(name: Optional[str] = None, fund_address: Optional[str] = None) -> ChainProvider:
+    """Fournisseur choisi par CHAIN_PROVIDER ; la chaîne simulée crédite fund_address"""
+    name = (name or CHAIN_PROVIDER).lower()
+    if name == "simulated":
+        provider = SimulatedChain()
+        if fund_address and SIM_CHAIN_FUNDING > 0:
+            provider.fund(fund_address, SIM_CHAIN_FUNDING)
+        return provider
+    if name == "woc":
+        return WhatsOnChainProvider()
+    raise ValueError(f"CHAIN_PROVIDER inconnu: {name}")
+
+
+# ============================================================================
+# SERVEUR WOC SIMULÉ
+# ============================================================================
+
+def create_app(provider: SimulatedChain):
+    """Application Flask exposant la chaîne simulée avec les routes WoC utilisées"""
+    from flask import Flask, jsonify, request
+
+    app = Flask(__name__)
+    prefix = f"/v1/bsv/{provider.chain.value}"
+
+    @app.errorhandler(ChainProviderError)
+    def provider_error(e):
+        return jsonify({"error": str(e)}), 503
+
+    @app.route(f"{prefix}/address/<address>/unspent")
+    def unspent(address):
+        return jsonify(provider.address_unspents(address))
+
+    @app.route(f"{prefix}/address/<address>/unspent/all")
+    def unspent_all(address):
+        return jsonify({"address": address, "result": provider.address_unspents(address)})
+
+    @app.route(f"{prefix}/address/<address>/balance")
+    def balance(address):
+        return jsonify({"confirmed": provider.get_balance(address=address), "unconfirmed": 0})
+
+    @app.route(f"{prefix}/tx/raw", methods=["POST"])
+    def tx_raw():
+        result = provider.broadcast((request.get_json(silent=True) or {}).get("txHex", ""))
+        return jsonify(result.data), 200 if result.propagated else 400
+
+    @app.route(f"{prefix}/tx/<txid>/opreturn")
+    def tx_opreturn(txid):
+        items = provider.op_return(txid)
+        return (jsonify(items), 200) if items is not None else (jsonify({"error": "tx inconnue"}), 404)
+
+    @app.route(f"{prefix}/tx/hash/<txid>")
+    def tx_hash(txid):
+        status = provider.tx_status(txid)
+        return (jsonify(status), 200) if status is not None else (jsonify({"error": "tx inconnue"}), 404)
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur WhatsOnChain simulé (chaîne en mémoire)")
+    parser.add_argument("command", choices=("serve",))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fund", action="append", default=[], help="ADRESSE:SATOSHIS (répétable)")
+    args = parser.parse_args(argv)
+
+    provider = SimulatedChain()
+    for funding in args.fund:
+        address, _, satoshi = funding.partition(":")
+        provider.fund(address, int(satoshi or SIM_CHAIN_FUNDING))
+    print(f"⛓️  Chaîne simulée: http://{args.host}:{args.port}/v1/bsv "
+          f"(latence {provider.latency}s, erreurs {provider.error_rate:.0%}, bloc {provider.block_time}s)")
+    create_app(provider).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compression négociée des réponses HTML/JSON (gzip, brotli si disponible).
+
+- seuil de taille (COMPRESSION_MIN_SIZE) et niveau (COMPRESSION_LEVEL) configurables
+- les corps déjà compressés sont gardés dans un cache LRU indexé par leur
+  empreinte : une page identique servie plusieurs fois n'est compressée qu'une fois
+- les réponses streamées (exports) et déjà encodées ne sont pas touchées
+
+Exporte :
+- init_app(app)
+- negotiate_encoding(accept_encodings) -> str | None
+- compress_body(body, encoding) -> bytes
+"""
+
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+try:
+    import brotli  # Optionnel: pip install brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))          # gzip 1-9
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))                # brotli 0-11
+COMPRESSION_CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", str(16 * 1024 * 1024)))
+
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+}
+
+
+class _CompressedCache:
+    """Cache LRU (empreinte du corps, encodage) -> corps compressé, borné en octets"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+_cache = _CompressedCache(COMPRESSION_CACHE_BYTES)
+
+
+def cache_stats() -> dict:
+    return {"entries": len(_cache._entries), "bytes": _cache.size, "hits": _cache.hits, "misses": _cache.misses}
+
+
+def negotiate_encoding(accept_encodings) -> Optional[str]:
+    """Choisit br puis gzip selon Accept-Encoding (objet Accept de werkzeug)"""
+    if brotli is not None and accept_encodings["br"] > 0:
+        return "br"
+    if accept_encodings["gzip"] > 0:
+        return "gzip"
+    return None
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """Compresse un corps en passant par le cache d'empreintes"""
+    key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+    compressed = _cache.get(key)
+    if compressed is None:
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            # mtime=0 : sortie déterministe pour un même corps
+            compressed = gzip.compress(body, compresslevel=COMPRESSION_LEVEL, mtime=0)
+        _cache.put(key, compressed)
+    return compressed
+
+
+def compress_response(response):
+    """Hook after_request: compresse la réponse si le client l'accepte"""
+    from flask import request
+
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_SIZE:
+        return response
+
+    compressed = compress_body(body, encoding)
+    if len(compressed) >= len(body):
+        return response
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
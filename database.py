@@ -4,12 +4,17 @@
 Base de données SQLite pour persister les routeurs SNR
 """
 
+import os
 import sqlite3
 import json
 from datetime import datetime
 from pathlib import Path
 
-DB_PATH = Path(__file__).parent / "data" / "snr_routers.db"
+from logs import get_logger
+
+log = get_logger("database")
+
+DB_PATH = Path(os.getenv("SNR_DB_PATH", Path(os.getenv("SNR_DATA_DIR", Path(__file__).parent / "data")) / "snr_routers.db"))
 
 def init_db():
     """Initialise la base de données"""
@@ -63,7 +68,7 @@ def init_db():
     
     conn.commit()
     conn.close()
-    print("✅ Base de données initialisée")
+    log.info("✅ Base de données initialisée")
 
 
 def add_or_update_router(router_id, router_data):
@@ -222,18 +227,53 @@ def get_router_history(router_id, limit=100):
         LIMIT ?
     ''', (router_id, limit))
     
-    history = []
-    for row in cursor.fetchall():
-        history.append({
-            'received_at': row['received_at'],
-            'chain_hash': row['chain_hash'],
-            'total_blocks': row['total_blocks'],
-            'data': json.loads(row['data_json'])
-        })
+    history = [_history_record(row) for row in cursor.fetchall()]
     
     conn.close()
     return history
 
 
+def _history_record(row):
+    return {
+        'received_at': row['received_at'],
+        'chain_hash': row['chain_hash'],
+        'total_blocks': row['total_blocks'],
+        'data': json.loads(row['data_json'])
+    }
+
+
+def iter_router_history(router_id=None, since=None, until=None, batch_size=1000):
+    """
+    Itère l'historique (du plus ancien au plus récent) sans le charger en mémoire.
+    since/until : bornes ISO incluses sur received_at
+    """
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    
+    query = 'SELECT * FROM router_data WHERE 1=1'
+    params = []
+    if router_id:
+        query += ' AND router_id = ?'
+        params.append(router_id)
+    if since:
+        query += ' AND received_at >= ?'
+        params.append(since)
+    if until:
+        query += ' AND received_at <= ?'
+        params.append(until)
+    query += ' ORDER BY received_at ASC'
+    
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield _history_record(row)
+    finally:
+        conn.close()
+
+
 # Initialiser la DB au chargement du module
 init_db()
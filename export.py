@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Export en flux (NDJSON / CSV) des ancrages et de l'historique des routeurs.
+
+Tout est produit par des générateurs : anchors.json est lu par morceaux et
+l'historique SQLite par fetchmany(), la mémoire reste constante quelle que
+soit la taille de l'export.
+
+Usage CLI :
+    python3 export.py anchors [--router ID] [--since T] [--until T] [--date YYYY-MM-DD]
+                              [--format ndjson|csv] [--gzip] [-o FICHIER]
+    python3 export.py history --router ID [--since T] [--until T] [--format ndjson|csv] [--gzip] [-o FICHIER]
+"""
+
+import io
+import os
+import csv
+import sys
+import json
+import zlib
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from jsonstream import JSONStreamReader
+
+ANCHORS_FILE = Path(os.getenv("SNR_DATA_DIR", Path(__file__).parent / "data")) / "anchors.json"
+
+ANCHOR_COLUMNS = ("txid", "snr_hash", "timestamp", "router_id", "slot_id", "slot_date", "blocks_count", "router_ip")
+HISTORY_COLUMNS = ("received_at", "chain_hash", "total_blocks", "data")
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Nombre d'enregistrements regroupés par chunk HTTP
+BATCH_SIZE = 500
+
+
+def iter_json_array(path: Path, chunk_size: int = 1 << 16) -> Iterator:
+    """
+    Itère les éléments d'un fichier contenant un tableau JSON, sans le charger
+    entièrement. Le fichier est ouvert dès l'appel : l'itération lit cet
+    instantané même si le fichier est remplacé (écriture atomique) pendant l'export.
+    """
+    return _iter_json_stream(open(path, "rb"), chunk_size)
+
+
+def _iter_json_stream(f, chunk_size: int) -> Iterator:
+    with f:
+        reader = JSONStreamReader(f, chunk_size)
+        if reader.peek() is None:
+            return  # fichier vide
+        yield from reader.iter_array()
+
+
+def _anchor_date(anchor: dict) -> Optional[str]:
+    """Date d'un ancrage: slot_date si présent, sinon date UTC du timestamp"""
+    if anchor.get("slot_date"):
+        return anchor["slot_date"]
+    if anchor.get("timestamp"):
+        return datetime.fromtimestamp(int(anchor["timestamp"]), tz=timezone.utc).strftime("%Y-%m-%d")
+    return None
+
+
+def iter_anchors(path: Path = ANCHORS_FILE, router_id: Optional[str] = None, since: Optional[int] = None,
+                 until: Optional[int] = None, date: Optional[str] = None) -> Iterator[dict]:
+    """Itère les ancrages filtrés (router_id, plage de timestamps incluse, date), sur l'instantané du fichier à l'appel"""
+    try:
+        anchors = iter_json_array(path)
+    except FileNotFoundError:
+        return iter(())
+    return _filter_anchors(anchors, router_id, since, until, date)
+
+
+def _filter_anchors(anchors: Iterator, router_id, since, until, date) -> Iterator[dict]:
+    for anchor in anchors:
+        if router_id and anchor.get("router_id") != router_id:
+            continue
+        timestamp = int(anchor.get("timestamp") or 0)
+        if since is not None and timestamp < since:
+            continue
+        if until is not None and timestamp > until:
+            continue
+        if date and _anchor_date(anchor) != date:
+            continue
+        yield anchor
+
+
+def ndjson_chunks(records: Iterable[dict], batch_size: int = BATCH_SIZE) -> Iterator[str]:
+    """Sérialise les enregistrements en NDJSON, par lots de batch_size lignes"""
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, separators=(",", ":")))
+        if len(lines) >= batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def csv_chunks(records: Iterable[dict], columns, batch_size: int = BATCH_SIZE) -> Iterator[str]:
+    """Sérialise les enregistrements en CSV (en-tête inclus); les valeurs non scalaires sont encodées en JSON"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    for record in records:
+        writer.writerow([
+            json.dumps(value, separators=(",", ":")) if isinstance(value, (dict, list)) else value
+            for value in (record.get(column) for column in columns)
+        ])
+        count += 1
+        if count >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def format_chunks(records: Iterable[dict], export_format: str, columns) -> Iterator[str]:
+    if export_format == "ndjson":
+        return ndjson_chunks(records)
+    if export_format == "csv":
+        return csv_chunks(records, columns)
+    raise ValueError(f"format non supporté: {export_format}")
+
+
+def gzip_chunks(chunks: Iterable, level: int = 6) -> Iterator[bytes]:
+    """Compresse un flux de chunks (str ou bytes) en un flux gzip"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _parse_time(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return int(datetime.fromisoformat(value).timestamp())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export NDJSON/CSV des ancrages et de l'historique SNR")
+    parser.add_argument("dataset", choices=("anchors", "history"))
+    parser.add_argument("--router", help="router_id à exporter")
+    parser.add_argument("--since", help="début (epoch ou ISO)")
+    parser.add_argument("--until", help="fin (epoch ou ISO)")
+    parser.add_argument("--date", help="date du slot (YYYY-MM-DD), ancrages uniquement")
+    parser.add_argument("--format", choices=tuple(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="compresser la sortie")
+    parser.add_argument("--anchors-file", default=str(ANCHORS_FILE))
+    parser.add_argument("-o", "--output", help="fichier de sortie (stdout par défaut)")
+    args = parser.parse_args(argv)
+
+    since, until = _parse_time(args.since), _parse_time(args.until)
+    if args.dataset == "anchors":
+        records = iter_anchors(Path(args.anchors_file), args.router, since, until, args.date)
+        columns = ANCHOR_COLUMNS
+    else:
+        if not args.router:
+            parser.error("--router est requis pour history")
+        from database import iter_router_history
+        records = iter_router_history(
+            args.router,
+            datetime.fromtimestamp(since).isoformat() if since is not None else None,
+            datetime.fromtimestamp(until).isoformat() if until is not None else None
+        )
+        columns = HISTORY_COLUMNS
+
+    chunks = format_chunks(records, args.format, columns)
+    if args.gzip:
+        chunks = gzip_chunks(chunks)
+    else:
+        chunks = (chunk.encode("utf-8") for chunk in chunks)
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
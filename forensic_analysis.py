@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analyse forensique précalculée : construite une seule fois à l'upload à partir
+du rapport de vérification, puis persistée à côté du blob.
+
+Contenu :
+- anomalies et first_breach_index (rapport de forensic_verify)
+- plages de blocks cassés, non tronquées (la liste des anomalies l'est)
+- fenêtre d'affichage par défaut (2 blocks avant la première cassure, sinon
+  les 30 derniers blocks)
+- correspondance blocks -> slots de 10 minutes (date UTC, numéro de slot)
+
+Une analyse dont la version ou le mode de hash ne correspond plus est
+recalculée à la lecture (voir ForensicStore.analysis).
+
+Exporte :
+- ANALYSIS_VERSION, SLOT_SECONDS
+- build_analysis(report, timestamps)
+- is_current(analysis, mode)
+- broken_blocks(analysis, start, end)
+"""
+
+import time
+import bisect
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+
+# Incrémenter à chaque changement du format ou des règles d'analyse
+ANALYSIS_VERSION = 3
+
+SLOT_SECONDS = 600
+BREACH_CONTEXT_BLOCKS = 2
+TAIL_BLOCKS = 30
+
+
+def slot_of(timestamp: int):
+    """(date UTC YYYY-MM-DD, numéro de slot 0..143) d'un timestamp"""
+    moment = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    return moment.strftime("%Y-%m-%d"), (moment.hour * 3600 + moment.minute * 60 + moment.second) // SLOT_SECONDS
+
+
+def _display_window(block_count: int, first_breach_index: Optional[int]) -> dict:
+    if first_breach_index is not None:
+        start = max(0, first_breach_index - BREACH_CONTEXT_BLOCKS)
+        message = (f"🔴 Affichage des logs depuis le block #{start} "
+                   f"({BREACH_CONTEXT_BLOCKS} blocks avant la première cassure)")
+    else:
+        start = max(0, block_count - TAIL_BLOCKS)
+        message = "✅ Aucune cassure détectée - Affichage des derniers blocks"
+    return {"start": start, "end": block_count, "message": message}
+
+
+def _slot_mapping(timestamps: Sequence[int], anomalies: list) -> list:
+    """Plages de blocks par slot (les blocks sans timestamp sont ignorés)"""
+    slots = {}
+    last_key, last_ts = None, None
+    for index, ts in enumerate(timestamps):
+        if ts <= 0:
+            continue
+        # Les timestamps consécutifs tombent presque toujours dans le même slot
+        if last_key is None or ts // SLOT_SECONDS != last_ts // SLOT_SECONDS:
+            last_key = slot_of(ts)
+        last_ts = ts
+        entry = slots.get(last_key)
+        if entry is None:
+            slots[last_key] = {"date": last_key[0], "slot": last_key[1], "first_index": index,
+                               "last_index": index, "blocks": 1, "anomalies": 0}
+        else:
+            entry["last_index"] = index
+            entry["blocks"] += 1
+    for anomaly in anomalies:
+        ts = anomaly.get("timestamp") or 0
+        if ts > 0:
+            slots[slot_of(ts)]["anomalies"] += 1
+    return list(slots.values())
+
+
+def build_analysis(report: dict, timestamps: Sequence[int]) -> dict:
+    """Analyse persistable à partir d'un rapport verify_packed()/verify_blocks()"""
+    first_break = report["first_break"]
+    first_breach_index = first_break["block_index"] if first_break else None
+    return {
+        "version": ANALYSIS_VERSION,
+        "mode": report["mode"],
+        "analyzed_at": int(time.time()),
+        "block_count": report["block_count"],
+        "valid": report["valid"],
+        "first_breach_index": first_breach_index,
+        "anomaly_count": report["anomaly_count"],
+        "anomalies": report["anomalies"],
+        "broken_ranges": report["broken_ranges"],
+        "display": _display_window(report["block_count"], first_breach_index),
+        "slots": _slot_mapping(timestamps, report["anomalies"]),
+        "verification": {
+            "workers": report["workers"],
+            "segments": report["segments"],
+            "elapsed_seconds": report["elapsed_seconds"],
+        },
+    }
+
+
+def is_current(analysis: Optional[dict], mode: str) -> bool:
+    return bool(analysis) and analysis.get("version") == ANALYSIS_VERSION and analysis.get("mode") == mode
+
+
+def broken_blocks(analysis: dict, start: int, end: int) -> dict:
+    """Blocks cassés de [start, end) -> type d'anomalie (d'après les plages, non tronquées)"""
+    ranges = analysis["broken_ranges"]
+    broken = {}
+    k = max(0, bisect.bisect_right(ranges, start, key=lambda r: r[0]) - 1)
+    while k < len(ranges) and ranges[k][0] < end:
+        first, last, kind = ranges[k]
+        for index in range(max(first, start), min(last, end)):
+            broken[index] = kind
+        k += 1
+    return broken
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Comparaison de deux uploads forensiques d'un même routeur (avant / après
+incident) : point de divergence et plages différentes.
+
+Alignement :
+- par index si les deux logs commencent au même timestamp
+- sinon par timestamp : le premier block du log qui commence le plus tard est
+  recherché par dichotomie dans l'autre (log tronqué par rotation)
+
+Recherche de la divergence : chain_hash est cumulatif (il dépend de
+prev_hash), donc deux logs alignés sont identiques sur un préfixe puis
+diffèrent jusqu'à la fin du recouvrement. Le premier chain_hash divergent est
+trouvé par dichotomie sur les .ch (32 octets par block) : O(log n)
+comparaisons, aucun block décodé.
+
+Sur ce préfixe commun, un logs_hash peut encore différer sans que la chaîne
+ne change (logs modifiés sans recalcul des chain_hash) : les .lh des deux
+uploads y sont toujours comparés, par tranches de DIFF_CHUNK_BLOCKS hashs
+(comparaison d'octets, linéaire mais sans décoder de block). Ces plages
+apparaissent dans ranges ("logs_differ", au plus DIFF_LOGS_RANGES_MAX) et
+placent le point de divergence au premier logs_hash différent.
+
+Le détail optionnel des logs_hash différents dans la zone divergente est
+linéaire en la taille de cette zone (plafonné à DIFF_DETAIL_MAX blocks).
+
+Exporte :
+- diff_uploads(store, forensic_id_a, forensic_id_b, detail=False)
+- DIFF_DETAIL_MAX, DIFF_LOGS_RANGES_MAX
+"""
+
+import os
+import mmap
+import bisect
+from typing import Optional, Tuple
+
+from forensic_verify import HASH_SIZE
+
+DIFF_DETAIL_MAX = int(os.getenv("FORENSIC_DIFF_DETAIL_MAX", "100000"))
+DIFF_LOGS_RANGES_MAX = int(os.getenv("FORENSIC_DIFF_LOGS_RANGES_MAX", "1000"))
+
+# Hashs comparés d'un bloc avant de descendre au block (1 Mio)
+DIFF_CHUNK_BLOCKS = 32768
+
+
+class PackedHashes:
+    """Accès aléatoire en lecture seule aux hashs de 32 octets d'un .ch ou .lh (mmap)"""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._count = size // HASH_SIZE
+        self.reads = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> bytes:
+        self.reads += 1
+        return self._map[index * HASH_SIZE:(index + 1) * HASH_SIZE]
+
+    def span(self, start: int, end: int) -> bytes:
+        """Hashs des blocks [start, end) concaténés"""
+        return self._map[start * HASH_SIZE:end * HASH_SIZE]
+
+    def close(self) -> None:
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _align(ts_a, ts_b):
+    """(méthode, début dans a, début dans b)"""
+    if not len(ts_a) or not len(ts_b) or ts_a[0] == ts_b[0] or ts_a[0] <= 0 or ts_b[0] <= 0:
+        return "index", 0, 0
+    if ts_b[0] > ts_a[0]:
+        start = bisect.bisect_left(ts_a, ts_b[0])
+        if start < len(ts_a) and ts_a[start] == ts_b[0]:
+            return "timestamp", start, 0
+    else:
+        start = bisect.bisect_left(ts_b, ts_a[0])
+        if start < len(ts_b) and ts_b[start] == ts_a[0]:
+            return "timestamp", 0, start
+    return "index", 0, 0
+
+
+def _first_divergence(hashes_a: PackedHashes, hashes_b: PackedHashes, a0: int, b0: int, overlap: int) -> Optional[int]:
+    """Décalage (dans le recouvrement) du premier chain_hash différent, None si identiques"""
+    if overlap == 0 or hashes_a[a0 + overlap - 1] == hashes_b[b0 + overlap - 1]:
+        return None
+    low, high = 0, overlap - 1  # high diverge toujours
+    while low < high:
+        middle = (low + high) // 2
+        if hashes_a[a0 + middle] == hashes_b[b0 + middle]:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def _hash_differences(hashes_a: PackedHashes, hashes_b: PackedHashes, a_start: int, b_start: int, count: int,
+                      max_ranges: Optional[int] = None) -> Tuple[list, bool]:
+    """
+    Plages (a, b) de hashs différents sur count blocks alignés, et si la
+    liste a été coupée à max_ranges plages. Les tranches identiques sont
+    écartées d'une seule comparaison.
+    """
+    ranges = []
+    current = None
+    for chunk in range(0, count, DIFF_CHUNK_BLOCKS):
+        end = min(count, chunk + DIFF_CHUNK_BLOCKS)
+        if hashes_a.span(a_start + chunk, a_start + end) == hashes_b.span(b_start + chunk, b_start + end):
+            current = None
+            continue
+        for k in range(chunk, end):
+            if hashes_a[a_start + k] == hashes_b[b_start + k]:
+                current = None
+            elif current is not None:
+                current["a"][1] += 1
+                current["b"][1] += 1
+            elif max_ranges is not None and len(ranges) >= max_ranges:
+                return ranges, True
+            else:
+                current = {"a": [a_start + k, a_start + k + 1], "b": [b_start + k, b_start + k + 1]}
+                ranges.append(current)
+    return ranges, False
+
+
+def _timestamp(timestamps, index: int):
+    return timestamps[index] if 0 <= index < len(timestamps) else None
+
+
+def diff_uploads(store, id_a: str, id_b: str, detail: bool = False) -> dict:
+    """
+    Compare deux uploads d'un même routeur. Lève KeyError si un upload est
+    inconnu, ValueError s'ils proviennent de routeurs différents.
+    """
+    summary_a, summary_b = store.get_summary(id_a), store.get_summary(id_b)
+    if summary_a is None:
+        raise KeyError(id_a)
+    if summary_b is None:
+        raise KeyError(id_b)
+    if summary_a["router_id"] != summary_b["router_id"]:
+        raise ValueError("les deux uploads doivent provenir du même routeur")
+
+    ts_a, ts_b = store.block_timestamps(id_a), store.block_timestamps(id_b)
+    method, a0, b0 = _align(ts_a, ts_b)
+
+    with PackedHashes(store.chain_hash_path(id_a)) as hashes_a, \
+            PackedHashes(store.chain_hash_path(id_b)) as hashes_b, \
+            PackedHashes(store.logs_hash_path(id_a)) as logs_a, \
+            PackedHashes(store.logs_hash_path(id_b)) as logs_b:
+        overlap = max(0, min(len(hashes_a) - a0, len(hashes_b) - b0))
+        divergence = _first_divergence(hashes_a, hashes_b, a0, b0, overlap)
+        comparisons = hashes_a.reads
+        prefix = overlap if divergence is None else divergence
+        logs_only, logs_truncated = _hash_differences(logs_a, logs_b, a0, b0, prefix, DIFF_LOGS_RANGES_MAX)
+
+        first = None
+        if logs_only or divergence is not None:
+            offset = logs_only[0]["a"][0] - a0 if logs_only else divergence
+            a_index, b_index = a0 + offset, b0 + offset
+            first = {
+                "a_index": a_index,
+                "b_index": b_index,
+                "cause": "logs_hash" if logs_only else "chain_hash",
+                "timestamp_a": _timestamp(ts_a, a_index),
+                "timestamp_b": _timestamp(ts_b, b_index),
+                "chain_hash_a": hashes_a[a_index].hex(),
+                "chain_hash_b": hashes_b[b_index].hex(),
+                "logs_hash_a": logs_a[a_index].hex(),
+                "logs_hash_b": logs_b[b_index].hex(),
+            }
+        logs_detail = None
+        if detail and divergence is not None:
+            count = overlap - divergence
+            logs_detail, _ = _hash_differences(logs_a, logs_b, a0 + divergence, b0 + divergence,
+                                               min(count, DIFF_DETAIL_MAX))
+        count_a, count_b = len(hashes_a), len(hashes_b)
+
+    ranges = []
+    if a0:
+        ranges.append({"kind": "only_a", "a": [0, a0]})
+    if b0:
+        ranges.append({"kind": "only_b", "b": [0, b0]})
+    ranges.extend({"kind": "logs_differ", "a": r["a"], "b": r["b"]} for r in logs_only)
+    if divergence is not None:
+        ranges.append({"kind": "diverged", "a": [a0 + divergence, a0 + overlap], "b": [b0 + divergence, b0 + overlap]})
+    if a0 + overlap < count_a:
+        ranges.append({"kind": "only_a", "a": [a0 + overlap, count_a]})
+    if b0 + overlap < count_b:
+        ranges.append({"kind": "only_b", "b": [b0 + overlap, count_b]})
+
+    result = {
+        "router_id": summary_a["router_id"],
+        "a": {"forensic_id": id_a, "block_count": count_a},
+        "b": {"forensic_id": id_b, "block_count": count_b},
+        "alignment": {"method": method, "a_start": a0, "b_start": b0, "overlap": overlap},
+        "identical": first is None and not ranges,
+        "common_prefix": prefix if first is None else first["a_index"] - a0,
+        "first_divergence": first,
+        "comparisons": comparisons,
+        "ranges": ranges,
+        "logs_differ_truncated": logs_truncated,
+    }
+    if logs_detail is not None:
+        result["logs_differences"] = logs_detail
+        result["logs_differences_truncated"] = overlap - divergence > DIFF_DETAIL_MAX
+    return result
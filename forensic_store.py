@@ -0,0 +1,629 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stockage des uploads forensiques : les blocks sont dédupliqués entre uploads
+(block_store), chaque upload est un manifeste adressé par son contenu, et un
+petit index de métadonnées.
+
+Arborescence (sous data/forensics/) :
+- blocks.db : blocks uniques, clé = chain_hash, avec compteur de références
+- blobs/<aa>/<id>.manifest : clé (32 octets) de chaque block, dans l'ordre ;
+  sa présence signale un upload complet
+- blobs/<aa>/<id>.envelope.json : champs de l'upload hors blocks
+- blobs/<aa>/<id>.ts : timestamp de chaque block (int64), pour la
+  recherche par dichotomie
+- blobs/<aa>/<id>.ch : chain_hash binaire de chaque block (32 octets),
+  pour les comparaisons entre uploads (forensic_diff)
+- blobs/<aa>/<id>.lh : logs_hash binaire de chaque block (32 octets), idem ;
+  reconstruit à la demande pour les uploads antérieurs
+- blobs/<aa>/<id>.analysis.json : analyse précalculée à l'upload
+  (anomalies, fenêtre d'affichage, slots ; voir forensic_analysis)
+- index.jsonl : une ligne de résumé par upload (append-only, la dernière
+  ligne d'un forensic_id fait foi)
+
+<id> = sha256(enveloppe + manifeste). Un nouvel upload d'un routeur ne stocke
+que ses nouveaux blocks plus 104 octets par block (manifeste, .ch, .lh, .ts).
+Lister coûte O(index) ; lire une plage de blocks lit la tranche du manifeste
+puis les blocks (cache LRU partagé entre uploads). Un index par routeur des
+(received_at, forensic_id) triés répond aux questions de récence par
+dichotomie (recent()).
+
+Exporte :
+- ForensicStore(root)
+- read_upload(stream, writer, max_bytes) : ingestion en flux d'un upload JSON
+- PayloadTooLarge
+"""
+
+import os
+import json
+import gzip
+import array
+import bisect
+import shutil
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from jsonstream import JSONStreamReader, PayloadTooLarge
+from forensic_verify import PackedChainWriter, verify_packed, unhex, CHAIN_HASH_MODE
+from forensic_analysis import build_analysis, is_current
+from block_store import BlockStore
+
+# Nombre d'anomalies conservées dans le résumé de l'index
+SUMMARY_MAX_ANOMALIES = 20
+
+KEY_SIZE = 32
+
+# Blocks envoyés au BlockStore / lus depuis le manifeste par lot
+BLOCK_BATCH = 512
+
+# Tableaux de timestamps gardés en mémoire (uploads les plus récemment consultés)
+TIMESTAMP_CACHE_SIZE = 8
+
+# Analyses décodées gardées en mémoire, revalidées par le mtime du .analysis.json
+ANALYSIS_CACHE_SIZE = 8
+
+SIDECARS = (".manifest", ".envelope.json", ".ts", ".ch", ".analysis.json", ".lh")
+
+
+def _atomic_write(path: Path, data: bytes, tmp_dir: Path) -> None:
+    fd, tmp = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _analyze_packed(packed: PackedChainWriter) -> dict:
+    """Vérifie un fichier compacté, construit l'analyse et supprime le fichier"""
+    packed.close()
+    try:
+        report = verify_packed(packed.path, packed.count, packed.timestamps, packed.malformed)
+        return build_analysis(report, packed.timestamps)
+    finally:
+        os.unlink(packed.path)
+
+
+def _iter_keys(path, start: int = 0, stop: Optional[int] = None) -> Iterator[List[bytes]]:
+    """Clés d'un manifeste [start, stop), par lots de BLOCK_BATCH"""
+    with open(path, "rb") as f:
+        f.seek(start * KEY_SIZE)
+        index = start
+        while stop is None or index < stop:
+            count = BLOCK_BATCH if stop is None else min(BLOCK_BATCH, stop - index)
+            data = f.read(count * KEY_SIZE)
+            if not data:
+                return
+            keys = [data[i:i + KEY_SIZE] for i in range(0, len(data), KEY_SIZE)]
+            index += len(keys)
+            yield keys
+
+
+class BlobWriter:
+    """
+    Écrit un upload de façon incrémentale : les blocks partent par lots dans
+    le BlockStore (dédupliqués), leurs clés dans un manifeste temporaire ; les
+    hashs sont compactés en parallèle pour l'analyse faite à finish().
+    """
+
+    def __init__(self, store: "ForensicStore"):
+        self.store = store
+        self.block_count = 0
+        self.new_blocks = 0
+        self.analysis = None
+        self._pending = []
+        self._released = False
+        tmp_dir = store.root / "tmp"
+        fd, self._manifest_path = tempfile.mkstemp(dir=tmp_dir, suffix=".manifest")
+        self._manifest = os.fdopen(fd, "wb")
+        fd, packed_path = tempfile.mkstemp(dir=tmp_dir, suffix=".chain")
+        os.close(fd)
+        fd, chain_path = tempfile.mkstemp(dir=tmp_dir, suffix=".ch")
+        os.close(fd)
+        fd, logs_path = tempfile.mkstemp(dir=tmp_dir, suffix=".lh")
+        os.close(fd)
+        self._packed = PackedChainWriter(packed_path, chain_path, logs_path)
+
+    def add_block(self, block: dict) -> None:
+        self._packed.add(block)
+        line = json.dumps(block, separators=(",", ":")).encode()
+        self._pending.append((unhex(block.get("chain_hash")), line))
+        self.block_count += 1
+        if len(self._pending) >= BLOCK_BATCH:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._pending:
+            keys, inserted = self.store.blocks.add_batch(self._pending)
+            self._manifest.write(b"".join(keys))
+            self.new_blocks += inserted
+            self._pending = []
+
+    def _release(self) -> None:
+        """Rend les références prises par cet upload (une seule fois)"""
+        if self._released:
+            return
+        self._released = True
+        self._manifest.close()
+        for keys in _iter_keys(self._manifest_path):
+            self.store.blocks.release(keys)
+
+    def _cleanup(self) -> None:
+        self._packed.close()
+        for path in (self._manifest_path, self._packed.path, self._packed.chain_path, self._packed.logs_path):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def finish(self, envelope: dict) -> Tuple[str, int]:
+        """Finalise l'upload, son analyse et ses index, retourne (empreinte sha256, taille propre en octets)"""
+        try:
+            self._flush()
+            self._manifest.close()
+            self.analysis = _analyze_packed(self._packed)
+            header = json.dumps(envelope, separators=(",", ":")).encode()
+            digest = hashlib.sha256(header + b"\n")
+            with open(self._manifest_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            blob_id = digest.hexdigest()
+            manifest = self.store.sidecar_path(blob_id, ".manifest")
+            manifest.parent.mkdir(parents=True, exist_ok=True)
+            if manifest.exists():
+                # Contenu identique déjà stocké : ses références suffisent
+                self._release()
+            else:
+                tmp_dir = self.store.root / "tmp"
+                _atomic_write(self.store.sidecar_path(blob_id, ".envelope.json"), header, tmp_dir)
+                _atomic_write(self.store.sidecar_path(blob_id, ".ts"), self._packed.timestamps.tobytes(), tmp_dir)
+                os.replace(self._packed.chain_path, self.store.sidecar_path(blob_id, ".ch"))
+                os.replace(self._packed.logs_path, self.store.sidecar_path(blob_id, ".lh"))
+                # Le manifeste en dernier : sa présence signale un upload complet
+                os.replace(self._manifest_path, manifest)
+        except BaseException:
+            self._release()
+            self._cleanup()
+            raise
+        self._cleanup()
+        return blob_id, len(header) + self.block_count * KEY_SIZE
+
+    def abort(self) -> None:
+        try:
+            self._pending = []
+            self._release()
+        finally:
+            self._cleanup()
+
+
+def read_upload(stream, writer: BlobWriter, max_bytes: Optional[int] = None) -> dict:
+    """
+    Lit un upload forensique JSON depuis un flux binaire : chaque élément de
+    "blocks" est compacté et écrit dans le BlobWriter dès qu'il est décodé.
+    Retourne l'enveloppe (tous les autres champs).
+    Lève PayloadTooLarge au-delà de max_bytes, ValueError si le JSON est invalide.
+    """
+    reader = JSONStreamReader(stream, max_bytes=max_bytes)
+    envelope = {}
+    if reader.peek() is None:
+        return envelope  # corps vide
+    for key in reader.iter_object():
+        if key == "blocks" and reader.peek() == "[":
+            for block in reader.iter_array():
+                if not isinstance(block, dict):
+                    raise ValueError("block invalide: objet attendu")
+                writer.add_block(block)
+        else:
+            envelope[key] = reader.read_value()
+    if reader.peek() is not None:
+        raise ValueError("JSON invalide: données après l'objet")
+    return envelope
+
+
+class ForensicStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        (self.root / "tmp").mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / "index.jsonl"
+        self.blocks = BlockStore(self.root / "blocks.db")
+        self._lock = threading.Lock()
+        self._timestamps: "OrderedDict[str, array.array]" = OrderedDict()
+        self._analyses: "OrderedDict[str, Tuple[int, dict]]" = OrderedDict()
+        self._entries: Dict[str, dict] = {}
+        self._by_router: Dict[str, List[Tuple[int, str]]] = {}
+        self._offset = 0
+        self._inode = None
+
+    # ------------------------------------------------------------------ index
+
+    def _refresh(self) -> None:
+        """Relit uniquement les lignes ajoutées à index.jsonl depuis la dernière lecture"""
+        try:
+            st = self.index_path.stat()
+        except FileNotFoundError:
+            self._reset(None)
+            return
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            # Fichier réécrit (compaction) : relecture complète
+            self._reset(st.st_ino)
+        if st.st_size == self._offset:
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(st.st_size - self._offset)
+        # Ignorer une éventuelle ligne en cours d'écriture par un autre process
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._offset += len(complete)
+
+    def _reset(self, inode) -> None:
+        self._entries, self._by_router, self._offset, self._inode = {}, {}, 0, inode
+
+    def _apply(self, record: dict) -> None:
+        forensic_id = record["forensic_id"]
+        previous = self._entries.pop(forensic_id, None)
+        if previous is not None:
+            recents = self._by_router.get(previous["router_id"], [])
+            key = (previous.get("received_at") or 0, forensic_id)
+            i = bisect.bisect_left(recents, key)
+            if i < len(recents) and recents[i] == key:
+                del recents[i]
+        if not record.get("deleted"):
+            self._entries[forensic_id] = record
+            # Les uploads arrivent dans l'ordre : insort ajoute en fin de liste
+            bisect.insort(self._by_router.setdefault(record["router_id"], []),
+                          (record.get("received_at") or 0, forensic_id))
+
+    def _append(self, record: dict) -> None:
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        # O_APPEND : écriture atomique d'une ligne, sûre entre workers
+        fd = os.open(self.index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def __contains__(self, forensic_id: str) -> bool:
+        return self.get_summary(forensic_id) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._entries)
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return list(self._entries)
+
+    def list(self) -> List[dict]:
+        """Résumés de tous les uploads (ordre d'arrivée)"""
+        with self._lock:
+            self._refresh()
+            return list(self._entries.values())
+
+    def get_summary(self, forensic_id: str) -> Optional[dict]:
+        with self._lock:
+            self._refresh()
+            return self._entries.get(forensic_id)
+
+    def recent(self, router_id: str, since: int = 0) -> List[str]:
+        """Uploads d'un routeur reçus depuis since (epoch), du plus ancien au plus récent : O(log n)"""
+        with self._lock:
+            self._refresh()
+            recents = self._by_router.get(router_id, [])
+            return [forensic_id for _, forensic_id in recents[bisect.bisect_left(recents, (since, "")):]]
+
+    # ------------------------------------------------------------------ blobs
+
+    def sidecar_path(self, blob_id: str, suffix: str) -> Path:
+        return self.root / "blobs" / blob_id[:2] / f"{blob_id}{suffix}"
+
+    def analysis_path(self, blob_id: str) -> Path:
+        return self.sidecar_path(blob_id, ".analysis.json")
+
+    def _write_analysis(self, blob_id: str, analysis: dict) -> None:
+        data = json.dumps(analysis, separators=(",", ":")).encode()
+        _atomic_write(self.analysis_path(blob_id), data, self.root / "tmp")
+
+    def analysis(self, forensic_id: str) -> dict:
+        """Analyse précalculée ; recalculée si absente ou d'une version/mode différents"""
+        summary = self.get_summary(forensic_id)
+        if summary is None:
+            raise KeyError(forensic_id)
+        blob_id = summary["blob"]
+        path = self.analysis_path(blob_id)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            cached = self._analyses.get(blob_id)
+            if cached is not None and cached[0] == mtime:
+                self._analyses.move_to_end(blob_id)
+                return cached[1]
+        try:
+            cached = json.loads(path.read_bytes())
+        except (FileNotFoundError, ValueError):
+            cached = None
+        if is_current(cached, CHAIN_HASH_MODE):
+            self._remember_analysis(blob_id, mtime, cached)
+            return cached
+        fd, packed_path = tempfile.mkstemp(dir=self.root / "tmp", suffix=".chain")
+        os.close(fd)
+        packed = PackedChainWriter(packed_path)
+        try:
+            for block in self.iter_blocks(forensic_id):
+                packed.add(block)
+        except BaseException:
+            packed.close()
+            os.unlink(packed_path)
+            raise
+        analysis = _analyze_packed(packed)
+        self._write_analysis(blob_id, analysis)
+        self._remember_analysis(blob_id, path.stat().st_mtime_ns, analysis)
+        return analysis
+
+    def _remember_analysis(self, blob_id: str, mtime: int, analysis: dict) -> None:
+        with self._lock:
+            self._analyses[blob_id] = (mtime, analysis)
+            self._analyses.move_to_end(blob_id)
+            while len(self._analyses) > ANALYSIS_CACHE_SIZE:
+                self._analyses.popitem(last=False)
+
+    def new_writer(self) -> BlobWriter:
+        return BlobWriter(self)
+
+    def commit(self, writer: BlobWriter, forensic_id: str, router_id: str, forensic_type: str,
+               timestamp, received_at: int, envelope: dict) -> dict:
+        """Finalise un BlobWriter et enregistre l'upload dans l'index"""
+        blob_id, blob_size = writer.finish(envelope)
+        analysis = writer.analysis
+        self._write_analysis(blob_id, analysis)
+        record = {
+            "forensic_id": forensic_id,
+            "router_id": router_id,
+            "forensic_type": forensic_type,
+            "timestamp": timestamp,
+            "received_at": received_at,
+            "block_count": writer.block_count,
+            "blob": blob_id,
+            "blob_size": blob_size,
+            "new_blocks": writer.new_blocks,
+            "breach": {
+                "detected": analysis["first_breach_index"] is not None,
+                "first_breach_index": analysis["first_breach_index"],
+                "anomaly_count": analysis["anomaly_count"],
+                "anomaly_indexes": [a["block_index"] for a in analysis["anomalies"][:SUMMARY_MAX_ANOMALIES]],
+            },
+        }
+        with self._lock:
+            self._refresh()
+            previous = self._entries.get(forensic_id)
+            self._append(record)
+            self._refresh()
+            # Un id réutilisé (renvoi du routeur) remplace l'entrée : son ancien blob perd sa référence
+            superseded = previous["blob"] if previous is not None else None
+            shared = superseded is not None and any(
+                entry["blob"] == superseded for entry in self._entries.values())
+        if superseded is not None and not shared:
+            self._drop_blob(superseded)
+        return record
+
+    def put(self, forensic_id: str, router_id: str, forensic_type: str, timestamp,
+            received_at: int, data: dict) -> dict:
+        """Stocke un upload complet déjà décodé (dict avec sa liste de blocks)"""
+        writer = self.new_writer()
+        try:
+            for block in data.get("blocks", []) or []:
+                writer.add_block(block)
+        except BaseException:
+            writer.abort()
+            raise
+        envelope = {k: v for k, v in data.items() if k != "blocks"}
+        return self.commit(writer, forensic_id, router_id, forensic_type, timestamp, received_at, envelope)
+
+    def iter_blocks(self, forensic_id: str, start: int = 0, stop: Optional[int] = None) -> Iterator[dict]:
+        """Blocks [start, stop) : tranche du manifeste puis lecture des blocks par lots"""
+        summary = self.get_summary(forensic_id)
+        if summary is None:
+            raise KeyError(forensic_id)
+        for keys in _iter_keys(self.sidecar_path(summary["blob"], ".manifest"), start, stop):
+            for line in self.blocks.get_many(keys):
+                yield json.loads(line)
+
+    def block_timestamps(self, forensic_id: str) -> array.array:
+        """Timestamps de tous les blocks (.ts)"""
+        summary = self.get_summary(forensic_id)
+        if summary is None:
+            raise KeyError(forensic_id)
+        blob_id = summary["blob"]
+        with self._lock:
+            cached = self._timestamps.get(blob_id)
+            if cached is not None:
+                self._timestamps.move_to_end(blob_id)
+                return cached
+        timestamps = array.array("q")
+        timestamps.frombytes(self.sidecar_path(blob_id, ".ts").read_bytes())
+        with self._lock:
+            self._timestamps[blob_id] = timestamps
+            while len(self._timestamps) > TIMESTAMP_CACHE_SIZE:
+                self._timestamps.popitem(last=False)
+        return timestamps
+
+    def chain_hash_path(self, forensic_id: str) -> Path:
+        summary = self.get_summary(forensic_id)
+        if summary is None:
+            raise KeyError(forensic_id)
+        return self.sidecar_path(summary["blob"], ".ch")
+
+    def logs_hash_path(self, forensic_id: str) -> Path:
+        """.lh (logs_hash de chaque block) ; reconstruit depuis les blocks pour un upload qui n'en a pas"""
+        summary = self.get_summary(forensic_id)
+        if summary is None:
+            raise KeyError(forensic_id)
+        path = self.sidecar_path(summary["blob"], ".lh")
+        if not path.exists():
+            tmp_dir = self.root / "tmp"
+            fd, packed_path = tempfile.mkstemp(dir=tmp_dir, suffix=".chain")
+            os.close(fd)
+            fd, logs_path = tempfile.mkstemp(dir=tmp_dir, suffix=".lh")
+            os.close(fd)
+            packed = PackedChainWriter(packed_path, logs_path=logs_path)
+            try:
+                for block in self.iter_blocks(forensic_id):
+                    packed.add(block)
+                packed.close()
+                os.replace(logs_path, path)
+            finally:
+                packed.close()  # sans effet si déjà fermé
+                for leftover in (packed_path, logs_path):
+                    if os.path.exists(leftover):
+                        os.unlink(leftover)
+        return path
+
+    def find_timestamp(self, forensic_id: str, timestamp: int) -> int:
+        """Index du premier block de timestamp >= timestamp (timestamps croissants)"""
+        return bisect.bisect_left(self.block_timestamps(forensic_id), timestamp)
+
+    def load_envelope(self, forensic_id: str) -> dict:
+        """Champs de l'upload hors blocks (router_id, network_info, log_size...)"""
+        summary = self.get_summary(forensic_id)
+        if summary is None:
+            raise KeyError(forensic_id)
+        return json.loads(self.sidecar_path(summary["blob"], ".envelope.json").read_bytes())
+
+    def load_data(self, forensic_id: str) -> dict:
+        """Reconstitue les données telles qu'envoyées par le routeur (enveloppe + blocks)"""
+        envelope = self.load_envelope(forensic_id)
+        envelope["blocks"] = list(self.iter_blocks(forensic_id))
+        return envelope
+
+    def load(self, forensic_id: str) -> dict:
+        """Entrée complète au format historique de forensics.json"""
+        summary = self.get_summary(forensic_id)
+        if summary is None:
+            raise KeyError(forensic_id)
+        return {
+            "forensic_id": forensic_id,
+            "router_id": summary["router_id"],
+            "forensic_type": summary["forensic_type"],
+            "timestamp": summary["timestamp"],
+            "received_at": summary["received_at"],
+            "data": self.load_data(forensic_id),
+        }
+
+    # ------------------------------------------------------------- rétention
+
+    def delete(self, forensic_id: str) -> dict:
+        """Supprime un upload ; ses blocks perdent une référence si plus aucun upload ne partage son manifeste"""
+        with self._lock:
+            self._refresh()
+            summary = self._entries.get(forensic_id)
+            if summary is None:
+                raise KeyError(forensic_id)
+            self._append({"forensic_id": forensic_id, "deleted": True})
+            self._refresh()
+            shared = any(entry["blob"] == summary["blob"] for entry in self._entries.values())
+        if not shared:
+            self._drop_blob(summary["blob"])
+        return summary
+
+    def _drop_blob(self, blob_id: str) -> None:
+        manifest = self.sidecar_path(blob_id, ".manifest")
+        fd, released = tempfile.mkstemp(dir=self.root / "tmp", suffix=".manifest")
+        os.close(fd)
+        try:
+            # Retirer le manifeste d'abord : un upload identique concurrent en recréera un complet
+            os.replace(manifest, released)
+        except FileNotFoundError:
+            os.unlink(released)
+            return
+        try:
+            for keys in _iter_keys(released):
+                self.blocks.release(keys)
+        finally:
+            os.unlink(released)
+        for suffix in SIDECARS[1:]:
+            path = self.sidecar_path(blob_id, suffix)
+            if path.exists() and not manifest.exists():
+                path.unlink()
+        with self._lock:
+            self._timestamps.pop(blob_id, None)
+            self._analyses.pop(blob_id, None)
+
+    def prune_router(self, router_id: str, keep: int) -> List[str]:
+        """Ne garde que les keep uploads les plus récents d'un routeur ; retourne les ids supprimés"""
+        ids = self.recent(router_id)
+        expired = ids[:max(0, len(ids) - keep)]
+        for forensic_id in expired:
+            self.delete(forensic_id)
+        return expired
+
+    # -------------------------------------------------------------- migration
+
+    def migrate_blobs(self) -> int:
+        """Convertit les blobs .ndjson.gz (un fichier par upload) en manifestes dédupliqués"""
+        by_blob: Dict[str, List[dict]] = {}
+        for entry in self.list():
+            if not self.sidecar_path(entry["blob"], ".manifest").exists():
+                by_blob.setdefault(entry["blob"], []).append(entry)
+        count = 0
+        for old_blob, entries in by_blob.items():
+            old_path = self.sidecar_path(old_blob, ".ndjson.gz")
+            if not old_path.exists():
+                continue
+            first = entries[0]
+            writer = self.new_writer()
+            try:
+                with gzip.open(old_path, "rb") as f:
+                    envelope = json.loads(f.readline())
+                    for line in f:
+                        writer.add_block(json.loads(line))
+            except BaseException:
+                writer.abort()
+                raise
+            record = self.commit(writer, first["forensic_id"], first["router_id"], first["forensic_type"],
+                                 first["timestamp"], first["received_at"], envelope)
+            with self._lock:
+                for entry in entries[1:]:
+                    self._append(dict(entry, blob=record["blob"], blob_size=record["blob_size"], new_blocks=0))
+                self._refresh()
+            for suffix in (".ndjson.gz", ".idx", ".ts", ".ch", ".analysis.json"):
+                path = self.sidecar_path(old_blob, suffix)
+                if path.exists():
+                    path.unlink()
+            count += len(entries)
+        return count
+
+    def migrate_legacy(self, legacy_file: Path) -> int:
+        """Importe l'ancien forensics.json puis le renomme en .migrated"""
+        legacy_file = Path(legacy_file)
+        if not legacy_file.exists():
+            return 0
+        try:
+            forensics = json.loads(legacy_file.read_text())
+        except ValueError:
+            return 0
+        count = 0
+        for forensic_id, entry in forensics.items():
+            if forensic_id in self:
+                continue
+            self.put(
+                forensic_id,
+                entry.get("router_id", "unknown"),
+                entry.get("forensic_type", "unknown"),
+                entry.get("timestamp"),
+                entry.get("received_at", 0),
+                entry.get("data", {}),
+            )
+            count += 1
+        shutil.move(str(legacy_file), str(legacy_file) + ".migrated")
+        return count
+
+    def storage_stats(self) -> dict:
+        stats = self.blocks.summary()
+        stats.update(self.blocks.stats)
+        return stats
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Moteur de vérification des chaînes de blocks forensiques.
+
+Pour chaque block :
+- lien : prev_hash == chain_hash du block précédent ("chain_break")
+- recalcul : chain_hash == H(prev_hash, logs_hash) ("hash_mismatch")
+- format : hashs hexadécimaux de 32 octets ("malformed")
+
+Les blocks sont compactés en enregistrements binaires de 96 octets
+(prev | logs | chain) dans un fichier ; les longues chaînes sont découpées en
+segments vérifiés en parallèle par un pool de process qui lisent leur segment
+directement dans le fichier. Les frontières de segments sont recousues dans
+l'ordre par le process parent : le résultat est déterministe.
+
+Le pool est créé une fois par process (start_pool au démarrage, sinon au
+premier besoin) et réutilisé : pas de démarrage de workers par upload. Ses
+workers sont lancés par un forkserver (spawn s'il n'existe pas), jamais par
+fork() depuis un thread de requête d'un process qui a d'autres threads
+(verrous hérités dans un état incohérent).
+
+Modes de calcul (SNR_CHAIN_HASH_MODE) :
+- binary : sha256(bytes(prev_hash) + bytes(logs_hash))
+- hex    : sha256(prev_hash_hex + logs_hash_hex) (convention sha256sum du routeur)
+- links  : pas de recalcul, uniquement les liens prev -> chain
+
+Exporte :
+- verify_blocks(blocks, ...) -> rapport
+- verify_packed(path, count, ...) -> rapport
+- broken_ranges(anomalies) -> plages de blocks cassés
+- start_pool(workers), shutdown_pool()
+- PackedChainWriter
+"""
+
+import os
+import time
+import array
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, List, Optional, Sequence
+
+RECORD_SIZE = 96
+HASH_SIZE = 32
+ZERO_RECORD = bytes(RECORD_SIZE)
+
+CHAIN_HASH_MODE = os.getenv("SNR_CHAIN_HASH_MODE", "binary")
+VERIFY_WORKERS = int(os.getenv("SNR_VERIFY_WORKERS", str(os.cpu_count() or 1)))
+VERIFY_PARALLEL_MIN = int(os.getenv("SNR_VERIFY_PARALLEL_MIN", "200000"))
+VERIFY_START_METHOD = os.getenv("SNR_VERIFY_START_METHOD", "forkserver")
+
+# Nombre max d'anomalies détaillées dans un rapport (le compte total et les
+# plages de blocks cassés restent exacts)
+MAX_REPORTED_ANOMALIES = 10000
+
+
+def unhex(value) -> Optional[bytes]:
+    if not isinstance(value, str) or len(value) != HASH_SIZE * 2:
+        return None
+    try:
+        return bytes.fromhex(value)
+    except ValueError:
+        return None
+
+
+def as_int(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class PackedChainWriter:
+    """
+    Compacte des blocks en enregistrements de 96 octets + tableau de timestamps.
+    Si chain_path (resp. logs_path) est fourni, les chain_hash (resp. logs_hash)
+    seuls, 32 octets par block, y sont aussi écrits.
+    """
+
+    def __init__(self, path: str, chain_path: Optional[str] = None, logs_path: Optional[str] = None):
+        self.path = path
+        self.chain_path = chain_path
+        self.logs_path = logs_path
+        self.count = 0
+        self.malformed: List[int] = []
+        self.timestamps = array.array("q")
+        self._file = open(path, "wb")
+        self._chain_file = open(chain_path, "wb") if chain_path else None
+        self._logs_file = open(logs_path, "wb") if logs_path else None
+
+    def add(self, block: dict) -> None:
+        prev, logs, chain = (unhex(block.get(k)) for k in ("prev_hash", "logs_hash", "chain_hash"))
+        if prev is None or logs is None or chain is None:
+            self.malformed.append(self.count)
+            # Garder le chain_hash lisible : le block suivant se relie à lui sans faux chain_break
+            chain = chain or ZERO_RECORD[:HASH_SIZE]
+            self._file.write(ZERO_RECORD[:2 * HASH_SIZE] + chain)
+        else:
+            self._file.write(prev + logs + chain)
+        if self._chain_file is not None:
+            self._chain_file.write(chain)
+        if self._logs_file is not None:
+            self._logs_file.write(logs or hashlib.sha256(str(block.get("logs_hash")).encode()).digest())
+        self.timestamps.append(as_int(block.get("timestamp")))
+        self.count += 1
+
+    def close(self) -> None:
+        self._file.close()
+        if self._chain_file is not None:
+            self._chain_file.close()
+        if self._logs_file is not None:
+            self._logs_file.close()
+
+
+def _verify_segment(path: str, start: int, end: int, mode: str):
+    """
+    Vérifie les blocks [start, end) du fichier compacté (exécuté dans un worker).
+    Retourne (start, end, anomalies, premier prev, dernier chain, durée).
+    """
+    began = time.perf_counter()
+    with open(path, "rb") as f:
+        f.seek(start * RECORD_SIZE)
+        data = f.read((end - start) * RECORD_SIZE)
+
+    sha256 = hashlib.sha256
+    anomalies = []
+    last_chain = None
+    for k in range(end - start):
+        offset = k * RECORD_SIZE
+        prev = data[offset:offset + HASH_SIZE]
+        chain = data[offset + 2 * HASH_SIZE:offset + RECORD_SIZE]
+        index = start + k
+        if last_chain is not None and prev != last_chain:
+            anomalies.append((index, "chain_break", last_chain, prev))
+        if mode == "binary":
+            computed = sha256(data[offset:offset + 2 * HASH_SIZE]).digest()
+        elif mode == "hex":
+            logs = data[offset + HASH_SIZE:offset + 2 * HASH_SIZE]
+            computed = sha256((prev.hex() + logs.hex()).encode()).digest()
+        else:
+            computed = chain
+        if computed != chain:
+            anomalies.append((index, "hash_mismatch", computed, chain))
+        last_chain = chain
+
+    first_prev = data[:HASH_SIZE] if data else None
+    return start, end, anomalies, first_prev, last_chain, time.perf_counter() - began
+
+
+def broken_ranges(anomalies: list) -> list:
+    """
+    Plages [début, fin, type] de blocks cassés consécutifs de même type, à
+    partir de toutes les anomalies triées par block. Un block qui a plusieurs
+    anomalies prend le type de la dernière.
+    """
+    ranges = []
+    for anomaly in anomalies:
+        index, kind = anomaly["block_index"], anomaly["type"]
+        if ranges and ranges[-1][1] > index:
+            if ranges[-1][2] == kind:
+                continue
+            ranges[-1][1] -= 1
+            if ranges[-1][0] == ranges[-1][1]:
+                ranges.pop()
+        if ranges and ranges[-1][1] == index and ranges[-1][2] == kind:
+            ranges[-1][1] += 1
+        else:
+            ranges.append([index, index + 1, kind])
+    return ranges
+
+
+# ============================================================================
+# POOL DE VÉRIFICATION
+# ============================================================================
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _forget_pool() -> None:
+    """Après fork() : le pool du parent (threads de gestion, pipes) n'est pas utilisable"""
+    global _pool
+    _pool = None
+
+
+os.register_at_fork(after_in_child=_forget_pool)
+
+
+def start_pool(workers: int = VERIFY_WORKERS) -> ProcessPoolExecutor:
+    """Pool de vérification du process, créé au premier appel puis réutilisé"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            method = VERIFY_START_METHOD if VERIFY_START_METHOD in methods else "spawn"
+            if method == "forkserver":
+                # Le forkserver n'importe que ce module (pas le __main__ du gateway)
+                multiprocessing.set_forkserver_preload([__name__])
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _verify_parallel(path: str, segments: list, mode: str, workers: int) -> Optional[list]:
+    """Segments vérifiés par le pool ; None si le pool est cassé (worker tué)"""
+    global _pool
+    pool = start_pool(workers)
+    try:
+        futures = [pool.submit(_verify_segment, path, start, end, mode) for start, end in segments]
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        return None
+
+
+def _segments(count: int, workers: int, segment_size: Optional[int]):
+    if segment_size is None:
+        # Quelques segments par worker pour équilibrer la charge
+        segment_size = max(1, -(-count // max(1, workers * 4)))
+    return [(start, min(count, start + segment_size)) for start in range(0, count, segment_size)]
+
+
+def verify_packed(path: str, count: int, timestamps: Optional[Sequence[int]] = None,
+                  malformed: Iterable[int] = (), mode: str = CHAIN_HASH_MODE,
+                  workers: int = VERIFY_WORKERS, segment_size: Optional[int] = None) -> dict:
+    """Vérifie un fichier compacté de count enregistrements"""
+    if mode not in ("binary", "hex", "links"):
+        raise ValueError(f"mode de hash inconnu: {mode}")
+    began = time.perf_counter()
+    parallel = workers > 1 and count >= VERIFY_PARALLEL_MIN
+    segments = _segments(count, workers if parallel else 1, segment_size)
+
+    results = None
+    if parallel and len(segments) > 1:
+        results = _verify_parallel(path, segments, mode, workers)
+        parallel = results is not None
+    if results is None:
+        # Chaîne courte, ou pool cassé (le prochain appel en recrée un) : vérification sur place
+        results = [_verify_segment(path, start, end, mode) for start, end in segments]
+
+    # Recoudre les frontières dans l'ordre des segments
+    malformed_set = set(malformed)
+    raw = []
+    for k, (start, end, anomalies, first_prev, last_chain, _) in enumerate(results):
+        if k > 0 and first_prev is not None:
+            previous_chain = results[k - 1][4]
+            if previous_chain is not None and first_prev != previous_chain:
+                raw.append((start, "chain_break", previous_chain, first_prev))
+        raw.extend(anomalies)
+    raw.sort(key=lambda a: (a[0], a[1] != "chain_break"))
+
+    anomalies = [
+        {"block_index": index, "type": "malformed", "expected": None, "actual": None}
+        for index in sorted(malformed_set)
+    ]
+    for index, kind, expected, actual in raw:
+        if index in malformed_set:
+            continue
+        anomalies.append({
+            "block_index": index,
+            "type": kind,
+            "expected": expected.hex(),
+            "actual": actual.hex(),
+        })
+    anomalies.sort(key=lambda a: a["block_index"])
+    for anomaly in anomalies:
+        anomaly["timestamp"] = timestamps[anomaly["block_index"]] if timestamps is not None else None
+
+    return {
+        "block_count": count,
+        "mode": mode,
+        "valid": not anomalies,
+        "first_break": anomalies[0] if anomalies else None,
+        "anomaly_count": len(anomalies),
+        "anomalies": anomalies[:MAX_REPORTED_ANOMALIES],
+        "broken_ranges": broken_ranges(anomalies),
+        "workers": workers if parallel else 1,
+        "segments": [
+            {"start": start, "end": end, "anomalies": len(seg_anomalies), "seconds": round(seconds, 6)}
+            for start, end, seg_anomalies, _, _, seconds in results
+        ],
+        "elapsed_seconds": round(time.perf_counter() - began, 6),
+    }
+
+
+def verify_blocks(blocks: Iterable[dict], mode: str = CHAIN_HASH_MODE, workers: int = VERIFY_WORKERS,
+                  segment_size: Optional[int] = None, tmp_dir: Optional[str] = None) -> dict:
+    """Compacte puis vérifie un itérable de blocks (dicts du routeur)"""
+    fd, path = tempfile.mkstemp(suffix=".chain", dir=tmp_dir)
+    os.close(fd)
+    try:
+        writer = PackedChainWriter(path)
+        for block in blocks:
+            writer.add(block)
+        writer.close()
+        return verify_packed(path, writer.count, writer.timestamps, writer.malformed,
+                             mode=mode, workers=workers, segment_size=segment_size)
+    finally:
+        os.unlink(path)
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index en mémoire sur l'état des routeurs et des ancrages.
+
+Les index sont reconstruits quand la signature de la source (mtime/taille du
+fichier JSON ou de la base SQLite) change ; une requête paginée coûte ensuite
+O(log n + page) au lieu de O(flotte).
+
+Exporte :
+- RouterIndex : tri, filtres et pagination par curseur sur les routeurs
+- AnchorIndex : compteurs par routeur, pagination keyset et lookup par slot,
+  ancrages relus à la demande dans anchors.json
+- encode_cursor(values) / decode_cursor(cursor)
+"""
+
+import os
+import json
+import array
+import base64
+import bisect
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from jsonstream import JSONStreamReader
+
+
+def encode_cursor(values) -> str:
+    """Encode un curseur opaque (base64url d'une liste JSON)"""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _as_tuple(value):
+    if isinstance(value, list):
+        return tuple(_as_tuple(v) for v in value)
+    return value
+
+
+def _utf8(value):
+    """Chaîne lue en latin-1 (offsets en octets) ramenée à son texte UTF-8"""
+    if isinstance(value, str) and not value.isascii():
+        try:
+            return value.encode("latin-1").decode("utf-8")
+        except UnicodeError:
+            return value
+    return value
+
+
+def _discard(entries: List[Tuple], item: Tuple) -> None:
+    """Retire item d'une liste triée s'il y est"""
+    i = bisect.bisect_left(entries, item)
+    if i < len(entries) and entries[i] == item:
+        del entries[i]
+
+
+def decode_cursor(cursor: str):
+    """Décode un curseur produit par encode_cursor() (ValueError si invalide)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as e:
+        raise ValueError(f"curseur invalide: {e}")
+    if not isinstance(values, list):
+        raise ValueError("curseur invalide")
+    return _as_tuple(values)
+
+
+class AnchorIndex:
+    """
+    Index des ancrages, sans garder les ancrages eux-mêmes en mémoire.
+
+    - offset et taille de chaque ancrage dans anchors.json : un ancrage est
+      relu à la demande (pread sur le fichier ouvert à la construction, donc
+      cohérent avec l'index même si anchors.json est remplacé entre-temps)
+    - résumé par routeur (nombre, premier, dernier dans l'ordre du fichier)
+    - listes triées (timestamp, txid, position) globale et par routeur pour la
+      pagination keyset
+    - lookup (router_id, slot_id, slot_date) -> position pour la vérification des slots
+
+    Quand anchors.json n'a fait que grandir par la fin (passage d'auto-ancrage),
+    refresh() n'analyse que les nouveaux éléments.
+    """
+
+    def __init__(self):
+        self.signature = None
+        self.built = False
+        self._lock = threading.RLock()
+        self._fd = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.total = 0
+        self._offsets = array.array("q")
+        self._sizes = array.array("q")
+        self._per_router: Dict[str, dict] = {}
+        self._sorted: List[Tuple] = []
+        self._sorted_by_router: Dict[str, List[Tuple]] = {}
+        self._slots: Dict[Tuple, int] = {}
+        self._end = None          # offset juste après le dernier élément
+        self._last_digest = None  # empreinte du dernier élément (détection d'un ajout en fin)
+
+    def __del__(self):
+        self.close()
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    @staticmethod
+    def _key(anchor: dict, position: int) -> Tuple:
+        return (int(anchor.get("timestamp") or 0), _utf8(anchor.get("txid")) or "", position)
+
+    def rebuild(self, path: Path, signature) -> None:
+        """Construit l'index depuis anchors.json (un fichier absent ou illisible donne un index vide)"""
+        with self._lock:
+            self.close()
+            self._reset()
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                fd = None
+            if fd is not None:
+                try:
+                    self._scan(fd, 0, bulk=True)
+                except ValueError:
+                    os.close(fd)
+                    self._reset()
+                    fd = None
+            self._fd = fd
+            for entries in self._sorted_by_router.values():
+                entries.sort()
+            self._sorted.sort()
+            self.signature = signature
+            self.built = True
+
+    def refresh(self, path: Path, signature) -> bool:
+        """
+        Ajoute les éléments écrits à la fin de anchors.json depuis la construction.
+        Retourne False si le fichier a été réécrit autrement (reconstruction nécessaire).
+        """
+        with self._lock:
+            if self._end is None:
+                return False
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                return False
+            try:
+                last = self.total - 1
+                raw = os.pread(fd, self._sizes[last], self._offsets[last])
+                if hashlib.sha1(raw).digest() != self._last_digest:
+                    os.close(fd)
+                    return False
+                self._scan(fd, self._end)
+            except (OSError, ValueError):
+                os.close(fd)
+                return False
+            self.close()
+            self._fd = fd
+            self.signature = signature
+            return True
+
+    def _scan(self, fd: int, start: int, bulk: bool = False) -> None:
+        """
+        Lit les éléments à partir de start (0 : début du tableau, sinon juste
+        après un élément). bulk : listes triées par l'appelant à la fin.
+        """
+        with os.fdopen(os.dup(fd), "rb") as f:
+            f.seek(start)
+            # latin-1 : un caractère par octet, tell() donne l'offset dans le fichier
+            reader = JSONStreamReader(f, encoding="latin-1", offset=start)
+            if start == 0 and reader.peek() is None:
+                return
+            last_raw = None
+            for anchor, begin, end in reader.iter_array_spans(resume=start > 0):
+                if not isinstance(anchor, dict):
+                    continue
+                self._add(anchor, begin, end - begin, bulk)
+                self._end = end
+                last_raw = (begin, end - begin)
+        if last_raw is not None:
+            self._last_digest = hashlib.sha1(os.pread(fd, last_raw[1], last_raw[0])).digest()
+
+    def _add(self, anchor: dict, offset: int, size: int, bulk: bool) -> None:
+        position = self.total
+        self._offsets.append(offset)
+        self._sizes.append(size)
+        self.total += 1
+        router_id = _utf8(anchor.get("router_id"))
+        summary = self._per_router.get(router_id)
+        if summary is None:
+            self._per_router[router_id] = {"count": 1, "first": position, "last": position}
+        else:
+            summary["count"] += 1
+            summary["last"] = position
+        key = self._key(anchor, position)
+        if bulk:
+            self._sorted_by_router.setdefault(router_id, []).append(key)
+            self._sorted.append(key)
+        else:
+            # Les ajouts en fin arrivent quasi triés : insort ajoute en fin de liste
+            bisect.insort(self._sorted_by_router.setdefault(router_id, []), key)
+            bisect.insort(self._sorted, key)
+        if anchor.get("slot_id") is not None:
+            # Le premier ancrage d'un slot fait foi (même ordre que l'ancien parcours linéaire)
+            self._slots.setdefault((router_id, _utf8(anchor.get("slot_id")), _utf8(anchor.get("slot_date"))),
+                                   position)
+
+    def get(self, position: int) -> dict:
+        """Relit l'ancrage à cette position"""
+        with self._lock:
+            return json.loads(os.pread(self._fd, self._sizes[position], self._offsets[position]))
+
+    def iter_all(self) -> Iterator[dict]:
+        """Tous les ancrages dans l'ordre du fichier, lus en flux"""
+        with self._lock:
+            if self._fd is None:
+                return iter(())
+            f = os.fdopen(os.dup(self._fd), "rb")
+
+        def generate():
+            with f:
+                f.seek(0)
+                for anchor in JSONStreamReader(f).iter_array():
+                    if isinstance(anchor, dict):
+                        yield anchor
+        return generate()
+
+    def count(self, router_id: str) -> int:
+        summary = self._per_router.get(router_id)
+        return summary["count"] if summary else 0
+
+    def first(self, router_id: str) -> Optional[dict]:
+        summary = self._per_router.get(router_id)
+        return self.get(summary["first"]) if summary else None
+
+    def last(self, router_id: str) -> Optional[dict]:
+        summary = self._per_router.get(router_id)
+        return self.get(summary["last"]) if summary else None
+
+    def oldest(self, router_id: Optional[str] = None) -> Optional[dict]:
+        """Ancrage le plus ancien (par timestamp), pour un routeur ou globalement"""
+        with self._lock:
+            entries = self._sorted if router_id is None else self._sorted_by_router.get(router_id, [])
+            return self.get(entries[0][2]) if entries else None
+
+    def find_slot(self, router_id: str, slot_id, slot_date) -> Optional[dict]:
+        position = self._slots.get((router_id, slot_id, slot_date))
+        return self.get(position) if position is not None else None
+
+    def page(self, router_id: Optional[str] = None, limit: int = 20, before: Optional[Tuple] = None,
+             since: Optional[int] = None, until: Optional[int] = None,
+             descending: bool = True) -> Tuple[List[dict], Optional[Tuple], int]:
+        """
+        Page keyset sur (timestamp, txid, position).
+
+        before       : position (timestamp, txid, position) du dernier élément de la page précédente
+        since, until : plage de timestamps (bornes incluses)
+        Retourne (ancrages, position pour la page suivante ou None, nombre d'ancrages dans la plage).
+        """
+        with self._lock:
+            entries = self._sorted if router_id is None else self._sorted_by_router.get(router_id, [])
+            lo, hi = 0, len(entries)
+            if since is not None:
+                lo = bisect.bisect_left(entries, (since,))
+            if until is not None:
+                hi = bisect.bisect_left(entries, (until + 1,))
+            total = max(0, hi - lo)
+            if before is not None:
+                if descending:
+                    hi = min(hi, bisect.bisect_left(entries, before, lo, hi))
+                else:
+                    lo = max(lo, bisect.bisect_right(entries, before, lo, hi))
+
+            if descending:
+                selected = entries[max(lo, hi - limit):hi][::-1]
+                has_more = hi - limit > lo
+            else:
+                selected = entries[lo:min(hi, lo + limit)]
+                has_more = lo + limit < hi
+            anchors = [self.get(position) for _, _, position in selected]
+        next_position = selected[-1] if has_more and selected else None
+        return anchors, next_position, total
+
+
+class RouterIndex:
+    """
+    Index trié des routeurs.
+
+    - une liste triée (clé, router_id) par champ de tri
+    - des buckets par valeur pour les filtres d'égalité (security_status, location),
+      avec leur propre liste triée calculée à la demande
+    - last_seen est normalisé en epoch pour les filtres de plage (bisect)
+    """
+
+    SORT_FIELDS = ("last_seen", "name", "router_id", "total_anchors")
+    BUCKET_FIELDS = ("security_status", "location")
+
+    def __init__(self):
+        self.signature = None
+        self.built = False
+        self.routers: Dict[str, dict] = {}
+        self.rows: Dict[str, dict] = {}
+        self._sorted: Dict[str, List[Tuple]] = {}
+        self._buckets: Dict[Tuple[str, str], set] = {}
+        self._bucket_sorted: Dict[Tuple[str, str, str], List[Tuple]] = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    @staticmethod
+    def _sort_key(field: str, row: dict) -> Tuple:
+        if field == "last_seen":
+            last_seen = row["last_seen_epoch"]
+            return (0, 0) if last_seen is None else (1, last_seen)
+        if field == "name":
+            return ((row["name"] or "").lower(),)
+        if field == "total_anchors":
+            return (row["total_anchors"],)
+        return ()
+
+    @staticmethod
+    def check_position(sort: str, key, router_id) -> Tuple:
+        """Valide une position (clé, router_id) lue dans un curseur pour le tri sort (ValueError sinon)"""
+        def number(value):
+            return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+        if sort == "last_seen":
+            valid = (isinstance(key, tuple) and len(key) == 2 and key[0] in (0, 1)
+                     and not isinstance(key[0], bool) and number(key[1]))
+        elif sort == "name":
+            valid = isinstance(key, tuple) and len(key) == 1 and isinstance(key[0], str)
+        elif sort == "total_anchors":
+            valid = isinstance(key, tuple) and len(key) == 1 and number(key[0])
+        else:
+            valid = key == ()
+        if not valid or not isinstance(router_id, str):
+            raise ValueError("curseur invalide")
+        return (key, router_id)
+
+    def rebuild(self, routers: Dict[str, dict], rows: Dict[str, dict], signature) -> None:
+        """
+        routers : infos brutes par router_id
+        rows    : champs indexés par router_id (last_seen_epoch, name,
+                  security_status, location, total_anchors)
+        """
+        self.routers = routers
+        self.rows = rows
+        self._sorted = {
+            field: sorted((self._sort_key(field, row), router_id) for router_id, row in rows.items())
+            for field in self.SORT_FIELDS
+        }
+        buckets: Dict[Tuple[str, str], set] = {}
+        for router_id, row in rows.items():
+            for field in self.BUCKET_FIELDS:
+                value = (row.get(field) or "").lower()
+                buckets.setdefault((field, value), set()).add(router_id)
+        self._buckets = buckets
+        self._bucket_sorted = {}
+        self.signature = signature
+        self.built = True
+
+    def update(self, router_id: str, router_info: dict, row: dict, signature) -> None:
+        """
+        Met à jour un seul routeur (ajout ou modification) en O(log n) par
+        liste triée : une ingestion /anchor ne reconstruit pas l'index.
+        """
+        old = self.rows.get(router_id)
+        for field in self.SORT_FIELDS:
+            entries = self._sorted[field]
+            if old is not None:
+                _discard(entries, (self._sort_key(field, old), router_id))
+            bisect.insort(entries, (self._sort_key(field, row), router_id))
+        for field in self.BUCKET_FIELDS:
+            value = (row.get(field) or "").lower()
+            if old is not None:
+                old_value = (old.get(field) or "").lower()
+                members = self._buckets.get((field, old_value))
+                if members is not None:
+                    members.discard(router_id)
+                for sort in self.SORT_FIELDS:
+                    cached = self._bucket_sorted.get((field, old_value, sort))
+                    if cached is not None:
+                        _discard(cached, (self._sort_key(sort, old), router_id))
+            self._buckets.setdefault((field, value), set()).add(router_id)
+            for sort in self.SORT_FIELDS:
+                cached = self._bucket_sorted.get((field, value, sort))
+                if cached is not None:
+                    bisect.insort(cached, (self._sort_key(sort, row), router_id))
+        self.routers[router_id] = router_info
+        self.rows[router_id] = row
+        self.signature = signature
+
+    def _bucket_list(self, field: str, value: str, sort: str) -> List[Tuple]:
+        cache_key = (field, value, sort)
+        entries = self._bucket_sorted.get(cache_key)
+        if entries is None:
+            members = self._buckets.get((field, value), set())
+            entries = sorted((self._sort_key(sort, self.rows[rid]), rid) for rid in members)
+            self._bucket_sorted[cache_key] = entries
+        return entries
+
+    def page(self, sort: str = "last_seen", descending: bool = True, limit: int = 100,
+             after: Optional[Tuple] = None, equals: Optional[Dict[str, str]] = None,
+             last_seen_range: Optional[Tuple] = None) -> Tuple[List[str], Optional[Tuple]]:
+        """
+        Retourne (router_ids de la page, position du dernier élément ou None).
+
+        after            : position (clé, router_id) renvoyée par la page précédente
+        equals           : {champ: valeur} pour les champs de BUCKET_FIELDS
+        last_seen_range  : intervalle (min, max, inclure_none) en epoch, bornes incluses
+        """
+        if sort not in self.SORT_FIELDS:
+            raise ValueError(f"tri non supporté: {sort}")
+        equals = {f: (v or "").lower() for f, v in (equals or {}).items()}
+
+        # Choisir la liste la plus sélective comme source de parcours
+        entries = self._sorted[sort]
+        driver = None
+        for field, value in equals.items():
+            size = len(self._buckets.get((field, value), ()))
+            if size < len(entries):
+                entries = self._bucket_list(field, value, sort)
+                driver = field
+
+        # Restreindre la plage par bisect quand le tri porte sur last_seen
+        lo, hi = 0, len(entries)
+        if sort == "last_seen" and last_seen_range:
+            min_ts, max_ts, include_none = last_seen_range
+            if not include_none:
+                lo = bisect.bisect_left(entries, ((1, min_ts if min_ts is not None else float("-inf")),))
+            if max_ts is not None:
+                hi = bisect.bisect_right(entries, ((1, max_ts), "\uffff"))
+
+        if after is not None:
+            if descending:
+                hi = min(hi, bisect.bisect_left(entries, after, lo, hi))
+            else:
+                lo = max(lo, bisect.bisect_right(entries, after, lo, hi))
+
+        def matches(router_id):
+            row = self.rows[router_id]
+            for field, value in equals.items():
+                if field != driver and (row.get(field) or "").lower() != value:
+                    return False
+            if last_seen_range:
+                min_ts, max_ts, include_none = last_seen_range
+                last_seen = row["last_seen_epoch"]
+                if last_seen is None:
+                    return include_none
+                if min_ts is not None and last_seen < min_ts:
+                    return False
+                if max_ts is not None and last_seen > max_ts:
+                    return False
+            return True
+
+        indices = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+        page_ids: List[str] = []
+        last_position = None
+        for i in indices:
+            key, router_id = entries[i]
+            if not matches(router_id):
+                continue
+            if len(page_ids) == limit:
+                # Il reste au moins un élément : la page suivante existe
+                return page_ids, last_position
+            page_ids.append(router_id)
+            last_position = (key, router_id)
+        return page_ids, None
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lecture incrémentale de JSON depuis un flux binaire (fichier, corps de requête).
+
+Le flux est lu par morceaux de chunk_size octets ; seules les valeurs en cours
+de décodage sont gardées en mémoire. Un tableau ou un objet de premier niveau
+peut être parcouru élément par élément, avec la position de chaque élément
+(iter_array_spans ; en latin-1, position = offset en octets dans le fichier).
+
+Exporte :
+- JSONStreamReader(stream, chunk_size, max_bytes)
+- PayloadTooLarge
+"""
+
+import json
+import codecs
+from typing import Iterator, Optional, Tuple
+
+WHITESPACE = " \t\r\n"
+NUMBER_CHARS = "0123456789.eE+-"
+
+# Une erreur de décodage à moins de TRUNCATION_MARGIN caractères de la fin du
+# buffer peut venir d'une valeur coupée (littéral, échappement \uXXXX) : relire
+TRUNCATION_MARGIN = 16
+
+
+class PayloadTooLarge(ValueError):
+    """Le flux dépasse max_bytes"""
+
+
+class JSONStreamReader:
+    def __init__(self, stream, chunk_size: int = 1 << 16, max_bytes: Optional[int] = None,
+                 encoding: str = "utf-8", offset: int = 0):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._max_bytes = max_bytes
+        self._text = codecs.getincrementaldecoder(encoding)()
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._base = offset  # position (caractères) de _buf[0] dans le flux
+        self.eof = False
+        self.bytes_read = 0
+
+    def _fill(self, size: Optional[int] = None) -> None:
+        chunk = self._stream.read(size or self._chunk_size)
+        if chunk:
+            self.bytes_read += len(chunk)
+            if self._max_bytes is not None and self.bytes_read > self._max_bytes:
+                raise PayloadTooLarge(f"payload > {self._max_bytes} octets")
+            text = self._text.decode(chunk)
+        else:
+            self.eof = True
+            text = self._text.decode(b"", final=True)
+        self._base += self._pos
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+
+    def tell(self) -> int:
+        """Position courante en caractères depuis le début du flux (plus l'offset initial)"""
+        return self._base + self._pos
+
+    def peek(self) -> Optional[str]:
+        """Prochain caractère significatif (None en fin de flux)"""
+        while True:
+            buf, pos = self._buf, self._pos
+            while pos < len(buf) and buf[pos] in WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if self.eof:
+                return None
+            self._fill()
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON invalide: '{char}' attendu, '{found}' trouvé (octet ~{self.bytes_read})")
+        self._pos += 1
+
+    def read_value(self):
+        """Décode la prochaine valeur complète"""
+        if self.peek() is None:
+            raise ValueError("JSON tronqué")
+        size = self._chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                if self.eof or not self._truncated(e):
+                    raise ValueError(f"JSON invalide: {e.msg} (octet ~{self.bytes_read})") from None
+            else:
+                # Un nombre en fin de buffer peut être tronqué (y compris après "." ou "e") :
+                # relire avant de conclure
+                if self.eof or self._buf[end:].lstrip(NUMBER_CHARS):
+                    break
+            # Lectures de taille croissante : une grande valeur n'est pas redécodée O(n) fois
+            self._fill(size)
+            size *= 2
+        self._pos = end
+        return value
+
+    def _truncated(self, error: json.JSONDecodeError) -> bool:
+        """L'erreur vient-elle de la fin du buffer (valeur incomplète) plutôt que d'une faute de syntaxe ?"""
+        return error.pos >= len(self._buf) - TRUNCATION_MARGIN or error.msg.startswith("Unterminated string")
+
+    def iter_array(self) -> Iterator:
+        """Itère les éléments d'un tableau JSON"""
+        for value, _, _ in self.iter_array_spans():
+            yield value
+
+    def iter_array_spans(self, resume: bool = False) -> Iterator[Tuple[object, int, int]]:
+        """
+        Itère (élément, début, fin) d'un tableau JSON, positions au sens de tell().
+        resume=True reprend un tableau juste après un élément déjà lu.
+        """
+        if resume:
+            if not self._next_item():
+                return
+        else:
+            self.expect("[")
+            if self.peek() == "]":
+                self._pos += 1
+                return
+        while True:
+            self.peek()
+            start = self.tell()
+            value = self.read_value()
+            yield value, start, self.tell()
+            if not self._next_item():
+                return
+
+    def _next_item(self) -> bool:
+        """Consomme le séparateur après un élément : True si un autre élément suit"""
+        char = self.peek()
+        if char == ",":
+            self._pos += 1
+            return True
+        if char == "]":
+            self._pos += 1
+            return False
+        raise ValueError(f"JSON invalide: ',' ou ']' attendu (octet ~{self.bytes_read})")
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Itère les clés d'un objet JSON. Après chaque clé, l'appelant doit
+        consommer la valeur (read_value() ou iter_array()) avant de continuer.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise ValueError("JSON invalide: clé attendue")
+            self.expect(":")
+            yield key
+            char = self.peek()
+            if char == ",":
+                self._pos += 1
+            elif char == "}":
+                self._pos += 1
+                return
+            else:
+                raise ValueError(f"JSON invalide: ',' ou '}}' attendu (octet ~{self.bytes_read})")
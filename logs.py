@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Journalisation structurée hors du chemin des requêtes.
+
+- les loggers "snr.*" n'ont qu'un QueueHandler : un thread de requête ne
+  fait que mettre l'enregistrement dans une file bornée ; le formatage et
+  l'écriture (stdout, éventuellement un pipe lent sous gunicorn) se font
+  dans le thread du QueueListener. File pleine = enregistrement abandonné
+  et compté, jamais d'attente
+- LOG_FORMAT=json : un objet JSON par ligne (ts, level, logger, msg, champs
+  passés en extra=..., exc) ; LOG_FORMAT=text (défaut) : ligne lisible
+- limitation de débit des messages INFO et DEBUG : au plus LOG_RATE_BURST
+  messages par gabarit (logger + message avant formatage) et par fenêtre de
+  LOG_RATE_WINDOW secondes ; le premier message de la fenêtre suivante porte
+  le nombre de messages supprimés (champ "suppressed").
+  extra={"rate_limit": False} pour un message qui ne doit jamais être
+  supprimé. WARNING et au-delà ne sont jamais limités : deux BREACH de
+  routeurs différents partagent leur gabarit, aucune ne doit disparaître
+
+Les messages gardent le style du projet (emoji en tête) ; les valeurs
+variables passent en arguments %s et en extra pour rester filtrables en JSON.
+
+Exporte :
+- get_logger(name) -> logging.Logger ("snr.<name>")
+- init_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, stream=None)
+- shutdown_logging()
+- JsonFormatter, RateLimitFilter
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from datetime import datetime, timezone
+
+from metrics import Counter
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_RATE_BURST = int(os.getenv("LOG_RATE_BURST", "20"))
+LOG_RATE_WINDOW = float(os.getenv("LOG_RATE_WINDOW", "60"))
+
+ROOT_LOGGER = "snr"
+
+LOG_RECORDS = Counter("snr_log_records_total", "Enregistrements de log (écrits, supprimés par limitation, perdus file pleine)",
+                      ("result",))
+
+# Attributs standard d'un LogRecord : tout le reste vient de extra=...
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "rate_limit"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            line += f"  (+{suppressed} messages similaires supprimés)"
+        return line
+
+
+class RateLimitFilter(logging.Filter):
+    """Fenêtre fixe par gabarit de message (INFO et DEBUG) ; coût : un dict et un verrou"""
+
+    MAX_KEYS = 10000
+
+    def __init__(self, burst: int = LOG_RATE_BURST, window: float = LOG_RATE_WINDOW):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._lock = threading.Lock()
+        self._windows = {}  # (logger, gabarit) -> [début de fenêtre, émis, supprimés]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno >= logging.WARNING or not getattr(record, "rate_limit", True):
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg).__name__)
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                if len(self._windows) >= self.MAX_KEYS:
+                    self._windows.clear()
+                suppressed = state[2] if state else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+        LOG_RECORDS.inc(result="suppressed")
+        return False
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler qui abandonne au lieu d'attendre (ou de lever) quand la file est pleine"""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            LOG_RECORDS.inc(result="queued")
+        except queue.Full:
+            LOG_RECORDS.inc(result="dropped")
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Seul le texte de l'exception est calculé ici (la trace n'existe plus après) ;
+        # le message est formaté par le listener
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+_listener = None
+
+
+def init_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None) -> None:
+    """Installe file + thread d'écriture sur le logger "snr" (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = _DroppingQueueHandler(log_queue)
+    handler.addFilter(RateLimitFilter())
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level)
+    root.addHandler(handler)
+    root.propagate = False
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Vide la file et arrête le thread d'écriture"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
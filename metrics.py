@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métriques exposées au format texte Prometheus sur /metrics.
+
+Deux façons d'alimenter /metrics :
+- collecteurs appelés au moment du scrape (register_collector) : aucun coût
+  sur le chemin des requêtes, pour les états déjà tenus ailleurs (caches,
+  stores)
+- instruments Counter / Gauge / Histogram : mis à jour sur le chemin chaud
+  (un verrou, une addition ; bisect sur les bornes pour un histogramme),
+  pour ce qui n'existe nulle part ailleurs (latences, compteurs d'ancrage)
+
+init_app(app) installe le middleware WSGI par route : latence, requêtes en
+cours, tailles de requête et de réponse (octets réellement envoyés, après
+compression), statuts. La route est la règle Flask (/api/forensics/<forensic_id>),
+pas le chemin : cardinalité bornée.
+
+Exporte :
+- register_collector(func) : func() -> itérable de (nom, type, aide, [(labels, valeur)])
+  (un échantillon (suffixe, labels, valeur) ajoute un suffixe au nom, ex: _bucket)
+- Counter, Gauge, Histogram, LATENCY_BUCKETS, SIZE_BUCKETS
+- init_app(app)
+- render_prometheus() -> str
+- CONTENT_TYPE
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, List
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(10))  # 256 o .. 64 Mo
+
+_collectors: List[Callable] = []
+
+
+def register_collector(func: Callable) -> Callable:
+    _collectors.append(func)
+    return func
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_prometheus() -> str:
+    lines = []
+    for collector in _collectors:
+        for name, metric_type, help_text, samples in collector():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample in samples:
+                suffix, labels, value = sample if len(sample) == 3 else ("", *sample)
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# INSTRUMENTS
+# ============================================================================
+
+class Counter:
+    """Compteur monotone, une valeur par combinaison de labels"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {} if self.labelnames else {(): 0}  # sans label : exposé à 0 dès le départ
+        self._lock = threading.Lock()
+        register_collector(self.collect)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        yield (self.name, self.metric_type, self.help_text,
+               [(dict(zip(self.labelnames, key)), value) for key, value in items])
+
+
+class Gauge(Counter):
+    """Valeur instantanée (profondeur de file, requêtes en cours)"""
+
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """Histogramme cumulatif Prometheus (_bucket, _sum, _count)"""
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labels -> [compte par borne (+Inf en dernier), somme, total]
+        self._lock = threading.Lock()
+        register_collector(self.collect)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe la durée du bloc (secondes), y compris s'il lève"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self):
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        samples = []
+        for key, (counts, total, count) in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", {**labels, "le": _format_value(float(bound))}, cumulative))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, count))
+        yield (self.name, "histogram", self.help_text, samples)
+
+
+# ============================================================================
+# MIDDLEWARE HTTP
+# ============================================================================
+
+HTTP_REQUESTS = Counter("snr_http_requests_total", "Requêtes HTTP par route et statut",
+                        ("method", "route", "status"))
+HTTP_DURATION = Histogram("snr_http_request_duration_seconds",
+                          "Durée des requêtes jusqu'au dernier octet de la réponse", ("method", "route"))
+HTTP_REQUEST_SIZE = Histogram("snr_http_request_size_bytes", "Taille annoncée des corps de requête",
+                              ("route",), SIZE_BUCKETS)
+HTTP_RESPONSE_SIZE = Histogram("snr_http_response_size_bytes", "Octets de réponse envoyés",
+                               ("route",), SIZE_BUCKETS)
+HTTP_IN_FLIGHT = Gauge("snr_http_requests_in_flight", "Requêtes HTTP en cours de traitement")
+
+ROUTE_ENVIRON_KEY = "snr.route"
+
+
+class _CountingIterable:
+    """Itérable de réponse WSGI qui compte les octets envoyés et appelle finish(octets) à la fermeture"""
+
+    def __init__(self, iterable, finish: Callable):
+        self._iterable = iterable
+        self._finish = finish
+        self._sent = 0
+
+    def __iter__(self):
+        for chunk in self._iterable:
+            self._sent += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self._iterable, "close"):
+                self._iterable.close()
+        finally:
+            self._finish(self._sent)
+
+
+class MetricsMiddleware:
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        status = {}
+
+        def metrics_start_response(status_line, headers, exc_info=None):
+            status["code"] = status_line[:3]
+            return start_response(status_line, headers, exc_info)
+
+        def finish(sent: int):
+            HTTP_IN_FLIGHT.dec()
+            method = environ.get("REQUEST_METHOD", "GET")
+            route = environ.get(ROUTE_ENVIRON_KEY, "unmatched")
+            HTTP_REQUESTS.inc(method=method, route=route, status=status.get("code", "000"))
+            HTTP_DURATION.observe(time.perf_counter() - started, method=method, route=route)
+            HTTP_REQUEST_SIZE.observe(int(environ.get("CONTENT_LENGTH") or 0), route=route)
+            HTTP_RESPONSE_SIZE.observe(sent, route=route)
+
+        try:
+            iterable = self.wsgi_app(environ, metrics_start_response)
+        except BaseException:
+            finish(0)
+            raise
+        return _CountingIterable(iterable, finish)
+
+
+def _record_route():
+    """Hook before_request : la règle Flask sert de label de route"""
+    from flask import request
+    if request.url_rule is not None:
+        request.environ[ROUTE_ENVIRON_KEY] = request.url_rule.rule
+
+
+def init_app(app):
+    """Installe le middleware par route (à appeler après les autres middlewares : il les mesure aussi)"""
+    app.before_request(_record_route)
+    app.wsgi_app = MetricsMiddleware(app.wsgi_app)
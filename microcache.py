@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-cache à TTL court avec coalescence des requêtes (single-flight).
+
+Pendant un incident, N requêtes identiques simultanées sur une route chaude
+ne déclenchent qu'un seul calcul : la première calcule, les autres attendent
+son résultat. Les entrées expirent après quelques secondes ; une écriture
+n'invalide que les clés qu'elle rend fausses (invalidate(key)), les vues
+agrégées se rafraîchissent à l'expiration du TTL.
+
+Exporte :
+- MicroCache(name, ttl, max_entries)
+- cached_response(cache, key_func) : décorateur de vue Flask
+"""
+
+import os
+import time
+import functools
+import threading
+from typing import Callable, Dict
+
+MICROCACHE_TTL = float(os.getenv("MICROCACHE_TTL", "1.5"))
+MICROCACHE_MAX_ENTRIES = int(os.getenv("MICROCACHE_MAX_ENTRIES", "512"))
+
+
+class _Flight:
+    """Calcul en cours partagé par les requêtes concurrentes d'une même clé"""
+
+    __slots__ = ("event", "value", "error", "stale")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+        self.stale = False
+
+
+class MicroCache:
+    def __init__(self, name: str, ttl: float = MICROCACHE_TTL, max_entries: int = MICROCACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[object, tuple] = {}     # clé -> (expire_at, valeur)
+        self._inflight: Dict[object, _Flight] = {}
+        self._generation = 0
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0, "evictions": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, compute: Callable):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.stats["hits"] += 1
+                return entry[1]
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.stats["coalesced"] += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self.stats["misses"] += 1
+                leader = True
+            generation = self._generation
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                # Un résultat calculé avant une invalidation n'est pas conservé
+                if flight.error is None and not flight.stale and generation == self._generation:
+                    self._store(key, flight.value)
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            flight.event.set()
+        return flight.value
+
+    def _store(self, key, value):
+        now = time.monotonic()
+        if len(self._entries) >= self.max_entries:
+            expired = [k for k, (expire_at, _) in self._entries.items() if expire_at <= now]
+            for k in expired:
+                del self._entries[k]
+            self.stats["evictions"] += len(expired)
+            if len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+                self.stats["evictions"] += 1
+        self._entries[key] = (now + self.ttl, value)
+
+    def invalidate(self, key=None):
+        """
+        Retire key du cache (tout le cache si key est None) ; les calculs en
+        cours pour ces clés ne seront pas mis en cache
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._inflight.clear()
+                self._generation += 1
+            else:
+                self._entries.pop(key, None)
+                flight = self._inflight.pop(key, None)
+                if flight is not None:
+                    flight.stale = True
+            self.stats["invalidations"] += 1
+
+
+def cached_response(cache: MicroCache, key_func: Callable):
+    """
+    Décorateur de vue Flask : met en cache (corps, statut, en-têtes) de la réponse
+    sous la clé key_func() pendant cache.ttl secondes.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import current_app, Response
+
+            def compute():
+                response = current_app.make_response(view(*args, **kwargs))
+                headers = [(k, v) for k, v in response.headers.items() if k.lower() != "content-length"]
+                return response.get_data(), response.status_code, headers
+
+            body, status, headers = cache.get_or_compute(key_func(), compute)
+            return Response(body, status=status, headers=headers)
+        return wrapper
+    return decorator
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profilage à la demande d'un gateway en production, sans redémarrage.
+
+- SamplingProfiler : un thread relève la pile de chaque thread toutes les
+  `interval` secondes (sys._current_frames) pendant N secondes. Rien n'est
+  instrumenté : le coût est celui du relevé (~100 Hz par défaut), nul hors
+  session. Résultat au format « collapsed stacks » (une pile par ligne,
+  cadres séparés par « ; », puis le nombre d'échantillons), prêt pour
+  flamegraph.pl / speedscope
+- MemoryTracker : snapshots tracemalloc nommés et différence entre deux
+  snapshots (top des lignes qui allouent) ; tracemalloc n'est actif
+  qu'entre le premier snapshot et stop() (il ralentit les allocations)
+- register_store / store_sizes : taille mémoire (récursive, bornée) des
+  stores en mémoire déclarés par le gateway (index, caches, canaux)
+
+Exporte :
+- SamplingProfiler, ProfilerBusy, PROFILER
+- MemoryTracker, MEMORY
+- register_store(name, func), store_sizes(max_objects=...)
+- deep_sizeof(obj, max_objects=...) -> (octets, objets, tronqué)
+"""
+
+import os
+import sys
+import time
+import threading
+import types
+import tracemalloc
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.01"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))
+TRACEMALLOC_MAX_SNAPSHOTS = int(os.getenv("TRACEMALLOC_MAX_SNAPSHOTS", "8"))
+STORE_SIZE_MAX_OBJECTS = int(os.getenv("STORE_SIZE_MAX_OBJECTS", "2000000"))
+
+# Feuilles de pile d'un thread qui attend (serveur en accept, file vide, sleep
+# dans une boucle) : exclues sauf include_idle, sinon elles écrasent le profil
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("socketserver.py", "serve_forever"),
+    ("queue.py", "get"),
+    ("snr_bsv_gateway.py", "auto_anchor_slots_to_bsv"),
+}
+
+
+class ProfilerBusy(RuntimeError):
+    """Une session de profilage est déjà en cours"""
+
+
+# ============================================================================
+# PROFILEUR PAR ÉCHANTILLONNAGE
+# ============================================================================
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Une session à la fois ; le dernier résultat reste disponible jusqu'à la suivante"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self.seconds = 0.0
+        self.interval = PROFILE_INTERVAL
+        self.include_idle = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: float = PROFILE_INTERVAL, include_idle: bool = False) -> None:
+        """Lance une session de `seconds` secondes (bornée par PROFILE_MAX_SECONDS)"""
+        with self._lock:
+            if self.running:
+                raise ProfilerBusy("profilage déjà en cours")
+            self.seconds = max(0.1, min(float(seconds), PROFILE_MAX_SECONDS))
+            self.interval = max(0.001, float(interval))
+            self.include_idle = include_idle
+            self._stacks = Counter()
+            self.samples = 0
+            self.started_at, self.stopped_at = time.time(), None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Arrête la session en cours (le résultat garde les échantillons déjà relevés)"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def wait(self) -> None:
+        """Attend la fin de la session en cours"""
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + self.seconds
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                code = frame.f_code
+                if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+        self.stopped_at = time.time()
+
+    def collapsed(self) -> str:
+        """Piles au format collapsed (la plus fréquente en premier)"""
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "seconds": self.seconds,
+            "interval": self.interval,
+            "include_idle": self.include_idle,
+            "samples": self.samples,
+            "stacks": len(self._stacks),
+        }
+
+
+# ============================================================================
+# SNAPSHOTS TRACEMALLOC
+# ============================================================================
+
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+def _where(traceback, key_type: str):
+    if key_type == "filename":
+        return traceback[0].filename
+    lines = [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+    return lines if key_type == "traceback" else lines[0]
+
+
+class MemoryTracker:
+    def __init__(self, frames: int = TRACEMALLOC_FRAMES, max_snapshots: int = TRACEMALLOC_MAX_SNAPSHOTS):
+        self.frames = frames
+        self.max_snapshots = max_snapshots
+        self._lock = threading.Lock()
+        self._snapshots: Dict[str, tuple] = {}  # nom -> (epoch, snapshot)
+        self._started_here = False
+
+    def snapshot(self, name: Optional[str] = None) -> dict:
+        """Prend un snapshot (démarre tracemalloc au premier appel) ; le plus ancien est oublié au-delà du maximum"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._started_here = True
+            snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+            name = name or f"s{int(time.time() * 1000)}"
+            self._snapshots.pop(name, None)
+            self._snapshots[name] = (time.time(), snapshot)
+            while len(self._snapshots) > self.max_snapshots:
+                del self._snapshots[next(iter(self._snapshots))]
+            current, peak = tracemalloc.get_traced_memory()
+            return {"name": name, "traced_bytes": current, "peak_bytes": peak,
+                    "total_bytes": sum(stat.size for stat in snapshot.statistics("filename"))}
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            return [{"name": name, "taken_at": taken_at} for name, (taken_at, _) in self._snapshots.items()]
+
+    def diff(self, before: str, after: str, top: int = 20, key_type: str = "lineno") -> dict:
+        """Lignes (ou fichiers, key_type="filename"/"traceback") dont l'allocation a le plus changé"""
+        with self._lock:
+            try:
+                old, new = self._snapshots[before][1], self._snapshots[after][1]
+            except KeyError as e:
+                raise KeyError(f"snapshot inconnu: {e.args[0]}")
+        stats = new.compare_to(old, key_type)
+        return {
+            "before": before,
+            "after": after,
+            "size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "top": [{
+                "where": _where(stat.traceback, key_type),
+                "size_bytes": stat.size,
+                "size_diff_bytes": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff,
+            } for stat in stats[:top]],
+        }
+
+    def stop(self) -> None:
+        """Oublie les snapshots et arrête tracemalloc s'il a été démarré ici"""
+        with self._lock:
+            self._snapshots.clear()
+            if self._started_here and tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self._started_here = False
+
+
+# ============================================================================
+# TAILLE DES STORES
+# ============================================================================
+
+_stores: Dict[str, Callable] = {}
+
+
+def register_store(name: str, func: Callable) -> None:
+    """func() -> objet à mesurer (relu à chaque appel : les index sont remplacés à la reconstruction)"""
+    _stores[name] = func
+
+
+# Partagés avec tout le process : jamais comptés dans un store
+_NOT_OWNED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_sizeof(obj, max_objects: int = STORE_SIZE_MAX_OBJECTS) -> tuple:
+    """(octets, objets, tronqué) : parcours des conteneurs et attributs, objets partagés comptés une fois"""
+    seen = set()
+    stack = [obj]
+    size = 0
+    while stack:
+        if len(seen) >= max_objects:
+            return size, len(seen), True
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _NOT_OWNED):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif isinstance(current, (str, bytes, bytearray, int, float, bool)) or current is None:
+            continue
+        else:
+            if hasattr(current, "__dict__"):
+                stack.append(vars(current))
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return size, len(seen), False
+
+
+def store_sizes(max_objects: int = STORE_SIZE_MAX_OBJECTS) -> Dict[str, dict]:
+    sizes = {}
+    for name, func in _stores.items():
+        started = time.perf_counter()
+        try:
+            size, objects, truncated = deep_sizeof(func(), max_objects)
+        except Exception as e:
+            sizes[name] = {"error": str(e)}
+            continue
+        sizes[name] = {"bytes": size, "objects": objects, "truncated": truncated,
+                       "measure_ms": round((time.perf_counter() - started) * 1000, 1)}
+    return sizes
+
+
+PROFILER = SamplingProfiler()
+MEMORY = MemoryTracker()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Canal des requêtes / réponses forensiques : map router_id -> entrée gardée en
+mémoire, écrite sur disque (JSON) à chaque modification.
+
+- lecture : servie depuis la mémoire ; le fichier n'est re-stat() qu'au plus
+  une fois par RELOAD_INTERVAL pour voir les écritures d'un autre process
+- écriture : fichier temporaire + os.replace (jamais de JSON à moitié écrit)
+- long-poll : wait_for() bloque sur une Condition jusqu'à ce qu'une entrée
+  satisfasse le prédicat ou que le délai expire ; une modification dans le
+  même process réveille immédiatement les attentes
+- cycle de vie : chaque entrée porte expires_at (epoch) ; un tas (heapq)
+  ordonné par expiration permet d'évincer les entrées expirées en
+  O(log n) à chaque accès, et de rester sous max_entries en évinçant celles
+  qui expirent le plus tôt. Les entrées remplacées laissent dans le tas une
+  ligne périmée, ignorée quand elle remonte.
+
+Exporte :
+- RequestChannel(path, name, ttl, max_entries)
+"""
+
+import os
+import json
+import time
+import heapq
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from logs import get_logger
+
+log = get_logger("request_channel")
+
+RELOAD_INTERVAL = float(os.getenv("FORENSIC_CHANNEL_RELOAD_INTERVAL", "1.0"))
+
+
+class RequestChannel:
+    def __init__(self, path: Path, name: str, ttl: Optional[int] = None, max_entries: Optional[int] = None):
+        self.path = Path(path)
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._cond = threading.Condition()
+        self._data: Dict[str, dict] = {}
+        self._heap: List[Tuple[int, str]] = []
+        self._signature = None
+        self._checked_at = 0.0
+        with self._cond:
+            self._reload(force=True)
+
+    def _file_signature(self):
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _reload(self, force: bool = False) -> None:
+        """Relit le fichier s'il a changé (appelé sous self._cond)"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < RELOAD_INTERVAL:
+            return
+        self._checked_at = now
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        try:
+            data = json.loads(self.path.read_text()) if signature else {}
+        except ValueError:
+            return  # fichier corrompu : garder l'état en mémoire
+        self._data, self._signature = data, signature
+        self._heap = []
+        for key, value in data.items():
+            self._schedule(key, value)
+        heapq.heapify(self._heap)
+        self._cond.notify_all()
+
+    def _schedule(self, key: str, value: dict) -> None:
+        """Ajoute l'expiration d'une entrée au tas (entrée antérieure sans expires_at : date de création + ttl)"""
+        if self.ttl is None:
+            return
+        if "expires_at" not in value:
+            created = value.get("created_at") or value.get("timestamp") or int(time.time())
+            value["expires_at"] = int(created) + self.ttl
+        self._heap.append((value["expires_at"], key))
+
+    def _evict(self) -> bool:
+        """Retire les entrées expirées puis celles en excès ; True si l'état a changé"""
+        now = time.time()
+        changed = False
+        while self._heap and (self._heap[0][0] <= now or (self.max_entries and len(self._data) > self.max_entries)):
+            expires_at, key = heapq.heappop(self._heap)
+            value = self._data.get(key)
+            if value is not None and value.get("expires_at") == expires_at:
+                del self._data[key]
+                self.evictions += 1
+                changed = True
+        return changed
+
+    def _refresh(self, force: bool = False) -> None:
+        self._reload(force)
+        if self._evict():
+            self._write()
+
+    def __len__(self) -> int:
+        with self._cond:
+            self._refresh()
+            return len(self._data)
+
+    def _write(self) -> None:
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._data, f, indent=2)
+            os.replace(tmp, self.path)
+            self._signature = self._file_signature()
+        except Exception as e:
+            log.error("❌ Erreur sauvegarde %s: %s", self.name, e)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._cond:
+            self._refresh()
+            value = self._data.get(key)
+            return dict(value) if value is not None else None
+
+    def items(self) -> Dict[str, dict]:
+        with self._cond:
+            self._refresh()
+            return {key: dict(value) for key, value in self._data.items()}
+
+    def set(self, key: str, value: dict) -> None:
+        with self._cond:
+            self._reload(force=True)
+            value = dict(value)
+            if self.ttl is not None:
+                value.setdefault("expires_at", int(time.time()) + self.ttl)
+                heapq.heappush(self._heap, (value["expires_at"], key))
+            self._data[key] = value
+            self._evict()
+            self._write()
+            self._cond.notify_all()
+
+    def pop(self, key: str) -> Optional[dict]:
+        with self._cond:
+            self._refresh(force=True)
+            value = self._data.pop(key, None)
+            if value is not None:
+                self._write()
+                self._cond.notify_all()
+            return value
+
+    def wait_for(self, key: str, predicate: Callable[[dict], bool], timeout: float) -> Optional[dict]:
+        """Attend (au plus timeout secondes) une entrée de key qui satisfait predicate"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._refresh()
+                value = self._data.get(key)
+                if value is not None and predicate(value):
+                    return dict(value)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                # Réveil au plus tard à chaque RELOAD_INTERVAL pour les écritures d'autres process
+                self._cond.wait(min(remaining, RELOAD_INTERVAL))
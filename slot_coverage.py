@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Couverture des slots par routeur et par jour, en bitmaps de 144 bits.
+
+Chaque routeur produit une grille fixe de 144 slots de 10 minutes par jour
+(slot 0..143 d'une date UTC, même grille que tracing.slot_end). Une ligne
+(routeur, jour) porte quatre bitmaps de 18 octets, bit i = slot i :
+- reported  : le slot a été vu dans un envoi /anchor
+- finalized : le slot a été reçu finalisé avec son slot_hash
+- anchored  : un ancrage BSV existe pour ce slot
+- expired   : finalisé, non ancré, et sorti de la fenêtre d'ancrage
+  (COVERAGE_PENDING_DAYS) : l'auto-ancrage ne le cherche plus
+plus pending = nombre de slots finalisés ni ancrés ni expirés (index partiel
+pending > 0 : l'auto-ancrage lit directement les slots à ancrer, sans
+reparcourir la flotte).
+
+Les bits ne font que s'allumer (sauf clear) : une mise à jour dont tous les
+bits sont déjà présents dans le cache (lignes récentes, COVERAGE_CACHE_ROWS)
+ne touche pas SQLite ; sinon la ligne est relue et fusionnée dans une
+transaction BEGIN IMMEDIATE (plusieurs process peuvent écrire). Un routeur
+qui envoie toutes les minutes ne provoque donc qu'une écriture par nouveau
+slot. clear() (reset, reconstruction) incrémente la génération stockée dans
+la table coverage_meta : un process qui voit une autre génération que celle
+de son cache vide le cache avant de s'y fier.
+
+Un rapport de trous sur une plage de dates lit une ligne par jour (clé
+primaire (router_id, day)) : O(jours), quel que soit le nombre d'ancrages.
+Les slots pas encore terminés ne sont jamais comptés comme manquants.
+
+Exporte :
+- CoverageStore(path, cache_rows)
+- gap_runs(mask) : suites de bits à 1 d'un bitmap -> [(premier slot, longueur)]
+- SLOTS_PER_DAY, GAP_KINDS, COVERAGE_PENDING_DAYS
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+SLOT_SECONDS = 600
+DAY_SECONDS = 86400
+SLOTS_PER_DAY = DAY_SECONDS // SLOT_SECONDS
+BITMAP_BYTES = SLOTS_PER_DAY // 8
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+COVERAGE_CACHE_ROWS = int(os.getenv("COVERAGE_CACHE_ROWS", "50000"))
+
+# Jours pendant lesquels un slot finalisé non ancré reste à ancrer (au-delà : expired)
+COVERAGE_PENDING_DAYS = int(os.getenv("COVERAGE_PENDING_DAYS", "2"))
+
+# Nature d'un slot terminé non ancré (un slot ancré n'est jamais un trou)
+GAP_KINDS = ("unreported", "unfinalized", "unanchored")
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS slot_coverage (
+        router_id TEXT NOT NULL,
+        day INTEGER NOT NULL,
+        reported BLOB NOT NULL,
+        finalized BLOB NOT NULL,
+        anchored BLOB NOT NULL,
+        pending INTEGER NOT NULL,
+        expired BLOB NOT NULL DEFAULT X'000000000000000000000000000000000000',
+        PRIMARY KEY (router_id, day)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS slot_coverage_pending ON slot_coverage (router_id, day) WHERE pending > 0",
+    "CREATE TABLE IF NOT EXISTS coverage_meta (id INTEGER PRIMARY KEY CHECK (id = 0), generation INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO coverage_meta VALUES (0, 0)",
+)
+
+_EPOCH = date(1970, 1, 1)
+
+
+def _day_number(value) -> Optional[int]:
+    try:
+        return (date.fromisoformat(str(value)) - _EPOCH).days
+    except ValueError:
+        return None
+
+
+def _day_string(day: int) -> str:
+    return (_EPOCH + timedelta(days=day)).isoformat()
+
+
+def _slot_bit(value) -> Optional[int]:
+    try:
+        slot = int(value)
+    except (TypeError, ValueError):
+        return None
+    return 1 << slot if 0 <= slot < SLOTS_PER_DAY else None
+
+
+def _to_blob(mask: int) -> bytes:
+    return mask.to_bytes(BITMAP_BYTES, "little")
+
+
+def _from_blob(blob: bytes) -> int:
+    return int.from_bytes(blob, "little")
+
+
+def gap_runs(mask: int) -> List[Tuple[int, int]]:
+    """Suites de bits à 1 : [(premier slot, longueur)], en O(nombre de suites)"""
+    runs = []
+    while mask:
+        low = (mask & -mask).bit_length() - 1
+        shifted = mask >> low
+        length = ((shifted ^ (shifted + 1)) >> 1).bit_length()
+        runs.append((low, length))
+        mask &= ~(((1 << length) - 1) << low)
+    return runs
+
+
+class CoverageStore:
+    def __init__(self, path: Path, cache_rows: int = COVERAGE_CACHE_ROWS):
+        self.path = Path(path)
+        self.cache_rows = cache_rows
+        self._local = threading.local()
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()  # (router_id, day) -> (reported, finalized, anchored)
+        self._cache_lock = threading.Lock()
+        self._generation = None  # génération de la base à laquelle correspond le cache
+        self.stats = {"updates": 0, "skipped": 0, "writes": 0, "expired": 0}
+        conn = self._conn()
+        for statement in SCHEMA:
+            conn.execute(statement)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(slot_coverage)")}
+        if "expired" not in columns:
+            # Base créée avant l'état expired
+            conn.execute("ALTER TABLE slot_coverage ADD COLUMN expired BLOB NOT NULL "
+                         "DEFAULT X'000000000000000000000000000000000000'")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _check_generation(self) -> None:
+        """Vide le cache si la base a été vidée par un autre process depuis qu'il a été rempli"""
+        generation = self._conn().execute("SELECT generation FROM coverage_meta WHERE id = 0").fetchone()[0]
+        with self._cache_lock:
+            if generation != self._generation:
+                self._cache.clear()
+                self._generation = generation
+
+    def _cached(self, key: tuple) -> Optional[tuple]:
+        with self._cache_lock:
+            bits = self._cache.get(key)
+            if bits is not None:
+                self._cache.move_to_end(key)
+            return bits
+
+    def _remember(self, key: tuple, bits: tuple) -> None:
+        with self._cache_lock:
+            self._cache[key] = bits
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_rows:
+                self._cache.popitem(last=False)
+
+    # ---------------------------------------------------------------- écriture
+
+    def update(self, changes: dict) -> int:
+        """
+        Allume des bits : changes = {(router_id, day): (reported, finalized, anchored)}
+        (masques entiers, un slot finalisé est aussi reporté). Retourne le nombre de lignes écrites.
+        """
+        self.stats["updates"] += 1
+        self._check_generation()
+        dirty = {}
+        for key, bits in changes.items():
+            cached = self._cached(key)
+            if cached is None or any(new & ~old for new, old in zip(bits, cached)):
+                dirty[key] = bits
+        if not dirty:
+            self.stats["skipped"] += 1
+            return 0
+
+        conn = self._conn()
+        merged = {}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for (router_id, day), bits in dirty.items():
+                row = conn.execute(
+                    "SELECT reported, finalized, anchored, expired FROM slot_coverage WHERE router_id = ? AND day = ?",
+                    (router_id, day)
+                ).fetchone()
+                old = tuple(_from_blob(blob) for blob in row) if row else (0, 0, 0, 0)
+                reported, finalized, anchored = (new | previous for new, previous in zip(bits, old))
+                reported |= finalized
+                merged[(router_id, day)] = (reported, finalized, anchored)
+                if row is None or (reported, finalized, anchored) != old[:3]:
+                    self._write_row(conn, router_id, day, reported, finalized, anchored, old[3])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        for key, bits in merged.items():
+            self._remember(key, bits)
+        self.stats["writes"] += len(merged)
+        return len(merged)
+
+    @staticmethod
+    def _write_row(conn, router_id: str, day: int, reported: int, finalized: int, anchored: int,
+                   expired: int) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO slot_coverage (router_id, day, reported, finalized, anchored, expired, pending) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (router_id, day, _to_blob(reported), _to_blob(finalized), _to_blob(anchored), _to_blob(expired),
+             bin(finalized & ~anchored & ~expired).count("1"))
+        )
+
+    def record_report(self, router_id: str, slots: Iterable[dict], anchored: Iterable[tuple] = ()) -> int:
+        """Slots d'un envoi /anchor (dicts date, slot, finalized, slot_hash) + (date, slot) déjà ancrés"""
+        changes = {}
+        for slot_data in slots:
+            day, bit = _day_number(slot_data.get("date")), _slot_bit(slot_data.get("slot"))
+            if day is None or bit is None:
+                continue
+            bits = changes.setdefault((router_id, day), [0, 0, 0])
+            bits[0] |= bit
+            if slot_data.get("finalized") and slot_data.get("slot_hash"):
+                bits[1] |= bit
+        for slot_date, slot_id in anchored:
+            day, bit = _day_number(slot_date), _slot_bit(slot_id)
+            if day is not None and bit is not None:
+                changes.setdefault((router_id, day), [0, 0, 0])[2] |= bit
+        return self.update({key: tuple(bits) for key, bits in changes.items()})
+
+    def mark_anchored(self, router_id: str, slot_date, slot_id) -> int:
+        day, bit = _day_number(slot_date), _slot_bit(slot_id)
+        if day is None or bit is None:
+            return 0
+        return self.update({(router_id, day): (0, 0, bit)})
+
+    def rebuild(self, anchors: Iterable[dict], routers: dict) -> int:
+        """Reconstruit tous les bitmaps depuis anchors.json et le dernier envoi de chaque routeur"""
+        changes = {}
+        for router_id, router_info in routers.items():
+            for slot_data in router_info.get("slots") or []:
+                day, bit = _day_number(slot_data.get("date")), _slot_bit(slot_data.get("slot"))
+                if day is None or bit is None:
+                    continue
+                bits = changes.setdefault((router_id, day), [0, 0, 0])
+                bits[0] |= bit
+                if slot_data.get("finalized") and slot_data.get("slot_hash"):
+                    bits[1] |= bit
+        for anchor in anchors:
+            day, bit = _day_number(anchor.get("slot_date")), _slot_bit(anchor.get("slot_id"))
+            if day is not None and bit is not None and anchor.get("router_id") is not None:
+                changes.setdefault((anchor["router_id"], day), [0, 0, 0])[2] |= bit
+        self.clear()
+        return self.update({key: tuple(bits) for key, bits in changes.items()})
+
+    def expire(self, now: Optional[float] = None, days: int = COVERAGE_PENDING_DAYS) -> int:
+        """
+        Passe en expired les slots en attente des jours antérieurs à la fenêtre
+        d'ancrage (days jours avant aujourd'hui). Retourne le nombre de slots expirés.
+        """
+        now = time.time() if now is None else now
+        cutoff = int(now // DAY_SECONDS) - days
+        conn = self._conn()
+        count = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT router_id, day, reported, finalized, anchored, expired FROM slot_coverage "
+                "WHERE pending > 0 AND day < ?", (cutoff,)
+            ).fetchall()
+            for router_id, day, *bitmaps in rows:
+                reported, finalized, anchored, expired = (_from_blob(blob) for blob in bitmaps)
+                late = finalized & ~anchored & ~expired
+                count += bin(late).count("1")
+                self._write_row(conn, router_id, day, reported, finalized, anchored, expired | late)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.stats["expired"] += count
+        return count
+
+    def clear(self) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM slot_coverage")
+            conn.execute("UPDATE coverage_meta SET generation = generation + 1 WHERE id = 0")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._cache_lock:
+            self._cache.clear()
+
+    # ----------------------------------------------------------------- lecture
+
+    def is_empty(self) -> bool:
+        return self._conn().execute("SELECT 1 FROM slot_coverage LIMIT 1").fetchone() is None
+
+    def unanchored(self, router_id: Optional[str] = None) -> List[tuple]:
+        """(router_id, date, slot) finalisés ni ancrés ni expirés, par routeur, jour, slot (index partiel pending > 0)"""
+        query = "SELECT router_id, day, finalized, anchored, expired FROM slot_coverage WHERE pending > 0"
+        params = ()
+        if router_id is not None:
+            query += " AND router_id = ?"
+            params = (router_id,)
+        slots = []
+        for row_router, day, finalized, anchored, expired in self._conn().execute(
+                query + " ORDER BY router_id, day", params):
+            slot_date = _day_string(day)
+            for first, length in gap_runs(_from_blob(finalized) & ~_from_blob(anchored) & ~_from_blob(expired)):
+                slots.extend((row_router, slot_date, slot) for slot in range(first, first + length))
+        return slots
+
+    def pending_count(self) -> int:
+        return self._conn().execute(
+            "SELECT COALESCE(SUM(pending), 0) FROM slot_coverage WHERE pending > 0"
+        ).fetchone()[0]
+
+    def gaps(self, router_id: str, since: str, until: str, now: Optional[float] = None) -> dict:
+        """
+        Trous d'un routeur du jour since au jour until (AAAA-MM-JJ inclus) :
+        une ligne SQLite par jour, suites de slots manquants fusionnées d'un
+        jour sur l'autre (ValueError si une date est illisible ou inversée).
+        """
+        first, last = _day_number(since), _day_number(until)
+        if first is None or last is None:
+            raise ValueError(f"date invalide: {since if first is None else until}")
+        if last < first:
+            raise ValueError("until doit suivre since")
+        now = time.time() if now is None else now
+        today = int(now // DAY_SECONDS)
+        finished_today = int((now - today * DAY_SECONDS) // SLOT_SECONDS)
+        rows = {day: tuple(_from_blob(blob) for blob in bitmaps) for day, *bitmaps in self._conn().execute(
+            "SELECT day, reported, finalized, anchored, expired FROM slot_coverage "
+            "WHERE router_id = ? AND day BETWEEN ? AND ? ORDER BY day",
+            (router_id, first, last)
+        )}
+
+        days, runs, totals = [], [], dict.fromkeys(GAP_KINDS, 0)
+        open_runs = {}  # nature -> suite touchant la fin du jour précédent
+        for day in range(first, min(last, today) + 1):
+            reported, finalized, anchored, expired = rows.get(day, (0, 0, 0, 0))
+            ended = FULL_DAY if day < today else (1 << finished_today) - 1
+            masks = {
+                "unreported": ended & ~reported & ~anchored,
+                "unfinalized": ended & reported & ~finalized & ~anchored,
+                "unanchored": ended & finalized & ~anchored,
+            }
+            entry = {
+                "date": _day_string(day),
+                "expected": bin(ended).count("1"),
+                "reported": bin(reported & ended).count("1"),
+                "finalized": bin(finalized & ended).count("1"),
+                "anchored": bin(anchored & ended).count("1"),
+                "expired": bin(expired & ~anchored & ended).count("1"),
+                "bitmaps": {"reported": _to_blob(reported).hex(), "finalized": _to_blob(finalized).hex(),
+                            "anchored": _to_blob(anchored).hex(), "expired": _to_blob(expired).hex()},
+            }
+            for kind, mask in masks.items():
+                entry[kind] = bin(mask).count("1")
+                totals[kind] += entry[kind]
+                continuing = open_runs.pop(kind, None)
+                for start, length in gap_runs(mask):
+                    if start == 0 and continuing is not None:
+                        continuing["length"] += length
+                        run = continuing
+                    else:
+                        run = {"kind": kind, "date": entry["date"], "slot": start, "length": length}
+                        runs.append(run)
+                    if start + length == SLOTS_PER_DAY:
+                        open_runs[kind] = run
+            days.append(entry)
+
+        runs.sort(key=lambda run: (run["date"], run["slot"], run["kind"]))
+        expected = sum(day["expected"] for day in days)
+        anchored_total = sum(day["anchored"] for day in days)
+        return {
+            "router_id": router_id,
+            "since": _day_string(first),
+            "until": _day_string(last),
+            "expected_slots": expected,
+            "anchored_slots": anchored_total,
+            "coverage": round(anchored_total / expected, 4) if expected else None,
+            "missing": totals,
+            "gaps": runs,
+            "days": days,
+        }
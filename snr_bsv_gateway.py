@@ -8,13 +8,40 @@ Multi-router monitoring with BSV blockchain anchoring and security breach detect
 import json
 import os
 import sys
+import hmac
 import shutil
 import time
+import tempfile
+import functools
+import threading
 import subprocess
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo  # Python 3.9+
 from pathlib import Path
-from flask import Flask, request, jsonify, render_template_string, redirect
+from flask import Flask, request, jsonify, render_template_string, redirect, Response, stream_with_context
+
+from indexes import RouterIndex, AnchorIndex, encode_cursor, decode_cursor
+from export import EXPORT_FORMATS, ANCHOR_COLUMNS, HISTORY_COLUMNS, iter_anchors, format_chunks, gzip_chunks
+from compression import init_app as init_compression, COMPRESSION_LEVEL
+from capture import init_app as init_capture
+from microcache import MicroCache, cached_response
+from metrics import (register_collector, render_prometheus, Counter, Gauge, Histogram, init_app as init_metrics,
+                     CONTENT_TYPE as METRICS_CONTENT_TYPE)
+from forensic_store import ForensicStore, read_upload, PayloadTooLarge
+from forensic_analysis import broken_blocks
+from upload_sessions import UploadSessionStore, UploadError, OffsetMismatch
+from forensic_verify import verify_blocks, start_pool as start_verify_pool, CHAIN_HASH_MODE, VERIFY_WORKERS
+from forensic_diff import diff_uploads
+from request_channel import RequestChannel
+from profiling import PROFILER, MEMORY, ProfilerBusy, register_store, store_sizes
+from logs import init_logging, get_logger
+from tracing import span, traced_request, current_span, slot_trace_id, SLOT_TRACKER
+from analytics import AnchorArrays, AnalyticsUnavailable, fleet_report, ANALYTICS_LAG_SLA
+from slot_coverage import CoverageStore, COVERAGE_PENDING_DAYS
+
+# Logs structurés écrits par un thread dédié (LOG_LEVEL, LOG_FORMAT=text|json, voir logs.py)
+init_logging()
+log = get_logger("gateway")
 
 # Timezone pour l'Europe (Paris/Brussels)
 EUROPE_TZ = ZoneInfo("Europe/Paris")
@@ -29,26 +56,28 @@ try:
             get_all_routers as db_get_all_routers,
             get_router,
             update_router_status,
-            get_router_history
+            get_router_history,
+            iter_router_history,
+            DB_PATH
         )
         try:
             init_db()
             USE_DATABASE = True
-            print("✅ Base de données SQLite activée et initialisée")
+            log.info("✅ Base de données SQLite activée et initialisée")
         except Exception as db_init_error:
-            print(f"⚠️  Erreur initialisation DB: {db_init_error}")
+            log.warning("⚠️  Erreur initialisation DB: %s", db_init_error)
             USE_DATABASE = False
     else:
-        print("ℹ️  Base de données désactivée (set ENABLE_DATABASE=true pour activer)")
+        log.info("ℹ️  Base de données désactivée (set ENABLE_DATABASE=true pour activer)")
 except ImportError as e:
-    print(f"⚠️  Module database non disponible: {e}")
+    log.warning("⚠️  Module database non disponible: %s", e)
 except Exception as e:
-    print(f"❌ Erreur inattendue database: {e}")
+    log.error("❌ Erreur inattendue database: %s", e)
 finally:
     if USE_DATABASE:
-        print("   → Mode: SQLite Database")
+        log.info("   → Mode: SQLite Database")
     else:
-        print("   → Mode: JSON Files")
+        log.info("   → Mode: JSON Files")
 
 # Configuration
 BSV_TESTNET_WIF = os.getenv("BSV_TESTNET_WIF", "cVEVNHpneqzMrghQPhxy6JLcRB2Czgjr9Fg9XWfDdh9ac9Te1mTh")
@@ -95,7 +124,7 @@ if BSV_PROJECT.exists():
 
 try:
     from flask import Flask, request, jsonify, render_template_string
-    from writer import send_hash_to_bsv, get_wallet_debug_info
+    from writer import send_hash_to_bsv, get_wallet_debug_info, get_tx_status
 except ImportError as e:
     print(f"❌ Erreur d'import: {e}")
     print("\nInstallation requise: pip3 install flask bsvlib requests python-dotenv")
@@ -103,105 +132,148 @@ except ImportError as e:
 
 app = Flask(__name__)
 
-# Fichiers de données
-DATA_DIR = Path(__file__).parent / "data"
+# Compression gzip/brotli des réponses HTML et JSON (COMPRESSION_MIN_SIZE, COMPRESSION_LEVEL)
+init_compression(app)
+
+# Capture du trafic d'ingestion pour rejeu (SNR_CAPTURE_FILE, voir capture.py / benchmarks/replay.py)
+CAPTURE_WRITER = init_capture(app)
+
+# Latence, tailles, statuts et requêtes en cours par route (installé en dernier : mesure aussi les autres middlewares)
+init_metrics(app)
+
+# Fichiers de données (SNR_DATA_DIR pour isoler une instance, ex: benchmarks)
+DATA_DIR = Path(os.getenv("SNR_DATA_DIR", Path(__file__).parent / "data"))
 DATA_DIR.mkdir(exist_ok=True)
 ANCHORS_FILE = DATA_DIR / "anchors.json"
 ROUTERS_FILE = DATA_DIR / "routers.json"
-FORENSICS_FILE = DATA_DIR / "forensics.json"
+FORENSICS_FILE = DATA_DIR / "forensics.json"  # Ancien format, migré vers FORENSICS_DIR
+FORENSICS_DIR = DATA_DIR / "forensics"
 FORENSIC_REQUESTS_FILE = DATA_DIR / "forensic_requests.json"
 FORENSIC_RESPONSES_FILE = DATA_DIR / "forensic_responses.json"
+SLOT_COVERAGE_DB = Path(os.getenv("SLOT_COVERAGE_DB", DATA_DIR / "slot_coverage.db"))
 
 # Mot de passe par défaut pour l'agent forensique (à changer en production!)
 FORENSIC_AGENT_PASSWORD = os.getenv("FORENSIC_AGENT_PASSWORD", "GripID2026Forensic")
 
+# Code admin (reset, profilage) : à changer en production!
+ADMIN_CODE = os.getenv("ADMIN_CODE", "GRIPID2026")
+
+# Taille maximale d'un upload forensique (vérifiée dès Content-Length puis pendant la lecture)
+FORENSIC_MAX_UPLOAD_BYTES = int(os.getenv("FORENSIC_MAX_UPLOAD_BYTES", str(512 * 1024 * 1024)))
+
+# Requêtes forensiques on-demand et réponses des routeurs: en mémoire, écrites sur disque à chaque changement.
+# Chaque entrée expire après son TTL (secondes) ; au-delà de FORENSIC_CHANNEL_MAX_ENTRIES, les plus proches
+# de l'expiration sont évincées
+FORENSIC_REQUEST_TTL = int(os.getenv("FORENSIC_REQUEST_TTL", "3600"))
+FORENSIC_RESPONSE_TTL = int(os.getenv("FORENSIC_RESPONSE_TTL", "86400"))
+FORENSIC_CHANNEL_MAX_ENTRIES = int(os.getenv("FORENSIC_CHANNEL_MAX_ENTRIES", "10000"))
+FORENSIC_REQUESTS = RequestChannel(FORENSIC_REQUESTS_FILE, "forensic requests",
+                                   ttl=FORENSIC_REQUEST_TTL, max_entries=FORENSIC_CHANNEL_MAX_ENTRIES)
+FORENSIC_RESPONSES = RequestChannel(FORENSIC_RESPONSES_FILE, "forensic responses",
+                                    ttl=FORENSIC_RESPONSE_TTL, max_entries=FORENSIC_CHANNEL_MAX_ENTRIES)
+
+# Un upload reçu depuis moins de FORENSIC_RECENT_SECONDS répond directement à une demande d'analyse
+FORENSIC_RECENT_SECONDS = int(os.getenv("FORENSIC_RECENT_SECONDS", "120"))
+
+# Durée maximale d'un long-poll GET /api/forensic-request/<router_id>?wait=N
+FORENSIC_LONGPOLL_MAX = float(os.getenv("FORENSIC_LONGPOLL_MAX", "55"))
+
+# Stockage des forensics: blocks dédupliqués entre uploads, un manifeste par upload + index de métadonnées
+FORENSIC_STORE = ForensicStore(FORENSICS_DIR)
+
+# Uploads conservés par routeur (0 = tous) ; les blocks partagés restent tant qu'un upload les référence
+FORENSIC_KEEP_PER_ROUTER = int(os.getenv("FORENSIC_KEEP_PER_ROUTER", "0"))
+
+# Sessions d'upload reprenables (expirées après FORENSIC_UPLOAD_TTL secondes d'inactivité)
+UPLOAD_SESSIONS = UploadSessionStore(
+    FORENSICS_DIR / "uploads",
+    max_bytes=FORENSIC_MAX_UPLOAD_BYTES,
+    ttl=int(os.getenv("FORENSIC_UPLOAD_TTL", str(24 * 3600)))
+)
+try:
+    migrated = FORENSIC_STORE.migrate_legacy(FORENSICS_FILE)
+    if migrated:
+        log.info("📦 %d forensics migrés depuis %s", migrated, FORENSICS_FILE.name)
+    migrated = FORENSIC_STORE.migrate_blobs()
+    if migrated:
+        log.info("📦 %d forensics convertis en blocks dédupliqués", migrated)
+except Exception as e:
+    log.warning("⚠️  Erreur migration forensics: %s", e)
+
+
+@register_collector
+def _forensic_store_metrics():
+    stats = FORENSIC_STORE.storage_stats()
+    yield ("snr_forensic_blocks", "gauge", "Blocks forensiques uniques stockés", [({}, stats["blocks"])])
+    yield ("snr_forensic_block_bytes", "gauge", "Taille des blocks stockés (compressés / JSON)",
+           [({"kind": "stored"}, stats["stored_bytes"]), ({"kind": "raw"}, stats["raw_bytes"])])
+    yield ("snr_forensic_blocks_ingested_total", "counter", "Blocks reçus (nouveaux ou déjà stockés)",
+           [({"result": "new"}, stats["new_blocks"]), ({"result": "shared"}, stats["shared_blocks"])])
+    yield ("snr_forensic_block_cache_total", "counter", "Lectures de blocks via le cache LRU",
+           [({"result": "hit"}, stats["cache_hits"]), ({"result": "miss"}, stats["cache_misses"])])
+    channels = (("requests", FORENSIC_REQUESTS), ("responses", FORENSIC_RESPONSES))
+    yield ("snr_forensic_channel_entries", "gauge", "Entrées en attente dans les canaux forensiques",
+           [({"channel": name}, len(channel)) for name, channel in channels])
+    yield ("snr_forensic_channel_evictions_total", "counter", "Entrées expirées ou évincées des canaux forensiques",
+           [({"channel": name}, channel.evictions) for name, channel in channels])
+
 
 # ============================================================================
 # DATA MANAGEMENT
 # ============================================================================
 
+STORAGE_SECONDS = Histogram("snr_storage_seconds", "Durée des chargements et sauvegardes (JSON / SQLite)",
+                            ("store", "op", "backend"))
+
+
 def load_anchors():
     """Charge tous les ancrages"""
     if not ANCHORS_FILE.exists():
         return []
+    with STORAGE_SECONDS.time(store="anchors", op="load", backend="json"):
+        try:
+            return json.loads(ANCHORS_FILE.read_text())
+        except:
+            return []
+
+
+def _write_json_atomic(path, value):
+    """
+    Écrit dans un fichier temporaire puis le renomme : un lecteur (export en
+    flux, index) voit l'ancien ou le nouveau fichier, jamais un fichier à moitié écrit.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
     try:
-        return json.loads(ANCHORS_FILE.read_text())
-    except:
-        return []
+        with os.fdopen(fd, "w") as f:
+            json.dump(value, f, indent=2)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
 
 
 def save_anchors(anchors):
     """Sauvegarde les ancrages"""
-    ANCHORS_FILE.write_text(json.dumps(anchors, indent=2))
+    with STORAGE_SECONDS.time(store="anchors", op="save", backend="json"):
+        _write_json_atomic(ANCHORS_FILE, anchors)
 
 
 def load_routers():
     """Charge les infos des routeurs"""
     if USE_DATABASE:
         # Utiliser la base de données SQLite
-        return db_get_all_routers()
+        with STORAGE_SECONDS.time(store="routers", op="load", backend="sqlite"):
+            return db_get_all_routers()
     else:
         # Fallback vers fichiers JSON
         if not ROUTERS_FILE.exists():
             return {}
-        try:
-            return json.loads(ROUTERS_FILE.read_text())
-        except:
-            return {}
-
-
-def load_forensics():
-    """Charge tous les forensics depuis le fichier JSON"""
-    if not FORENSICS_FILE.exists():
-        return {}
-    try:
-        return json.loads(FORENSICS_FILE.read_text())
-    except:
-        return {}
-
-
-def save_forensics(forensics):
-    """Sauvegarde tous les forensics dans le fichier JSON"""
-    try:
-        FORENSICS_FILE.write_text(json.dumps(forensics, indent=2))
-    except Exception as e:
-        print(f"❌ Erreur sauvegarde forensics: {e}")
-
-
-def load_forensic_requests():
-    """Charge les requêtes forensiques depuis le fichier JSON"""
-    if not FORENSIC_REQUESTS_FILE.exists():
-        return {}
-    try:
-        return json.loads(FORENSIC_REQUESTS_FILE.read_text())
-    except:
-        return {}
-
-
-def save_forensic_requests(requests):
-    """Sauvegarde les requêtes forensiques dans le fichier JSON"""
-    try:
-        FORENSIC_REQUESTS_FILE.write_text(json.dumps(requests, indent=2))
-    except Exception as e:
-        print(f"❌ Erreur sauvegarde forensic requests: {e}")
-
-
-def load_forensic_responses():
-    """Charge les réponses forensiques depuis le fichier JSON"""
-    if not FORENSIC_RESPONSES_FILE.exists():
-        return {}
-    try:
-        return json.loads(FORENSIC_RESPONSES_FILE.read_text())
-    except:
-        return {}
-
-
-def save_forensic_responses(responses):
-    """Sauvegarde les réponses forensiques dans le fichier JSON"""
-    try:
-        FORENSIC_RESPONSES_FILE.write_text(json.dumps(responses, indent=2))
-    except Exception as e:
-        print(f"❌ Erreur sauvegarde forensic responses: {e}")
+        with STORAGE_SECONDS.time(store="routers", op="load", backend="json"):
+            try:
+                return json.loads(ROUTERS_FILE.read_text())
+            except:
+                return {}
 
 
 def save_routers(routers):
@@ -212,7 +284,8 @@ def save_routers(routers):
         pass
     else:
         # Fallback vers fichiers JSON
-        ROUTERS_FILE.write_text(json.dumps(routers, indent=2))
+        with STORAGE_SECONDS.time(store="routers", op="save", backend="json"):
+            _write_json_atomic(ROUTERS_FILE, routers)
 
 
 def get_all_routers():
@@ -224,7 +297,8 @@ def get_all_routers():
     """
     if USE_DATABASE:
         # Utiliser la base de données SQLite
-        all_routers = db_get_all_routers()
+        with STORAGE_SECONDS.time(store="routers", op="load", backend="sqlite"):
+            all_routers = db_get_all_routers()
         
         # Enrichir avec les infos de REGISTERED_ROUTERS si disponibles
         for router_id in REGISTERED_ROUTERS:
@@ -280,15 +354,213 @@ def get_all_routers():
     return all_routers
 
 
+# Bitmaps de couverture (reporté / finalisé / ancré) par routeur et par jour : mis à jour à
+# l'ingestion et à l'ancrage, reconstruits depuis anchors.json + routeurs au premier démarrage
+SLOT_COVERAGE = CoverageStore(SLOT_COVERAGE_DB)
+try:
+    if SLOT_COVERAGE.is_empty():
+        rebuilt = SLOT_COVERAGE.rebuild(load_anchors(), load_routers())
+        if rebuilt:
+            log.info("🧩 Couverture des slots reconstruite (%d routeur-jours)", rebuilt)
+except Exception as e:
+    log.warning("⚠️  Erreur reconstruction couverture des slots: %s", e)
+
+
+@register_collector
+def _slot_coverage_metrics():
+    yield ("snr_slots_unanchored", "gauge", "Slots finalisés sans ancrage BSV (bitmaps de couverture)",
+           [({}, SLOT_COVERAGE.pending_count())])
+    yield ("snr_slots_expired_total", "counter", "Slots finalisés sortis de la fenêtre d'ancrage sans être ancrés",
+           [({}, SLOT_COVERAGE.stats["expired"])])
+    yield ("snr_slot_coverage_updates_total", "counter",
+           "Mises à jour des bitmaps (ignorées: bits déjà présents dans le cache)",
+           [({"result": "skipped"}, SLOT_COVERAGE.stats["skipped"]),
+            ({"result": "written"}, SLOT_COVERAGE.stats["updates"] - SLOT_COVERAGE.stats["skipped"])])
+
+
+# ============================================================================
+# MICRO-CACHE DES ROUTES CHAUDES
+# ============================================================================
+# TTL court (MICROCACHE_TTL, 1.5s par défaut) + coalescence : N requêtes
+# identiques simultanées ne déclenchent qu'un calcul. Une écriture sur un
+# routeur n'invalide que son statut de sécurité ; le dashboard et /api/devices
+# (vues agrégées) peuvent rester en retard d'au plus un TTL.
+
+DASHBOARD_CACHE = MicroCache("dashboard")
+DEVICES_CACHE = MicroCache("devices")
+SECURITY_STATUS_CACHE = MicroCache("security_status")
+READ_CACHES = (DASHBOARD_CACHE, DEVICES_CACHE, SECURITY_STATUS_CACHE)
+
+
+def invalidate_read_caches():
+    """Vide tous les micro-caches (reset des données)"""
+    for cache in READ_CACHES:
+        cache.invalidate()
+
+
+def invalidate_router_caches(router_id):
+    """Invalide les entrées propres à un routeur après une écriture (anchor, ancrage BSV)"""
+    SECURITY_STATUS_CACHE.invalidate(f"/api/security-status/{router_id}")
+
+
+@register_collector
+def _capture_metrics():
+    if CAPTURE_WRITER is None:
+        return
+    yield ("snr_capture_records_total", "counter", "Requêtes d'ingestion capturées pour rejeu",
+           [({"result": "written"}, CAPTURE_WRITER.stats["captured"]),
+            ({"result": "dropped"}, CAPTURE_WRITER.stats["dropped"])])
+    yield ("snr_capture_bytes_total", "counter", "Octets écrits dans le fichier de capture",
+           [({}, CAPTURE_WRITER.stats["bytes"])])
+
+
+@register_collector
+def _microcache_metrics():
+    for stat, help_text in (
+        ("hits", "Réponses servies depuis le micro-cache"),
+        ("misses", "Calculs déclenchés faute d'entrée valide"),
+        ("coalesced", "Requêtes ayant attendu un calcul déjà en cours"),
+        ("invalidations", "Invalidations suite à une ingestion"),
+        ("evictions", "Entrées évincées (capacité atteinte)"),
+    ):
+        yield (f"snr_microcache_{stat}_total", "counter", help_text,
+               [({"cache": cache.name}, cache.stats[stat]) for cache in READ_CACHES])
+    yield ("snr_microcache_entries", "gauge", "Entrées présentes dans le micro-cache",
+           [({"cache": cache.name}, len(cache)) for cache in READ_CACHES])
+
+
+# ============================================================================
+# INDEX EN MÉMOIRE
+# ============================================================================
+# Les index sont reconstruits uniquement quand la signature (mtime, taille) de
+# leur source change : les lectures répétées ne reparsent plus les fichiers.
+# Une ingestion /anchor met à jour l'index des routeurs en place (save_router) ;
+# la reconstruction complète reste pour le démarrage et les écritures externes.
+
+_index_lock = threading.RLock()
+_routers_write_lock = threading.Lock()
+_anchor_index = AnchorIndex()
+_router_index = RouterIndex()
+
+
+def _file_signature(path):
+    """Signature (mtime, taille) d'un fichier, None s'il n'existe pas"""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _routers_signature():
+    if USE_DATABASE:
+        return _file_signature(DB_PATH)
+    return _file_signature(ROUTERS_FILE)
+
+
+def _as_epoch(value):
+    """Normalise un last_seen (epoch en JSON, ISO en SQLite) en epoch entier"""
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return int(datetime.fromisoformat(str(value)).timestamp())
+    except ValueError:
+        return None
+
+
+def get_anchor_index():
+    """
+    Index des ancrages, mis à jour si anchors.json a changé : seuls les
+    éléments ajoutés en fin sont lus, reconstruction complète sinon.
+    """
+    global _anchor_index
+    signature = _file_signature(ANCHORS_FILE)
+    with _index_lock:
+        if _anchor_index.built and _anchor_index.signature != signature:
+            if not _anchor_index.refresh(ANCHORS_FILE, signature):
+                _anchor_index = AnchorIndex()
+        if not _anchor_index.built:
+            with STORAGE_SECONDS.time(store="anchors", op="index", backend="json"):
+                _anchor_index.rebuild(ANCHORS_FILE, signature)
+        return _anchor_index
+
+
+_analytics_lock = threading.Lock()
+_anchor_arrays = None
+
+
+def get_anchor_arrays():
+    """Ancrages en colonnes NumPy (analytics), reconstruits avec l'index des ancrages"""
+    global _anchor_arrays
+    anchor_index = get_anchor_index()
+    with _analytics_lock:
+        if _anchor_arrays is None or _anchor_arrays.signature != anchor_index.signature:
+            _anchor_arrays = AnchorArrays(anchor_index.iter_all(), anchor_index.signature)
+        return _anchor_arrays
+
+
+def _router_row(router_id, router_info, anchor_index):
+    """Champs indexés d'un routeur (voir RouterIndex.rebuild)"""
+    return {
+        "last_seen_epoch": _as_epoch(router_info.get("last_seen")),
+        "name": router_info.get("name"),
+        "location": router_info.get("location"),
+        "security_status": compute_security_status(router_info)["status"],
+        "total_anchors": anchor_index.count(router_id),
+    }
+
+
+def get_router_index():
+    """
+    Index des routeurs, reconstruit si les routeurs ou les ancrages ont changé
+    hors de save_router(). Les lectures de l'index se font sous _index_lock.
+    """
+    global _router_index
+    anchor_index = get_anchor_index()
+    signature = (_routers_signature(), anchor_index.signature)
+    with _index_lock:
+        if not _router_index.built or _router_index.signature != signature:
+            routers = load_routers()
+            rows = {router_id: _router_row(router_id, router_info, anchor_index)
+                    for router_id, router_info in routers.items()}
+            index = RouterIndex()
+            index.rebuild(routers, rows, signature)
+            _router_index = index
+        return _router_index
+
+
+def save_router(router_id, routers):
+    """
+    Sauvegarde les routeurs après la mise à jour d'un seul d'entre eux et
+    reporte cette mise à jour dans l'index en place, si l'index reflétait
+    l'état précédent (sinon, écriture concurrente : reconstruction à la
+    prochaine lecture).
+    """
+    with _routers_write_lock:
+        before = _routers_signature()
+        save_routers(routers)
+        after = _routers_signature()
+    with _index_lock:
+        index = _router_index
+        if index.built and index.signature[0] == before:
+            index.update(router_id, routers[router_id],
+                         _router_row(router_id, routers[router_id], _anchor_index),
+                         (after, index.signature[1]))
+
+
 def get_router_stats(router_id):
     """Statistiques pour un routeur"""
-    anchors = load_anchors()
-    router_anchors = [a for a in anchors if a.get("router_id") == router_id]
+    anchor_index = get_anchor_index()
+    first_anchor = anchor_index.first(router_id)
     
     return {
-        "total_anchors": len(router_anchors),
-        "last_anchor": router_anchors[-1] if router_anchors else None,
-        "first_seen": router_anchors[0]["timestamp"] if router_anchors else None
+        "total_anchors": anchor_index.count(router_id),
+        "last_anchor": anchor_index.last(router_id),
+        "first_seen": first_anchor["timestamp"] if first_anchor else None
     }
 
 
@@ -333,8 +605,11 @@ def get_security_status(router_id):
     que c'est "secure" si le routeur envoie régulièrement ses hashs.
     """
     routers = load_routers()
-    router_info = routers.get(router_id, {})
-    
+    return compute_security_status(routers.get(router_id, {}))
+
+
+def compute_security_status(router_info):
+    """Statut de sécurité calculé à partir des infos d'un routeur déjà chargées"""
     # Hash actuel du routeur (reçu toutes les 30s)
     local_hash = router_info.get("local_hash", "")
     
@@ -1438,7 +1713,54 @@ GRIPID_EXPLORER_HTML = """
         }
     </style>
     <script>
-        setTimeout(function(){ location.reload(); }, 30000);
+        var extraPagesLoaded = false;
+        setTimeout(function(){ if (!extraPagesLoaded) { location.reload(); } }, 30000);
+        
+        function escapeHtml(value) {
+            return String(value).replace(/[&<>"']/g, function(c) {
+                return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+            });
+        }
+        
+        function loadMoreAnchors() {
+            var btn = document.getElementById('loadMoreBtn');
+            var cursor = btn.getAttribute('data-cursor');
+            btn.disabled = true;
+            btn.textContent = 'Chargement...';
+            fetch('/api/explorer/{{ device_id | urlencode }}/anchors?cursor=' + encodeURIComponent(cursor))
+                .then(function(r) { return r.json(); })
+                .then(function(page) {
+                    extraPagesLoaded = true;
+                    var list = document.getElementById('anchorsList');
+                    page.anchors.forEach(function(anchor) {
+                        var card = document.createElement('div');
+                        card.className = 'anchor-card';
+                        card.innerHTML =
+                            '<div class="anchor-header">' +
+                                '<div class="anchor-time">🕐 ' + escapeHtml(anchor.time) + '</div>' +
+                                '<div class="anchor-blocks">Block #' + escapeHtml(anchor.blocks_count) + '</div>' +
+                            '</div>' +
+                            '<div class="anchor-data">' +
+                                '<div style="margin-bottom: 10px;"><strong>TXID:</strong> ' +
+                                    '<a href="https://test.whatsonchain.com/tx/' + escapeHtml(anchor.txid) + '" target="_blank" class="txid-link">' +
+                                    escapeHtml(anchor.txid) + '</a></div>' +
+                                '<div><strong>SNR Hash:</strong> ' + escapeHtml(anchor.snr_hash) + '</div>' +
+                            '</div>';
+                        list.appendChild(card);
+                    });
+                    if (page.next_cursor) {
+                        btn.setAttribute('data-cursor', page.next_cursor);
+                        btn.disabled = false;
+                        btn.textContent = 'Load more';
+                    } else {
+                        btn.style.display = 'none';
+                    }
+                })
+                .catch(function() {
+                    btn.disabled = false;
+                    btn.textContent = 'Load more';
+                });
+        }
     </script>
 </head>
 <body>
@@ -1479,9 +1801,10 @@ GRIPID_EXPLORER_HTML = """
         </div>
         
         <div class="anchors-section">
-            <h2 class="section-title">📜 BSV Anchors History (Last 20)</h2>
+            <h2 class="section-title">📜 BSV Anchors History</h2>
             
             {% if anchors %}
+                <div id="anchorsList">
                 {% for anchor in anchors %}
                 <div class="anchor-card">
                     <div class="anchor-header">
@@ -1502,6 +1825,13 @@ GRIPID_EXPLORER_HTML = """
                     </div>
                 </div>
                 {% endfor %}
+                </div>
+                {% if next_cursor %}
+                <div style="text-align: center; margin-top: 20px;">
+                    <button id="loadMoreBtn" class="back-btn" style="border: none; cursor: pointer;"
+                            data-cursor="{{ next_cursor }}" onclick="loadMoreAnchors()">Load more</button>
+                </div>
+                {% endif %}
             {% else %}
                 <p style="text-align: center; color: #666; padding: 40px;">
                     No anchors yet for this device.
@@ -1519,10 +1849,12 @@ GRIPID_EXPLORER_HTML = """
 # ============================================================================
 
 @app.route('/')
+@cached_response(DASHBOARD_CACHE, lambda: request.path)
 def dashboard():
     """Dashboard principal avec monitoring de sécurité"""
     routers = get_all_routers()  # Utilise get_all_routers() pour inclure les routeurs enregistrés
-    anchors = load_anchors()
+    raw_routers = load_routers()
+    anchor_index = get_anchor_index()
     wallet = get_wallet_debug_info()
     
     devices = []
@@ -1531,7 +1863,7 @@ def dashboard():
     
     for router_id, router_info in routers.items():
         stats = get_router_stats(router_id)
-        security = get_security_status(router_id)
+        security = compute_security_status(raw_routers.get(router_id, {}))
         last_anchor = stats["last_anchor"]
         last_seen_ts = router_info.get("last_seen")
         
@@ -1607,7 +1939,7 @@ def dashboard():
         total_devices=len(devices),
         secure_count=secure_count,
         breach_count=breach_count,
-        total_anchors=len(anchors),
+        total_anchors=anchor_index.total,
         wallet_balance=f"{wallet['balance_satoshis']:,}",
         devices=devices,
         admin_address=ADMIN_ADDRESS
@@ -1695,43 +2027,69 @@ def audit(router_id):
     )
 
 
+def _format_explorer_anchor(anchor):
+    return {
+        "txid": anchor.get("txid"),
+        "snr_hash": anchor.get("snr_hash"),
+        "blocks_count": anchor.get("blocks_count", "N/A"),
+        "time": datetime.fromtimestamp(anchor["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
 @app.route('/explorer/<router_id>')
 def explorer(router_id):
-    """Explorer BSV pour un routeur"""
+    """Explorer BSV pour un routeur (20 derniers ancrages, puis "load more" par curseur)"""
     routers = load_routers()
-    anchors = load_anchors()
-    
-    router_anchors = [a for a in anchors if a.get("router_id") == router_id]
-    router_anchors = sorted(router_anchors, key=lambda x: x["timestamp"], reverse=True)[:20]
-    
     router_info = routers.get(router_id, {})
-    formatted_anchors = []
-    for anchor in router_anchors:
-        formatted_anchors.append({
-            "txid": anchor["txid"],
-            "snr_hash": anchor["snr_hash"],
-            "blocks_count": anchor["blocks_count"],
-            "time": datetime.fromtimestamp(anchor["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
-        })
     
-    first_seen = datetime.fromtimestamp(router_anchors[-1]["timestamp"]).strftime("%Y-%m-%d %H:%M:%S") if router_anchors else "Unknown"
+    anchors, next_cursor, total = _anchors_page({}, router_id=router_id)
+    formatted_anchors = [_format_explorer_anchor(anchor) for anchor in anchors]
+    
+    oldest = get_anchor_index().oldest(router_id)
+    first_seen = datetime.fromtimestamp(oldest["timestamp"]).strftime("%Y-%m-%d %H:%M:%S") if oldest else "Unknown"
     
     return render_template_string(
         GRIPID_EXPLORER_HTML,
         device_id=router_id,
         device_name=router_info.get("name", "GTEN Router"),
         device_ip=router_info.get("last_ip", "Unknown"),
-        total_anchors=len([a for a in anchors if a.get("router_id") == router_id]),
+        total_anchors=total,
         first_seen=first_seen,
-        anchors=formatted_anchors
+        anchors=formatted_anchors,
+        next_cursor=next_cursor
     )
 
 
-@app.route('/forensics', methods=['POST'])
-def receive_forensics():
-    """Reçoit les données forensiques complètes du routeur lors d'une breach"""
+@app.route('/api/explorer/<router_id>/anchors')
+def api_explorer_anchors(router_id):
+    """Page suivante d'ancrages pour le bouton "load more" de l'explorer"""
     try:
-        data = request.get_json() or {}
+        anchors, next_cursor, total = _anchors_page(request.args, router_id=router_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        "total": total,
+        "anchors": [_format_explorer_anchor(anchor) for anchor in anchors],
+        "next_cursor": next_cursor
+    })
+
+
+def _ingest_forensic_stream(stream):
+    """
+    Ingestion d'un upload forensique JSON lu en flux (POST /forensics et commit
+    d'un upload reprenable). Retourne (corps JSON, code HTTP).
+    """
+    writer = FORENSIC_STORE.new_writer()
+    try:
+        try:
+            data = read_upload(stream, writer, max_bytes=FORENSIC_MAX_UPLOAD_BYTES)
+        except PayloadTooLarge:
+            writer.abort()
+            return {"error": f"Upload trop volumineux (max {FORENSIC_MAX_UPLOAD_BYTES} octets)"}, 413
+        except ValueError as e:
+            writer.abort()
+            return {"error": f"JSON invalide: {e}"}, 400
         
         router_id = data.get('router_id', 'unknown')
         forensic_type = data.get('forensic_type', 'unknown')
@@ -1740,39 +2098,140 @@ def receive_forensics():
         # Créer un ID forensique unique
         forensic_id = f"{router_id}-{timestamp}"
         
-        # Charger tous les forensics
-        forensics = load_forensics()
-        
-        # Ajouter les nouvelles données forensiques
-        forensics[forensic_id] = {
-            "forensic_id": forensic_id,
-            "router_id": router_id,
-            "forensic_type": forensic_type,
-            "timestamp": timestamp,
-            "received_at": int(datetime.now().timestamp()),
-            "data": data
-        }
-        
-        # Sauvegarder
-        save_forensics(forensics)
-        
-        print(f"🔍 Données forensiques reçues: {router_id}")
-        print(f"   Type: {forensic_type}")
-        print(f"   Blocks: {len(data.get('blocks', []))}")
-        print(f"   ID: {forensic_id}")
+        # Finaliser le blob (analyse incluse) et l'enregistrer dans l'index
+        record = FORENSIC_STORE.commit(
+            writer,
+            forensic_id,
+            router_id,
+            forensic_type,
+            timestamp,
+            int(datetime.now().timestamp()),
+            data
+        )
+        if FORENSIC_KEEP_PER_ROUTER:
+            for expired_id in FORENSIC_STORE.prune_router(router_id, FORENSIC_KEEP_PER_ROUTER):
+                log.info("🗑️  Forensic expiré (rétention %d/routeur): %s", FORENSIC_KEEP_PER_ROUTER, expired_id,
+                         extra={"router_id": router_id, "forensic_id": expired_id})
+        
+        log.info("🔍 Données forensiques reçues: %s (type %s, %d blocks dont %d nouveaux, %d anomalies) -> %s",
+                 router_id, forensic_type, writer.block_count, writer.new_blocks,
+                 record['breach']['anomaly_count'], forensic_id,
+                 extra={"router_id": router_id, "forensic_id": forensic_id, "forensic_type": forensic_type,
+                        "blocks": writer.block_count, "new_blocks": writer.new_blocks,
+                        "anomalies": record['breach']['anomaly_count']})
         
-        return jsonify({
+        return {
             "status": "success",
             "forensic_id": forensic_id,
             "message": "Données forensiques sauvegardées",
+            "breach": record["breach"],
             "analysis_url": f"/forensics/{forensic_id}"
-        })
+        }, 200
         
     except Exception as e:
-        print(f"❌ Erreur forensics: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
+        writer.abort()
+        log.exception("❌ Erreur forensics: %s", e)
+        return {"error": str(e)}, 500
+
+
+@app.route('/forensics', methods=['POST'])
+def receive_forensics():
+    """
+    Reçoit les données forensiques complètes du routeur lors d'une breach.
+    Le corps est lu en flux : les blocks sont vérifiés et écrits au fur et à
+    mesure, la mémoire reste bornée quelle que soit la taille des logs.
+    """
+    # Refuser tôt un upload annoncé trop gros
+    if request.content_length is not None and request.content_length > FORENSIC_MAX_UPLOAD_BYTES:
+        return jsonify({"error": f"Upload trop volumineux (max {FORENSIC_MAX_UPLOAD_BYTES} octets)"}), 413
+    
+    body, status = _ingest_forensic_stream(request.stream)
+    return jsonify(body), status
+
+
+# ----------------------------------------------------------------------------
+# Uploads forensiques reprenables (routeurs sur liens instables)
+#   POST   /forensics/uploads                  {router_id, total_size, sha256} -> upload_id
+#   PATCH  /forensics/uploads/<id>             corps brut, en-tête Upload-Offset
+#   GET    /forensics/uploads/<id>             -> offset reçu (reprise)
+#   POST   /forensics/uploads/<id>/commit      {sha256} -> ingestion comme /forensics
+#   DELETE /forensics/uploads/<id>
+# ----------------------------------------------------------------------------
+
+def _upload_status_response(meta, status=200):
+    response = jsonify({
+        "upload_id": meta["upload_id"],
+        "offset": meta["offset"],
+        "total_size": meta.get("total_size"),
+        "upload_url": f"/forensics/uploads/{meta['upload_id']}"
+    })
+    response.headers["Upload-Offset"] = str(meta["offset"])
+    return response, status
+
+
+@app.route('/forensics/uploads', methods=['POST'])
+def begin_forensic_upload():
+    """Ouvre une session d'upload reprenable"""
+    data = request.get_json(silent=True) or {}
+    try:
+        total_size = int(data["total_size"]) if data.get("total_size") is not None else None
+        meta = UPLOAD_SESSIONS.begin(
+            router_id=data.get("router_id"),
+            total_size=total_size,
+            sha256=data.get("sha256")
+        )
+    except (TypeError, ValueError) as e:
+        status = e.status if isinstance(e, UploadError) else 400
+        return jsonify({"error": str(e)}), status
+    return _upload_status_response(meta, 201)
+
+
+@app.route('/forensics/uploads/<upload_id>', methods=['GET', 'PATCH', 'DELETE'])
+def forensic_upload_session(upload_id):
+    """Statut (offset reçu), ajout d'un morceau à un offset donné, ou abandon"""
+    try:
+        if request.method == 'GET':
+            return _upload_status_response(UPLOAD_SESSIONS.status(upload_id))
+        
+        if request.method == 'DELETE':
+            UPLOAD_SESSIONS.status(upload_id)
+            UPLOAD_SESSIONS.discard(upload_id)
+            return jsonify({"status": "success", "message": "Upload abandonné"})
+        
+        offset_value = request.headers.get("Upload-Offset", request.args.get("offset"))
+        if offset_value is None:
+            return jsonify({"error": "Upload-Offset requis"}), 400
+        UPLOAD_SESSIONS.append(upload_id, int(offset_value), request.stream, request.content_length)
+        return _upload_status_response(UPLOAD_SESSIONS.status(upload_id))
+    
+    except OffsetMismatch as e:
+        response = jsonify({"error": str(e), "offset": e.expected})
+        response.headers["Upload-Offset"] = str(e.expected)
+        return response, e.status
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/forensics/uploads/<upload_id>/commit', methods=['POST'])
+def commit_forensic_upload(upload_id):
+    """Vérifie le digest du corps reçu puis l'ingère comme un POST /forensics"""
+    data = request.get_json(silent=True) or {}
+    try:
+        UPLOAD_SESSIONS.verify(upload_id, data.get("sha256"))
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    
+    with open(UPLOAD_SESSIONS.body_path(upload_id), "rb") as body_stream:
+        body, status = _ingest_forensic_stream(body_stream)
+    if status == 200:
+        UPLOAD_SESSIONS.discard(upload_id)
+    return jsonify(body), status
+
+
+def _is_pending(req):
+    return req.get("status") == "pending"
 
 
 @app.route('/api/forensic-request/<router_id>', methods=['GET', 'POST', 'DELETE'])
@@ -1780,22 +2239,29 @@ def forensic_request(router_id):
     """
     Gère les requêtes forensiques on-demand
     GET: Vérifie s'il y a une requête pending (pour le routeur qui poll)
+         ?wait=N : long-poll, répond dès qu'une requête est créée ou après N secondes
     POST: Crée une nouvelle requête forensique (depuis l'admin DMS)
     DELETE: Supprime une requête (après traitement)
     """
-    requests = load_forensic_requests()
-    
     if request.method == 'GET':
-        # Le routeur vérifie s'il y a une requête pending
-        if router_id in requests:
-            req = requests[router_id]
-            if req.get("status") == "pending":
-                return jsonify({
-                    "has_request": True,
-                    "request_id": req.get("request_id"),
-                    "created_at": req.get("created_at"),
-                    "admin_message": "Admin demande l'envoi des logs forensiques"
-                })
+        # Le routeur vérifie s'il y a une requête pending (servi depuis la mémoire)
+        try:
+            wait = min(float(request.args.get("wait", 0)), FORENSIC_LONGPOLL_MAX)
+        except ValueError:
+            return jsonify({"error": "wait doit être un nombre de secondes"}), 400
+        
+        if wait > 0:
+            req = FORENSIC_REQUESTS.wait_for(router_id, _is_pending, wait)
+        else:
+            req = FORENSIC_REQUESTS.get(router_id)
+        
+        if req and _is_pending(req):
+            return jsonify({
+                "has_request": True,
+                "request_id": req.get("request_id"),
+                "created_at": req.get("created_at"),
+                "admin_message": "Admin demande l'envoi des logs forensiques"
+            })
         
         return jsonify({"has_request": False})
     
@@ -1814,18 +2280,17 @@ def forensic_request(router_id):
         
         request_id = f"FR-{router_id}-{int(time.time())}"
         
-        requests[router_id] = {
+        FORENSIC_REQUESTS.set(router_id, {
             "request_id": request_id,
             "router_id": router_id,
             "status": "pending",
             "created_at": int(time.time()),
             "created_by": "admin",
             "agent_password": agent_password  # Transmis au routeur pour vérification
-        }
-        
-        save_forensic_requests(requests)
+        })
         
-        print(f"🔍 Nouvelle requête forensique créée: {request_id}")
+        log.info("🔍 Nouvelle requête forensique créée: %s", request_id,
+                 extra={"router_id": router_id, "request_id": request_id})
         
         return jsonify({
             "status": "success",
@@ -1835,9 +2300,7 @@ def forensic_request(router_id):
     
     elif request.method == 'DELETE':
         # Supprimer la requête (après traitement)
-        if router_id in requests:
-            del requests[router_id]
-            save_forensic_requests(requests)
+        if FORENSIC_REQUESTS.pop(router_id) is not None:
             return jsonify({"status": "success", "message": "Request deleted"})
         
         return jsonify({"status": "error", "message": "Request not found"}), 404
@@ -1854,28 +2317,22 @@ def forensic_response(router_id):
         message = data.get('message', '')
         request_id = data.get('request_id', '')
         
-        responses = load_forensic_responses()
-        
-        responses[router_id] = {
+        FORENSIC_RESPONSES.set(router_id, {
             "router_id": router_id,
             "request_id": request_id,
             "status": response_status,
             "reason": reason,
             "message": message,
             "timestamp": int(datetime.now().timestamp())
-        }
-        
-        save_forensic_responses(responses)
+        })
         
-        print(f"📥 Réponse forensique reçue: {router_id}")
-        print(f"   Status: {response_status}")
-        print(f"   Reason: {reason}")
-        print(f"   Message: {message}")
+        log.info("📥 Réponse forensique reçue: %s (status %s, reason %s) %s", router_id, response_status, reason, message,
+                 extra={"router_id": router_id, "request_id": request_id, "response_status": response_status})
         
         return jsonify({"status": "success", "message": "Response received"})
         
     except Exception as e:
-        print(f"❌ Erreur forensic response: {e}")
+        log.error("❌ Erreur forensic response: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -1900,16 +2357,9 @@ def request_forensic_analysis(router_id):
             "message": "Mot de passe agent incorrect"
         }), 403
     
-    # Vérifier si on a déjà des données forensiques récentes (moins de 2 minutes)
-    forensics = load_forensics()
-    recent_forensics = []
+    # Vérifier si on a déjà des données forensiques récentes (index par routeur, dichotomie)
     current_time = int(time.time())
-    
-    for fid, fdata in forensics.items():
-        if fdata.get("router_id") == router_id:
-            received_at = fdata.get("received_at", 0)
-            if current_time - received_at < 120:  # 2 minutes
-                recent_forensics.append(fid)
+    recent_forensics = FORENSIC_STORE.recent(router_id, current_time - FORENSIC_RECENT_SECONDS + 1)
     
     if recent_forensics:
         return jsonify({
@@ -1919,19 +2369,16 @@ def request_forensic_analysis(router_id):
         })
     
     # Créer une requête forensique on-demand avec le mot de passe
-    requests = load_forensic_requests()
     request_id = f"FR-{router_id}-{int(time.time())}"
     
-    requests[router_id] = {
+    FORENSIC_REQUESTS.set(router_id, {
         "request_id": request_id,
         "router_id": router_id,
         "status": "pending",
         "created_at": int(time.time()),
         "created_by": "admin",
         "agent_password": agent_password
-    }
-    
-    save_forensic_requests(requests)
+    })
     
     return jsonify({
         "status": "pending",
@@ -1944,13 +2391,13 @@ def request_forensic_analysis(router_id):
 def api_list_forensics():
     """Liste tous les forensics disponibles"""
     try:
-        forensics = load_forensics()
+        forensic_ids = FORENSIC_STORE.ids()
         return jsonify({
-            "total": len(forensics),
-            "forensics": list(forensics.keys())
+            "total": len(forensic_ids),
+            "forensics": forensic_ids
         })
     except Exception as e:
-        print(f"❌ Erreur liste forensics: {e}")
+        log.error("❌ Erreur liste forensics: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -1958,83 +2405,263 @@ def api_list_forensics():
 def api_get_forensics(forensic_id):
     """API pour récupérer les données forensiques en JSON"""
     try:
-        forensics = load_forensics()
+        log.debug("🔍 Recherche forensic: %s", forensic_id)
         
-        print(f"🔍 Recherche forensic: {forensic_id}")
-        print(f"   Forensics disponibles: {list(forensics.keys())}")
-        
-        if forensic_id not in forensics:
+        if forensic_id not in FORENSIC_STORE:
             return jsonify({
                 "error": "Forensic data not found",
                 "forensic_id": forensic_id,
-                "available_forensics": list(forensics.keys())
+                "available_forensics": FORENSIC_STORE.ids()
             }), 404
         
-        forensic_data = forensics[forensic_id]
-        return jsonify(forensic_data.get("data", {}))
+        return jsonify(FORENSIC_STORE.load_data(forensic_id))
         
     except Exception as e:
-        print(f"❌ Erreur API forensics: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ Erreur API forensics: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+ANOMALY_MESSAGES = {
+    "chain_break": ("PREV", "PREV hash ne correspond pas au CHAIN précédent"),
+    "hash_mismatch": ("CHAIN", "CHAIN hash ne correspond pas au hash recalculé (PREV + LOGS)"),
+    "malformed": ("HASH", "hashs absents ou non hexadécimaux"),
+}
+
+
+def _describe_anomaly(anomaly: dict, first_breach_index) -> dict:
+    """Ajoute à une anomalie du moteur de vérification les champs d'affichage"""
+    field, message = ANOMALY_MESSAGES[anomaly["type"]]
+    return dict(
+        anomaly,
+        field=field,
+        message=f"Block #{anomaly['block_index']}: {message}",
+        is_first_breach=(anomaly["block_index"] == first_breach_index),
+    )
+
+
+@app.route('/api/forensics/<forensic_id>/verify')
+def api_verify_forensics(forensic_id):
+    """Vérification complète d'une chaîne forensique (premier bris, anomalies, timings)"""
+    if forensic_id not in FORENSIC_STORE:
+        return jsonify({"error": "Forensic data not found", "forensic_id": forensic_id}), 404
+    mode = request.args.get("mode", CHAIN_HASH_MODE)
+    try:
+        report = verify_blocks(FORENSIC_STORE.iter_blocks(forensic_id), mode=mode)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    report["forensic_id"] = forensic_id
+    return jsonify(report)
+
+
+@app.route('/api/forensics/diff')
+def api_forensics_diff():
+    """Compare deux uploads d'un même routeur (?a=<forensic_id>&b=<forensic_id>[&detail=1])"""
+    id_a, id_b = request.args.get("a"), request.args.get("b")
+    if not id_a or not id_b:
+        return jsonify({"error": "paramètres a et b requis"}), 400
+    try:
+        return jsonify(diff_uploads(FORENSIC_STORE, id_a, id_b, detail=request.args.get("detail") in ("1", "true")))
+    except KeyError as e:
+        return jsonify({"error": "Forensic data not found", "forensic_id": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/api/forensics/<forensic_id>/analysis')
+def api_forensics_analysis(forensic_id):
+    """Analyse précalculée (anomalies, fenêtre d'affichage, correspondance slots)"""
+    if forensic_id not in FORENSIC_STORE:
+        return jsonify({"error": "Forensic data not found", "forensic_id": forensic_id}), 404
+    return jsonify(FORENSIC_STORE.analysis(forensic_id))
+
+
+FORENSIC_BLOCKS_PAGE_DEFAULT = 100
+FORENSIC_BLOCKS_PAGE_MAX = 1000
+# Anomalies détaillées dans la page HTML (la liste complète est dans l'API analysis)
+ANOMALIES_DISPLAY_MAX = 100
+
+
+@app.route('/api/forensics/<forensic_id>/blocks')
+def api_forensic_blocks(forensic_id):
+    """
+    Plage de blocks d'un upload forensique.
+    Paramètres: offset, limit, ou saut direct avec at (timestamp epoch/ISO,
+    recherche par dichotomie) ou anomaly (n-ième anomalie, "first"), before
+    (blocks de contexte avant la cible).
+    """
+    if forensic_id not in FORENSIC_STORE:
+        return jsonify({"error": "Forensic data not found", "forensic_id": forensic_id}), 404
+    try:
+        limit = int(request.args.get("limit", FORENSIC_BLOCKS_PAGE_DEFAULT))
+        if limit < 1:
+            raise ValueError("limit doit être >= 1")
+        limit = min(limit, FORENSIC_BLOCKS_PAGE_MAX)
+        analysis = FORENSIC_STORE.analysis(forensic_id)
+        
+        target = None
+        if request.args.get("at"):
+            target = FORENSIC_STORE.find_timestamp(forensic_id, _parse_epoch_arg(request.args["at"]))
+        elif request.args.get("anomaly"):
+            position = request.args["anomaly"]
+            position = 0 if position == "first" else int(position)
+            if not 0 <= position < len(analysis["anomalies"]):
+                raise ValueError(f"anomalie {position} inexistante ({analysis['anomaly_count']} anomalies)")
+            target = analysis["anomalies"][position]["block_index"]
+        
+        if target is not None:
+            offset = max(0, target - int(request.args.get("before", 0)))
+        else:
+            offset = int(request.args.get("offset", 0))
+            if offset < 0:
+                raise ValueError("offset doit être >= 0")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    broken = broken_blocks(analysis, offset, offset + limit)
+    blocks = []
+    for index, block in enumerate(FORENSIC_STORE.iter_blocks(forensic_id, offset, offset + limit), start=offset):
+        blocks.append(dict(block, index=index, broken=index in broken, anomaly=broken.get(index)))
+    end = offset + len(blocks)
+    
+    return jsonify({
+        "forensic_id": forensic_id,
+        "total": analysis["block_count"],
+        "offset": offset,
+        "limit": limit,
+        "target": target,
+        "blocks": blocks,
+        "next_offset": end if end < analysis["block_count"] else None
+    })
+
+
+# Tableau virtualisé : seules les lignes visibles existent dans le DOM, les
+# blocks sont chargés par pages via /api/forensics/<id>/blocks
+FORENSIC_VIEWER_JS = """
+(function() {
+    var ROW_HEIGHT = 28, PAGE_SIZE = 200, KEEP_PAGES = 6, MAX_SPACER = 5000000;
+    var viewport = document.getElementById('blockViewport');
+    var spacer = document.getElementById('blockSpacer');
+    var rows = document.getElementById('blockRows');
+    var forensicId = decodeURIComponent(location.pathname.split('/').pop());
+    var total = parseInt(viewport.getAttribute('data-total'), 10);
+    var pages = {};
+    var scheduled = false;
+    
+    // Au-delà de MAX_SPACER px, la position de défilement est mise à l'échelle
+    spacer.style.height = Math.min(total * ROW_HEIGHT, MAX_SPACER) + 'px';
+    
+    function escapeHtml(value) {
+        return String(value).replace(/[&<>"']/g, function(c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    }
+    
+    function shortHash(value) {
+        return value ? escapeHtml(String(value).substring(0, 16)) + '...' : 'N/A';
+    }
+    
+    function visibleCount() { return Math.ceil(viewport.clientHeight / ROW_HEIGHT); }
+    function maxFirst() { return Math.max(0, total - visibleCount()); }
+    function maxScroll() { return Math.max(0, spacer.offsetHeight - viewport.clientHeight); }
+    
+    function firstVisible() {
+        var m = maxScroll();
+        return m ? Math.round(viewport.scrollTop / m * maxFirst()) : 0;
+    }
+    
+    function loadPage(n) {
+        if (pages[n]) { return; }
+        pages[n] = 'loading';
+        fetch('/api/forensics/' + encodeURIComponent(forensicId) + '/blocks?offset=' + (n * PAGE_SIZE) + '&limit=' + PAGE_SIZE)
+            .then(function(r) { return r.json(); })
+            .then(function(page) { pages[n] = page.blocks; schedule(); })
+            .catch(function() { delete pages[n]; });
+    }
+    
+    function render() {
+        var first = firstVisible();
+        var last = Math.min(total, first + visibleCount() + 1);
+        var html = '';
+        for (var i = first; i < last; i++) {
+            var n = Math.floor(i / PAGE_SIZE);
+            var page = pages[n];
+            if (!page || page === 'loading') {
+                loadPage(n);
+                html += '<div class="block-row"><span>' + i + '</span><span>…</span></div>';
+                continue;
+            }
+            var b = page[i - n * PAGE_SIZE];
+            if (!b) { continue; }
+            html += '<div class="block-row' + (b.broken ? ' block-broken' : '') + '">' +
+                '<span>' + b.index + '</span>' +
+                '<span>' + escapeHtml(b.timestamp === undefined ? 'N/A' : b.timestamp) + '</span>' +
+                '<span class="hash">' + shortHash(b.logs_hash) + '</span>' +
+                '<span class="hash">' + shortHash(b.prev_hash) + '</span>' +
+                '<span class="hash">' + shortHash(b.chain_hash) + '</span>' +
+                '<span class="hash">' + shortHash(b.global_hash) + '</span>' +
+                '</div>';
+        }
+        rows.style.top = viewport.scrollTop + 'px';
+        rows.innerHTML = html;
+        // Libérer les pages éloignées de la position courante
+        var current = Math.floor(first / PAGE_SIZE);
+        Object.keys(pages).forEach(function(key) {
+            if (Math.abs(key - current) > KEEP_PAGES) { delete pages[key]; }
+        });
+    }
+    
+    function schedule() {
+        if (scheduled) { return; }
+        scheduled = true;
+        requestAnimationFrame(function() { scheduled = false; render(); });
+    }
+    
+    function scrollToBlock(index) {
+        var m = maxFirst();
+        index = Math.min(Math.max(0, index - 2), m);
+        viewport.scrollTop = m ? index / m * maxScroll() : 0;
+        render();
+    }
+    
+    window.scrollToBlock = scrollToBlock;
+    window.jumpToTime = function() {
+        var value = document.getElementById('jumpTime').value;
+        fetch('/api/forensics/' + encodeURIComponent(forensicId) + '/blocks?limit=1&at=' + encodeURIComponent(value))
+            .then(function(r) { return r.json(); })
+            .then(function(page) {
+                if (page.error) { alert(page.error); } else { scrollToBlock(page.target); }
+            });
+    };
+    
+    viewport.addEventListener('scroll', schedule);
+    window.addEventListener('resize', schedule);
+    scrollToBlock(parseInt(viewport.getAttribute('data-start'), 10) + 2);
+})();
+"""
+
+
 @app.route('/forensics/<forensic_id>')
 def view_forensics(forensic_id):
     """Affiche l'analyse forensique détaillée avec highlighting des blocks cassés"""
     try:
-        forensics = load_forensics()
-        
-        if forensic_id not in forensics:
+        if forensic_id not in FORENSIC_STORE:
             return "Forensic data not found. ID: " + forensic_id, 404
         
-        forensic_entry = forensics[forensic_id]
-        data = forensic_entry.get("data", {})
+        summary = FORENSIC_STORE.get_summary(forensic_id)
+        data = FORENSIC_STORE.load_envelope(forensic_id)
+        timestamp = int(summary.get("timestamp") or summary.get("received_at") or 0)
+        # Analyse calculée à l'upload (recalculée seulement si sa version a changé)
+        analysis = FORENSIC_STORE.analysis(forensic_id)
+        display = analysis["display"]
     except Exception as e:
-        print(f"❌ Erreur lecture forensics: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ Erreur lecture forensics: %s", e)
         return f"Error loading forensic data: {str(e)}", 500
     
-    # Analyser les données
-    blocks = data.get('blocks', [])
-    total_blocks = len(blocks)
-    
-    # Détecter les anomalies dans la chaîne ET trouver le premier block cassé
-    anomalies = []
-    first_breach_index = None
-    
-    for i in range(1, len(blocks)):
-        prev_block = blocks[i-1]
-        curr_block = blocks[i]
-        
-        # Vérifier si PREV du block actuel = CHAIN du block précédent
-        if curr_block.get('prev_hash') != prev_block.get('chain_hash'):
-            if first_breach_index is None:
-                first_breach_index = i  # Premier block cassé
-            
-            anomalies.append({
-                'block_index': i,
-                'type': 'chain_break',
-                'message': f"Block #{i}: PREV hash ne correspond pas au CHAIN précédent",
-                'timestamp': curr_block.get('timestamp'),
-                'expected': prev_block.get('chain_hash'),
-                'actual': curr_block.get('prev_hash'),
-                'is_first_breach': (first_breach_index == i)
-            })
-            # Marquer le block comme cassé
-            blocks[i]['is_broken'] = True
-    
-    # Si une cassure existe, afficher seulement depuis 2 blocks avant la cassure
-    if first_breach_index is not None:
-        context_start = max(0, first_breach_index - 2)
-        display_blocks = blocks[context_start:]
-        display_message = f"🔴 Affichage des logs depuis le block #{context_start} (2 blocks avant la première cassure)"
-    else:
-        # Pas de cassure, afficher les derniers 30 blocks
-        display_blocks = blocks[-30:] if len(blocks) > 30 else blocks
-        display_message = "✅ Aucune cassure détectée - Affichage des derniers blocks"
+    total_blocks = analysis["block_count"]
+    first_breach_index = analysis["first_breach_index"]
+    anomalies = [_describe_anomaly(a, first_breach_index) for a in analysis["anomalies"]]
+    display_start = display["start"]
+    display_message = display["message"]
     
     # HTML pour l'affichage
     html = f"""
@@ -2130,25 +2757,62 @@ def view_forensics(forensic_id):
                 font-weight: bold;
                 color: #0ff;
             }}
-            .blocks-table {{
-                width: 100%;
-                border-collapse: collapse;
+            .block-toolbar {{
                 margin-top: 20px;
+                display: flex;
+                gap: 10px;
+                align-items: center;
+            }}
+            .block-toolbar input, .block-toolbar button {{
+                background: #111;
+                color: #0f0;
+                border: 1px solid #0f0;
+                padding: 6px 10px;
+                font-family: inherit;
+            }}
+            .block-toolbar button {{
+                cursor: pointer;
+            }}
+            .block-header, .block-row {{
+                display: grid;
+                grid-template-columns: 90px 120px repeat(4, 1fr);
+                gap: 8px;
+                padding: 0 8px;
+                white-space: nowrap;
+                overflow: hidden;
             }}
-            .blocks-table th {{
+            .block-header {{
+                margin-top: 10px;
                 background: #0f0;
                 color: #000;
-                padding: 10px;
-                text-align: left;
+                font-weight: bold;
+                line-height: 36px;
+            }}
+            .block-viewport {{
+                height: 600px;
+                overflow-y: auto;
+                border: 1px solid #333;
             }}
-            .blocks-table td {{
+            #blockSpacer {{
+                position: relative;
+            }}
+            #blockRows {{
+                position: absolute;
+                left: 0;
+                right: 0;
+            }}
+            .block-row {{
+                height: 28px;
+                line-height: 28px;
                 border-bottom: 1px solid #333;
-                padding: 8px;
                 font-size: 11px;
             }}
-            .blocks-table tr:hover {{
+            .block-row:hover {{
                 background: #111;
             }}
+            .anomaly-title {{
+                cursor: pointer;
+            }}
             .hash {{
                 font-family: monospace;
                 color: #0ff;
@@ -2208,44 +2872,40 @@ def view_forensics(forensic_id):
             <h2>🚨 Anomalies Detected: {len(anomalies)}</h2>
             {''.join([f'''
             <div class="anomaly">
-                <div class="anomaly-title">{'🚨 PREMIÈRE CASSURE → ' if a.get('is_first_breach') else '❌ '}{a['type'].upper()} - Block #{a['block_index']}</div>
+                <div class="anomaly-title" onclick="scrollToBlock({a['block_index']})">{'🚨 PREMIÈRE CASSURE → ' if a.get('is_first_breach') else '❌ '}{a['type'].upper()} - Block #{a['block_index']}</div>
                 <div>{a['message']}</div>
                 <div style="margin-top: 10px; color: #888;">Timestamp: {a['timestamp']}</div>
                 <div style="margin-top: 10px;">
-                    <div>Expected PREV: <span class="hash" style="color: #0f0;">{a['expected'][:32]}...</span></div>
-                    <div style="color: #f00; font-weight: bold;">Actual PREV: <span class="hash">{a['actual'][:32]}...</span></div>
+                    <div>Expected {a['field']}: <span class="hash" style="color: #0f0;">{(a['expected'] or 'N/A')[:32]}...</span></div>
+                    <div style="color: #f00; font-weight: bold;">Actual {a['field']}: <span class="hash">{(a['actual'] or 'N/A')[:32]}...</span></div>
                 </div>
             </div>
-            ''' for a in anomalies]) if anomalies else '<p class="status-ok">✅ No anomalies detected in chain integrity</p>'}
+            ''' for a in anomalies[:ANOMALIES_DISPLAY_MAX]]) if anomalies else '<p class="status-ok">✅ No anomalies detected in chain integrity</p>'}
+            {f'<p>… {analysis["anomaly_count"] - ANOMALIES_DISPLAY_MAX} autres anomalies : <a href="/api/forensics/{forensic_id}/analysis" class="hash">analyse complète</a></p>' if analysis["anomaly_count"] > ANOMALIES_DISPLAY_MAX else ''}
             
             <h2>📋 Complete Block History ({total_blocks} blocks)</h2>
-            <table class="blocks-table">
-                <thead>
-                    <tr>
-                        <th>#</th>
-                        <th>Timestamp</th>
-                        <th>LOGS Hash</th>
-                        <th>PREV Hash</th>
-                        <th>CHAIN Hash</th>
-                        <th>GLOBAL Hash</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {''.join([f'''
-                    <tr {'class="block-broken"' if block.get('is_broken') else ''}>
-                        <td>{context_start + i if first_breach_index is not None else (total_blocks - len(display_blocks) + i)}</td>
-                        <td>{block.get('timestamp', 'N/A')}</td>
-                        <td class="hash">{block.get('logs_hash', 'N/A')[:16]}...</td>
-                        <td class="hash">{block.get('prev_hash', 'N/A')[:16]}...</td>
-                        <td class="hash">{block.get('chain_hash', 'N/A')[:16]}...</td>
-                        <td class="hash">{block.get('global_hash', 'N/A')[:16]}...</td>
-                    </tr>
-                    ''' for i, block in enumerate(display_blocks)])}
-                </tbody>
-            </table>
+            <div class="block-toolbar">
+                {f'<button onclick="scrollToBlock({first_breach_index})">🚨 Première cassure (#{first_breach_index})</button>' if first_breach_index is not None else ''}
+                <input id="jumpTime" placeholder="epoch ou 2026-02-06T12:00">
+                <button onclick="jumpToTime()">⏱ Aller au timestamp</button>
+                <input id="jumpBlock" type="number" min="0" max="{max(total_blocks - 1, 0)}" placeholder="block #">
+                <button onclick="scrollToBlock(parseInt(document.getElementById('jumpBlock').value, 10) || 0)">Aller au block</button>
+            </div>
+            <div class="block-header">
+                <span>#</span>
+                <span>Timestamp</span>
+                <span>LOGS Hash</span>
+                <span>PREV Hash</span>
+                <span>CHAIN Hash</span>
+                <span>GLOBAL Hash</span>
+            </div>
+            <div id="blockViewport" class="block-viewport" data-total="{total_blocks}" data-start="{display_start}">
+                <div id="blockSpacer"><div id="blockRows"></div></div>
+            </div>
             
             <a href="/" class="btn">← Back to Dashboard</a>
         </div>
+        <script>{FORENSIC_VIEWER_JS}</script>
     </body>
     </html>
     """
@@ -2266,7 +2926,191 @@ def health():
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métriques au format texte Prometheus"""
+    return Response(render_prometheus(), content_type=METRICS_CONTENT_TYPE)
+
+
+# ============================================================================
+# PROFILAGE À LA DEMANDE (ADMIN)
+# ============================================================================
+# Code admin dans l'en-tête X-Admin-Code, le JSON (admin_code) ou ?admin_code=.
+# CPU : POST /admin/profile/start {"seconds": 30} puis GET /admin/profile/stacks
+# (ou "wait": true pour recevoir les piles directement) ; format collapsed.
+# Mémoire : POST /admin/memory/snapshot {"name": "avant"} ... {"name": "après"},
+# GET /admin/memory/diff?before=avant&after=après, POST /admin/memory/stop.
+
+register_store("anchor_index", lambda: _anchor_index)
+register_store("router_index", lambda: _router_index)
+register_store("anchor_arrays", lambda: _anchor_arrays)
+register_store("slot_coverage", lambda: SLOT_COVERAGE)
+register_store("forensic_store", lambda: FORENSIC_STORE)
+register_store("forensic_requests", lambda: FORENSIC_REQUESTS)
+register_store("forensic_responses", lambda: FORENSIC_RESPONSES)
+register_store("upload_sessions", lambda: UPLOAD_SESSIONS)
+for _cache in READ_CACHES:
+    register_store(f"microcache.{_cache.name}", lambda cache=_cache: cache)
+
+
+def admin_required(view):
+    """Refuse la requête (403) sans le code admin"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        data = request.get_json(silent=True) or {}
+        code = request.headers.get("X-Admin-Code") or data.get("admin_code") or request.args.get("admin_code", "")
+        if not hmac.compare_digest(str(code).encode(), ADMIN_CODE.encode()):
+            return jsonify({"error": "Code admin incorrect"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _profile_stacks_response():
+    status = PROFILER.status()
+    return Response(PROFILER.collapsed(), content_type="text/plain; charset=utf-8",
+                    headers={"X-Profile-Samples": str(status["samples"]),
+                             "X-Profile-Interval": str(status["interval"])})
+
+
+@app.route('/admin/profile/start', methods=['POST'])
+@admin_required
+def admin_profile_start():
+    """Lance le profileur par échantillonnage pour N secondes"""
+    data = request.get_json(silent=True) or {}
+    try:
+        seconds = float(data.get("seconds", 30))
+        interval = float(data.get("interval_ms", 10)) / 1000
+    except (TypeError, ValueError):
+        return jsonify({"error": "seconds / interval_ms invalides"}), 400
+    try:
+        PROFILER.start(seconds, interval, include_idle=bool(data.get("include_idle")))
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e), "profile": PROFILER.status()}), 409
+    log.info("🔬 Profilage CPU lancé pour %ss", PROFILER.seconds)
+    if data.get("wait"):
+        PROFILER.wait()
+        return _profile_stacks_response()
+    return jsonify({"status": "started", "profile": PROFILER.status()}), 202
+
+
+@app.route('/admin/profile/stop', methods=['POST'])
+@admin_required
+def admin_profile_stop():
+    """Arrête la session en cours et renvoie les piles relevées"""
+    PROFILER.stop()
+    return _profile_stacks_response()
+
+
+@app.route('/admin/profile', methods=['GET'])
+@admin_required
+def admin_profile_status():
+    return jsonify(PROFILER.status())
+
+
+@app.route('/admin/profile/stacks', methods=['GET'])
+@admin_required
+def admin_profile_stacks():
+    """Piles de la dernière session (409 tant qu'elle tourne, sauf ?partial=1)"""
+    if PROFILER.running and request.args.get("partial") != "1":
+        return jsonify({"error": "profilage en cours", "profile": PROFILER.status()}), 409
+    return _profile_stacks_response()
+
+
+@app.route('/admin/memory/snapshot', methods=['POST'])
+@admin_required
+def admin_memory_snapshot():
+    """Snapshot tracemalloc nommé (démarre tracemalloc au premier appel)"""
+    data = request.get_json(silent=True) or {}
+    return jsonify(MEMORY.snapshot(data.get("name")))
+
+
+@app.route('/admin/memory/snapshots', methods=['GET'])
+@admin_required
+def admin_memory_snapshots():
+    return jsonify({"snapshots": MEMORY.list()})
+
+
+@app.route('/admin/memory/diff', methods=['GET'])
+@admin_required
+def admin_memory_diff():
+    """Top des allocations qui ont le plus changé entre deux snapshots"""
+    key_type = request.args.get("key", "lineno")
+    if key_type not in ("lineno", "filename", "traceback"):
+        return jsonify({"error": "key doit être lineno, filename ou traceback"}), 400
+    try:
+        top = max(1, min(int(request.args.get("top", 20)), 500))
+        return jsonify(MEMORY.diff(request.args.get("before", ""), request.args.get("after", ""), top, key_type))
+    except ValueError:
+        return jsonify({"error": "top invalide"}), 400
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+
+
+@app.route('/admin/memory/stop', methods=['POST'])
+@admin_required
+def admin_memory_stop():
+    """Oublie les snapshots et arrête tracemalloc"""
+    MEMORY.stop()
+    return jsonify({"status": "stopped"})
+
+
+@app.route('/admin/stores', methods=['GET'])
+@admin_required
+def admin_store_sizes():
+    """Taille mémoire des stores en mémoire (index, caches, canaux forensiques)"""
+    return jsonify({"stores": store_sizes()})
+
+
+ANCHOR_VERIFY_SECONDS = Histogram("snr_anchor_verify_seconds",
+                                  "Durée de la comparaison slots / ancrages BSV dans /anchor")
+
+
+def verify_slots(router_id, slots, anchor_index):
+    """
+    Compare les slots finalisés reçus d'un routeur avec leurs ancrages BSV.
+    Retourne (slots compromis, slots sécurisés) ; un slot pas encore ancré n'apparaît dans aucune liste.
+    """
+    compromised_slots = []
+    secure_slots = []
+    
+    for slot_data in slots:
+        slot_id = slot_data.get('slot')
+        slot_date = slot_data.get('date')
+        received_hash = slot_data.get('slot_hash')
+        finalized = slot_data.get('finalized', False)
+        
+        if not finalized or not received_hash:
+            continue
+        
+        # Chercher ancrage BSV
+        anchored_data = anchor_index.find_slot(router_id, slot_id, slot_date)
+        
+        if anchored_data:
+            anchored_hash = anchored_data.get('snr_hash')
+            
+            if received_hash != anchored_hash:
+                # BREACH!
+                compromised_slots.append({
+                    'slot': slot_id,
+                    'date': slot_date,
+                    'expected_hash': anchored_hash,
+                    'received_hash': received_hash,
+                    'txid': anchored_data.get('txid'),
+                    'whatsonchain_url': f"https://test.whatsonchain.com/tx/{anchored_data.get('txid')}"
+                })
+            else:
+                secure_slots.append({
+                    'slot': slot_id,
+                    'date': slot_date,
+                    'hash': received_hash,
+                    'txid': anchored_data.get('txid')
+                })
+    
+    return compromised_slots, secure_slots
+
+
 @app.route('/anchor', methods=['POST'])
+@traced_request("anchor.ingest")
 def anchor():
     """
     Reçoit les slots du SNR et les compare avec les ancrages BSV.
@@ -2300,10 +3144,16 @@ def anchor():
         routers = load_routers()
         router_info = routers.get(router_id, {})
         
+        # Slots déjà finalisés au précédent envoi (pour repérer les nouveaux, traçage)
+        previously_finalized = {
+            (slot_data.get('date'), slot_data.get('slot'))
+            for slot_data in router_info.get('slots', []) if slot_data.get('finalized')
+        }
+        
         # Nouveau routeur
         is_new_router = router_id not in routers
         if is_new_router:
-            print(f"🆕 Nouveau routeur: {router_name} ({router_id[:16]}...)")
+            log.info("🆕 Nouveau routeur: %s (%s...)", router_name, router_id[:16], extra={"router_id": router_id})
             router_info["first_seen"] = timestamp
         
         # Mettre à jour infos de base
@@ -2321,58 +3171,31 @@ def anchor():
             router_info["slots"] = slots
             
             # Comparer avec BSV
-            breach_detected = False
-            compromised_slots = []
-            secure_slots = []
+            anchor_index = get_anchor_index()
+            with ANCHOR_VERIFY_SECONDS.time():
+                compromised_slots, secure_slots = verify_slots(router_id, slots, anchor_index)
+            breach_detected = bool(compromised_slots)
             
-            anchors = load_anchors()
+            # Bitmaps de couverture : slots vus, finalisés, et ceux dont l'ancrage vient d'être retrouvé
+            SLOT_COVERAGE.record_report(router_id, slots, [
+                (slot_data['date'], slot_data['slot']) for slot_data in compromised_slots + secure_slots
+            ])
             
-            for slot_data in slots:
-                slot_id = slot_data.get('slot')
-                slot_date = slot_data.get('date')
-                received_hash = slot_data.get('slot_hash')
-                finalized = slot_data.get('finalized', False)
-                
-                if not finalized or not received_hash:
-                    continue
-                
-                # Chercher ancrage BSV
-                anchored_data = None
-                for anchor in anchors:
-                    if (anchor.get('router_id') == router_id and 
-                        anchor.get('slot_id') == slot_id and
-                        anchor.get('slot_date') == slot_date):
-                        anchored_data = anchor
-                        break
-                
-                if anchored_data:
-                    anchored_hash = anchored_data.get('snr_hash')
-                    
-                    if received_hash != anchored_hash:
-                        # BREACH!
-                        breach_detected = True
-                        compromised_slots.append({
-                            'slot': slot_id,
-                            'date': slot_date,
-                            'expected_hash': anchored_hash,
-                            'received_hash': received_hash,
-                            'txid': anchored_data.get('txid'),
-                            'whatsonchain_url': f"https://test.whatsonchain.com/tx/{anchored_data.get('txid')}"
-                        })
-                    else:
-                        secure_slots.append({
-                            'slot': slot_id,
-                            'date': slot_date,
-                            'hash': received_hash,
-                            'txid': anchored_data.get('txid')
-                        })
+            # Début de la trace des slots nouvellement finalisés (pas encore ancrés)
+            SLOT_TRACKER.ingested(router_id, [
+                slot_data for slot_data in slots
+                if slot_data.get('finalized') and slot_data.get('slot_hash')
+                and (slot_data.get('date'), slot_data.get('slot')) not in previously_finalized
+                and anchor_index.find_slot(router_id, slot_data.get('slot'), slot_data.get('date')) is None
+            ], current_span())
             
             # Mettre à jour statut
             if breach_detected:
                 router_info["security_status"] = "breach"
                 router_info["compromised_slots"] = compromised_slots
                 router_info["breach_detected_at"] = timestamp
-                print(f"🚨 BREACH: {router_name} - {len(compromised_slots)} slots compromis")
+                log.warning("🚨 BREACH: %s - %d slots compromis", router_name, len(compromised_slots),
+                            extra={"router_id": router_id, "compromised_slots": len(compromised_slots)})
             else:
                 router_info["security_status"] = "secure"
                 router_info["compromised_slots"] = []
@@ -2380,7 +3203,8 @@ def anchor():
             
             # Sauvegarder
             routers[router_id] = router_info
-            save_routers(routers)
+            save_router(router_id, routers)
+            invalidate_router_caches(router_id)
             
             return jsonify({
                 "status": "success",
@@ -2395,7 +3219,8 @@ def anchor():
             router_info["local_hash"] = legacy_hash
             router_info["security_status"] = "unknown"
             routers[router_id] = router_info
-            save_routers(routers)
+            save_router(router_id, routers)
+            invalidate_router_caches(router_id)
             
             return jsonify({
                 "status": "received",
@@ -2403,77 +3228,298 @@ def anchor():
             })
         
     except Exception as e:
-        print(f"❌ Erreur anchor(): {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ Erreur anchor(): %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+ANCHORS_PAGE_DEFAULT = 20
+ANCHORS_PAGE_MAX = int(os.getenv("ANCHORS_PAGE_MAX", "500"))
+
+
+def _parse_epoch_arg(value):
+    """Paramètre de temps: epoch entier ou date/heure ISO (ex: 2026-02-06T12:00)"""
+    if value is None or value == "":
+        return None
+    epoch = _as_epoch(value)
+    if epoch is None:
+        raise ValueError(f"date invalide: {value}")
+    return epoch
+
+
+def _anchors_page(args, router_id=None, default_limit=ANCHORS_PAGE_DEFAULT):
+    """Lit limit/cursor/since/until et retourne (ancrages, next_cursor, total dans la plage since/until)"""
+    limit = int(args.get("limit", default_limit))
+    if limit < 1:
+        raise ValueError("limit doit être >= 1")
+    limit = min(limit, ANCHORS_PAGE_MAX)
+    
+    before = None
+    if args.get("cursor"):
+        cursor = decode_cursor(args["cursor"])
+        try:
+            if len(cursor) != 3:
+                raise ValueError
+            # (timestamp, txid, position) : deux ancrages de même (timestamp, txid) restent distincts
+            before = (int(cursor[0]), str(cursor[1]), int(cursor[2]))
+        except (TypeError, ValueError, IndexError, OverflowError):
+            raise ValueError("curseur invalide")
+    
+    anchors, next_position, total = get_anchor_index().page(
+        router_id=router_id,
+        limit=limit,
+        before=before,
+        since=_parse_epoch_arg(args.get("since")),
+        until=_parse_epoch_arg(args.get("until"))
+    )
+    next_cursor = encode_cursor(list(next_position)) if next_position else None
+    return anchors, next_cursor, total
+
+
 @app.route('/anchors', methods=['GET'])
 def get_anchors():
-    """Retourne l'historique des ancrages"""
-    anchors = load_anchors()
-    router_id = request.args.get('router_id')
+    """
+    Retourne l'historique des ancrages, du plus récent au plus ancien.
     
-    if router_id:
-        anchors = [a for a in anchors if a.get("router_id") == router_id]
+    Paramètres: router_id, since, until (epoch ou ISO), limit, cursor
+    (next_cursor de la page précédente).
+    """
+    try:
+        anchors, next_cursor, total = _anchors_page(request.args, router_id=request.args.get('router_id'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     return jsonify({
-        "total": len(anchors),
-        "anchors": anchors[-20:] if len(anchors) > 20 else anchors
+        "total": total,
+        "anchors": anchors,
+        "next_cursor": next_cursor
     })
 
 
+def _export_response(records, export_format, columns, filename):
+    """Réponse streamée (chunked) NDJSON/CSV, compressée en gzip si le client l'accepte"""
+    chunks = format_chunks(records, export_format, columns)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}.{export_format}"',
+        "Vary": "Accept-Encoding"
+    }
+    if request.accept_encodings["gzip"]:
+        chunks = gzip_chunks(chunks, level=COMPRESSION_LEVEL)
+        headers["Content-Encoding"] = "gzip"
+    return Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[export_format], headers=headers)
+
+
+@app.route('/api/export/anchors', methods=['GET'])
+def export_anchors():
+    """
+    Export complet des ancrages en flux.
+    Paramètres: format=ndjson|csv, router_id, since, until (epoch ou ISO), date (YYYY-MM-DD)
+    """
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format non supporté: {export_format}"}), 400
+    try:
+        since = _parse_epoch_arg(request.args.get("since"))
+        until = _parse_epoch_arg(request.args.get("until"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    records = iter_anchors(
+        ANCHORS_FILE,
+        router_id=request.args.get("router_id"),
+        since=since,
+        until=until,
+        date=request.args.get("date")
+    )
+    return _export_response(records, export_format, ANCHOR_COLUMNS, "anchors")
+
+
+@app.route('/api/export/history/<router_id>', methods=['GET'])
+def export_router_history(router_id):
+    """
+    Export en flux de l'historique d'un routeur (mode SQLite uniquement).
+    Paramètres: format=ndjson|csv, since, until (epoch ou ISO)
+    """
+    if not USE_DATABASE:
+        return jsonify({"error": "Historique disponible uniquement avec ENABLE_DATABASE=true"}), 404
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format non supporté: {export_format}"}), 400
+    try:
+        since = _parse_epoch_arg(request.args.get("since"))
+        until = _parse_epoch_arg(request.args.get("until"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    records = iter_router_history(
+        router_id,
+        since=datetime.fromtimestamp(since).isoformat() if since is not None else None,
+        until=datetime.fromtimestamp(until).isoformat() if until is not None else None
+    )
+    return _export_response(records, export_format, HISTORY_COLUMNS, f"history-{router_id}")
+
+
 @app.route('/api/security-status/<router_id>', methods=['GET'])
+@cached_response(SECURITY_STATUS_CACHE, lambda: request.path)
 def api_security_status_router(router_id):
     """API pour que le routeur vérifie son propre statut de sécurité"""
     security = get_security_status(router_id)
     return jsonify(security)
 
 
-@app.route('/api/devices', methods=['GET'])
-def get_devices():
-    """Liste des devices avec statut de sécurité et connexion"""
-    routers = load_routers()
-    devices = []
-    
-    for router_id, router_info in routers.items():
-        stats = get_router_stats(router_id)
-        security = get_security_status(router_id)
-        last_seen = router_info.get("last_seen")
-        connection_status = get_connection_status(last_seen)
-        
-        # Calculer le temps depuis la dernière connexion
-        if last_seen:
-            current_time = int(datetime.now().timestamp())
-            seconds_ago = current_time - last_seen
-        else:
-            seconds_ago = None
-        
-        devices.append({
-            "id": router_id,
-            "name": router_info.get("name"),
-            "ip": router_info.get("last_ip"),
-            "local_ip": router_info.get("local_ip", router_info.get("last_ip")),
-            "mac_address": router_info.get("mac_address", "N/A"),
-            "last_seen": last_seen,
-            "seconds_ago": seconds_ago,
-            "connection_status": connection_status,
-            "total_anchors": stats["total_anchors"],
+DEVICE_FIELDS = (
+    "id", "name", "ip", "local_ip", "mac_address", "location", "last_seen", "seconds_ago",
+    "connection_status", "total_anchors", "security_status", "local_hash",
+    "blockchain_hash", "hash_match", "hash_interval", "block_interval",
+    "retention_days", "total_blocks"
+)
+DEVICES_PAGE_DEFAULT = int(os.getenv("DEVICES_PAGE_DEFAULT", "100"))
+DEVICES_PAGE_MAX = int(os.getenv("DEVICES_PAGE_MAX", "1000"))
+
+
+def _connection_status_range(connection_status, now):
+    """Traduit un connection_status en intervalle (min, max, inclure_none) sur last_seen"""
+    online_min = now - (ROUTER_SEND_INTERVAL + 10)
+    if connection_status == "online":
+        return (online_min, None, False)
+    if connection_status == "waiting":
+        return (now - OFFLINE_TIMEOUT, online_min - 1, False)
+    if connection_status == "offline":
+        return (None, now - OFFLINE_TIMEOUT - 1, True)
+    raise ValueError(f"connection_status inconnu: {connection_status}")
+
+
+def _intersect_ranges(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    mins = [v for v in (a[0], b[0]) if v is not None]
+    maxs = [v for v in (a[1], b[1]) if v is not None]
+    return (max(mins) if mins else None, min(maxs) if maxs else None, a[2] and b[2])
+
+
+def _device_entry(router_id, router_info, fields, now):
+    """Construit l'entrée /api/devices d'un routeur, limitée aux champs demandés"""
+    last_seen = _as_epoch(router_info.get("last_seen"))
+    entry = {"id": router_id}
+    
+    if fields & {"total_anchors"}:
+        entry["total_anchors"] = get_router_stats(router_id)["total_anchors"]
+    if fields & {"security_status", "local_hash", "blockchain_hash", "hash_match"}:
+        security = compute_security_status(router_info)
+        entry.update({
             "security_status": security["status"],
             "local_hash": security["local_hash"],
             "blockchain_hash": security["blockchain_hash"],
             "hash_match": security["match"],
-            "hash_interval": router_info.get("hash_interval", 10),
-            "block_interval": router_info.get("block_interval", 30),
-            "retention_days": router_info.get("retention_days", 3),
-            "total_blocks": router_info.get("total_blocks", 0)
         })
     
-    return jsonify({"devices": devices})
+    entry.update({
+        "name": router_info.get("name"),
+        "ip": router_info.get("last_ip"),
+        "local_ip": router_info.get("local_ip", router_info.get("last_ip")),
+        "mac_address": router_info.get("mac_address", "N/A"),
+        "location": router_info.get("location"),
+        "last_seen": router_info.get("last_seen"),
+        # Temps depuis la dernière connexion
+        "seconds_ago": now - last_seen if last_seen is not None else None,
+        "connection_status": get_connection_status(last_seen),
+        "hash_interval": router_info.get("hash_interval", 10),
+        "block_interval": router_info.get("block_interval", 30),
+        "retention_days": router_info.get("retention_days", 3),
+        "total_blocks": router_info.get("total_blocks", 0)
+    })
+    return {field: entry[field] for field in DEVICE_FIELDS if field in fields}
+
+
+@app.route('/api/devices', methods=['GET'])
+@cached_response(DEVICES_CACHE, lambda: request.full_path)
+def get_devices():
+    """
+    Liste des devices avec statut de sécurité et connexion.
+    
+    Paramètres (tous optionnels):
+    - limit, cursor : pagination par curseur (next_cursor dans la réponse)
+    - sort=last_seen|name|router_id|total_anchors, order=asc|desc
+    - connection_status, security_status, location : filtres d'égalité
+    - last_seen_after, last_seen_before : plage epoch (bornes incluses)
+    - fields=id,name,... : projection des champs retournés
+    """
+    args = request.args
+    now = int(datetime.now().timestamp())
+    
+    try:
+        limit = int(args.get("limit", DEVICES_PAGE_DEFAULT))
+        if limit < 1:
+            raise ValueError("limit doit être >= 1")
+        limit = min(limit, DEVICES_PAGE_MAX)
+        
+        sort = args.get("sort", "last_seen")
+        order = args.get("order", "desc")
+        if order not in ("asc", "desc"):
+            raise ValueError("order doit être asc ou desc")
+        
+        fields = set(DEVICE_FIELDS)
+        if args.get("fields"):
+            fields = {f.strip() for f in args["fields"].split(",") if f.strip()}
+            unknown = fields - set(DEVICE_FIELDS)
+            if unknown:
+                raise ValueError(f"champs inconnus: {', '.join(sorted(unknown))}")
+            fields.add("id")
+        
+        equals = {}
+        for field in ("security_status", "location"):
+            if args.get(field):
+                equals[field] = args[field]
+        
+        last_seen_range = None
+        if args.get("connection_status"):
+            last_seen_range = _connection_status_range(args["connection_status"], now)
+        if args.get("last_seen_after") or args.get("last_seen_before"):
+            after = int(args["last_seen_after"]) if args.get("last_seen_after") else None
+            before = int(args["last_seen_before"]) if args.get("last_seen_before") else None
+            last_seen_range = _intersect_ranges(last_seen_range, (after, before, False))
+        
+        position = None
+        if args.get("cursor"):
+            cursor = decode_cursor(args["cursor"])
+            if len(cursor) != 4:
+                raise ValueError("curseur invalide")
+            cursor_sort, cursor_order, key, cursor_router = cursor
+            if (cursor_sort, cursor_order) != (sort, order):
+                raise ValueError("curseur incompatible avec sort/order")
+            position = RouterIndex.check_position(sort, key, cursor_router)
+        
+        with _index_lock:
+            index = get_router_index()
+            page_ids, last_position = index.page(
+                sort=sort,
+                descending=(order == "desc"),
+                limit=limit,
+                after=position,
+                equals=equals,
+                last_seen_range=last_seen_range
+            )
+            page_routers = [(router_id, index.routers[router_id]) for router_id in page_ids]
+            total = len(index)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    devices = [_device_entry(router_id, router_info, fields, now) for router_id, router_info in page_routers]
+    next_cursor = None
+    if last_position is not None:
+        next_cursor = encode_cursor([sort, order, list(last_position[0]), last_position[1]])
+    
+    return jsonify({
+        "devices": devices,
+        "count": len(devices),
+        "total": total,
+        "next_cursor": next_cursor
+    })
 
 
 @app.route('/api/security-status/<router_id>', methods=['GET'])
+@cached_response(SECURITY_STATUS_CACHE, lambda: request.path)
 def api_security_status(router_id):
     """API pour obtenir le statut de sécurité d'un routeur"""
     security = get_security_status(router_id)
@@ -2565,6 +3611,54 @@ def api_breach_details(router_id):
     })
 
 
+COVERAGE_DEFAULT_DAYS = 7
+COVERAGE_MAX_DAYS = int(os.getenv("COVERAGE_MAX_DAYS", "366"))
+
+
+@app.route('/api/coverage/<router_id>', methods=['GET'])
+def api_slot_coverage(router_id):
+    """
+    Slots manquants d'un routeur (jamais reportés, jamais finalisés, finalisés non ancrés)
+    depuis les bitmaps journaliers : O(jours) (?since=AAAA-MM-JJ&until=AAAA-MM-JJ, 7 derniers jours par défaut)
+    """
+    today = datetime.now(timezone.utc).date()
+    until = request.args.get("until") or today.isoformat()
+    since = request.args.get("since")
+    try:
+        if not since:
+            since = (datetime.fromisoformat(until).date() - timedelta(days=COVERAGE_DEFAULT_DAYS - 1)).isoformat()
+        if (datetime.fromisoformat(until) - datetime.fromisoformat(since)).days >= COVERAGE_MAX_DAYS:
+            return jsonify({"error": f"plage limitée à {COVERAGE_MAX_DAYS} jours"}), 400
+        return jsonify(SLOT_COVERAGE.gaps(router_id, since, until))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/api/analytics', methods=['GET'])
+def api_analytics():
+    """
+    Lag d'ancrage, couverture des slots, trous, breaches et tx par jour sur tout l'historique
+    (?since=AAAA-MM-JJ&until=AAAA-MM-JJ&router=<router_id>&sla=<secondes>&top=<plus grands trous>)
+    """
+    router_id = request.args.get("router")
+    try:
+        sla = float(request.args.get("sla", ANALYTICS_LAG_SLA))
+        top = max(0, min(int(request.args.get("top", 20)), 1000))
+    except ValueError:
+        return jsonify({"error": "sla et top doivent être numériques"}), 400
+    try:
+        arrays = get_anchor_arrays()
+        routers = load_routers()
+        if router_id and arrays.router_code(router_id) is None and router_id not in routers:
+            return jsonify({"error": "Router not found", "router_id": router_id}), 404
+        return jsonify(fleet_report(arrays, routers, request.args.get("since"), request.args.get("until"),
+                                    router_id, sla, top_gaps=top))
+    except AnalyticsUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
 @app.route('/reset', methods=['POST'])
 def reset_system():
     """Reset complet du système (admin only)"""
@@ -2574,7 +3668,7 @@ def reset_system():
         admin_code = data.get('admin_code', '')
         
         # Code admin simple (à changer en production!)
-        if admin_code != "GRIPID2026":
+        if admin_code != ADMIN_CODE:
             return jsonify({"error": "Code admin incorrect"}), 403
         
         # Backup des données actuelles
@@ -2583,18 +3677,20 @@ def reset_system():
         if ANCHORS_FILE.exists():
             backup_anchors = DATA_DIR / f"anchors_{timestamp}.backup"
             shutil.copy(ANCHORS_FILE, backup_anchors)
-            print(f"💾 Backup anchors: {backup_anchors}")
+            log.info("💾 Backup anchors: %s", backup_anchors)
         
         if ROUTERS_FILE.exists():
             backup_routers = DATA_DIR / f"routers_{timestamp}.backup"
             shutil.copy(ROUTERS_FILE, backup_routers)
-            print(f"💾 Backup routers: {backup_routers}")
+            log.info("💾 Backup routers: %s", backup_routers)
         
         # Reset des fichiers
-        ANCHORS_FILE.write_text("[]")
-        ROUTERS_FILE.write_text("{}")
+        _write_json_atomic(ANCHORS_FILE, [])
+        _write_json_atomic(ROUTERS_FILE, {})
+        SLOT_COVERAGE.clear()
+        invalidate_read_caches()
         
-        print("🗑️  Système réinitialisé!")
+        log.warning("🗑️  Système réinitialisé!", extra={"backup_timestamp": timestamp})
         
         return jsonify({
             "status": "success",
@@ -2603,7 +3699,7 @@ def reset_system():
         })
         
     except Exception as e:
-        print(f"❌ Erreur reset: {e}")
+        log.error("❌ Erreur reset: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -2611,74 +3707,128 @@ def reset_system():
 # 🤖 AUTO-ANCRAGE BSV POUR SLOTS DE 10 MINUTES
 # ═══════════════════════════════════════════════════════════════════════════════
 
+ANCHORS_BROADCAST = Counter("snr_anchors_broadcast_total", "Slots ancrés sur BSV (tx diffusée)")
+ANCHOR_FAILURES = Counter("snr_anchor_failures_total", "Échecs d'ancrage (la tentative sera refaite au passage suivant)")
+ANCHOR_QUEUE_DEPTH = Gauge("snr_anchor_queue_depth", "Slots finalisés en attente d'ancrage")
+ANCHOR_SWEEP_SECONDS = Histogram("snr_anchor_sweep_seconds", "Durée d'un passage d'auto-ancrage",
+                                 buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600))
+
+
+def anchor_pending_slots():
+    """
+    Un passage d'auto-ancrage : ancre sur BSV chaque slot finalisé pas encore ancré.
+    Retourne (slots ancrés, échecs).
+    """
+    started = time.perf_counter()
+    routers = load_routers()
+    anchors = load_anchors()
+    anchor_index = get_anchor_index()
+    anchored_now = set()
+    failures = 0
+    
+    # Slots trop anciens pour être encore ancrés : état expired, ils ne sont plus relus à chaque passage
+    expired = SLOT_COVERAGE.expire()
+    if expired:
+        log.warning("⏰ [AUTO-ANCHOR] %d slot(s) finalisé(s) non ancré(s) expirés (fenêtre de %d jours)",
+                    expired, COVERAGE_PENDING_DAYS)
+    
+    # File d'attente : slots finalisés sans ancrage, lus directement dans les bitmaps de couverture
+    # (le hash vient du dernier envoi du routeur ; un slot absent de cet envoi attend son expiration)
+    pending = {}
+    reported = {}
+    for router_id, slot_date, slot_number in SLOT_COVERAGE.unanchored():
+        if router_id not in reported:
+            reported[router_id] = {
+                (str(slot_data.get('date')), int(slot_data.get('slot'))): slot_data
+                for slot_data in routers.get(router_id, {}).get('slots', [])
+                if slot_data.get('finalized') and slot_data.get('slot_hash')
+                and str(slot_data.get('slot')).isdigit()
+            }
+        slot_data = reported[router_id].get((slot_date, slot_number))
+        if slot_data is None:
+            continue
+        slot_id = slot_data.get('slot')
+        
+        # Bitmap en retard sur anchors.json (ancrage fait par un autre process) : le rattraper
+        if anchor_index.find_slot(router_id, slot_id, slot_date) is not None:
+            SLOT_COVERAGE.mark_anchored(router_id, slot_date, slot_id)
+            continue
+        pending[(router_id, slot_id, slot_date)] = slot_data['slot_hash']
+    
+    ANCHOR_QUEUE_DEPTH.set(len(pending))
+    
+    for (router_id, slot_id, slot_date), slot_hash in pending.items():
+        # Ancrer sur BSV
+        log.info("🔗 [AUTO-ANCHOR] Ancrage slot %s (%s) pour %s...", slot_id, slot_date, router_id[:16],
+                 extra={"router_id": router_id, "slot_id": slot_id, "slot_date": slot_date})
+        
+        SLOT_TRACKER.scheduled(router_id, slot_date, slot_id)
+        try:
+            with span("slot.anchor", trace_id=slot_trace_id(router_id, slot_date, slot_id),
+                      router_id=router_id, slot=slot_id, date=slot_date):
+                send_started = time.perf_counter()
+                with span("anchor.send"):
+                    txid = send_hash_to_bsv(slot_hash)
+                sent = time.perf_counter()
+                
+                # Sauvegarder
+                with span("anchor.persist", txid=txid):
+                    anchor_entry = {
+                        "txid": txid,
+                        "snr_hash": slot_hash,
+                        "timestamp": int(datetime.now().timestamp()),
+                        "router_id": router_id,
+                        "slot_id": slot_id,
+                        "slot_date": slot_date
+                    }
+                    anchors.append(anchor_entry)
+                    save_anchors(anchors)
+                    SLOT_COVERAGE.mark_anchored(router_id, slot_date, slot_id)
+                    anchored_now.add((router_id, slot_id, slot_date))
+                    invalidate_router_caches(router_id)
+                SLOT_TRACKER.broadcast(router_id, slot_date, slot_id, txid,
+                                       sent - send_started, time.perf_counter() - sent)
+            ANCHORS_BROADCAST.inc()
+            ANCHOR_QUEUE_DEPTH.dec()
+            
+            log.info("   ✅ TXID: %s (https://test.whatsonchain.com/tx/%s)", txid, txid,
+                     extra={"router_id": router_id, "slot_id": slot_id, "txid": txid})
+            
+        except Exception as e:
+            failures += 1
+            ANCHOR_FAILURES.inc()
+            log.error("   ❌ Erreur ancrage: %s", e, extra={"router_id": router_id, "slot_id": slot_id})
+    
+    ANCHOR_SWEEP_SECONDS.observe(time.perf_counter() - started)
+    return len(anchored_now), failures
+
+
+# Intervalle de vérification des confirmations des ancrages diffusés (traçage)
+CONFIRMATION_POLL_INTERVAL = int(os.getenv("CONFIRMATION_POLL_INTERVAL", "60"))
+
+
 def auto_anchor_slots_to_bsv():
     """
     Thread background qui ancre automatiquement les slots finalisés sur BSV.
-    Tourne toutes les 10 minutes.
+    Tourne toutes les 10 minutes ; entre deux passages, vérifie les confirmations
+    des ancrages diffusés toutes les CONFIRMATION_POLL_INTERVAL secondes.
     """
     import time
-    import threading
     
-    print("🔗 [AUTO-ANCHOR] Thread démarré (ancrage BSV toutes les 10 minutes)")
+    log.info("🔗 [AUTO-ANCHOR] Thread démarré (ancrage BSV toutes les 10 minutes)")
     
+    next_sweep = time.time() + 600  # 10 minutes
     while True:
         try:
-            time.sleep(600)  # 10 minutes
-            
-            routers = load_routers()
-            anchors = load_anchors()
-            
-            for router_id, router_info in routers.items():
-                slots = router_info.get('slots', [])
-                
-                for slot_data in slots:
-                    slot_id = slot_data.get('slot')
-                    slot_date = slot_data.get('date')
-                    slot_hash = slot_data.get('slot_hash')
-                    finalized = slot_data.get('finalized', False)
-                    
-                    if not finalized or not slot_hash:
-                        continue
-                    
-                    # Vérifier si déjà ancré
-                    already_anchored = any(
-                        a.get('router_id') == router_id and
-                        a.get('slot_id') == slot_id and
-                        a.get('slot_date') == slot_date
-                        for a in anchors
-                    )
-                    
-                    if already_anchored:
-                        continue
-                    
-                    # Ancrer sur BSV
-                    print(f"🔗 [AUTO-ANCHOR] Ancrage slot {slot_id} ({slot_date}) pour {router_id[:16]}...")
-                    
-                    try:
-                        txid = send_hash_to_bsv(slot_hash)
-                        
-                        # Sauvegarder
-                        anchor_entry = {
-                            "txid": txid,
-                            "snr_hash": slot_hash,
-                            "timestamp": int(datetime.now().timestamp()),
-                            "router_id": router_id,
-                            "slot_id": slot_id,
-                            "slot_date": slot_date
-                        }
-                        anchors.append(anchor_entry)
-                        save_anchors(anchors)
-                        
-                        print(f"   ✅ TXID: {txid}")
-                        print(f"   🌐 https://test.whatsonchain.com/tx/{txid}")
-                        
-                    except Exception as e:
-                        print(f"   ❌ Erreur ancrage: {e}")
+            time.sleep(max(0, min(CONFIRMATION_POLL_INTERVAL, next_sweep - time.time())))
+            if SLOT_TRACKER.pending_confirmations():
+                SLOT_TRACKER.check_confirmations(get_tx_status)
+            if time.time() >= next_sweep:
+                next_sweep = time.time() + 600
+                anchor_pending_slots()
         
         except Exception as e:
-            print(f"❌ [AUTO-ANCHOR] Erreur: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("❌ [AUTO-ANCHOR] Erreur: %s", e)
 
 
 # ============================================================================
@@ -2711,6 +3861,12 @@ if __name__ == "__main__":
     print(f"   Anchor: http://localhost:5000/anchor (POST)")
     print(f"   Devices API: http://localhost:5000/api/devices")
     print(f"   Security API: http://localhost:5000/api/security-status/<router_id>")
+    print(f"   Analytics API: http://localhost:5000/api/analytics")
+    print(f"   Coverage API: http://localhost:5000/api/coverage/<router_id>")
+    
+    # Pool de vérification forensique créé avant les requêtes, réutilisé par tous les uploads
+    if VERIFY_WORKERS > 1:
+        start_verify_pool()
     
     # Démarrer le thread d'auto-ancrage
     anchor_thread = threading.Thread(target=auto_anchor_slots_to_bsv, daemon=True)
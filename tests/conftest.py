@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fixtures communes des tests.
+
+Le gateway lit sa configuration à l'import : l'environnement (répertoire de
+données temporaire, chaîne simulée) est fixé ici, avant tout import du
+projet. Le module est importé une seule fois par session ; la fixture
+client repart de fichiers de données vides à chaque test.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+DATA_DIR = tempfile.mkdtemp(prefix="snr-tests-")
+os.environ["SNR_DATA_DIR"] = DATA_DIR
+os.environ["CHAIN_PROVIDER"] = "simulated"
+os.environ["SIM_CHAIN_BLOCK_TIME"] = "1"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("BSV_TESTNET_WIF", "cVEVNHpneqzMrghQPhxy6JLcRB2Czgjr9Fg9XWfDdh9ac9Te1mTh")
+os.environ.pop("SNR_CAPTURE_FILE", None)
+os.environ.pop("ENABLE_DATABASE", None)
+
+
+@pytest.fixture(scope="session")
+def gateway():
+    import snr_bsv_gateway
+    return snr_bsv_gateway
+
+
+def reset_data(gateway) -> None:
+    """Fichiers de données vides, index et caches remis à zéro"""
+    from indexes import AnchorIndex, RouterIndex
+    gateway.ANCHORS_FILE.write_text("[]")
+    gateway.ROUTERS_FILE.write_text("{}")
+    gateway.SLOT_COVERAGE.clear()
+    with gateway._index_lock:
+        gateway._anchor_index = AnchorIndex()
+        gateway._router_index = RouterIndex()
+    gateway.invalidate_read_caches()
+
+
+@pytest.fixture
+def client(gateway):
+    reset_data(gateway)
+    return gateway.app.test_client()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analyses de la flotte : lag d'ancrage (percentiles par routeur identiques à
+np.percentile), couverture et trous par routeur, doublons ignorés, tx par
+jour, et erreurs de l'API /api/analytics.
+"""
+
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from analytics import AnchorArrays, fleet_report, day_number, day_string, _grouped_percentiles  # noqa: E402
+
+DAY = "2026-01-01"
+DAY_START = day_number(DAY) * 86400
+NOW = DAY_START + 2 * 86400
+
+
+def anchor(router_id: str, slot: int, lag: float, txid: str = "tx") -> dict:
+    return {"router_id": router_id, "slot_date": DAY, "slot_id": slot, "txid": f"{txid}-{router_id}-{slot}",
+            "timestamp": DAY_START + (slot + 1) * 600 + lag}
+
+
+def make_anchors() -> list:
+    anchors = [anchor("r1", slot, 60) for slot in range(10)]
+    anchors += [anchor("r2", 0, 7200), anchor("r2", 143, 30)]
+    anchors.append(anchor("r1", 0, 99999, txid="doublon"))
+    return anchors
+
+
+def test_day_numbers():
+    assert day_string(day_number(DAY)) == DAY
+    assert day_number("pas une date") < 0
+
+
+def test_lag_and_coverage_per_router():
+    report = fleet_report(AnchorArrays(make_anchors()), now=NOW, sla=3600)
+    assert report["anchors"] == 13 and report["slots_anchored"] == 12
+    assert report["duplicate_anchors"] == 1
+    assert report["lag_seconds"]["late"] == 1 and report["lag_seconds"]["max"] == 7200
+
+    r1, r2 = report["routers"]["r1"], report["routers"]["r2"]
+    assert r1["lag_p50"] == 60 and r1["late"] == 0
+    assert (r1["expected_slots"], r1["anchored_slots"], r1["gaps"], r1["longest_gap_slots"]) == (144, 10, 1, 134)
+    assert (r2["anchored_slots"], r2["gaps"], r2["longest_gap_slots"]) == (2, 1, 142)
+    assert report["coverage"]["largest_gaps"][0] == {"router_id": "r2", "date": DAY, "slot": 1, "length_slots": 142}
+    # Le slot 143 de r2 et le doublon sont ancrés le lendemain (jour UTC de l'ancrage)
+    assert report["daily_tx"] == [{"date": DAY, "tx": 11}, {"date": day_string(day_number(DAY) + 1), "tx": 2}]
+
+
+def test_unfinished_slots_are_not_expected():
+    now = DAY_START + 10 * 600 + 1    # 10 slots terminés
+    report = fleet_report(AnchorArrays([anchor("r1", slot, 0) for slot in range(5)]), now=now)
+    assert report["routers"]["r1"]["expected_slots"] == 10
+    assert report["coverage"]["missing_slots"] == 5
+
+
+def test_grouped_percentiles_match_numpy():
+    rng = np.random.default_rng(1)
+    groups = rng.integers(0, 5, 500)
+    values = rng.exponential(600, 500)
+    counts, result = _grouped_percentiles(groups, values, 6)
+    assert counts[5] == 0 and np.isnan(result[5]).all()
+    for group in range(5):
+        assert np.allclose(result[group], np.percentile(values[groups == group], (50, 90, 95, 99)))
+
+
+def test_router_filter_and_bad_dates():
+    arrays = AnchorArrays(make_anchors())
+    report = fleet_report(arrays, {"r3": {}}, router_id="r3", now=NOW)
+    assert report["slots_anchored"] == 0 and report["never_anchored"] == ["r3"]
+    with pytest.raises(ValueError):
+        fleet_report(arrays, since="hier")
+
+
+def test_api(gateway, client):
+    gateway.ANCHORS_FILE.write_text(json.dumps(make_anchors()))
+    gateway.invalidate_read_caches()
+    body = client.get(f"/api/analytics?since={DAY}&until={DAY}").get_json()
+    assert body["slots_anchored"] == 12
+    assert client.get("/api/analytics?router=absent").status_code == 404
+    assert client.get("/api/analytics?since=hier").status_code == 400
+    assert client.get("/api/analytics?sla=abc").status_code == 400
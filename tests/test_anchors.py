@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Historique des ancrages : pagination keyset (/anchors, explorer), total
+filtré, curseurs invalides, et AnchorIndex relu à la demande dans
+anchors.json (ajouts en fin lus seuls, réécriture = reconstruction).
+"""
+
+import json
+
+import pytest
+
+from indexes import AnchorIndex, encode_cursor
+
+
+def make_anchors(count: int, routers=("r1", "r2")) -> list:
+    return [
+        {
+            "txid": f"tx{i:05d}",
+            "snr_hash": "ab" * 32,
+            "timestamp": 1700000000 + i * 60,
+            "router_id": routers[i % len(routers)],
+            "slot_id": i // len(routers),
+            "slot_date": "2023-11-14",
+        }
+        for i in range(count)
+    ]
+
+
+def collect(client, url: str) -> tuple:
+    txids, cursor, totals = [], None, set()
+    while True:
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        txids.extend(anchor["txid"] for anchor in body["anchors"])
+        totals.add(body["total"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return txids, totals
+
+
+def test_pages_newest_first(gateway, client):
+    anchors = make_anchors(45)
+    gateway.ANCHORS_FILE.write_text(json.dumps(anchors, indent=2))
+    txids, totals = collect(client, "/anchors?limit=7")
+    assert txids == [anchor["txid"] for anchor in reversed(anchors)]
+    assert totals == {45}
+
+
+def test_router_filter_and_explorer(gateway, client):
+    anchors = make_anchors(30)
+    gateway.ANCHORS_FILE.write_text(json.dumps(anchors, indent=2))
+    txids, totals = collect(client, "/anchors?router_id=r2&limit=4")
+    assert txids == [a["txid"] for a in reversed(anchors) if a["router_id"] == "r2"]
+    assert totals == {15}
+    txids, _ = collect(client, "/api/explorer/r1/anchors?limit=4")
+    assert txids == [a["txid"] for a in reversed(anchors) if a["router_id"] == "r1"]
+
+
+def test_total_counts_only_the_time_range(gateway, client):
+    anchors = make_anchors(40)
+    gateway.ANCHORS_FILE.write_text(json.dumps(anchors, indent=2))
+    since, until = 1700000000 + 10 * 60, 1700000000 + 19 * 60
+    txids, totals = collect(client, f"/anchors?since={since}&until={until}&limit=3")
+    assert txids == [f"tx{i:05d}" for i in range(19, 9, -1)]
+    assert totals == {10}
+
+
+def test_duplicate_keys_straddling_a_page_are_kept(gateway, client):
+    anchors = make_anchors(6)
+    duplicate = dict(anchors[2])
+    anchors[3:3] = [dict(duplicate), dict(duplicate)]
+    gateway.ANCHORS_FILE.write_text(json.dumps(anchors, indent=2))
+    for limit in (1, 2, 3, 4):
+        txids, _ = collect(client, f"/anchors?limit={limit}")
+        assert len(txids) == len(anchors)
+        assert txids.count(duplicate["txid"]) == 3
+
+
+@pytest.mark.parametrize("cursor", [
+    "%%%",
+    encode_cursor([1, "t"]),
+    encode_cursor([[1], "t", 0]),
+    encode_cursor([None, "t", 0]),
+    encode_cursor(["x", "t", 0]),
+    encode_cursor([1, "t", "p"]),
+    encode_cursor([1e400, "t", 0]),
+    encode_cursor([1, "t", 0, 9]),
+])
+def test_invalid_cursor_is_400(gateway, client, cursor):
+    gateway.ANCHORS_FILE.write_text(json.dumps(make_anchors(3)))
+    assert client.get(f"/anchors?cursor={cursor}").status_code == 400
+    assert client.get(f"/api/explorer/r1/anchors?cursor={cursor}").status_code == 400
+
+
+def test_appended_anchors_are_read_incrementally(gateway, client):
+    anchors = make_anchors(10)
+    gateway.ANCHORS_FILE.write_text(json.dumps(anchors, indent=2))
+    index = gateway.get_anchor_index()
+    assert index.total == 10
+
+    anchors.extend(make_anchors(13)[10:])
+    gateway.save_anchors(anchors)
+    assert gateway.get_anchor_index() is index
+    assert index.total == 13
+    assert index.count("r2") == 6
+    assert index.last("r1")["txid"] == "tx00012"
+    assert client.get("/anchors?limit=1").get_json()["anchors"][0]["txid"] == "tx00012"
+
+    gateway.save_anchors(anchors[:5])
+    rebuilt = gateway.get_anchor_index()
+    assert rebuilt is not index
+    assert rebuilt.total == 5
+
+
+def test_index_reads_anchors_from_the_file(tmp_path):
+    path = tmp_path / "anchors.json"
+    anchors = make_anchors(8, routers=("routeur-é", "r2"))
+    path.write_text(json.dumps(anchors, indent=2, ensure_ascii=False), encoding="utf-8")
+    index = AnchorIndex()
+    index.rebuild(path, "sig")
+    assert not hasattr(index, "anchors")
+    assert index.count("routeur-é") == 4
+    assert index.first("routeur-é") == anchors[0]
+    assert index.find_slot("r2", 3, "2023-11-14") == anchors[7]
+    assert index.oldest() == anchors[0]
+    assert list(index.iter_all()) == anchors
+
+    # anchors.json remplacé : l'index garde le fichier qu'il a lu
+    path.unlink()
+    path.write_text("[]")
+    assert index.get(5) == anchors[5]
+    index.close()
+
+
+def test_missing_or_invalid_file_gives_empty_index(tmp_path):
+    index = AnchorIndex()
+    index.rebuild(tmp_path / "absent.json", None)
+    assert index.built and index.total == 0
+    (tmp_path / "bad.json").write_text('[{"txid": "a", "timestamp": 1}, {oops}]')
+    index.rebuild(tmp_path / "bad.json", "bad")
+    assert index.total == 0
+    assert index.page() == ([], None, 0)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Totaux du BlockStore : tenus à jour par add_batch / release (sans parcours
+de la table à chaque lecture), initialisés une fois sur une base existante.
+"""
+
+import hashlib
+import sqlite3
+import zlib
+
+from block_store import BlockStore
+
+
+def lines(count: int, seed: str) -> list:
+    return [(hashlib.sha256(f"{seed}{i}".encode()).digest(), f'{{"i": {i}, "s": "{seed}"}}'.encode())
+            for i in range(count)]
+
+
+def scan(path) -> dict:
+    with sqlite3.connect(path) as conn:
+        count, stored, raw = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length(body)), 0), COALESCE(SUM(size), 0) FROM blocks"
+        ).fetchone()
+    return {"blocks": count, "stored_bytes": stored, "raw_bytes": raw}
+
+
+def totals(store: BlockStore) -> dict:
+    summary = store.summary()
+    return {key: summary[key] for key in ("blocks", "stored_bytes", "raw_bytes")}
+
+
+def test_totals_follow_add_and_release(tmp_path):
+    store = BlockStore(tmp_path / "blocks.db")
+    assert totals(store) == {"blocks": 0, "stored_bytes": 0, "raw_bytes": 0}
+
+    keys_a, new = store.add_batch(lines(20, "a"))
+    assert new == 20
+    keys_b, new = store.add_batch(lines(10, "a") + lines(5, "b"))
+    assert new == 5
+    assert totals(store) == scan(store.path)
+
+    store.release(keys_a)
+    assert totals(store) == scan(store.path) and totals(store)["blocks"] == 15
+    store.release(keys_b)
+    assert totals(store) == scan(store.path) == {"blocks": 0, "stored_bytes": 0, "raw_bytes": 0}
+
+
+def test_totals_are_shared_between_connections(tmp_path):
+    writer = BlockStore(tmp_path / "blocks.db")
+    reader = BlockStore(tmp_path / "blocks.db")
+    writer.add_batch(lines(7, "x"))
+    assert totals(reader)["blocks"] == 7
+
+
+def test_existing_database_is_counted_once(tmp_path):
+    path = tmp_path / "blocks.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE blocks (key BLOB PRIMARY KEY, digest BLOB NOT NULL, body BLOB NOT NULL, "
+                     "size INTEGER NOT NULL, refs INTEGER NOT NULL) WITHOUT ROWID")
+        for key, line in lines(3, "old"):
+            conn.execute("INSERT INTO blocks VALUES (?, ?, ?, ?, 1)",
+                         (key, hashlib.sha256(line).digest(), zlib.compress(line), len(line)))
+    store = BlockStore(path)
+    assert totals(store) == scan(path) and totals(store)["blocks"] == 3
+    assert totals(BlockStore(path)) == scan(path)
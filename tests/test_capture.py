@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Capture du trafic d'ingestion : seuls les endpoints d'ingestion sont
+capturés, corps tronqués, relecture, file bornée en octets de corps
+(abandons comptés dans stats["dropped"]), et rejeu accéléré d'une capture.
+"""
+
+import sys
+import time
+import argparse
+import threading
+
+from flask import Flask
+
+from capture import CaptureWriter, CaptureMiddleware, read_capture
+from conftest import ROOT
+
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from replay import replay, build_report  # noqa: E402
+
+
+class PausedWriter(CaptureWriter):
+    """Writer dont le thread n'écrit qu'après gate.set() : la file se remplit"""
+
+    gate = threading.Event()
+
+    def _run(self) -> None:
+        self.gate.wait()
+        super()._run()
+
+
+def wait_for(predicate, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_queue_is_bounded_by_bytes(tmp_path):
+    PausedWriter.gate.clear()
+    writer = PausedWriter(str(tmp_path / "capture.ndjson"), queue_size=100, queue_bytes=1000)
+    writer.submit({"m": "POST"}, b"x" * 600)
+    writer.submit({"m": "POST"}, b"y" * 600)   # 1200 > 1000 : abandonné
+    writer.submit({"m": "POST"}, b"z" * 400)
+    assert writer.stats["dropped"] == 1
+    PausedWriter.gate.set()
+    wait_for(lambda: writer.stats["captured"] == 2)
+    writer.submit({"m": "POST"}, b"w" * 900)   # budget rendu après écriture
+    wait_for(lambda: writer.stats["captured"] == 3)
+    bodies = [record["body"] for record in read_capture(str(tmp_path / "capture.ndjson"))]
+    assert bodies == [b"x" * 600, b"z" * 400, b"w" * 900]
+
+
+def test_queue_is_bounded_by_count(tmp_path):
+    PausedWriter.gate.clear()
+    writer = PausedWriter(str(tmp_path / "capture.ndjson"), queue_size=2)
+    for _ in range(3):
+        writer.submit({"m": "POST"})
+    assert writer.stats["dropped"] == 1
+    PausedWriter.gate.set()
+    wait_for(lambda: writer.stats["captured"] == 2)
+
+
+def test_middleware_captures_ingest_endpoints_only(tmp_path):
+    app = Flask(__name__)
+
+    @app.route("/anchor", methods=["POST"])
+    def anchor():
+        from flask import request
+        return {"size": len(request.get_data())}
+
+    @app.route("/anchors")
+    def anchors():
+        return {"anchors": []}
+
+    path = str(tmp_path / "capture.ndjson")
+    writer = CaptureWriter(path)
+    app.wsgi_app = CaptureMiddleware(app, writer, max_body=24)
+    client = app.test_client()
+    client.post("/anchor", data=b'{"router_id": "r9", "hash": "' + b"a" * 64 + b'"}',
+                content_type="application/json").close()
+    client.get("/anchors").close()
+    wait_for(lambda: writer.stats["captured"] == 1)
+
+    (record,) = read_capture(path)
+    assert record["e"] == "anchor" and record["m"] == "POST" and record["s"] == 200
+    assert record["trunc"] and len(record["body"]) == 24
+    assert record["r"] == "r9"
+
+
+class RecordingTarget:
+    """Cible de rejeu : note l'instant de chaque envoi et renvoie un statut fixé par chemin"""
+
+    def __init__(self, statuses: dict):
+        self.statuses = statuses
+        self.sent = []
+
+    def send(self, record: dict) -> int:
+        self.sent.append((record["p"], time.perf_counter()))
+        if record["p"] == "/boom":
+            raise ConnectionError("coupure")
+        return self.statuses[record["p"]]
+
+
+def test_replay_keeps_the_schedule_and_reports_mismatches():
+    records = [
+        {"t": 100.0, "m": "POST", "p": "/anchor", "e": "anchor", "s": 200, "d": 5.0, "body": b"{}"},
+        {"t": 100.5, "m": "POST", "p": "/anchor", "e": "anchor", "s": 200, "d": 7.0, "body": b"{}"},
+        {"t": 102.0, "m": "POST", "p": "/forensics", "e": "forensics", "s": 200, "d": 9.0, "body": b"{}"},
+        {"t": 102.0, "m": "POST", "p": "/boom", "e": "boom", "s": 200, "body": b""},
+    ]
+    target = RecordingTarget({"/anchor": 200, "/forensics": 503})
+    started = time.perf_counter()
+    results = replay(records, target, speed=20, concurrency=4)
+    # 2 s de capture rejouées en ~0,1 s, dans l'ordre d'origine
+    assert 0.09 < max(at for _, at in target.sent) - started < 1
+    assert [path for path, _ in target.sent][:2] == ["/anchor", "/anchor"]
+    assert [result["status"] for result in results] == [200, 200, 503, "exception:ConnectionError"]
+
+    args = argparse.Namespace(label="test", capture="capture.ndjson", target=None, root=".", speed=20, concurrency=4)
+    report = build_report(records, results, args, 0.1)
+    assert report["captured_span_seconds"] == 2.0
+    anchor, forensics, boom = (report["endpoints"][name] for name in ("anchor", "forensics", "boom"))
+    assert anchor["count"] == 2 and anchor["errors"] == 0 and anchor["captured_latency_ms"]["max"] == 7.0
+    assert forensics["errors"] == 1 and forensics["status_mismatch"] == 1
+    assert boom["error_rate"] == 1.0
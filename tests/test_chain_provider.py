@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chaîne simulée : UTXOs dépensés et rendus, OP_RETURN relus, confirmations
+d'après la hauteur, erreurs simulées, serveur WoC simulé utilisé par
+WhatsOnChainProvider, et arriéré de slots vidé par l'auto-ancrage.
+"""
+
+import os
+from datetime import datetime, timezone
+
+import pytest
+from bsvlib import Wallet, Key
+from bsvlib.constants import Chain
+
+import writer
+from chain_provider import (SimulatedChain, ChainProviderError, WhatsOnChainProvider,
+                            make_provider, create_app)
+
+KEY = Key(os.environ["BSV_TESTNET_WIF"])
+
+
+def anchor(chain: SimulatedChain, data: bytes):
+    wallet = Wallet(chain=Chain.TEST, provider=chain)
+    wallet.add_key(KEY)
+    return wallet.create_transaction(outputs=[], pushdatas=[data], combine=True)
+
+
+def test_broadcast_spends_and_returns_change():
+    chain = SimulatedChain(block_time=0)
+    chain.fund(KEY.address(), 100000)
+    tx = anchor(chain, b"snr-slot")
+    result = chain.broadcast(tx.hex())
+    assert result.propagated and result.data == tx.txid()
+
+    unspents = chain.address_unspents(KEY.address())
+    assert [u["tx_hash"] for u in unspents] == [tx.txid()]
+    assert 99000 < chain.get_balance(address=KEY.address()) < 100000
+    assert b"snr-slot".hex() in chain.op_return(tx.txid())[0]["hex"]
+    # Rediffuser la même tx est idempotent
+    assert chain.broadcast(tx.hex()).propagated
+
+
+def test_double_spend_is_rejected():
+    chain = SimulatedChain(block_time=0)
+    chain.fund(KEY.address(), 100000)
+    first, second = anchor(chain, b"premier"), anchor(chain, b"second")
+    assert chain.broadcast(first.hex()).propagated
+    result = chain.broadcast(second.hex())
+    assert not result.propagated and result.data == "Missing inputs"
+    assert chain.stats["rejected"] == 1
+
+
+def test_confirmations_follow_block_height(monkeypatch):
+    clock = [1700000000.0]
+    monkeypatch.setattr("chain_provider.time.time", lambda: clock[0])
+    chain = SimulatedChain(block_time=600)
+    chain.fund(KEY.address(), 100000)
+    tx = anchor(chain, b"slot")
+    chain.broadcast(tx.hex())
+    assert chain.tx_status(tx.txid()) == {"txid": tx.txid(), "confirmations": 0, "blockheight": None}
+    clock[0] += 1200
+    status = chain.tx_status(tx.txid())
+    assert status["confirmations"] == 2 and status["blockheight"] == chain.height() - 1
+    assert chain.tx_status("00" * 32) is None and chain.op_return("00" * 32) is None
+
+
+def test_simulated_errors():
+    chain = SimulatedChain(error_rate=1.0, seed=1)
+    with pytest.raises(ChainProviderError):
+        chain.address_unspents(KEY.address())
+    assert chain.get_unspents(address=KEY.address()) == []
+    assert not chain.broadcast("00").propagated
+    assert chain.stats["errors"] == 3
+
+
+def test_make_provider():
+    provider = make_provider("simulated", fund_address=KEY.address())
+    assert isinstance(provider, SimulatedChain) and provider.get_balance(address=KEY.address()) > 0
+    assert isinstance(make_provider("woc"), WhatsOnChainProvider)
+    with pytest.raises(ValueError):
+        make_provider("autre")
+
+
+def test_woc_routes_of_the_simulated_server():
+    chain = SimulatedChain(block_time=0)
+    chain.fund(KEY.address(), 100000)
+    client = create_app(chain).test_client()
+    prefix = f"/v1/bsv/{chain.chain.value}"
+    tx = anchor(chain, b"via-http")
+    assert client.post(f"{prefix}/tx/raw", json={"txHex": tx.hex()}).get_json() == tx.txid()
+    assert client.get(f"{prefix}/tx/{tx.txid()}/opreturn").status_code == 200
+    assert client.get(f"{prefix}/tx/hash/{tx.txid()}").get_json()["txid"] == tx.txid()
+    assert client.get(f"{prefix}/tx/hash/{'00' * 32}").status_code == 404
+    assert client.get(f"{prefix}/address/{KEY.address()}/balance").get_json()["confirmed"] > 0
+
+
+def test_gateway_drains_a_backlog_on_the_simulated_chain(gateway, client):
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    slots = [{"date": today, "slot": slot, "finalized": True, "slot_hash": f"{slot:02x}" * 32} for slot in range(3)]
+    client.post("/anchor", json={"router_id": "r-drain", "hash": "ab" * 32, "slots": slots}).close()
+    assert gateway.anchor_pending_slots() == (3, 0)
+    assert gateway.SLOT_COVERAGE.unanchored("r-drain") == []
+    txids = [entry["txid"] for entry in gateway.load_anchors() if entry.get("router_id") == "r-drain"]
+    assert len(txids) == 3
+    assert all(writer.PROVIDER.op_return(txid) for txid in txids)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compression des réponses : négociation br/gzip, seuil de taille, réponses
+streamées laissées telles quelles, corps identiques compressés une seule fois.
+"""
+
+import gzip
+
+import pytest
+from flask import Flask, Response
+
+import compression
+from compression import init_app, compress_body, cache_stats
+
+
+def make_app() -> Flask:
+    app = Flask(__name__)
+
+    @app.route("/big")
+    def big():
+        return {"anchors": [{"router_id": f"r{i}", "hash": "ab" * 32} for i in range(100)]}
+
+    @app.route("/small")
+    def small():
+        return {"ok": True}
+
+    @app.route("/stream")
+    def stream():
+        return Response((line for line in ["a" * 2000, "b" * 2000]), mimetype="application/x-ndjson")
+
+    @app.route("/png")
+    def png():
+        return Response(b"\x89PNG" + bytes(4000), mimetype="image/png")
+
+    init_app(app)
+    return app
+
+
+def test_gzip_when_accepted(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    client = make_app().test_client()
+    plain = client.get("/big")
+    assert "Content-Encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.headers["Vary"]
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli non installé")
+def test_brotli_preferred_when_available():
+    client = make_app().test_client()
+    response = client.get("/big", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert compression.brotli.decompress(response.get_data()) == client.get("/big").get_data()
+
+
+def test_small_streamed_and_binary_responses_untouched():
+    client = make_app().test_client()
+    for path in ("/small", "/stream", "/png"):
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers, path
+        response.close()
+
+
+def test_identical_bodies_compressed_once():
+    body = b'{"page": "' + b"x" * 5000 + b'"}'
+    before = cache_stats()
+    first = compress_body(body, "gzip")
+    assert compress_body(body, "gzip") == first
+    after = cache_stats()
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 1
+    assert gzip.decompress(first) == body
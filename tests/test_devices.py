@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/api/devices : pagination par curseur, filtres, projection, curseurs
+invalides, et mise à jour en place de l'index des routeurs par /anchor.
+"""
+
+import json
+
+import pytest
+
+from indexes import encode_cursor
+
+
+def write_routers(gateway, count: int) -> dict:
+    routers = {
+        f"r{i:03d}": {
+            "name": f"Router {i % 7}",
+            "location": "Paris" if i % 2 else "Lyon",
+            "last_seen": 1700000000 + i * 10,
+        }
+        for i in range(count)
+    }
+    gateway.ROUTERS_FILE.write_text(json.dumps(routers))
+    return routers
+
+
+def collect(client, query: str) -> list:
+    ids, cursor = [], None
+    while True:
+        url = f"/api/devices?{query}" + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(url)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        ids.extend(device["id"] for device in body["devices"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("sort", ["last_seen", "name", "router_id", "total_anchors"])
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_pages_cover_every_router_once(gateway, client, sort, order):
+    routers = write_routers(gateway, 53)
+    ids = collect(client, f"sort={sort}&order={order}&limit=7")
+    assert sorted(ids) == sorted(routers)
+    assert len(ids) == len(set(ids))
+
+
+def test_last_seen_order_and_filters(gateway, client):
+    write_routers(gateway, 20)
+    ids = collect(client, "sort=last_seen&order=desc&limit=3")
+    assert ids == [f"r{i:03d}" for i in range(19, -1, -1)]
+    paris = collect(client, "location=paris&limit=4")
+    assert paris == [f"r{i:03d}" for i in range(19, -1, -1) if i % 2]
+    window = collect(client, f"last_seen_after={1700000000 + 50}&last_seen_before={1700000000 + 80}&limit=2")
+    assert window == ["r008", "r007", "r006", "r005"]
+
+
+def test_fields_projection(gateway, client):
+    write_routers(gateway, 3)
+    body = client.get("/api/devices?fields=name").get_json()
+    assert all(set(device) == {"id", "name"} for device in body["devices"])
+    assert client.get("/api/devices?fields=name,nope").status_code == 400
+
+
+@pytest.mark.parametrize("cursor", [
+    "%%%",
+    encode_cursor({"a": 1}),
+    encode_cursor([1]),
+    encode_cursor(["last_seen", "desc", 5, "r1"]),
+    encode_cursor(["last_seen", "desc", [1], "r1"]),
+    encode_cursor(["last_seen", "desc", ["x", 1], "r1"]),
+    encode_cursor(["last_seen", "desc", [1, 5], 7]),
+    encode_cursor(["last_seen", "desc", [1, 5], "r1", 9]),
+    encode_cursor(["name", "desc", [3], "r1"]),
+    encode_cursor(["last_seen", "asc", [1, 5], "r1"]),
+])
+def test_invalid_cursor_is_400(gateway, client, cursor):
+    write_routers(gateway, 5)
+    assert client.get(f"/api/devices?cursor={cursor}").status_code == 400
+
+
+def test_anchor_updates_index_in_place(gateway, client):
+    write_routers(gateway, 10)
+    assert collect(client, "limit=50")[0] == "r009"
+    index = gateway.get_router_index()
+
+    response = client.post("/anchor", json={"router_id": "r000", "router_name": "Renamed",
+                                            "hash": "ab" * 32, "timestamp": 1800000000})
+    assert response.status_code == 200
+
+    assert gateway.get_router_index() is index
+    body = client.get("/api/devices?limit=1").get_json()
+    assert body["devices"][0]["id"] == "r000"
+    assert body["devices"][0]["name"] == "Renamed"
+
+    response = client.post("/anchor", json={"router_id": "new", "hash": "cd" * 32, "timestamp": 1900000000})
+    assert response.status_code == 200
+    assert gateway.get_router_index() is index
+    assert collect(client, "limit=4")[:2] == ["new", "r000"]
+    # "gten router" (nom par défaut) < "renamed" < "router n"
+    assert collect(client, "sort=name&order=asc&limit=3")[:2] == ["new", "r000"]
+
+
+def test_external_write_rebuilds_index(gateway, client):
+    write_routers(gateway, 4)
+    index = gateway.get_router_index()
+    routers = json.loads(gateway.ROUTERS_FILE.read_text())
+    routers["r999"] = {"name": "external", "last_seen": 1999999999}
+    gateway.ROUTERS_FILE.write_text(json.dumps(routers))
+    assert collect(client, "limit=2")[0] == "r999"
+    assert gateway.get_router_index() is not index
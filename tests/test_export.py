@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Export en flux des ancrages : formats, filtres, gzip, et lecture d'un
+instantané stable pendant qu'anchors.json est réécrit.
+"""
+
+import csv
+import gzip
+import io
+import json
+
+from export import iter_anchors, csv_chunks, ANCHOR_COLUMNS
+
+
+def make_anchors(count: int) -> list:
+    return [
+        {"txid": f"tx{i:05d}", "timestamp": 1700000000 + i * 3600, "router_id": "r1" if i % 3 else "r2",
+         "slot_id": i, "slot_date": "2023-11-14", "snr_hash": "ab" * 32}
+        for i in range(count)
+    ]
+
+
+def test_ndjson_export_with_filters(gateway, client):
+    anchors = make_anchors(50)
+    gateway.save_anchors(anchors)
+    response = client.get("/api/export/anchors?router_id=r2")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines == [anchor for anchor in anchors if anchor["router_id"] == "r2"]
+
+    since, until = 1700000000 + 10 * 3600, 1700000000 + 12 * 3600
+    body = client.get(f"/api/export/anchors?since={since}&until={until}").get_data(as_text=True)
+    assert [json.loads(line)["txid"] for line in body.splitlines()] == ["tx00010", "tx00011", "tx00012"]
+
+
+def test_csv_export_gzip(gateway, client):
+    anchors = make_anchors(5)
+    gateway.save_anchors(anchors)
+    response = client.get("/api/export/anchors?format=csv", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    data = response.get_data()
+    if response.headers.get("Content-Encoding") == "gzip":
+        data = gzip.decompress(data)
+    rows = list(csv.DictReader(io.StringIO(data.decode())))
+    assert [row["txid"] for row in rows] == [anchor["txid"] for anchor in anchors]
+    assert client.get("/api/export/anchors?format=xml").status_code == 400
+
+
+def test_csv_encodes_nested_values():
+    chunks = list(csv_chunks([{"txid": "a", "slot_id": [1, 2]}], ANCHOR_COLUMNS, batch_size=1))
+    rows = list(csv.reader(io.StringIO("".join(chunks))))
+    assert rows[1][ANCHOR_COLUMNS.index("slot_id")] == "[1,2]"
+
+
+def test_export_reads_a_stable_snapshot(gateway, tmp_path):
+    path = tmp_path / "anchors.json"
+    path.write_text(json.dumps(make_anchors(5000), indent=2))
+    records = iter_anchors(path)
+    first = next(records)
+    # Réécriture atomique pendant l'export (comme save_anchors)
+    replacement = tmp_path / "anchors.json.tmp"
+    replacement.write_text(json.dumps(make_anchors(10)[::-1], indent=2))
+    replacement.replace(path)
+    rest = list(records)
+    assert [first["txid"]] + [anchor["txid"] for anchor in rest] == [f"tx{i:05d}" for i in range(5000)]
+
+
+def test_save_anchors_replaces_the_file(gateway):
+    gateway.save_anchors(make_anchors(3))
+    with open(gateway.ANCHORS_FILE, "rb") as f:
+        gateway.save_anchors(make_anchors(1000))
+        assert len(json.loads(f.read())) == 3
+    assert len(json.loads(gateway.ANCHORS_FILE.read_text())) == 1000
+    assert not [p for p in gateway.ANCHORS_FILE.parent.iterdir() if p.name.endswith(".tmp")]
+
+
+def test_missing_file_exports_nothing(tmp_path):
+    assert list(iter_anchors(tmp_path / "absent.json")) == []
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Banc de charge de la flotte : slots et ancrages déterministes, état initial
+écrit dans le répertoire de données, percentiles, et une charge de
+l'ordre de celle du banc rejouée sur le gateway de test.
+"""
+
+import sys
+import json
+
+from conftest import ROOT
+
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import fleet_load  # noqa: E402
+from fleet_load import Fleet, SLOTS_PER_DAY, seed_data, percentile  # noqa: E402
+
+
+def make_fleet(size: int = 5, tampered: float = 0.0) -> Fleet:
+    return Fleet(size, days=1, finalized=0.8, anchored=0.9, tampered=tampered, seed=42)
+
+
+def test_fleet_is_deterministic():
+    first, second = make_fleet(), make_fleet()
+    assert first.router_ids == second.router_ids == [f"bench-{i:06d}" for i in range(5)]
+    slots, anchors = first.router_slots("bench-000001")
+    assert (slots, anchors) == second.router_slots("bench-000001")
+    assert len(slots) == SLOTS_PER_DAY
+    finalized = sum(slot["finalized"] for slot in slots)
+    assert 0.6 * SLOTS_PER_DAY < finalized < SLOTS_PER_DAY
+    assert 0 < len(anchors) <= finalized
+
+
+def test_tampered_slots_differ_from_their_anchor():
+    slots, anchors = make_fleet(tampered=1.0).router_slots("bench-000000")
+    by_slot = {(anchor["slot_date"], anchor["slot_id"]): anchor["snr_hash"] for anchor in anchors}
+    assert all(slot["slot_hash"] != by_slot[(slot["date"], slot["slot"])]
+               for slot in slots if (slot["date"], slot["slot"]) in by_slot)
+
+
+def test_seed_data_json_mode(tmp_path):
+    fleet = make_fleet(3)
+    all_slots = seed_data(fleet, tmp_path, "json")
+    routers = json.loads((tmp_path / "routers.json").read_text())
+    anchors = json.loads((tmp_path / "anchors.json").read_text())
+    assert sorted(routers) == fleet.router_ids == sorted(all_slots)
+    assert {anchor["router_id"] for anchor in anchors} <= set(fleet.router_ids)
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 95) == 0.0
+
+
+def test_fleet_payloads_are_accepted(gateway, client):
+    fleet = make_fleet(3)
+    transport = fleet_load.TestClientTransport(gateway.app)
+    for router_id in fleet.router_ids:
+        slots, _ = fleet.router_slots(router_id)
+        status, body = transport.post("/anchor", fleet.payload(router_id, slots))
+        assert status == 200, body
+    assert len(json.loads(gateway.ROUTERS_FILE.read_text())) == 3
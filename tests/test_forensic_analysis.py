@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analyse forensique précalculée : plages de blocks cassés non tronquées,
+cache de l'analyse décodée (revalidé par mtime), recalcul d'une analyse
+d'une version antérieure.
+"""
+
+import hashlib
+import json
+import os
+
+import forensic_verify
+from forensic_analysis import ANALYSIS_VERSION, broken_blocks
+from forensic_verify import broken_ranges
+
+
+def make_blocks(count: int, seed: str = "a", tampered=range(0)) -> list:
+    """Chaîne valide (mode binary) ; logs_hash modifié sur les blocks tampered"""
+    blocks, prev = [], bytes(32)
+    for i in range(count):
+        logs = hashlib.sha256(f"{seed}-{i}".encode()).digest()
+        chain = hashlib.sha256(prev + logs).digest()
+        if i in tampered:
+            logs = hashlib.sha256(f"tampered-{i}".encode()).digest()
+        blocks.append({"timestamp": 1700000000 + i, "prev_hash": prev.hex(),
+                       "logs_hash": logs.hex(), "chain_hash": chain.hex(), "logs": f"ligne {i}"})
+        prev = chain
+    return blocks
+
+
+def put(gateway, forensic_id: str, blocks: list) -> None:
+    gateway.FORENSIC_STORE.put(forensic_id, "r-analysis", "periodic", 1700000000, 1700000000,
+                               {"router_id": "r-analysis", "blocks": blocks})
+
+
+def test_broken_ranges_merge_runs_and_keep_last_type():
+    anomalies = [
+        {"block_index": 2, "type": "hash_mismatch"},
+        {"block_index": 3, "type": "hash_mismatch"},
+        {"block_index": 4, "type": "chain_break"},
+        {"block_index": 4, "type": "hash_mismatch"},
+        {"block_index": 5, "type": "chain_break"},
+        {"block_index": 9, "type": "malformed"},
+    ]
+    assert broken_ranges(anomalies) == [[2, 5, "hash_mismatch"], [5, 6, "chain_break"], [9, 10, "malformed"]]
+    analysis = {"broken_ranges": broken_ranges(anomalies)}
+    assert broken_blocks(analysis, 3, 9) == {3: "hash_mismatch", 4: "hash_mismatch", 5: "chain_break"}
+    assert broken_blocks(analysis, 6, 9) == {}
+    assert broken_blocks(analysis, 0, 100)[9] == "malformed"
+
+
+def test_blocks_past_reported_anomalies_stay_broken(gateway, client, monkeypatch):
+    monkeypatch.setattr(forensic_verify, "MAX_REPORTED_ANOMALIES", 3)
+    put(gateway, "analysis-truncated", make_blocks(60, tampered=range(10, 40)))
+    analysis = gateway.FORENSIC_STORE.analysis("analysis-truncated")
+    assert analysis["anomaly_count"] == 30 and len(analysis["anomalies"]) == 3
+    assert analysis["broken_ranges"] == [[10, 40, "hash_mismatch"]]
+
+    body = client.get("/api/forensics/analysis-truncated/blocks?offset=35&limit=10").get_json()
+    assert [block["broken"] for block in body["blocks"]] == [True] * 5 + [False] * 5
+    assert body["blocks"][0]["anomaly"] == "hash_mismatch"
+
+
+def test_parsed_analysis_is_cached_per_mtime(gateway, client):
+    store = gateway.FORENSIC_STORE
+    put(gateway, "analysis-cached", make_blocks(20))
+    analysis = store.analysis("analysis-cached")
+    assert store.analysis("analysis-cached") is analysis
+
+    path = store.analysis_path(store.get_summary("analysis-cached")["blob"])
+    edited = dict(analysis, display={"start": 0, "end": 20, "message": "modifiée"})
+    path.write_text(json.dumps(edited))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert store.analysis("analysis-cached")["display"]["message"] == "modifiée"
+
+
+def test_outdated_analysis_is_recomputed(gateway, client):
+    store = gateway.FORENSIC_STORE
+    put(gateway, "analysis-old", make_blocks(12, tampered={5}))
+    path = store.analysis_path(store.get_summary("analysis-old")["blob"])
+    old = json.loads(path.read_text())
+    old["version"] = ANALYSIS_VERSION - 1
+    del old["broken_ranges"]
+    path.write_text(json.dumps(old))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    analysis = store.analysis("analysis-old")
+    assert analysis["version"] == ANALYSIS_VERSION
+    assert analysis["broken_ranges"] == [[5, 6, "hash_mismatch"]]
+    assert json.loads(path.read_text())["version"] == ANALYSIS_VERSION
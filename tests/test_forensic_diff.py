@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Diff de deux uploads forensiques : divergence de chaîne trouvée par
+dichotomie, logs_hash modifiés sans recalcul de la chaîne détectés sur le
+préfixe commun, alignement par timestamp, .lh reconstruit pour un ancien upload.
+"""
+
+import hashlib
+
+import forensic_diff
+from forensic_diff import diff_uploads
+
+
+def make_blocks(count: int, seed: str = "a", start: int = 0, fork_at=None, tampered=()) -> list:
+    """
+    Chaîne binaire des blocks start..start+count ; à partir de fork_at les logs
+    changent (la chaîne diverge) ; sur tampered seul logs_hash change
+    (chain_hash conservé, comme des logs réécrits sans recalcul).
+    """
+    blocks, prev = [], bytes(32)
+    for i in range(start + count):
+        label = f"{seed}-{i}" if fork_at is None or i < fork_at else f"fork-{i}"
+        logs = hashlib.sha256(label.encode()).digest()
+        chain = hashlib.sha256(prev + logs).digest()
+        if i >= start:
+            shown = hashlib.sha256(f"tampered-{i}".encode()).digest() if i in tampered else logs
+            blocks.append({"timestamp": 1700000000 + i, "prev_hash": prev.hex(),
+                           "logs_hash": shown.hex(), "chain_hash": chain.hex()})
+        prev = chain
+    return blocks
+
+
+def put(store, forensic_id: str, blocks: list, router_id: str = "r-diff") -> None:
+    store.put(forensic_id, router_id, "periodic", 1700000000, 1700000000, {"router_id": router_id, "blocks": blocks})
+
+
+def test_identical_uploads(gateway, client):
+    store = gateway.FORENSIC_STORE
+    put(store, "diff-same-a", make_blocks(50))
+    put(store, "diff-same-b", make_blocks(50))
+    result = diff_uploads(store, "diff-same-a", "diff-same-b")
+    assert result["identical"] and result["first_divergence"] is None
+    assert result["common_prefix"] == 50
+
+
+def test_chain_divergence(gateway, client):
+    store = gateway.FORENSIC_STORE
+    put(store, "diff-fork-a", make_blocks(200))
+    put(store, "diff-fork-b", make_blocks(200, fork_at=120))
+    result = diff_uploads(store, "diff-fork-a", "diff-fork-b", detail=True)
+    assert not result["identical"]
+    assert result["first_divergence"]["a_index"] == 120
+    assert result["first_divergence"]["cause"] == "chain_hash"
+    assert result["comparisons"] < 20
+    assert {"kind": "diverged", "a": [120, 200], "b": [120, 200]} in result["ranges"]
+    assert result["logs_differences"] == [{"a": [120, 200], "b": [120, 200]}]
+
+
+def test_logs_hash_difference_with_identical_chain(gateway, client, monkeypatch):
+    monkeypatch.setattr(forensic_diff, "DIFF_CHUNK_BLOCKS", 16)
+    store = gateway.FORENSIC_STORE
+    put(store, "diff-logs-a", make_blocks(100))
+    put(store, "diff-logs-b", make_blocks(100, tampered={40, 41, 77}))
+    result = diff_uploads(store, "diff-logs-a", "diff-logs-b")
+    assert not result["identical"]
+    assert result["first_divergence"]["cause"] == "logs_hash"
+    assert result["first_divergence"]["a_index"] == 40
+    assert result["common_prefix"] == 40
+    assert [r for r in result["ranges"] if r["kind"] == "logs_differ"] == [
+        {"kind": "logs_differ", "a": [40, 42], "b": [40, 42]},
+        {"kind": "logs_differ", "a": [77, 78], "b": [77, 78]},
+    ]
+    assert not result["logs_differ_truncated"]
+
+    monkeypatch.setattr(forensic_diff, "DIFF_LOGS_RANGES_MAX", 1)
+    result = diff_uploads(store, "diff-logs-a", "diff-logs-b")
+    assert len([r for r in result["ranges"] if r["kind"] == "logs_differ"]) == 1
+    assert result["logs_differ_truncated"]
+
+
+def test_alignment_by_timestamp_after_rotation(gateway, client):
+    store = gateway.FORENSIC_STORE
+    put(store, "diff-rot-a", make_blocks(100))
+    put(store, "diff-rot-b", make_blocks(80, start=30, tampered={50}))
+    result = diff_uploads(store, "diff-rot-a", "diff-rot-b")
+    assert result["alignment"] == {"method": "timestamp", "a_start": 30, "b_start": 0, "overlap": 70}
+    assert result["first_divergence"]["a_index"] == 50 and result["first_divergence"]["b_index"] == 20
+    assert {"kind": "only_a", "a": [0, 30]} in result["ranges"]
+    assert {"kind": "only_b", "b": [70, 80]} in result["ranges"]
+
+
+def test_logs_hashes_rebuilt_for_older_uploads(gateway, client):
+    store = gateway.FORENSIC_STORE
+    put(store, "diff-old-a", make_blocks(30))
+    put(store, "diff-old-b", make_blocks(30, tampered={7}))
+    for forensic_id in ("diff-old-a", "diff-old-b"):
+        store.sidecar_path(store.get_summary(forensic_id)["blob"], ".lh").unlink()
+    assert diff_uploads(store, "diff-old-a", "diff-old-b")["first_divergence"]["a_index"] == 7
+    assert store.logs_hash_path("diff-old-a").exists()
+
+
+def test_api_errors(gateway, client):
+    store = gateway.FORENSIC_STORE
+    put(store, "diff-api-a", make_blocks(5))
+    put(store, "diff-api-other", make_blocks(5), router_id="r-other")
+    assert client.get("/api/forensics/diff?a=diff-api-a").status_code == 400
+    assert client.get("/api/forensics/diff?a=diff-api-a&b=absent").status_code == 404
+    assert client.get("/api/forensics/diff?a=diff-api-a&b=diff-api-other").status_code == 400
+    body = client.get("/api/forensics/diff?a=diff-api-a&b=diff-api-a").get_json()
+    assert body["identical"]
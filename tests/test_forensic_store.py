@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ForensicStore : aller-retour d'un upload, index partagé entre process,
+import de l'ancien forensics.json, et comptage des références (après
+suppression de tous les uploads, y compris renvoyés sous le même
+forensic_id, blocks.db doit être vide).
+"""
+
+import sys
+import json
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from forensic_store import ForensicStore  # noqa: E402
+
+
+def make_blocks(count: int, seed: str) -> list:
+    """Chaîne valide de count blocks (mode binary)"""
+    blocks = []
+    prev = bytes(32)
+    for i in range(count):
+        logs = hashlib.sha256(f"{seed}-{i}".encode()).digest()
+        chain = hashlib.sha256(prev + logs).digest()
+        blocks.append({
+            "timestamp": 1700000000 + i,
+            "prev_hash": prev.hex(),
+            "logs_hash": logs.hex(),
+            "chain_hash": chain.hex(),
+        })
+        prev = chain
+    return blocks
+
+
+class ForensicStoreRefcountTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = ForensicStore(Path(self._tmp.name))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def put(self, forensic_id: str, received_at: int, blocks: list) -> dict:
+        data = {"router_id": "r1", "blocks": blocks}
+        return self.store.put(forensic_id, "r1", "periodic", received_at, received_at, data)
+
+    def manifests(self) -> list:
+        return list((self.store.root / "blobs").rglob("*.manifest"))
+
+    def test_put_duplicate_delete_prune_releases_all_blocks(self):
+        self.put("r1-1", 1, make_blocks(20, "a"))
+        self.put("r1-1", 1, make_blocks(20, "a"))
+        self.put("r1-2", 2, make_blocks(30, "a"))
+        self.put("r1-3", 3, make_blocks(10, "b"))
+        self.assertEqual(self.store.blocks.summary()["blocks"], 40)
+
+        self.store.delete("r1-2")
+        self.assertEqual(self.store.prune_router("r1", 0), ["r1-1", "r1-3"])
+
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(self.store.blocks.summary()["blocks"], 0)
+        self.assertEqual(self.manifests(), [])
+
+    def test_recommit_same_id_drops_superseded_blob(self):
+        self.put("r1-1", 1, make_blocks(20, "a"))
+        self.put("r1-1", 1, make_blocks(15, "b"))
+        self.assertEqual(self.store.blocks.summary()["blocks"], 15)
+        self.assertEqual(len(self.manifests()), 1)
+
+        self.store.delete("r1-1")
+        self.assertEqual(self.store.blocks.summary()["blocks"], 0)
+        self.assertEqual(self.manifests(), [])
+
+    def test_recommit_keeps_blob_shared_with_another_upload(self):
+        self.put("r1-1", 1, make_blocks(20, "a"))
+        self.put("r1-2", 1, make_blocks(20, "a"))
+        self.put("r1-1", 1, make_blocks(5, "b"))
+        self.assertEqual(list(self.store.iter_blocks("r1-2")), make_blocks(20, "a"))
+
+        self.store.prune_router("r1", 0)
+        self.assertEqual(self.store.blocks.summary()["blocks"], 0)
+
+
+class ForensicStoreBlobTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.store = ForensicStore(self.root)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_round_trip_and_summary(self):
+        blocks = make_blocks(12, "a")
+        blocks[5]["chain_hash"] = "00" * 32
+        data = {"router_id": "r1", "log_size": 4096, "blocks": blocks}
+        record = self.store.put("r1-1", "r1", "periodic", 1700000000, 1700000100, data)
+
+        self.assertEqual(record["block_count"], 12)
+        self.assertTrue(record["breach"]["detected"])
+        self.assertEqual(record["breach"]["first_breach_index"], 5)
+        self.assertEqual(self.store.load_data("r1-1"), data)
+        self.assertEqual(self.store.load_envelope("r1-1"), {"router_id": "r1", "log_size": 4096})
+        self.assertEqual(list(self.store.iter_blocks("r1-1", 3, 6)), blocks[3:6])
+        self.assertEqual(self.store.load("r1-1")["received_at"], 1700000100)
+        with self.assertRaises(KeyError):
+            self.store.load_data("absent")
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.store.put("r1-1", "r1", "periodic", 1, 1, {"router_id": "r1", "blocks": make_blocks(8, "a")})
+        second = self.store.put("r1-2", "r1", "periodic", 1, 2, {"router_id": "r1", "blocks": make_blocks(8, "a")})
+        self.assertEqual(first["blob"], second["blob"])
+        self.assertEqual(second["new_blocks"], 0)
+
+    def test_index_written_by_another_process_is_tailed(self):
+        other = ForensicStore(self.root)
+        self.assertEqual(len(other), 0)
+        self.store.put("r1-1", "r1", "periodic", 1, 10, {"router_id": "r1", "blocks": make_blocks(3, "a")})
+        self.store.put("r1-2", "r1", "periodic", 1, 20, {"router_id": "r1", "blocks": make_blocks(3, "b")})
+        self.assertEqual(other.ids(), ["r1-1", "r1-2"])
+        self.assertEqual(other.recent("r1", since=15), ["r1-2"])
+
+        self.store.delete("r1-1")
+        self.assertNotIn("r1-1", other)
+        self.assertEqual([entry["forensic_id"] for entry in other.list()], ["r1-2"])
+
+    def test_migrate_legacy(self):
+        legacy = self.root / "forensics.json"
+        legacy.write_text(json.dumps({
+            "r1-old": {"router_id": "r1", "forensic_type": "breach", "timestamp": 5, "received_at": 6,
+                       "data": {"router_id": "r1", "blocks": make_blocks(4, "a")}},
+        }))
+        self.assertEqual(self.store.migrate_legacy(legacy), 1)
+        self.assertFalse(legacy.exists())
+        self.assertTrue((self.root / "forensics.json.migrated").exists())
+        entry = self.store.load("r1-old")
+        self.assertEqual(entry["forensic_type"], "breach")
+        self.assertEqual(entry["data"]["blocks"], make_blocks(4, "a"))
+        self.assertEqual(self.store.migrate_legacy(legacy), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vérification des chaînes forensiques : anomalies détectées par mode de
+hash, résultat identique en série et en parallèle, pool de process
+réutilisé d'une vérification à l'autre (forkserver, pas de fork par upload).
+"""
+
+import hashlib
+
+import pytest
+
+import forensic_verify
+from forensic_verify import verify_blocks, start_pool, shutdown_pool
+
+
+def make_blocks(count: int, mode: str = "binary") -> list:
+    blocks, prev = [], bytes(32)
+    for i in range(count):
+        logs = hashlib.sha256(f"log-{i}".encode()).digest()
+        if mode == "hex":
+            chain = hashlib.sha256((prev.hex() + logs.hex()).encode()).digest()
+        else:
+            chain = hashlib.sha256(prev + logs).digest()
+        blocks.append({"timestamp": 1700000000 + i, "prev_hash": prev.hex(),
+                       "logs_hash": logs.hex(), "chain_hash": chain.hex()})
+        prev = chain
+    return blocks
+
+
+def kinds(report: dict) -> list:
+    return [(a["block_index"], a["type"]) for a in report["anomalies"]]
+
+
+@pytest.fixture
+def pool():
+    yield start_pool(2)
+    shutdown_pool()
+
+
+@pytest.mark.parametrize("mode", ["binary", "hex"])
+def test_valid_chain(mode):
+    report = verify_blocks(make_blocks(50, mode), mode=mode, workers=1)
+    assert report["valid"] and report["anomaly_count"] == 0 and report["block_count"] == 50
+
+
+def test_detects_each_anomaly_kind():
+    blocks = make_blocks(20)
+    blocks[5]["logs_hash"] = "00" * 32
+    blocks[10]["prev_hash"] = "11" * 32
+    blocks[15]["logs_hash"] = "zz"
+    report = verify_blocks(blocks, mode="binary", workers=1)
+    assert kinds(report) == [(5, "hash_mismatch"), (10, "chain_break"), (10, "hash_mismatch"), (15, "malformed")]
+    assert report["first_break"]["block_index"] == 5
+    assert report["anomalies"][0]["timestamp"] == 1700000005
+    # links : seuls les liens prev -> chain sont vérifiés
+    assert kinds(verify_blocks(blocks, mode="links", workers=1)) == [(10, "chain_break"), (15, "malformed")]
+    with pytest.raises(ValueError):
+        verify_blocks(blocks, mode="md5")
+
+
+def test_parallel_matches_serial_and_reuses_the_pool(monkeypatch, pool):
+    monkeypatch.setattr(forensic_verify, "VERIFY_PARALLEL_MIN", 1)
+    blocks = make_blocks(300)
+    blocks[99]["chain_hash"] = "22" * 32
+    blocks[150]["prev_hash"] = "33" * 32
+
+    serial = verify_blocks(blocks, mode="binary", workers=1)
+    parallel = verify_blocks(blocks, mode="binary", workers=2, segment_size=50)
+    assert parallel["workers"] == 2 and len(parallel["segments"]) == 6
+    assert kinds(parallel) == kinds(serial) == [
+        (99, "hash_mismatch"), (100, "chain_break"), (150, "chain_break"), (150, "hash_mismatch")
+    ]
+
+    verify_blocks(blocks, mode="binary", workers=2, segment_size=50)
+    assert start_pool(2) is pool
+    if "forkserver" in forensic_verify.multiprocessing.get_all_start_methods():
+        assert pool._mp_context.get_start_method() == "forkserver"
+
+
+def test_broken_pool_falls_back_to_serial(monkeypatch, pool):
+    monkeypatch.setattr(forensic_verify, "VERIFY_PARALLEL_MIN", 1)
+
+    def broken(*args, **kwargs):
+        raise forensic_verify.BrokenProcessPool("worker tué")
+
+    monkeypatch.setattr(pool, "submit", broken)
+    report = verify_blocks(make_blocks(100), mode="binary", workers=2, segment_size=10)
+    assert report["valid"] and report["workers"] == 1
+    assert start_pool(2) is not pool
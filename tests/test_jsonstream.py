@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lecture incrémentale de JSON : valeurs coupées entre deux morceaux, erreurs
+de syntaxe détectées sans lire le reste du flux, limite de taille.
+"""
+
+import io
+import sys
+import json
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jsonstream import JSONStreamReader, PayloadTooLarge  # noqa: E402
+
+
+def blocks(count: int) -> list:
+    return [{"timestamp": 1700000000 + i, "chain_hash": f"{i:064x}", "ok": True, "note": "éé"} for i in range(count)]
+
+
+class JSONStreamReaderTest(unittest.TestCase):
+    def test_small_chunks_roundtrip(self):
+        data = {"router_id": "r1", "blocks": blocks(50), "n": -1.5e3, "empty": [], "flag": False}
+        raw = json.dumps(data, ensure_ascii=False).encode()
+        for chunk_size in (1, 3, 7, 64):
+            reader = JSONStreamReader(io.BytesIO(raw), chunk_size=chunk_size)
+            result = {}
+            for key in reader.iter_object():
+                if key == "blocks":
+                    result[key] = list(reader.iter_array())
+                else:
+                    result[key] = reader.read_value()
+            self.assertEqual(result, data)
+
+    def test_number_at_chunk_boundary_is_not_cut(self):
+        raw = b"[12345678, -1.5e3, 1.23456e-05, 1000.0, 9]"
+        for chunk_size in range(1, 16):
+            reader = JSONStreamReader(io.BytesIO(raw), chunk_size=chunk_size)
+            self.assertEqual(list(reader.iter_array()), json.loads(raw))
+
+    def test_syntax_error_early_in_large_array_fails_fast(self):
+        items = [json.dumps(block) for block in blocks(20000)]
+        items[3] = '{"timestamp": 1, "chain_hash": oops}'
+        raw = ("[" + ",".join(items) + "]").encode()
+        reader = JSONStreamReader(io.BytesIO(raw), chunk_size=4096)
+        with self.assertRaises(ValueError) as ctx:
+            list(reader.iter_array())
+        self.assertNotIsInstance(ctx.exception, PayloadTooLarge)
+        self.assertLess(reader.bytes_read, 3 * 4096)
+        self.assertLess(reader.bytes_read, len(raw) // 100)
+
+    def test_truncated_stream_raises(self):
+        raw = json.dumps(blocks(10)).encode()[:-40]
+        reader = JSONStreamReader(io.BytesIO(raw), chunk_size=64)
+        with self.assertRaises(ValueError):
+            list(reader.iter_array())
+
+    def test_unterminated_string_spanning_chunks_is_read(self):
+        value = "x" * 10000
+        reader = JSONStreamReader(io.BytesIO(json.dumps([value, 1]).encode()), chunk_size=16)
+        self.assertEqual(list(reader.iter_array()), [value, 1])
+
+    def test_max_bytes(self):
+        raw = json.dumps(blocks(1000)).encode()
+        reader = JSONStreamReader(io.BytesIO(raw), chunk_size=1024, max_bytes=4096)
+        with self.assertRaises(PayloadTooLarge):
+            list(reader.iter_array())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Journalisation : limitation de débit par gabarit (INFO/DEBUG seulement),
+format JSON, file bornée qui abandonne au lieu d'attendre.
+"""
+
+import json
+import logging
+import queue
+
+from logs import RateLimitFilter, JsonFormatter, _DroppingQueueHandler, LOG_RECORDS
+
+
+def make_record(msg: str, *args, level: int = logging.INFO, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("snr.test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_info_is_limited_per_template(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("logs.time.monotonic", lambda: clock[0])
+    limiter = RateLimitFilter(burst=3, window=10)
+    passed = [limiter.filter(make_record("📡 Données reçues de %s", f"r{i}")) for i in range(5)]
+    assert passed == [True, True, True, False, False]
+    assert limiter.filter(make_record("autre gabarit"))
+
+    clock[0] += 10
+    record = make_record("📡 Données reçues de %s", "r9")
+    assert limiter.filter(record)
+    assert record.suppressed == 2
+
+
+def test_warnings_and_opt_out_are_never_limited():
+    limiter = RateLimitFilter(burst=1, window=60)
+    breaches = [make_record("🚨 BREACH: %s - %d slots compromis", f"router-{i}", i, level=logging.WARNING)
+                for i in range(10)]
+    assert all(limiter.filter(record) for record in breaches)
+    assert all(limiter.filter(make_record("❌ Erreur %s", i, level=logging.ERROR)) for i in range(5))
+    assert all(limiter.filter(make_record("info", rate_limit=False)) for _ in range(5))
+
+
+def test_json_formatter_includes_extra_fields():
+    record = make_record("🔗 Ancrage %s", "tx1", router_id="r1", slot_id=4)
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["msg"] == "🔗 Ancrage tx1"
+    assert entry["level"] == "INFO" and entry["logger"] == "snr.test"
+    assert entry["router_id"] == "r1" and entry["slot_id"] == 4
+
+
+def test_full_queue_drops_without_blocking():
+    handler = _DroppingQueueHandler(queue.Queue(maxsize=1))
+    dropped = LOG_RECORDS.value(result="dropped")
+    handler.handle(make_record("a"))
+    handler.handle(make_record("b"))
+    assert handler.queue.qsize() == 1
+    assert LOG_RECORDS.value(result="dropped") == dropped + 1
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/metrics : format texte Prometheus, instruments, label de route par règle
+Flask, et collecteur forensique (totaux tenus par le BlockStore).
+"""
+
+from metrics import Counter, Histogram, CONTENT_TYPE
+
+
+def sample(text: str, line_prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{line_prefix} absent")
+
+
+def test_instruments():
+    counter = Counter("snr_test_total", "aide", ("kind",))
+    counter.inc(kind="a")
+    counter.inc(2, kind="a")
+    assert counter.value(kind="a") == 3
+    histogram = Histogram("snr_test_seconds", "aide", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(5)
+    (_, _, _, histogram_samples), = histogram.collect()
+    samples = {(suffix, tuple(labels.items())): value for suffix, labels, value in histogram_samples}
+    assert samples[("_bucket", (("le", "0.1"),))] == 1
+    assert samples[("_bucket", (("le", "+Inf"),))] == 2
+    assert samples[("_count", ())] == 2
+
+
+def test_scrape_labels_routes_by_rule(gateway, client):
+    # Le middleware compte la requête à la fermeture de la réponse
+    client.get("/api/security-status/r-metrics").close()
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert 'route="/api/security-status/<router_id>"' in text
+    assert "r-metrics" not in text
+
+
+def test_forensic_collector_follows_totals(gateway, client):
+    blocks = gateway.FORENSIC_STORE.blocks
+    before = sample(client.get("/metrics").get_data(as_text=True), "snr_forensic_blocks")
+    keys, _ = blocks.add_batch([(None, b'{"metrics": 1}'), (None, b'{"metrics": 2}')])
+    assert sample(client.get("/metrics").get_data(as_text=True), "snr_forensic_blocks") == before + 2
+    blocks.release(keys)
+    assert sample(client.get("/metrics").get_data(as_text=True), "snr_forensic_blocks") == before
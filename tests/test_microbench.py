@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmarks : calibrage de la mesure, comparaison aux baselines (seuil
+global ou propre au cas) et cohérence des cas avec baselines.json.
+"""
+
+import sys
+import json
+
+from conftest import ROOT
+
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from microbench import measure, compare, build_cases, Workspace, make_chain, BASELINE_FILE  # noqa: E402
+
+
+def test_measure_calibrates_the_number_of_calls():
+    calls = []
+    result = measure(lambda: calls.append(1), repeat=3, min_time=0.01)
+    assert result["number"] > 1 and result["repeat"] == 3
+    # échauffement + calibrage + repeat - 1 échantillons supplémentaires
+    assert len(calls) >= 1 + result["number"] * 3
+    assert 0 < result["min_seconds"] <= result["seconds"]
+
+
+def test_compare_against_baseline():
+    baseline = {"cases": {
+        "lent": {"seconds": 1.0},
+        "rapide": {"seconds": 1.0},
+        "stable": {"seconds": 1.0},
+        "bruité": {"seconds": 1.0, "threshold": 1.0},
+    }}
+    results = {name: {"seconds": seconds} for name, seconds in
+               (("lent", 1.5), ("rapide", 0.5), ("stable", 1.1), ("bruité", 1.9), ("nouveau", 1.0))}
+    assert compare(results, baseline, threshold=0.25) == ["lent"]
+    assert {name: result["status"] for name, result in results.items()} == {
+        "lent": "regression", "rapide": "improved", "stable": "ok", "bruité": "ok", "nouveau": "new"}
+    assert results["lent"]["ratio"] == 1.5
+
+
+def test_make_chain_is_valid():
+    from forensic_verify import verify_blocks
+    assert verify_blocks(make_chain(50))["valid"]
+
+
+def test_every_case_has_a_baseline(gateway, tmp_path):
+    names = [case.name for case in build_cases(gateway, Workspace(gateway, tmp_path), quick=False)]
+    assert len(names) == len(set(names))
+    assert set(names) <= set(json.loads(BASELINE_FILE.read_text())["cases"])
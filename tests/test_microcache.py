@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-cache : TTL, coalescence des requêtes concurrentes, invalidation par
+clé ; une écriture sur un routeur n'invalide que son statut de sécurité.
+"""
+
+import threading
+import time
+
+from microcache import MicroCache
+
+
+def test_hit_until_ttl_expires():
+    cache = MicroCache("t", ttl=0.05)
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+    assert cache.get_or_compute("k", compute) == 1
+    assert cache.get_or_compute("k", compute) == 1
+    time.sleep(0.06)
+    assert cache.get_or_compute("k", compute) == 2
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 2
+
+
+def test_concurrent_requests_share_one_computation():
+    cache = MicroCache("t", ttl=10)
+    started, release, calls = threading.Event(), threading.Event(), []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "résultat"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+                 for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    while cache.stats["coalesced"] < 5:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert results == ["résultat"] * 6 and len(calls) == 1
+
+
+def test_invalidate_key_keeps_other_entries():
+    cache = MicroCache("t", ttl=10)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 1)
+    cache.invalidate("a")
+    assert cache.get_or_compute("a", lambda: 2) == 2
+    assert cache.get_or_compute("b", lambda: 2) == 1
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_result_computed_across_an_invalidation_is_not_stored():
+    cache = MicroCache("t", ttl=10)
+
+    def compute():
+        cache.invalidate("a")
+        return "ancien"
+
+    assert cache.get_or_compute("a", compute) == "ancien"
+    assert cache.get_or_compute("a", lambda: "nouveau") == "nouveau"
+
+
+def test_anchor_invalidates_only_that_router(gateway, client):
+    for router_id in ("r1", "r2"):
+        client.post("/anchor", json={"router_id": router_id, "hash": "ab" * 32})
+    assert client.get("/api/security-status/r1").get_json()["local_hash"] == "ab" * 32
+    client.get("/api/security-status/r2")
+    cache = gateway.SECURITY_STATUS_CACHE
+    hits = cache.stats["hits"]
+
+    client.post("/anchor", json={"router_id": "r1", "hash": "cd" * 32})
+    assert client.get("/api/security-status/r1").get_json()["local_hash"] == "cd" * 32
+    assert cache.stats["hits"] == hits
+    client.get("/api/security-status/r2")
+    assert cache.stats["hits"] == hits + 1
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profilage à la demande : piles collapsed du profileur par échantillonnage,
+différence entre snapshots tracemalloc, taille des stores, et endpoints
+/admin protégés par le code admin.
+"""
+
+import threading
+
+import pytest
+
+from profiling import SamplingProfiler, ProfilerBusy, MemoryTracker, deep_sizeof
+
+
+def busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler_collects_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="travail")
+    worker.start()
+    profiler = SamplingProfiler()
+    try:
+        profiler.start(0.3, interval=0.005)
+        with pytest.raises(ProfilerBusy):
+            profiler.start(1)
+        profiler.wait()
+    finally:
+        stop.set()
+        worker.join()
+    assert not profiler.running and profiler.samples > 5
+    lines = profiler.collapsed().splitlines()
+    assert all(int(line.rsplit(" ", 1)[1]) >= 1 for line in lines)
+    assert any(line.startswith("travail;") and "test_profiling.py:busy_loop" in line for line in lines)
+
+
+def test_memory_diff_finds_the_allocating_line():
+    tracker = MemoryTracker(frames=1, max_snapshots=2)
+    try:
+        tracker.snapshot("avant")
+        retained = [bytes(1000) for _ in range(2000)]  # noqa: F841
+        tracker.snapshot("après")
+        diff = tracker.diff("avant", "après", top=3)
+        assert diff["size_diff_bytes"] > 1_000_000
+        assert diff["top"][0]["where"].startswith(__file__)
+        with pytest.raises(KeyError):
+            tracker.diff("avant", "absent")
+        tracker.snapshot("troisième")
+        assert [s["name"] for s in tracker.list()] == ["après", "troisième"]
+    finally:
+        tracker.stop()
+
+
+def test_deep_sizeof_counts_shared_objects_once():
+    shared = "x" * 10000
+    size, objects, truncated = deep_sizeof({"a": shared, "b": shared})
+    assert 10000 < size < 20000 and not truncated
+    assert deep_sizeof([[i] for i in range(1000)], max_objects=100)[2]
+
+
+def test_admin_endpoints(gateway, client):
+    assert client.get("/admin/stores").status_code == 403
+    headers = {"X-Admin-Code": gateway.ADMIN_CODE}
+    stores = client.get("/admin/stores", headers=headers).get_json()["stores"]
+    assert {"anchor_index", "forensic_requests", "slot_coverage"} <= set(stores)
+    assert all("bytes" in size for size in stores.values())
+
+    response = client.post("/admin/profile/start", json={"seconds": 0.1, "interval_ms": 5, "wait": True},
+                           headers=headers)
+    assert response.status_code == 200 and int(response.headers["X-Profile-Samples"]) > 0
+    assert client.post("/admin/profile/start", json={"seconds": "abc"}, headers=headers).status_code == 400
+
+    client.post("/admin/memory/snapshot", json={"name": "a"}, headers=headers)
+    client.post("/admin/memory/snapshot", json={"name": "b"}, headers=headers)
+    assert client.get("/admin/memory/diff?before=a&after=b", headers=headers).status_code == 200
+    assert client.get("/admin/memory/diff?before=a&after=z", headers=headers).status_code == 404
+    assert client.get("/admin/memory/diff?before=a&after=b&key=x", headers=headers).status_code == 400
+    client.post("/admin/memory/stop", headers=headers)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Canal des requêtes forensiques : lectures servies depuis la mémoire,
+écritures d'un autre process vues après RELOAD_INTERVAL, long-poll réveillé
+par une écriture ; expiration des entrées (tas ordonné par expires_at) et
+borne max_entries.
+"""
+
+import json
+import threading
+import time
+
+import request_channel
+from request_channel import RequestChannel
+
+
+def test_reads_are_served_from_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(request_channel, "RELOAD_INTERVAL", 3600)
+    channel = RequestChannel(tmp_path / "requests.json", "test")
+    channel.set("r1", {"status": "pending"})
+    assert json.loads((tmp_path / "requests.json").read_text())["r1"]["status"] == "pending"
+
+    calls = []
+    monkeypatch.setattr(channel, "_file_signature", lambda: calls.append(1))
+    for _ in range(100):
+        assert channel.get("r1") == {"status": "pending"}
+    assert calls == []
+
+
+def test_writes_from_another_process_are_reloaded(tmp_path, monkeypatch):
+    monkeypatch.setattr(request_channel, "RELOAD_INTERVAL", 0)
+    reader = RequestChannel(tmp_path / "requests.json", "lecteur")
+    writer = RequestChannel(tmp_path / "requests.json", "écrivain")
+    assert reader.get("r1") is None
+    writer.set("r1", {"status": "pending"})
+    assert reader.get("r1") == {"status": "pending"}
+    writer.pop("r1")
+    assert reader.get("r1") is None
+
+
+def test_long_poll_wakes_on_write(tmp_path):
+    channel = RequestChannel(tmp_path / "requests.json", "test")
+    pending = lambda value: value.get("status") == "pending"
+    timer = threading.Timer(0.05, channel.set, ("r1", {"status": "pending"}))
+    started = time.monotonic()
+    timer.start()
+    assert channel.wait_for("r1", pending, timeout=5) == {"status": "pending"}
+    assert time.monotonic() - started < 1
+    assert channel.wait_for("r2", pending, timeout=0.05) is None
+
+
+def test_router_poll_with_wait(gateway, client):
+    password = gateway.FORENSIC_AGENT_PASSWORD
+    assert client.get("/api/forensic-request/r-poll?wait=0.05").get_json() == {"has_request": False}
+    timer = threading.Timer(0.05, lambda: gateway.app.test_client().post(
+        "/api/forensic-request/r-poll", json={"agent_password": password}))
+    timer.start()
+    body = client.get("/api/forensic-request/r-poll?wait=5").get_json()
+    timer.join()
+    assert body["has_request"] and body["request_id"].startswith("FR-r-poll-")
+    assert client.get("/api/forensic-request/r-poll?wait=abc").status_code == 400
+    client.delete("/api/forensic-request/r-poll")
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    clock = [1700000000.0]
+    monkeypatch.setattr("request_channel.time.time", lambda: clock[0])
+    channel = RequestChannel(tmp_path / "requests.json", "test", ttl=60)
+    channel.set("r1", {"status": "pending"})
+    channel.set("r2", {"status": "pending"})
+    clock[0] += 30
+    # Remplacer r1 repousse son expiration : l'ancienne ligne du tas est ignorée
+    channel.set("r1", {"status": "pending"})
+    assert channel.get("r1")["expires_at"] == 1700000090
+
+    clock[0] += 45
+    assert channel.get("r1") is not None
+    assert channel.get("r2") is None
+    assert channel.evictions == 1
+    assert "r2" not in json.loads((tmp_path / "requests.json").read_text())
+
+
+def test_max_entries_evicts_soonest_expiring(tmp_path):
+    channel = RequestChannel(tmp_path / "requests.json", "test", ttl=3600, max_entries=2)
+    now = int(time.time())
+    channel.set("a", {"expires_at": now + 300})
+    channel.set("b", {"expires_at": now + 100})
+    channel.set("c", {"expires_at": now + 200})
+    assert sorted(channel.items()) == ["a", "c"]
+    assert channel.evictions == 1
+
+
+def test_legacy_entries_get_an_expiry_on_load(tmp_path):
+    path = tmp_path / "requests.json"
+    old = int(time.time()) - 7200
+    path.write_text(json.dumps({"r-old": {"status": "pending", "created_at": old},
+                                "r-new": {"status": "pending", "created_at": int(time.time())}}))
+    channel = RequestChannel(path, "test", ttl=3600)
+    assert list(channel.items()) == ["r-new"]
+    assert channel.get("r-new")["expires_at"] > time.time()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bitmaps de couverture des slots : suites de trous, file des slots à ancrer,
+expiration hors de la fenêtre d'ancrage, et cache de mise à jour revalidé
+après un reset fait par un autre process.
+"""
+
+import sqlite3
+import time
+from datetime import datetime, timezone, timedelta
+
+from slot_coverage import CoverageStore, gap_runs, COVERAGE_PENDING_DAYS
+
+
+def day_string(days_ago: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).strftime("%Y-%m-%d")
+
+
+def finalized(slot_date: str, *slots: int) -> list:
+    return [{"date": slot_date, "slot": slot, "finalized": True, "slot_hash": "ab" * 32} for slot in slots]
+
+
+def test_gap_runs():
+    assert gap_runs(0) == []
+    assert gap_runs(0b1110011) == [(0, 2), (4, 3)]
+    assert gap_runs(1 << 143) == [(143, 1)]
+
+
+def test_unanchored_queue_and_skipped_updates(tmp_path):
+    store = CoverageStore(tmp_path / "coverage.db")
+    today = day_string(0)
+    assert store.record_report("r1", finalized(today, 3, 4, 5)) == 1
+    assert store.unanchored() == [("r1", today, 3), ("r1", today, 4), ("r1", today, 5)]
+    store.mark_anchored("r1", today, 4)
+    assert store.unanchored("r1") == [("r1", today, 3), ("r1", today, 5)]
+    assert store.pending_count() == 2
+
+    skipped = store.stats["skipped"]
+    assert store.record_report("r1", finalized(today, 3, 5)) == 0
+    assert store.stats["skipped"] == skipped + 1
+
+
+def test_reset_by_another_process_invalidates_the_cache(tmp_path):
+    worker_a = CoverageStore(tmp_path / "coverage.db")
+    worker_b = CoverageStore(tmp_path / "coverage.db")
+    today = day_string(0)
+    worker_a.record_report("r1", finalized(today, 7))
+    worker_b.clear()
+    assert worker_a.is_empty()
+    # Même envoi : le cache de worker_a date d'avant le reset, la ligne doit être réécrite
+    assert worker_a.record_report("r1", finalized(today, 7)) == 1
+    assert worker_b.unanchored() == [("r1", today, 7)]
+
+
+def test_slots_outside_the_window_expire(tmp_path):
+    store = CoverageStore(tmp_path / "coverage.db")
+    old, today = day_string(COVERAGE_PENDING_DAYS + 1), day_string(0)
+    store.record_report("r1", finalized(old, 1, 2) + finalized(today, 9))
+    store.mark_anchored("r1", old, 2)
+
+    assert store.expire() == 1
+    assert store.unanchored() == [("r1", today, 9)]
+    assert store.pending_count() == 1
+    assert store.expire() == 0
+
+    report = store.gaps("r1", old, old)
+    assert report["days"][0]["expired"] == 1
+    assert report["missing"]["unanchored"] == 1
+    # Un ancrage tardif reste possible : le slot n'est plus un trou
+    store.mark_anchored("r1", old, 1)
+    assert store.gaps("r1", old, old)["missing"]["unanchored"] == 0
+
+
+def test_database_without_expired_column_is_migrated(tmp_path):
+    path = tmp_path / "coverage.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE slot_coverage (router_id TEXT NOT NULL, day INTEGER NOT NULL, "
+                     "reported BLOB NOT NULL, finalized BLOB NOT NULL, anchored BLOB NOT NULL, "
+                     "pending INTEGER NOT NULL, PRIMARY KEY (router_id, day)) WITHOUT ROWID")
+        bit = (1 << 5).to_bytes(18, "little")
+        conn.execute("INSERT INTO slot_coverage VALUES ('r1', ?, ?, ?, ?, 1)",
+                     (int(time.time() // 86400), bit, bit, bytes(18)))
+    store = CoverageStore(path)
+    assert store.unanchored() == [("r1", day_string(0), 5)]
+
+
+def test_sweep_expires_old_slots(gateway, client):
+    old = day_string(COVERAGE_PENDING_DAYS + 3)
+    gateway.SLOT_COVERAGE.record_report("r-old", finalized(old, 10, 11))
+    assert gateway.anchor_pending_slots() == (0, 0)
+    assert gateway.SLOT_COVERAGE.unanchored("r-old") == []
+    assert gateway.SLOT_COVERAGE.pending_count() == 0
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Traçage : en-tête traceparent, spans imbriquées et en erreur, trace
+déterministe d'un slot, suivi des confirmations (une tx bloquée ne gèle pas
+les suivantes) et export NDJSON au format OTLP.
+"""
+
+import json
+import time
+
+import pytest
+from flask import Flask
+
+import tracing
+from tracing import (span, current_span, parse_traceparent, slot_trace_id, slot_end,
+                     traced_request, SlotTracker, SpanExporter)
+
+
+def test_parse_traceparent():
+    trace_id, span_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    assert parse_traceparent(f"00-{trace_id}-{span_id}-01") == (trace_id, span_id)
+    for header in (None, "", "00-abc-def-01", f"00-{'0' * 32}-{span_id}-01", f"00-{'z' * 32}-{span_id}-01"):
+        assert parse_traceparent(header) is None
+
+
+def test_nested_spans_and_errors():
+    with span("parent", router_id="r1") as parent:
+        with span("enfant") as child:
+            assert current_span() is child
+        assert current_span() is parent
+    assert child.trace_id == parent.trace_id and child.parent_id == parent.span_id
+    assert current_span() is None
+
+    with pytest.raises(ValueError):
+        with span("échec") as failed:
+            raise ValueError("boom")
+    assert failed.error == "ValueError: boom"
+    assert failed.to_otlp()["status"] == {"code": 2, "message": "ValueError: boom"}
+
+
+def test_slot_trace_is_deterministic():
+    assert slot_trace_id("r1", "2026-01-01", 5) == slot_trace_id("r1", "2026-01-01", 5)
+    assert slot_trace_id("r1", "2026-01-01", 5) != slot_trace_id("r1", "2026-01-01", 6)
+    assert slot_end("2026-01-01", 0) - slot_end("2026-01-01", 143) == -143 * 600
+    assert slot_end("demain", 0) is None
+
+
+def test_traced_request_joins_the_caller_trace():
+    app = Flask(__name__)
+    seen = []
+
+    @app.route("/anchor", methods=["POST"])
+    @traced_request("anchor.request")
+    def anchor():
+        seen.append(current_span())
+        return {}
+
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    app.test_client().post("/anchor", headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+    assert seen[0].trace_id == trace_id and seen[0].parent_id == "00f067aa0ba902b7"
+    assert seen[0].attributes["route"] == "/anchor"
+
+
+def test_confirmations_skip_a_stuck_transaction(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(tracing, "record_span", lambda name, trace_id, *args, **kw: recorded.append((name, trace_id)))
+    tracker = SlotTracker()
+    tracker.ingested("r1", [{"date": "2026-01-01", "slot": 1}, {"date": "2026-01-01", "slot": 2}])
+    for slot, txid in ((1, "tx-bloquée"), (2, "tx-ok")):
+        tracker.scheduled("r1", "2026-01-01", slot)
+        tracker.broadcast("r1", "2026-01-01", slot, txid, 0.1, 0.01)
+
+    statuses = {"tx-bloquée": {"confirmations": 0}, "tx-ok": {"confirmations": 1, "blockheight": 10}}
+    assert tracker.check_confirmations(statuses.get, batch=1) == 0
+    # La tx bloquée est repassée en fin de file : le passage suivant confirme l'autre
+    assert tracker.check_confirmations(statuses.get, batch=1) == 1
+    assert tracker.pending_confirmations() == 1
+    assert ("slot.confirm", slot_trace_id("r1", "2026-01-01", 2)) in recorded
+    assert [name for name, _ in recorded].count("slot.queue") == 2
+
+    assert tracker.check_confirmations(statuses.get, max_age=-1) == 0
+    assert tracker.pending_confirmations() == 0
+
+
+def test_exporter_writes_otlp_ndjson(tmp_path):
+    path = tmp_path / "spans.ndjson"
+    exporter = SpanExporter(str(path))
+    with span("export.test", router_id="r1") as exported:
+        pass
+    exporter.submit(exported)
+    deadline = time.monotonic() + 5
+    while not path.exists() or not path.read_text():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    (line,) = path.read_text().splitlines()
+    entry = json.loads(line)
+    assert entry["name"] == "export.test" and entry["spanId"] == exported.span_id
+    assert {"key": "router_id", "value": {"stringValue": "r1"}} in entry["attributes"]
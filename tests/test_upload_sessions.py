@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Uploads reprenables : ajout à l'offset courant uniquement (409 sinon avec
+l'offset réel), reprise après coupure, taille annoncée et sha256 vérifiés
+au commit, sessions inactives expirées.
+"""
+
+import io
+import os
+import json
+import time
+import hashlib
+
+import pytest
+
+from upload_sessions import UploadSessionStore, UploadError, OffsetMismatch
+
+
+def test_append_at_current_offset_only(tmp_path):
+    store = UploadSessionStore(tmp_path, max_bytes=1000)
+    upload_id = store.begin(router_id="r1", total_size=10)["upload_id"]
+    assert store.append(upload_id, 0, io.BytesIO(b"01234")) == 5
+    with pytest.raises(OffsetMismatch) as excinfo:
+        store.append(upload_id, 3, io.BytesIO(b"xx"))
+    assert excinfo.value.expected == 5 and excinfo.value.status == 409
+    assert store.append(upload_id, 5, io.BytesIO(b"56789")) == 10
+    assert store.status(upload_id)["offset"] == 10
+
+
+def test_size_limits(tmp_path):
+    store = UploadSessionStore(tmp_path, max_bytes=100)
+    with pytest.raises(UploadError) as excinfo:
+        store.begin(total_size=101)
+    assert excinfo.value.status == 413
+
+    upload_id = store.begin(total_size=4)["upload_id"]
+    with pytest.raises(UploadError):
+        store.append(upload_id, 0, io.BytesIO(b"012345"))
+    # Le morceau refusé est annulé : l'offset reste cohérent
+    assert store.status(upload_id)["offset"] == 0
+
+
+def test_verify_checks_completeness_and_digest(tmp_path):
+    store = UploadSessionStore(tmp_path, max_bytes=100)
+    body = b'{"router_id": "r1"}'
+    upload_id = store.begin(total_size=len(body))["upload_id"]
+    store.append(upload_id, 0, io.BytesIO(body[:5]))
+    with pytest.raises(UploadError) as excinfo:
+        store.verify(upload_id, hashlib.sha256(body).hexdigest())
+    assert excinfo.value.status == 409
+
+    store.append(upload_id, 5, io.BytesIO(body[5:]))
+    with pytest.raises(UploadError) as excinfo:
+        store.verify(upload_id, "00" * 32)
+    assert excinfo.value.status == 422
+    assert store.verify(upload_id, hashlib.sha256(body).hexdigest().upper())["offset"] == len(body)
+
+
+def test_unknown_ids_and_expiry(tmp_path):
+    store = UploadSessionStore(tmp_path, max_bytes=100, ttl=60)
+    for upload_id in ("absent0", "../etc"):
+        with pytest.raises(UploadError) as excinfo:
+            store.status(upload_id)
+        assert excinfo.value.status == 404
+
+    upload_id = store.begin()["upload_id"]
+    old = time.time() - 120
+    os.utime(tmp_path / upload_id / "meta.json", (old, old))
+    assert store.expire() == 1
+    with pytest.raises(UploadError):
+        store.status(upload_id)
+
+
+def test_resumed_upload_is_ingested(gateway, client):
+    body = json.dumps({"router_id": "r-up", "forensic_type": "periodic", "timestamp": 1700000500,
+                       "blocks": [{"timestamp": 1700000000 + i, "logs_hash": "ab" * 32} for i in range(20)]}).encode()
+    digest = hashlib.sha256(body).hexdigest()
+    response = client.post("/forensics/uploads", json={"router_id": "r-up", "total_size": len(body), "sha256": digest})
+    assert response.status_code == 201
+    url = response.get_json()["upload_url"]
+
+    assert client.patch(url, data=body[:100], headers={"Upload-Offset": "0"}).headers["Upload-Offset"] == "100"
+    # Reprise avec un offset périmé : 409 et offset réel
+    stale = client.patch(url, data=body[:100], headers={"Upload-Offset": "0"})
+    assert stale.status_code == 409 and stale.get_json()["offset"] == 100
+    assert client.get(url).headers["Upload-Offset"] == "100"
+    client.patch(url, data=body[100:], headers={"Upload-Offset": "100"})
+
+    result = client.post(url + "/commit", json={})
+    assert result.status_code == 200
+    assert result.get_json()["forensic_id"] == "r-up-1700000500"
+    assert gateway.FORENSIC_STORE.get_summary("r-up-1700000500")["block_count"] == 20
+    assert client.get(url).status_code == 404
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Traçage de bout en bout d'un slot : finalisation sur le routeur, ingestion
+(/anchor), file d'auto-ancrage, send_hash_to_bsv (UTXOs, signature,
+diffusion), persistance, confirmation on-chain.
+
+- span(name, **attributs) : context manager ; le parent est la span
+  courante (contextvars, suit le thread ou la requête) ; une exception
+  marque la span en erreur
+- slot_trace_id(router_id, date, slot) : identifiant de trace déterministe ;
+  toutes les étapes d'un slot (requêtes /anchor, passage d'auto-ancrage
+  des minutes plus tard, confirmation) tombent dans la même trace sans rien
+  persister, même après un redémarrage
+- SlotTracker : horodatage des étapes d'un slot (vu à l'ingestion, pris par
+  l'auto-ancrage, diffusé, confirmé) ; chaque étape émet une span
+  rétroactive et alimente snr_slot_stage_seconds{stage} sur /metrics
+- export (thread dédié, file bornée, jamais sur le chemin des requêtes) :
+  TRACE_FILE (NDJSON, une span par ligne au format OTLP JSON) et/ou
+  TRACE_OTLP_URL (POST OTLP/HTTP JSON par lots, ex: collecteur
+  OpenTelemetry ou `python3 tracing.py collect`)
+
+Toutes les spans alimentent snr_trace_span_seconds{name}, même sans export.
+
+Collecteur de remplacement (écrit les spans reçues en NDJSON) et résumé :
+    python3 tracing.py collect [--port 4318] [-o spans.ndjson]
+    python3 tracing.py summary spans.ndjson
+
+Exporte :
+- span(name, trace_id=None, **attributes), record_span(...), current_span()
+- traced_request(name) : décorateur de vue Flask (racine ou suite d'un traceparent W3C)
+- parse_traceparent(header), slot_trace_id(router_id, date, slot), slot_end(date, slot)
+- SlotTracker, SLOT_TRACKER, SpanExporter, EXPORTER
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import hashlib
+import argparse
+import itertools
+import functools
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from metrics import Counter, Histogram, register_collector
+from logs import get_logger
+
+log = get_logger("tracing")
+
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+TRACE_OTLP_URL = os.getenv("TRACE_OTLP_URL", "")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "snr-gateway")
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+TRACE_MAX_TRACKED = int(os.getenv("TRACE_MAX_TRACKED", "200000"))
+# Tx interrogées par passage de confirmation, et durée max de suivi d'une tx non confirmée
+TRACE_CONFIRM_BATCH = int(os.getenv("TRACE_CONFIRM_BATCH", "20"))
+TRACE_CONFIRM_MAX_AGE = int(os.getenv("TRACE_CONFIRM_MAX_AGE", str(24 * 3600)))
+
+SLOT_SECONDS = 600
+
+SPAN_SECONDS = Histogram("snr_trace_span_seconds", "Durée des spans de traçage par nom", ("name",))
+SLOT_STAGE_SECONDS = Histogram(
+    "snr_slot_stage_seconds",
+    "Retard d'un slot par étape (ingest: finalisation -> reçu, queue: reçu -> pris par l'auto-ancrage, "
+    "send: diffusion BSV, persist: sauvegarde, confirm: diffusé -> confirmé, total: finalisation -> confirmé)",
+    ("stage",),
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200, 14400, 43200, 86400),
+)
+SPANS_EXPORTED = Counter("snr_trace_spans_total", "Spans exportées (ou perdues file pleine / erreur d'export)",
+                         ("result",))
+
+_current: contextvars.ContextVar = contextvars.ContextVar("snr_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def slot_trace_id(router_id: str, date: str, slot) -> str:
+    return hashlib.sha256(f"slot|{router_id}|{date}|{slot}".encode()).hexdigest()[:32]
+
+
+def slot_end(date: str, slot) -> Optional[float]:
+    """Fin du slot (epoch) : date UTC + (slot + 1) x 10 min, None si illisible"""
+    try:
+        day = datetime.strptime(str(date), "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        return day.timestamp() + (int(slot) + 1) * SLOT_SECONDS
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """(trace_id, span_id) d'un en-tête W3C traceparent, None s'il est absent ou invalide"""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32:
+        return None
+    return parts[1], parts[2]
+
+
+# ============================================================================
+# SPANS
+# ============================================================================
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 start: Optional[float] = None, attributes: Optional[dict] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.start = time.time() if start is None else start
+        self.end = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def finish(self, end: Optional[float] = None) -> None:
+        self.end = time.time() if end is None else end
+        SPAN_SECONDS.observe(max(0.0, self.end - self.start), name=self.name)
+        if EXPORTER is not None:
+            EXPORTER.submit(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(int(self.start * 1e9)),
+            "endTimeUnixNano": str(int((self.end or self.start) * 1e9)),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None, **attributes):
+    """Span enfant de la span courante, ou racine de trace_id (nouvelle trace si aucun)"""
+    parent = _current.get()
+    if trace_id is None and parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    current = Span(name, trace_id or _new_id(128), parent_id, attributes=attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        current.finish()
+
+
+def traced_request(name: str):
+    """Vue Flask exécutée dans une span ; un en-tête traceparent entrant la rattache à la trace de l'appelant"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import request
+            incoming = parse_traceparent(request.headers.get("traceparent"))
+            trace_id, parent_id = incoming if incoming else (None, None)
+            with span(name, trace_id=trace_id, parent_id=parent_id, route=request.path):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name: str, trace_id: str, start: float, end: float, parent_id: Optional[str] = None,
+                **attributes) -> Span:
+    """Span rétroactive (intervalle connu après coup, ex: attente dans la file d'ancrage)"""
+    recorded = Span(name, trace_id, parent_id, start=start, attributes=attributes)
+    recorded.finish(end)
+    return recorded
+
+
+# ============================================================================
+# ÉTAPES D'UN SLOT
+# ============================================================================
+
+class SlotTracker:
+    """
+    Étapes d'un slot en mémoire (bornées à max_tracked) :
+    vu finalisé à l'ingestion -> pris par l'auto-ancrage -> diffusé -> confirmé.
+    Après un redémarrage, les étapes déjà passées manquent : seules les
+    suivantes sont mesurées.
+    """
+
+    def __init__(self, max_tracked: int = TRACE_MAX_TRACKED):
+        self.max_tracked = max_tracked
+        self._lock = threading.Lock()
+        self._seen: "OrderedDict[tuple, float]" = OrderedDict()        # (router, date, slot) -> reçu à
+        self._unconfirmed: "OrderedDict[str, dict]" = OrderedDict()    # txid -> étapes, ordre de diffusion
+
+    def ingested(self, router_id: str, slots, parent: Optional[Span] = None) -> None:
+        """Slots finalisés vus pour la première fois dans une requête /anchor"""
+        now = time.time()
+        for slot_data in slots:
+            key = (router_id, slot_data.get("date"), slot_data.get("slot"))
+            with self._lock:
+                if key in self._seen:
+                    continue
+                self._seen[key] = now
+                while len(self._seen) > self.max_tracked:
+                    self._seen.popitem(last=False)
+            finalized_at = slot_end(key[1], key[2])
+            if finalized_at is not None:
+                SLOT_STAGE_SECONDS.observe(max(0.0, now - finalized_at), stage="ingest")
+            record_span("slot.ingest", slot_trace_id(*key), min(finalized_at or now, now), now,
+                        router_id=router_id, slot=key[2], date=key[1],
+                        request_trace_id=parent.trace_id if parent else "")
+
+    def scheduled(self, router_id: str, date: str, slot) -> None:
+        """Slot pris par un passage d'auto-ancrage"""
+        key = (router_id, date, slot)
+        now = time.time()
+        with self._lock:
+            seen_at = self._seen.pop(key, None)
+        if seen_at is not None:
+            SLOT_STAGE_SECONDS.observe(now - seen_at, stage="queue")
+            record_span("slot.queue", slot_trace_id(*key), seen_at, now, router_id=router_id, slot=slot, date=date)
+
+    def broadcast(self, router_id: str, date: str, slot, txid: str, sent_seconds: float,
+                  persist_seconds: float) -> None:
+        SLOT_STAGE_SECONDS.observe(sent_seconds, stage="send")
+        SLOT_STAGE_SECONDS.observe(persist_seconds, stage="persist")
+        with self._lock:
+            self._unconfirmed[txid] = {"key": (router_id, date, slot), "broadcast_at": time.time()}
+            while len(self._unconfirmed) > self.max_tracked:
+                self._unconfirmed.popitem(last=False)
+
+    def pending_confirmations(self) -> int:
+        return len(self._unconfirmed)
+
+    def check_confirmations(self, tx_status: Callable[[str], Optional[dict]],
+                            batch: int = TRACE_CONFIRM_BATCH, max_age: float = TRACE_CONFIRM_MAX_AGE) -> int:
+        """
+        Interroge au plus batch tx diffusées par passage. Une tx encore non
+        confirmée repasse en fin de file : une tx bloquée ne gèle pas les
+        suivantes, et son suivi est abandonné après max_age secondes.
+        Retourne le nombre de confirmations enregistrées.
+        """
+        with self._lock:
+            candidates = list(itertools.islice(self._unconfirmed.items(), batch))
+        confirmed = 0
+        for txid, entry in candidates:
+            try:
+                status = tx_status(txid)
+            except Exception as e:
+                log.warning("⚠️  Statut de confirmation indisponible pour %s: %s", txid, e)
+                return confirmed
+            now = time.time()
+            if status is not None and not status.get("confirmations"):
+                with self._lock:
+                    if txid not in self._unconfirmed:
+                        continue
+                    if now - entry["broadcast_at"] > max_age:
+                        del self._unconfirmed[txid]
+                        log.warning("⚠️  Tx %s toujours non confirmée après %ds : suivi abandonné",
+                                    txid, int(now - entry["broadcast_at"]))
+                    else:
+                        self._unconfirmed.move_to_end(txid)
+                continue
+            with self._lock:
+                self._unconfirmed.pop(txid, None)
+            if status is None:
+                continue  # tx inconnue du fournisseur : abandon du suivi
+            router_id, date, slot = entry["key"]
+            SLOT_STAGE_SECONDS.observe(now - entry["broadcast_at"], stage="confirm")
+            finalized_at = slot_end(date, slot)
+            if finalized_at is not None:
+                SLOT_STAGE_SECONDS.observe(max(0.0, now - finalized_at), stage="total")
+            record_span("slot.confirm", slot_trace_id(router_id, date, slot), entry["broadcast_at"], now,
+                        router_id=router_id, slot=slot, date=date, txid=txid,
+                        blockheight=status.get("blockheight") or 0)
+            confirmed += 1
+        return confirmed
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def _otlp_payload(spans) -> dict:
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "snr.tracing"}, "spans": spans}],
+    }]}
+
+
+class SpanExporter:
+    """File bornée + thread : NDJSON (path) et/ou POST OTLP/HTTP JSON (url), par lots"""
+
+    BATCH = 512
+
+    def __init__(self, path: str = "", url: str = "", queue_size: int = TRACE_QUEUE_SIZE):
+        self.path = path
+        self.url = url.rstrip("/")
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=queue_size)
+        threading.Thread(target=self._run, name="span-exporter", daemon=True).start()
+
+    def submit(self, finished: Span) -> None:
+        try:
+            self._queue.put_nowait(finished)
+        except queue.Full:
+            SPANS_EXPORTED.inc(result="dropped")
+
+    def _run(self) -> None:
+        import requests
+        while True:
+            batch = [self._queue.get()]
+            time.sleep(0.2)  # laisser les spans d'une même opération arriver ensemble
+            while len(batch) < self.BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            spans = [item.to_otlp() for item in batch]
+            try:
+                if self.path:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write("".join(json.dumps(item, separators=(",", ":")) + "\n" for item in spans))
+                if self.url:
+                    requests.post(f"{self.url}/v1/traces", json=_otlp_payload(spans), timeout=10).raise_for_status()
+                SPANS_EXPORTED.inc(len(spans), result="exported")
+            except Exception as e:
+                SPANS_EXPORTED.inc(len(spans), result="error")
+                log.warning("⚠️  Export des spans impossible: %s", e)
+
+
+EXPORTER = SpanExporter(TRACE_FILE, TRACE_OTLP_URL) if (TRACE_FILE or TRACE_OTLP_URL) else None
+SLOT_TRACKER = SlotTracker()
+
+
+@register_collector
+def _slot_tracker_metrics():
+    yield ("snr_anchor_unconfirmed", "gauge", "Ancrages diffusés en attente de confirmation (suivis en mémoire)",
+           [({}, SLOT_TRACKER.pending_confirmations())])
+
+
+# ============================================================================
+# COLLECTEUR DE REMPLACEMENT ET RÉSUMÉ
+# ============================================================================
+
+def _iter_spans(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def collect(port: int, output: str) -> None:
+    """Reçoit POST /v1/traces (OTLP/HTTP JSON) et ajoute chaque span à output"""
+    from flask import Flask, request, jsonify
+    app = Flask("trace-collector")
+    lock = threading.Lock()
+
+    @app.route("/v1/traces", methods=["POST"])
+    def traces():
+        payload = request.get_json(force=True) or {}
+        spans = [item for resource in payload.get("resourceSpans", [])
+                 for scope in resource.get("scopeSpans", []) for item in scope.get("spans", [])]
+        with lock, open(output, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(item, separators=(",", ":")) + "\n" for item in spans))
+        return jsonify({"partialSuccess": {}})
+
+    print(f"📥 Collecteur de traces sur :{port} -> {output}")
+    app.run(host="127.0.0.1", port=port, threaded=True)
+
+
+def summary(path: str) -> None:
+    """Durées par nom de span (p50/p95/max) et nombre de traces de slot complètes"""
+    durations: Dict[str, list] = {}
+    by_trace: Dict[str, set] = {}
+    for item in _iter_spans(path):
+        seconds = (int(item["endTimeUnixNano"]) - int(item["startTimeUnixNano"])) / 1e9
+        durations.setdefault(item["name"], []).append(seconds)
+        by_trace.setdefault(item["traceId"], set()).add(item["name"])
+    print(f"{'span':24} {'n':>7} {'p50':>10} {'p95':>10} {'max':>10}")
+    for name, values in sorted(durations.items()):
+        values.sort()
+        pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+        print(f"{name:24} {len(values):>7} {pick(0.5):>9.3f}s {pick(0.95):>9.3f}s {values[-1]:>9.3f}s")
+    complete = sum(1 for names in by_trace.values() if {"slot.ingest", "anchor.send", "slot.confirm"} <= names)
+    print(f"🧵 {len(by_trace)} traces, dont {complete} slots suivis de l'ingestion à la confirmation")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collecteur OTLP de remplacement et résumé des spans")
+    commands = parser.add_subparsers(dest="command", required=True)
+    collect_parser = commands.add_parser("collect", help="recevoir les spans (OTLP/HTTP JSON)")
+    collect_parser.add_argument("--port", type=int, default=4318)
+    collect_parser.add_argument("-o", "--output", default="spans.ndjson")
+    summary_parser = commands.add_parser("summary", help="résumer un fichier de spans")
+    summary_parser.add_argument("path")
+    args = parser.parse_args(argv)
+    if args.command == "collect":
+        collect(args.port, args.output)
+    else:
+        summary(args.path)
+
+
+if __name__ == "__main__":
+    main()
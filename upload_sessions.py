@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sessions d'upload reprenables pour les dumps forensiques.
+
+Protocole :
+1. begin  -> upload_id (état persisté sur disque)
+2. append -> ajoute un morceau à l'offset courant ; un offset différent est
+             refusé et l'offset réellement reçu est renvoyé
+3. status -> dernier offset reçu (pour reprendre après une coupure)
+4. commit -> vérifie la taille et le sha256 du corps complet
+
+Arborescence : <root>/<upload_id>/meta.json et body.part
+
+Exporte :
+- UploadSessionStore(root, max_bytes, ttl)
+- UploadError, OffsetMismatch
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import fcntl
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+COPY_CHUNK = 1 << 16
+
+
+class UploadError(ValueError):
+    """Erreur de protocole (session inconnue, taille ou digest invalides)"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, expected: int, received: int):
+        super().__init__(f"offset {received} refusé, offset courant {expected}", status=409)
+        self.expected = expected
+
+
+class UploadSessionStore:
+    def __init__(self, root: Path, max_bytes: int, ttl: int = 24 * 3600):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    def _dir(self, upload_id: str) -> Path:
+        # upload_id est un uuid hex : pas de séparateur de chemin possible
+        if not upload_id or not all(c in "0123456789abcdef" for c in upload_id):
+            raise UploadError("upload_id invalide", status=404)
+        return self.root / upload_id
+
+    def _read_meta(self, upload_id: str) -> dict:
+        meta_path = self._dir(upload_id) / "meta.json"
+        try:
+            return json.loads(meta_path.read_text())
+        except FileNotFoundError:
+            raise UploadError("upload inconnu ou expiré", status=404)
+
+    def _write_meta(self, upload_id: str, meta: dict) -> None:
+        meta_path = self._dir(upload_id) / "meta.json"
+        tmp = meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, meta_path)
+
+    def body_path(self, upload_id: str) -> Path:
+        return self._dir(upload_id) / "body.part"
+
+    def begin(self, router_id: Optional[str] = None, total_size: Optional[int] = None,
+              sha256: Optional[str] = None) -> dict:
+        self.expire()
+        if total_size is not None and total_size > self.max_bytes:
+            raise UploadError(f"Upload trop volumineux (max {self.max_bytes} octets)", status=413)
+        upload_id = uuid.uuid4().hex
+        self._dir(upload_id).mkdir()
+        self.body_path(upload_id).touch()
+        now = int(time.time())
+        meta = {
+            "upload_id": upload_id,
+            "router_id": router_id,
+            "total_size": total_size,
+            "sha256": sha256,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self._write_meta(upload_id, meta)
+        return self.status(upload_id)
+
+    def status(self, upload_id: str) -> dict:
+        meta = self._read_meta(upload_id)
+        meta["offset"] = self.body_path(upload_id).stat().st_size
+        return meta
+
+    def append(self, upload_id: str, offset: int, stream, length: Optional[int] = None) -> int:
+        """Ajoute le contenu de stream à l'offset donné et retourne le nouvel offset"""
+        meta = self._read_meta(upload_id)
+        limit = meta.get("total_size") or self.max_bytes
+        with open(self.body_path(upload_id), "ab") as body:
+            # Verrou exclusif : deux appends concurrents ne peuvent pas valider le même offset
+            fcntl.flock(body, fcntl.LOCK_EX)
+            current = os.fstat(body.fileno()).st_size
+            if offset != current:
+                raise OffsetMismatch(current, offset)
+            if length is not None and current + length > limit:
+                raise UploadError(f"Dépassement de la taille annoncée ({limit} octets)", status=413)
+            written = 0
+            try:
+                while True:
+                    chunk = stream.read(COPY_CHUNK)
+                    if not chunk:
+                        break
+                    if current + written + len(chunk) > limit:
+                        raise UploadError(f"Dépassement de la taille annoncée ({limit} octets)", status=413)
+                    body.write(chunk)
+                    written += len(chunk)
+            except UploadError:
+                # Annuler le morceau partiel pour garder un offset cohérent
+                body.flush()
+                body.truncate(current)
+                raise
+            # Un morceau interrompu reste valide : le client reprendra à l'offset reçu
+            body.flush()
+            os.fsync(body.fileno())
+        meta["updated_at"] = int(time.time())
+        self._write_meta(upload_id, meta)
+        return current + written
+
+    def verify(self, upload_id: str, sha256: Optional[str] = None) -> dict:
+        """Vérifie taille et digest du corps reçu avant commit"""
+        meta = self.status(upload_id)
+        if meta.get("total_size") is not None and meta["offset"] != meta["total_size"]:
+            raise UploadError(f"Upload incomplet: {meta['offset']}/{meta['total_size']} octets", status=409)
+        expected = (sha256 or meta.get("sha256") or "").lower()
+        if not expected:
+            raise UploadError("sha256 requis pour le commit")
+        digest = hashlib.sha256()
+        with open(self.body_path(upload_id), "rb") as body:
+            for chunk in iter(lambda: body.read(1 << 20), b""):
+                digest.update(chunk)
+        if digest.hexdigest() != expected:
+            raise UploadError("sha256 ne correspond pas au contenu reçu", status=422)
+        return meta
+
+    def discard(self, upload_id: str) -> None:
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def expire(self) -> int:
+        """Supprime les sessions inactives depuis plus de ttl secondes"""
+        now = time.time()
+        removed = 0
+        for session_dir in self.root.iterdir():
+            meta_path = session_dir / "meta.json"
+            try:
+                if now - meta_path.stat().st_mtime > self.ttl:
+                    shutil.rmtree(session_dir, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
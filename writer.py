@@ -1,11 +1,14 @@
 # gripid_bsv_chain/writer.py
 # -*- coding: utf-8 -*-
 """
-Fonctions d'ancrage/lecture sur la blockchain BSV (testnet) via bsvlib + WhatsOnChain.
+Fonctions d'ancrage/lecture sur la blockchain BSV (testnet) via bsvlib et un
+fournisseur de chaîne (WhatsOnChain par défaut, chaîne simulée avec
+CHAIN_PROVIDER=simulated ; voir chain_provider).
 
 Exporte :
 - send_hash_to_bsv(data_hash_hex: str) -> str
 - read_op_return(txid: str) -> str | None
+- get_tx_status(txid: str) -> dict | None
 - get_wallet_debug_info() -> dict
 """
 
@@ -15,17 +18,20 @@ import json
 import binascii
 from typing import Optional, List, Dict
 
-import requests
 from dotenv import load_dotenv
 
 from bsvlib import Wallet, Key
 from bsvlib.constants import Chain
-from bsvlib.service import WhatsOnChain
+
+from chain_provider import make_provider
+from logs import get_logger
+from tracing import span
+
+log = get_logger("writer")
 
 # Chargement des variables d'environnement (.env à la racine du projet)
 load_dotenv()
 
-WOC_BASE = "https://api.whatsonchain.com/v1/bsv/test"
 BSV_TESTNET_WIF = os.getenv("BSV_TESTNET_WIF")
 
 if not BSV_TESTNET_WIF:
@@ -33,31 +39,19 @@ if not BSV_TESTNET_WIF:
         "BSV_TESTNET_WIF manquant. Renseigne-le dans le fichier .env à la racine du projet."
     )
 
-# Provider WoC pour bsvlib (testnet)
-PROVIDER = WhatsOnChain(Chain.TEST)
-
 # Adresse dérivée du WIF (testnet)
 KEY = Key(BSV_TESTNET_WIF)
 ADDRESS = KEY.address()
 
+# Fournisseur de chaîne pour bsvlib et les lectures (CHAIN_PROVIDER=woc|simulated)
+PROVIDER = make_provider(fund_address=ADDRESS)
+
 
 def _sum_unspents_satoshis(addr: str) -> int:
-    url = f"{WOC_BASE}/address/{addr}/unspent/all"
     try:
-        r = requests.get(url, timeout=20)
-        r.raise_for_status()
-        response = r.json()
-
-        if isinstance(response, dict) and "result" in response:
-            utxos = response["result"]
-        elif isinstance(response, list):
-            utxos = response
-        else:
-            print("[ERROR] Format UTXO inattendu :", response)
-            return 0
-
+        utxos = PROVIDER.address_unspents(addr)
     except Exception as e:
-        print(f"[ERROR] Exception lors du fetch UTXOs: {e}")
+        log.error("Exception lors du fetch UTXOs: %s", e)
         return 0
 
     total = 0
@@ -66,7 +60,7 @@ def _sum_unspents_satoshis(addr: str) -> int:
             sat = u.get("value", u.get("satoshis", 0))
             total += int(sat)
         else:
-            print(f"[WARN] UTXO ignoré (type={type(u)}): {u}")
+            log.warning("UTXO ignoré (type=%s): %s", type(u).__name__, u)
     return total
 
 
@@ -124,7 +118,8 @@ def send_hash_to_bsv(data_hash_hex: str) -> str:
     except binascii.Error as e:
         raise ValueError(f"data_hash_hex invalide: {e}")
 
-    balance = _sum_unspents_satoshis(ADDRESS)
+    with span("bsv.utxo_fetch"):
+        balance = _sum_unspents_satoshis(ADDRESS)
     MIN_FEE_SAT = 500
     if balance < MIN_FEE_SAT:
         raise RuntimeError(
@@ -132,16 +127,21 @@ def send_hash_to_bsv(data_hash_hex: str) -> str:
             f"Solde actuel: {balance} sat."
         )
 
-    wallet = Wallet(chain=Chain.TEST, provider=PROVIDER)
-    wallet.add_key(KEY)
+    # create_transaction relit les UTXOs du wallet puis signe
+    with span("bsv.sign"):
+        wallet = Wallet(chain=Chain.TEST, provider=PROVIDER)
+        wallet.add_key(KEY)
 
-    tx = wallet.create_transaction(
-        outputs=[],
-        pushdatas=[data_bytes],
-        combine=True,
-    )
+        tx = wallet.create_transaction(
+            outputs=[],
+            pushdatas=[data_bytes],
+            combine=True,
+        )
 
-    result = tx.broadcast()
+    with span("bsv.broadcast", provider=PROVIDER.name):
+        result = tx.broadcast()
+    if getattr(result, "propagated", True) is False:
+        raise RuntimeError(f"Diffusion refusée par {PROVIDER.name}: {result.data}")
 
     # Correction ici
     txid = None
@@ -169,12 +169,7 @@ def send_hash_to_bsv(data_hash_hex: str) -> str:
 
 
 def read_op_return(txid: str) -> Optional[str]:
-    url = f"{WOC_BASE}/tx/{txid}/opreturn"
-    r = requests.get(url, timeout=20)
-    if r.status_code == 404:
-        return None
-    r.raise_for_status()
-    items = r.json() or []
+    items = PROVIDER.op_return(txid)
 
     if not items:
         return None
@@ -191,13 +186,14 @@ def read_op_return(txid: str) -> Optional[str]:
     return None
 
 
+def get_tx_status(txid: str) -> Optional[Dict[str, object]]:
+    return PROVIDER.tx_status(txid)
+
+
 def get_wallet_debug_info() -> Dict[str, object]:
     balance = _sum_unspents_satoshis(ADDRESS)
-    url = f"{WOC_BASE}/address/{ADDRESS}/unspent/all"
     try:
-        r = requests.get(url, timeout=20)
-        r.raise_for_status()
-        utxos = r.json() or []
+        utxos = PROVIDER.address_unspents(ADDRESS)
     except Exception:
         utxos = []
 
@@ -205,7 +201,7 @@ def get_wallet_debug_info() -> Dict[str, object]:
         "address": ADDRESS,
         "balance_satoshis": int(balance),
         "unspent_count": len(utxos),
-        "provider": "WhatsOnChain testnet",
+        "provider": f"{PROVIDER.name} testnet",
         "time": int(time.time()),
     }
 